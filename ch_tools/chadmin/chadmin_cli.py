@@ -1,13 +1,12 @@
 #!/usr/bin/env python3
 import warnings
 from datetime import timedelta
-from typing import Any, List
+from typing import Dict
 
 import cloup
 from click import Context
 
 from ch_tools.chadmin.cli.chadmin_group import Chadmin
-from ch_tools.chadmin.cli.move_group import move_group
 from ch_tools.common.config import load_config
 from ch_tools.common.utils import update_by_key_path
 
@@ -19,39 +18,6 @@ warnings.filterwarnings(
 # pylint: disable=wrong-import-position
 
 from ch_tools import __version__
-from ch_tools.chadmin.cli.chs3_backup_group import chs3_backup_group
-from ch_tools.chadmin.cli.config_command import config_command
-from ch_tools.chadmin.cli.crash_log_group import crash_log_group
-from ch_tools.chadmin.cli.data_store_group import data_store_group
-from ch_tools.chadmin.cli.database_group import database_group
-from ch_tools.chadmin.cli.diagnostics_command import diagnostics_command
-from ch_tools.chadmin.cli.dictionary_group import dictionary_group
-from ch_tools.chadmin.cli.disk_group import disks_group
-from ch_tools.chadmin.cli.flamegraph_group import flamegraph_group
-from ch_tools.chadmin.cli.list_async_metrics_command import list_async_metrics_command
-from ch_tools.chadmin.cli.list_events_command import list_events_command
-from ch_tools.chadmin.cli.list_functions_command import list_functions_command
-from ch_tools.chadmin.cli.list_macros_command import list_macros_command
-from ch_tools.chadmin.cli.list_metrics_command import list_metrics_command
-from ch_tools.chadmin.cli.list_settings_command import list_settings_command
-from ch_tools.chadmin.cli.merge_group import merge_group
-from ch_tools.chadmin.cli.mutation_group import mutation_group
-from ch_tools.chadmin.cli.object_storage_group import object_storage_group
-from ch_tools.chadmin.cli.part_group import part_group
-from ch_tools.chadmin.cli.part_log_group import part_log_group
-from ch_tools.chadmin.cli.partition_group import partition_group
-from ch_tools.chadmin.cli.process_group import process_group
-from ch_tools.chadmin.cli.query_log_group import query_log_group
-from ch_tools.chadmin.cli.replica_group import replica_group
-from ch_tools.chadmin.cli.replicated_fetch_group import replicated_fetch_group
-from ch_tools.chadmin.cli.replication_queue_group import replication_queue_group
-from ch_tools.chadmin.cli.restore_replica_command import restore_replica_command
-from ch_tools.chadmin.cli.s3_credentials_config_group import s3_credentials_config_group
-from ch_tools.chadmin.cli.stack_trace_command import stack_trace_command
-from ch_tools.chadmin.cli.table_group import table_group
-from ch_tools.chadmin.cli.thread_log_group import thread_log_group
-from ch_tools.chadmin.cli.wait_group import wait_group
-from ch_tools.chadmin.cli.zookeeper_group import zookeeper_group
 from ch_tools.common.cli.context_settings import CONTEXT_SETTINGS
 from ch_tools.common.cli.locale_resolver import LocaleResolver
 from ch_tools.common.cli.parameters import TimeSpanParamType, YamlParamType
@@ -112,53 +78,53 @@ def cli(
     ctx.default_map = config["chadmin"]
 
 
-commands: List[Any] = [
-    config_command,
-    diagnostics_command,
-    data_store_group,
-    list_async_metrics_command,
-    list_events_command,
-    list_functions_command,
-    list_macros_command,
-    list_metrics_command,
-    list_settings_command,
-    restore_replica_command,
-    stack_trace_command,
-]
-
-groups: List[Any] = [
-    chs3_backup_group,
-    crash_log_group,
-    data_store_group,
-    database_group,
-    dictionary_group,
-    disks_group,
-    merge_group,
-    move_group,
-    mutation_group,
-    object_storage_group,
-    part_group,
-    part_log_group,
-    s3_credentials_config_group,
-    partition_group,
-    process_group,
-    query_log_group,
-    replicated_fetch_group,
-    replication_queue_group,
-    table_group,
-    replica_group,
-    thread_log_group,
-    wait_group,
-    zookeeper_group,
-    flamegraph_group,
-]
+# Commands are imported on first use from modules of ch_tools.chadmin.cli package
+commands: Dict[str, str] = {
+    "config": "config_command:config_command",
+    "diagnostics": "diagnostics_command:diagnostics_command",
+    "async-metrics": "list_async_metrics_command:list_async_metrics_command",
+    "events": "list_events_command:list_events_command",
+    "functions": "list_functions_command:list_functions_command",
+    "macros": "list_macros_command:list_macros_command",
+    "metrics": "list_metrics_command:list_metrics_command",
+    "settings": "list_settings_command:list_settings_command",
+    "restore-replica": "restore_replica_command:restore_replica_command",
+    "stack-trace": "stack_trace_command:stack_trace_command",
+}
+
+groups: Dict[str, str] = {
+    "chs3-backup": "chs3_backup_group:chs3_backup_group",
+    "crash-log": "crash_log_group:crash_log_group",
+    "data-store": "data_store_group:data_store_group",
+    "database": "database_group:database_group",
+    "dictionary": "dictionary_group:dictionary_group",
+    "disks": "disk_group:disks_group",
+    "merge": "merge_group:merge_group",
+    "move": "move_group:move_group",
+    "mutation": "mutation_group:mutation_group",
+    "object-storage": "object_storage_group:object_storage_group",
+    "part": "part_group:part_group",
+    "part-log": "part_log_group:part_log_group",
+    "s3-credentials-config": "s3_credentials_config_group:s3_credentials_config_group",
+    "partition": "partition_group:partition_group",
+    "process": "process_group:process_group",
+    "query-log": "query_log_group:query_log_group",
+    "replicated-fetch": "replicated_fetch_group:replicated_fetch_group",
+    "replication-queue": "replication_queue_group:replication_queue_group",
+    "table": "table_group:table_group",
+    "replica": "replica_group:replica_group",
+    "thread-log": "thread_log_group:thread_log_group",
+    "wait": "wait_group:wait_group",
+    "zookeeper": "zookeeper_group:zookeeper_group",
+    "flamegraph": "flamegraph_group:flamegraph_group",
+}
 
 section = cloup.Section("Commands")
-for command in commands:
-    cli.add_command(command, section=section)
+for name, import_path in commands.items():
+    cli.add_lazy_command(name, f"ch_tools.chadmin.cli.{import_path}", section=section)
 section = cloup.Section("Groups")
-for group in groups:
-    cli.add_group(group, section=section)
+for name, import_path in groups.items():
+    cli.add_lazy_command(name, f"ch_tools.chadmin.cli.{import_path}", section=section)
 
 
 def main() -> None:
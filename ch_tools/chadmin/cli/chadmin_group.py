@@ -7,12 +7,13 @@ import cloup
 
 from ch_tools import __version__
 from ch_tools.common import logging
+from ch_tools.common.cli.lazy_group import LazyGroup
 from ch_tools.common.utils import get_full_command_name
 
 # pylint: disable=too-many-ancestors
 
 
-class Chadmin(cloup.Group):
+class Chadmin(LazyGroup):
     def add_command(
         self,
         cmd: click.Command,
@@ -78,3 +79,11 @@ class Chadmin(cloup.Group):
             section=section,
             fallback_to_default_section=fallback_to_default_section,
         )
+
+    def _add_loaded_command(
+        self, cmd: click.Command, name: str, section: Optional[cloup.Section]
+    ) -> None:
+        if isinstance(cmd, click.Group):
+            self.add_group(cmd, name=name, section=section)
+        else:
+            self.add_command(cmd, name=name, section=section)
@@ -1,11 +1,10 @@
 import os
 import shutil
-import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
-from typing import Any, Dict, List, NamedTuple, Optional, Set
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
 
-import boto3
-from boto3 import client as Boto3Client
 from click import Context, group, option, pass_context
 from cloup.constraints import AcceptAtMost, constraint
 
@@ -18,21 +17,39 @@ from ch_tools.chadmin.internal.clickhouse_disks import (
     make_ch_disks_config,
     remove_from_ch_disk,
 )
+from ch_tools.chadmin.internal.data_store import (
+    DEFAULT_SCAN_WORKERS,
+    MetadataUuidIndex,
+    format_disk_usage,
+    get_disk_usage,
+)
+from ch_tools.chadmin.internal.object_storage.blob_inventory import (
+    BlobInventory,
+    open_blob_inventory,
+)
+from ch_tools.chadmin.internal.object_storage.s3_existence import (
+    DEFAULT_CHECK_WORKERS,
+    find_missing_keys,
+)
 from ch_tools.chadmin.internal.object_storage.s3_object_metadata import (
-    S3ObjectLocalInfo,
     S3ObjectLocalMetaData,
 )
 from ch_tools.chadmin.internal.system import get_version
-from ch_tools.chadmin.internal.utils import execute_query, remove_from_disk
+from ch_tools.chadmin.internal.utils import (
+    execute_query,
+    iter_query_rows,
+    remove_from_disk,
+)
 from ch_tools.common import logging
 from ch_tools.common.cli.formatting import print_response
-from ch_tools.common.clickhouse.client import OutputFormat
 from ch_tools.common.clickhouse.config import get_clickhouse_config
 from ch_tools.common.clickhouse.config.storage_configuration import S3DiskConfiguration
 from ch_tools.common.process_pool import WorkerTask, execute_tasks_in_parallel
 
 ATTACH_DETTACH_TIMEOUT = 5000
 ATTACH_DETACH_QUERY_RETRY = 10
+# Number of directories with metadata files parsed by a process pool task
+METADATA_PARSE_CHUNK_SIZE = 256
 
 
 class TablePartition(NamedTuple):
@@ -75,23 +92,29 @@ def data_store_group() -> None:
     default=True,
     help="Flag to only orphaned metadata.",
 )
+@option(
+    "--max-workers",
+    default=DEFAULT_SCAN_WORKERS,
+    help="Max workers for scanning directories.",
+)
 def clean_orphaned_tables_command(
     ctx: Context,
     column: Optional[str],
     remove: bool,
     store_path: str,
     show_only_orphaned_metadata: bool,
+    max_workers: int,
 ) -> None:
+    metadata_index = MetadataUuidIndex.build(CLICKHOUSE_PATH, max_workers)
+    logging.info("Found {} UUIDs referenced in metadata", len(metadata_index))
+    disk_usage = get_disk_usage(store_path, max_workers)
+
     results: List[Dict[str, Any]] = []
-    for prefix in os.listdir(store_path):
+    for prefix, size in sorted(disk_usage.items()):
         path = store_path + "/" + prefix
-        try:
-            path_result = process_path(path, prefix, column, remove)
-        except subprocess.CalledProcessError as e:
-            if "No such file or directory" in e.stdout.decode("utf-8"):
-                print("Skip directory {} because it is removed: {}", path, e.stdout)
-                continue
-            raise
+        path_result = process_path(
+            path, prefix, format_disk_usage(size), metadata_index, column, remove
+        )
 
         if show_only_orphaned_metadata and path_result["status"] != "not_used":
             continue
@@ -103,6 +126,8 @@ def clean_orphaned_tables_command(
 def process_path(
     path: str,
     prefix: str,
+    size: str,
+    metadata_index: MetadataUuidIndex,
     column: Optional[str],
     remove: bool,
 ) -> Dict[str, Any]:
@@ -111,15 +136,12 @@ def process_path(
     result: Dict[str, Any] = {
         "path": path,
         "status": "unknown",
-        "size": 0,
+        "size": size,
         "removed": False,
     }
-
-    size = du(path)
     logging.info("Size of path {}: {}", path, size)
-    result["size"] = size
 
-    file = prefix_exists_in_metadata(prefix)
+    file = metadata_index.find(prefix)
 
     if file:
         logging.info('Prefix "{}" is used in metadata file "{}"', prefix, file)
@@ -149,22 +171,6 @@ def process_path(
     return result
 
 
-def prefix_exists_in_metadata(prefix: str) -> Optional[str]:
-    for w in os.walk(CLICKHOUSE_PATH):
-        dir_name = w[0]
-        filenames = w[2]
-
-        for file in filenames:
-            if not file.endswith(".sql"):
-                continue
-
-            with open(dir_name + "/" + file, encoding="utf-8") as f:
-                if f"'{prefix}" in f.read():
-                    return file
-
-    return None
-
-
 def additional_check_successed(column: str, path: str) -> bool:
     for w in os.walk(path):
         filenames = w[2]
@@ -176,14 +182,6 @@ def additional_check_successed(column: str, path: str) -> bool:
     return False
 
 
-def du(path: str) -> str:
-    return (
-        subprocess.check_output(["du", "-sh", path], stderr=subprocess.STDOUT)
-        .split()[0]
-        .decode("utf-8")
-    )
-
-
 def remove_data(path: str) -> None:
     def onerror(*args: Any) -> None:
         errors = "\n".join(list(args))
@@ -370,10 +368,15 @@ def collect_orphaned_sql_objects_recursive(
     default=False,
     help="Flag to detach broken partitions.",
 )
+@option(
+    "--max-workers",
+    default=DEFAULT_CHECK_WORKERS,
+    help="Max workers for parsing metadata files and checking objects.",
+)
 @constraint(AcceptAtMost(1), ["detach", "reattach"])
 @pass_context
 def detect_broken_partitions(
-    ctx: Context, root_path: str, reattach: bool, detach: bool
+    ctx: Context, root_path: str, reattach: bool, detach: bool, max_workers: int
 ) -> None:
     ch_config = get_clickhouse_config(ctx)
 
@@ -382,61 +385,57 @@ def detect_broken_partitions(
         "object_storage",
         ctx.obj["config"]["object_storage"]["bucket_name_prefix"],
     )
-    s3_client = boto3.client(
-        "s3",
-        endpoint_url=disk_conf.endpoint_url,
-        aws_access_key_id=disk_conf.access_key_id,
-        aws_secret_access_key=disk_conf.secret_access_key,
-    )
-    repaired_partitions: Set[TablePartition] = set()
 
-    for path, _, files in os.walk(root_path):
-        objects: List[S3ObjectLocalInfo] = []
-        logging.debug(f"Checking files from: {path}")
-        for file in files:
-            try:
-                file_full_path = Path(os.path.join(path, file))
-                objects.extend(S3ObjectLocalMetaData.from_file(file_full_path).objects)
-            except Exception as e:
-                logging.error("Failed to perform extend objects: {!r}", e)
-
-        for s3_object in objects:
-            object_storage_key = os.path.join(disk_conf.prefix, s3_object.key)
+    inventory = open_blob_inventory(ctx)
+    try:
+        part_keys = read_parts_metadata(
+            root_path, disk_conf.prefix, max_workers, inventory
+        )
+    finally:
+        if inventory:
+            inventory.close()
+    missing_keys = find_missing_keys(
+        disk_conf,
+        (key for keys in part_keys.values() for key in keys),
+        max_workers,
+    )
+    logging.debug("Found {} missing keys", len(missing_keys))
 
-            if check_key_in_object_storage(
-                s3_client, disk_conf.bucket_name, object_storage_key
-            ):
-                continue
+    partitions = PartitionResolver(ctx, root_path)
+    repaired_partitions: Set[TablePartition] = set()
 
-            logging.debug("Not found key {}", object_storage_key)
+    for path, keys in sorted(part_keys.items()):
+        missing_key = next((key for key in keys if key in missing_keys), None)
+        if missing_key is None:
+            continue
 
-            table_partition = get_partition_by_path(ctx, path)
+        logging.debug("Not found key {}", missing_key)
 
-            if table_partition is None:
-                logging.warning("Skip failed path {}.", path)
-                break
+        table_partition = partitions.get(path)
 
-            if table_partition not in repaired_partitions:
-                repaired_partitions.add(table_partition)
+        if table_partition is None:
+            logging.warning("Skip failed path {}.", path)
+            continue
 
-                logging.debug(
-                    "Found the partition with missing blob in the object storage: path={} table={} partition={} ",
-                    path,
-                    table_partition.table,
-                    table_partition.partition,
-                )
-                if detach:
-                    try_repair_partition(ctx, table_partition, False)
-                elif reattach:
-                    try_repair_partition(ctx, table_partition)
-            else:
-                logging.debug(
-                    "Partition {} for table {} was already repared. Skip.",
-                    table_partition.partition,
-                    table_partition.table,
-                )
+        if table_partition not in repaired_partitions:
+            repaired_partitions.add(table_partition)
 
-            break
+            logging.debug(
+                "Found the partition with missing blob in the object storage: path={} table={} partition={} ",
+                path,
+                table_partition.table,
+                table_partition.partition,
+            )
+            if detach:
+                try_repair_partition(ctx, table_partition, False)
+            elif reattach:
+                try_repair_partition(ctx, table_partition)
+        else:
+            logging.debug(
+                "Partition {} for table {} was already repared. Skip.",
+                table_partition.partition,
+                table_partition.table,
+            )
 
     print_partitions(ctx, repaired_partitions)
 
@@ -446,6 +445,53 @@ def detect_broken_partitions(
     )
 
 
+def read_parts_metadata(
+    root_path: str,
+    prefix: str,
+    max_workers: int,
+    inventory: Optional[BlobInventory] = None,
+) -> Dict[str, List[str]]:
+    """
+    Parse metadata files of all directories under the root path in a process pool.
+    Return object storage keys referenced in each directory.
+
+    If the inventory is passed, only directories modified since its last refresh
+    are parsed.
+    """
+    if inventory:
+        inventory.refresh(root_path, max_workers)
+        return inventory.get_dir_keys(root_path, prefix)
+
+    dirs = [(path, files) for path, _, files in os.walk(root_path) if files]
+    result: Dict[str, List[str]] = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for path, keys, errors in executor.map(
+            _parse_dir_metadata,
+            dirs,
+            repeat(prefix),
+            chunksize=METADATA_PARSE_CHUNK_SIZE,
+        ):
+            for error in errors:
+                logging.error("Failed to perform extend objects: {}", error)
+            result[path] = keys
+    return result
+
+
+def _parse_dir_metadata(
+    dir_files: Tuple[str, List[str]], prefix: str
+) -> Tuple[str, List[str], List[str]]:
+    path, files = dir_files
+    keys: List[str] = []
+    errors: List[str] = []
+    for file in files:
+        try:
+            metadata = S3ObjectLocalMetaData.from_file(Path(os.path.join(path, file)))
+            keys.extend(os.path.join(prefix, obj.key) for obj in metadata.objects)
+        except Exception as e:
+            errors.append(repr(e))
+    return path, keys, errors
+
+
 def try_repair_partition(
     ctx: Context, table_partition: TablePartition, attach: bool = True
 ) -> None:
@@ -458,40 +504,34 @@ def try_repair_partition(
         attach_partition(ctx, table_partition)
 
 
-def check_key_in_object_storage(s3_client: Boto3Client, bucket: str, key: str) -> bool:
+class PartitionResolver:
     """
-    Check that object exists in s3 bucket with the specified key.
+    Resolver of part paths to partitions. Parts under the root path are loaded from
+    system.parts with a single query on the first lookup.
     """
-    s3_resp = s3_client.list_objects_v2(
-        Bucket=bucket,
-        Prefix=key,
-    )
-    if "Contents" not in s3_resp:
-        return False
-    if len(s3_resp["Contents"]) != 1:
-        return False
-    res = s3_resp["Contents"][0]["Key"] == key
-    return res
-
-
-def get_partition_by_path(ctx: Context, path: str) -> Optional[TablePartition]:
-    """
-    Get partition from path
-    """
-    query_string = (
-        f"SELECT database, table, partition FROM system.parts WHERE path='{path}/'"
-    )
-    res = execute_query(ctx, query_string, format_=OutputFormat.JSONCompact)
-    if "data" not in res:
-        logging.warning("Not found data for part with path {}", path)
-        return None
-
-    if len(res["data"]) != 1 or len(res["data"][0]) != 3:
-        return None
 
-    table = f"`{res['data'][0][0]}`.`{res['data'][0][1]}`"
-    partition = res["data"][0][2]
-    return TablePartition(table, partition)
+    def __init__(self, ctx: Context, root_path: str) -> None:
+        self._ctx = ctx
+        self._root_path = os.path.join(root_path, "")
+        self._partitions: Optional[Dict[str, TablePartition]] = None
+
+    def get(self, path: str) -> Optional[TablePartition]:
+        if self._partitions is None:
+            self._partitions = self._load()
+        return self._partitions.get(os.path.join(path, ""))
+
+    def _load(self) -> Dict[str, TablePartition]:
+        query = f"""
+            SELECT path, database, table, partition
+            FROM system.parts
+            WHERE startsWith(path, '{self._root_path}')
+            """
+        partitions: Dict[str, TablePartition] = {}
+        for row in iter_query_rows(self._ctx, query):
+            table = f"`{row['database']}`.`{row['table']}`"
+            partitions[row["path"]] = TablePartition(table, row["partition"])
+        logging.debug("Loaded {} parts from system.parts", len(partitions))
+        return partitions
 
 
 def print_partitions(ctx: Context, repaired_partitions: Set[TablePartition]) -> None:
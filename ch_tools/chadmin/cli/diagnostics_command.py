@@ -1,6 +1,10 @@
 import cloup
 from click import Context, pass_context
 
+from ch_tools.chadmin.internal.diagnostics.data import (
+    DEFAULT_MAX_WORKERS,
+    DEFAULT_TASK_TIMEOUT,
+)
 from ch_tools.chadmin.internal.diagnostics.diagnose import diagnose
 from ch_tools.common.cli.parameters import env_var_help
 
@@ -27,11 +31,31 @@ from ch_tools.common.cli.parameters import env_var_help
     help="Whether to normalize queries for ClickHouse client. "
     + env_var_help("CHADMIN_DIAGNOSTICS_NORMALIZE_QUERIES"),
 )
+@cloup.option(
+    "--max-workers",
+    type=int,
+    default=DEFAULT_MAX_WORKERS,
+    envvar="CHADMIN_DIAGNOSTICS_MAX_WORKERS",
+    help="Max number of concurrently executed queries and commands. "
+    + env_var_help("CHADMIN_DIAGNOSTICS_MAX_WORKERS"),
+)
+@cloup.option(
+    "--timeout",
+    type=int,
+    default=DEFAULT_TASK_TIMEOUT,
+    envvar="CHADMIN_DIAGNOSTICS_TIMEOUT",
+    help="Timeout in seconds for each query and command, partial results are reported "
+    "on timeout. " + env_var_help("CHADMIN_DIAGNOSTICS_TIMEOUT"),
+)
 @pass_context
 def diagnostics_command(
-    ctx: Context, output_format: str, normalize_queries: bool
+    ctx: Context,
+    output_format: str,
+    normalize_queries: bool,
+    max_workers: int,
+    timeout: int,
 ) -> None:
     """
     Collect diagnostics data.
     """
-    diagnose(ctx, output_format, normalize_queries)
+    diagnose(ctx, output_format, normalize_queries, max_workers, timeout)
@@ -19,6 +19,7 @@ from ch_tools.common.clickhouse.config import get_clickhouse_config
 from ch_tools.common.clickhouse.config.storage_configuration import S3DiskConfiguration
 from ch_tools.common.commands.clean_object_storage import (
     DEFAULT_GUARD_INTERVAL,
+    AntijoinMode,
     CleanScope,
     clean,
 )
@@ -114,6 +115,47 @@ def object_storage_group(ctx: Context, disk_name: str) -> None:
     is_flag=True,
     help=("Use saved object list without traversing object storage again."),
 )
+@option(
+    "--resume-listing",
+    "resume_listing",
+    is_flag=True,
+    help=(
+        "Resume interrupted listing of object storage from the saved checkpoint. "
+        "The listing table must be kept by the previous run with --keep-paths."
+    ),
+)
+@option(
+    "--resume",
+    "resume",
+    is_flag=True,
+    help=(
+        "Resume interrupted clean from the saved checkpoint: continue listing, "
+        "skip completed antijoin and objects that are already deleted. "
+        "If the clean fails, its tables are kept only with this option or --keep-paths."
+    ),
+)
+@option(
+    "--antijoin-mode",
+    "antijoin_mode",
+    type=Choice([mode.value for mode in AntijoinMode]),
+    default=None,
+    help=(
+        "How to find orphaned objects: 'table' joins the listing inserted into a table, "
+        "'merge' merges sorted listing with remote data paths without tables. "
+        "Default value is taken from the config."
+    ),
+)
+@option(
+    "--antijoin-buckets",
+    "antijoin_buckets",
+    type=IntRange(min=1),
+    default=None,
+    help=(
+        "Split the antijoin into the number of buckets by hash of the path and join "
+        "them one by one to bound memory consumption of the server. "
+        "Default value is taken from the config."
+    ),
+)
 @option(
     "--store-state-local",
     "store_state_local",
@@ -165,6 +207,10 @@ def clean_command(
     dry_run: bool,
     keep_paths: bool,
     use_saved_list: bool,
+    resume_listing: bool,
+    resume: bool,
+    antijoin_mode: Optional[str],
+    antijoin_buckets: Optional[int],
     store_state_local: bool,
     store_state_zk_path: str,
     verify_paths_regex: Optional[str],
@@ -182,6 +228,12 @@ def clean_command(
     if cluster_name == DEFAULT_CLUSTER_NAME:
         cluster_name = "{" + cluster_name + "}"
 
+    clean_config = ctx.obj["config"]["object_storage"]["clean"]
+    if antijoin_mode is None:
+        antijoin_mode = clean_config["antijoin_mode"]
+    if antijoin_buckets is None:
+        antijoin_buckets = clean_config["antijoin_buckets"]
+
     try:
         deleted, total_size = clean(
             ctx,
@@ -196,6 +248,10 @@ def clean_command(
             verify_paths_regex,
             max_size_to_delete_bytes,
             max_size_to_delete_fraction,
+            resume_listing,
+            AntijoinMode(antijoin_mode),
+            antijoin_buckets,
+            resume,
         )
     finally:
         state = OrphanedObjectsState(total_size, error_msg)
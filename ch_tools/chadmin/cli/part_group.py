@@ -1,5 +1,5 @@
 from collections import OrderedDict
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional
 
 from click import Context
 from cloup import Choice, group, option, option_group, pass_context
@@ -13,6 +13,7 @@ from ch_tools.chadmin.internal.part import (
     drop_detached_part_from_disk,
     drop_part,
     get_disks,
+    iter_parts,
     list_detached_parts,
     list_parts,
     move_part,
@@ -126,10 +127,11 @@ def list_parts_command(
 
         return result
 
+    parts: Iterable[Dict[str, Any]]
     if detached:
         parts = list_detached_parts(ctx, reason=reason, **kwargs)
     else:
-        parts = list_parts(
+        parts = iter_parts(
             ctx,
             active=active,
             min_size=min_size,
@@ -1,5 +1,4 @@
 import json
-from collections import OrderedDict
 from typing import Any, Dict, Optional
 
 from click import Context
@@ -13,6 +12,8 @@ from ch_tools.chadmin.internal.partition import (
     drop_partition,
     materialize_ttl_in_partition,
     optimize_partition,
+    process_partitions,
+    reattach_partition,
 )
 from ch_tools.chadmin.internal.utils import execute_query
 from ch_tools.common import logging
@@ -186,6 +187,7 @@ def list_partitions_command(ctx: Context, **kwargs: Any) -> None:
     default=False,
     help="Enable dry run mode and do not perform any modifying actions.",
 )
+@option("-w", "--workers", default=4, help="Number of workers.")
 @pass_context
 def attach_partitions_command(
     ctx: Context,
@@ -195,6 +197,7 @@ def attach_partitions_command(
     partition_id: Optional[str],
     keep_going: bool,
     dry_run: bool,
+    workers: int,
     **kwargs: Any,
 ) -> None:
     """Attach one or several partitions."""
@@ -207,20 +210,14 @@ def attach_partitions_command(
         format_="JSON",
         **kwargs,
     )["data"]
-    for p in partitions:
-        try:
-            attach_partition(
-                ctx,
-                database=p["database"],
-                table=p["table"],
-                partition_id=p["partition_id"],
-                dry_run=dry_run,
-            )
-        except Exception as e:
-            if keep_going:
-                logging.warning("{!r}\n", e)
-            else:
-                raise
+    process_partitions(
+        partitions,
+        attach_partition,
+        ctx=ctx,
+        dry_run=dry_run,
+        workers=workers,
+        keep_going=keep_going,
+    )
 
 
 @partition_group.command("detach")
@@ -320,6 +317,7 @@ def attach_partitions_command(
     default=False,
     help="Enable dry run mode and do not perform any modifying actions.",
 )
+@option("-w", "--workers", default=4, help="Number of workers.")
 @pass_context
 def detach_partitions_command(
     ctx: Context,
@@ -336,6 +334,7 @@ def detach_partitions_command(
     replication_task_exception: Optional[str],
     keep_going: bool,
     dry_run: bool,
+    workers: int,
     use_partition_list_from_json: Optional[str],
 ) -> None:
     """Detach one or several partitions."""
@@ -354,20 +353,14 @@ def detach_partitions_command(
         format_="JSON",
         use_partition_list_from_json=use_partition_list_from_json,
     )["data"]
-    for p in partitions:
-        try:
-            detach_partition(
-                ctx,
-                database=p["database"],
-                table=p["table"],
-                partition_id=p["partition_id"],
-                dry_run=dry_run,
-            )
-        except Exception as e:
-            if keep_going:
-                logging.warning("{!r}\n", e)
-            else:
-                raise
+    process_partitions(
+        partitions,
+        detach_partition,
+        ctx=ctx,
+        dry_run=dry_run,
+        workers=workers,
+        keep_going=keep_going,
+    )
 
 
 @partition_group.command("reattach")
@@ -481,6 +474,7 @@ def detach_partitions_command(
     default=False,
     help="Enable dry run mode and do not perform any modifying actions.",
 )
+@option("-w", "--workers", default=4, help="Number of workers.")
 @pass_context
 def reattach_partitions_command(
     ctx: Context,
@@ -501,19 +495,10 @@ def reattach_partitions_command(
     keep_going: bool,
     limit_errors: int,
     dry_run: bool,
+    workers: int,
     use_partition_list_from_json: Optional[str],
 ) -> None:
     """Perform sequential attach and detach of one or several partitions."""
-
-    def _table_formatter(partition: Dict[str, Any]) -> OrderedDict:
-        return OrderedDict(
-            (
-                ("database", partition["database"]),
-                ("table", partition["table"]),
-                ("partition_id", partition["partition_id"]),
-            )
-        )
-
     partitions = get_partitions(
         ctx,
         database,
@@ -533,24 +518,15 @@ def reattach_partitions_command(
         use_partition_list_from_json=use_partition_list_from_json,
     )["data"]
 
-    error_count = 0
-    failed_partitions = []
-    for p in partitions:
-        try:
-            detach_partition(
-                ctx, p["database"], p["table"], p["partition_id"], dry_run=dry_run
-            )
-            attach_partition(
-                ctx, p["database"], p["table"], p["partition_id"], dry_run=dry_run
-            )
-        except Exception:
-            error_count += 1
-            failed_partitions.append(p)
-            if not keep_going:
-                raise
-            if error_count == limit_errors:
-                logging.info("Max number of errors reached.")
-                break
+    failed_partitions = process_partitions(
+        partitions,
+        reattach_partition,
+        ctx=ctx,
+        dry_run=dry_run,
+        workers=workers,
+        keep_going=keep_going,
+        limit_errors=limit_errors,
+    )
 
     if failed_partitions:
         print("Partitions that failed to detach or attach:")
@@ -558,7 +534,7 @@ def reattach_partitions_command(
             ctx,
             failed_partitions,
             default_format="table",
-            table_formatter=_table_formatter,
+            fields=["database", "table", "partition_id"],
         )
 
 
@@ -601,6 +577,7 @@ def reattach_partitions_command(
     ),
     constraint=RequireAtLeast(1),
 )
+@option("-k", "--keep-going", is_flag=True, help="Do not stop on the first error.")
 @option(
     "-n",
     "--dry-run",
@@ -608,6 +585,7 @@ def reattach_partitions_command(
     default=False,
     help="Enable dry run mode and do not perform any modifying actions.",
 )
+@option("-w", "--workers", default=4, help="Number of workers.")
 @pass_context
 def delete_partitions_command(
     ctx: Context,
@@ -619,7 +597,9 @@ def delete_partitions_command(
     min_date: Optional[str],
     max_date: Optional[str],
     disk_name: Optional[str],
+    keep_going: bool,
     dry_run: bool,
+    workers: int,
     use_partition_list_from_json: Optional[str],
 ) -> None:
     """Delete one or several partitions."""
@@ -636,10 +616,14 @@ def delete_partitions_command(
         format_="JSON",
         use_partition_list_from_json=use_partition_list_from_json,
     )["data"]
-    for p in partitions:
-        drop_partition(
-            ctx, p["database"], p["table"], p["partition_id"], dry_run=dry_run
-        )
+    process_partitions(
+        partitions,
+        drop_partition,
+        ctx=ctx,
+        dry_run=dry_run,
+        workers=workers,
+        keep_going=keep_going,
+    )
 
 
 @partition_group.command("optimize")
@@ -675,6 +659,7 @@ def delete_partitions_command(
     ),
     constraint=RequireAtLeast(1),
 )
+@option("-k", "--keep-going", is_flag=True, help="Do not stop on the first error.")
 @option(
     "-n",
     "--dry-run",
@@ -682,6 +667,7 @@ def delete_partitions_command(
     default=False,
     help="Enable dry run mode and do not perform any modifying actions.",
 )
+@option("-w", "--workers", default=4, help="Number of workers.")
 @pass_context
 def optimize_partitions_command(
     ctx: Context,
@@ -693,10 +679,12 @@ def optimize_partitions_command(
     min_date: Optional[str],
     max_date: Optional[str],
     disk_name: Optional[str],
+    keep_going: bool,
     dry_run: bool,
+    workers: int,
 ) -> None:
     """Optimize partitions."""
-    for p in get_partitions(
+    partitions = get_partitions(
         ctx,
         database,
         table,
@@ -707,10 +695,15 @@ def optimize_partitions_command(
         max_date=max_date,
         disk_name=disk_name,
         format_="JSON",
-    )["data"]:
-        optimize_partition(
-            ctx, p["database"], p["table"], p["partition_id"], dry_run=dry_run
-        )
+    )["data"]
+    process_partitions(
+        partitions,
+        optimize_partition,
+        ctx=ctx,
+        dry_run=dry_run,
+        workers=workers,
+        keep_going=keep_going,
+    )
 
 
 @partition_group.command("materialize-ttl")
@@ -746,6 +739,7 @@ def optimize_partitions_command(
     ),
     constraint=RequireAtLeast(1),
 )
+@option("-k", "--keep-going", is_flag=True, help="Do not stop on the first error.")
 @option(
     "-n",
     "--dry-run",
@@ -753,6 +747,7 @@ def optimize_partitions_command(
     default=False,
     help="Enable dry run mode and do not perform any modifying actions.",
 )
+@option("-w", "--workers", default=4, help="Number of workers.")
 @pass_context
 def materialize_ttl_command(
     ctx: Context,
@@ -764,10 +759,12 @@ def materialize_ttl_command(
     min_date: Optional[str],
     max_date: Optional[str],
     disk_name: Optional[str],
+    keep_going: bool,
     dry_run: bool,
+    workers: int,
 ) -> None:
     """Materialize TTL."""
-    for p in get_partitions(
+    partitions = get_partitions(
         ctx,
         database,
         table,
@@ -778,10 +775,15 @@ def materialize_ttl_command(
         max_date=max_date,
         disk_name=disk_name,
         format_="JSON",
-    )["data"]:
-        materialize_ttl_in_partition(
-            ctx, p["database"], p["table"], p["partition_id"], dry_run=dry_run
-        )
+    )["data"]
+    process_partitions(
+        partitions,
+        materialize_ttl_in_partition,
+        ctx=ctx,
+        dry_run=dry_run,
+        workers=workers,
+        keep_going=keep_going,
+    )
 
 
 def read_and_validate_partitions_from_json(json_path: str) -> Dict[str, Any]:
@@ -1,11 +1,12 @@
 import datetime
-from typing import Any, Optional
+from typing import Any, Dict, Optional
 
 from click import Choice, Context, argument, group, option, pass_context
 
 from ch_tools.chadmin.cli.chadmin_group import Chadmin
-from ch_tools.chadmin.internal.utils import execute_query
+from ch_tools.chadmin.internal.utils import execute_query, iter_query_rows
 from ch_tools.common import logging
+from ch_tools.common.cli.formatting import format_vertical
 from ch_tools.common.clickhouse.config import get_cluster_name
 
 
@@ -128,16 +129,17 @@ def list_queries_command(
     max_date = max_date or date
     min_time = min_time or time
     max_time = max_time or time
-    logging.info(
-        get_queries(
-            ctx,
-            min_date=min_date,
-            max_date=max_date,
-            min_time=min_time,
-            max_time=max_time,
-            **kwargs,
-        )
+    queries = get_queries(
+        ctx,
+        min_date=min_date,
+        max_date=max_date,
+        min_time=min_time,
+        max_time=max_time,
+        stream=True,
+        **kwargs,
     )
+    for i, query in enumerate(queries, 1):
+        logging.info(("\n" if i > 1 else "") + format_vertical(query, i))
 
 
 @query_log_group.command("get-statistics")
@@ -317,7 +319,12 @@ def get_queries(
     limit: int = 10,
     order_by: str = "query_start_time",
     verbose: bool = False,
+    stream: bool = False,
 ) -> Any:
+    """
+    Get log records of queries. The result is a text in Vertical format, or an
+    iterator over rows if `stream` is set.
+    """
     cluster = get_cluster_name(ctx) if on_cluster else None
     query_str = """
         SELECT
@@ -411,9 +418,7 @@ def get_queries(
         LIMIT {{ limit }}
         {% endif %}
         """
-    return execute_query(
-        ctx,
-        query_str,
+    query_args: Dict[str, Any] = dict(
         user=user,
         exclude_user=exclude_user,
         query_id=query_id,
@@ -432,8 +437,11 @@ def get_queries(
         limit=limit,
         verbose=verbose,
         order_by=order_by,
-        format_="Vertical",
     )
+    if stream:
+        return iter_query_rows(ctx, query_str, **query_args)
+
+    return execute_query(ctx, query_str, format_="Vertical", **query_args)
 
 
 def get_query_settings(
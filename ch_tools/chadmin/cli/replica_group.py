@@ -8,6 +8,7 @@ from cloup.constraints import AnySet, If, RequireAtLeast, accept_none, require_a
 from ch_tools.chadmin.cli.chadmin_group import Chadmin
 from ch_tools.chadmin.internal.table_replica import (
     get_table_replica,
+    iter_table_replicas,
     list_table_replicas,
     restart_table_replica,
     restore_replica,
@@ -101,7 +102,7 @@ def list_command(ctx: Context, **kwargs: Any) -> None:
             )
         )
 
-    table_replicas = list_table_replicas(ctx, verbose=True, **kwargs)
+    table_replicas = iter_table_replicas(ctx, verbose=True, **kwargs)
     print_response(
         ctx,
         table_replicas,
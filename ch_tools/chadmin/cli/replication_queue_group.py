@@ -1,12 +1,13 @@
 from collections import defaultdict
-from typing import Any, Optional, Union
+from typing import Any, Dict, Optional, Union
 
 from click import Context, group, option, pass_context
 
 from ch_tools.chadmin.cli.chadmin_group import Chadmin
-from ch_tools.chadmin.internal.utils import execute_query
+from ch_tools.chadmin.internal.utils import execute_query, iter_query_rows
 from ch_tools.chadmin.internal.zookeeper import delete_zk_node
 from ch_tools.common import logging
+from ch_tools.common.cli.formatting import format_vertical
 from ch_tools.common.cli.parameters import TimeSpanParamType
 from ch_tools.common.clickhouse.client import OutputFormat
 from ch_tools.common.clickhouse.config import get_cluster_name
@@ -100,7 +101,9 @@ def list_replication_queue_command(ctx: Context, **kwargs: Any) -> None:
     """
     List replication queue tasks.
     """
-    logging.info(get_replication_queue_tasks(ctx, **kwargs, format_="Vertical"))
+    tasks = get_replication_queue_tasks(ctx, **kwargs, stream=True)
+    for i, task in enumerate(tasks, 1):
+        logging.info(("\n" if i > 1 else "") + format_vertical(task, i))
 
 
 @replication_queue_group.command("delete")
@@ -153,9 +156,7 @@ def delete_command(ctx: Context, **kwargs: Any) -> None:
     """
     Delete replication queue tasks.
     """
-    tasks = get_replication_queue_tasks(ctx, **kwargs, verbose=True, format_="JSON")[
-        "data"
-    ]
+    tasks = get_replication_queue_tasks(ctx, **kwargs, verbose=True, stream=True)
     for table, tasks in group_tasks_by_table(tasks).items():
         database, table = table
 
@@ -201,7 +202,12 @@ def get_replication_queue_tasks(
     verbose: Optional[bool] = None,
     limit: Optional[int] = None,
     format_: Optional[Union[str, OutputFormat]] = None,
+    stream: bool = False,
 ) -> Any:
+    """
+    Get replication queue tasks. The result is formatted according to `format_`, or
+    it is an iterator over rows if `stream` is set.
+    """
     cluster = get_cluster_name(ctx) if on_cluster else None
     query = """
     SELECT
@@ -272,9 +278,7 @@ def get_replication_queue_tasks(
     LIMIT {{ limit }}
     {% endif %}
     """
-    return execute_query(
-        ctx,
-        query,
+    query_args: Dict[str, Any] = dict(
         cluster=cluster,
         database=database,
         table=table,
@@ -289,8 +293,11 @@ def get_replication_queue_tasks(
         max_postpone_count=max_postpone_count,
         verbose=verbose,
         limit=limit,
-        format_=format_,
     )
+    if stream:
+        return iter_query_rows(ctx, query, **query_args)
+
+    return execute_query(ctx, query, format_=format_, **query_args)
 
 
 def group_tasks_by_table(tasks: Any) -> Any:
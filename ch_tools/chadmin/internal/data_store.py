@@ -0,0 +1,176 @@
+"""
+Inspection of ClickHouse local data store without external tools.
+"""
+
+import bisect
+import math
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from stat import S_ISDIR
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple, TypeVar
+
+from ch_tools.chadmin.internal.clickhouse_disks import CLICKHOUSE_PATH
+
+T = TypeVar("T")
+
+DEFAULT_SCAN_WORKERS = 8
+# Number of subtrees per worker to balance uneven directories
+SUBTREES_PER_WORKER = 8
+UUID_RE = re.compile(
+    r"'([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})'"
+)
+# du reports sizes in 512-byte blocks
+BLOCK_SIZE = 512
+SIZE_UNITS = ["", "K", "M", "G", "T", "P", "E"]
+
+
+def scan_tree(
+    root: str,
+    visit: Callable[[os.DirEntry], Optional[T]],
+    workers: int = DEFAULT_SCAN_WORKERS,
+) -> Iterator[T]:
+    """
+    Walk the directory tree with concurrent os.scandir calls without following symlinks.
+
+    `visit` is called for every entry of the tree, including directories, mostly in
+    worker threads.
+    Results other than None are returned in arbitrary order. Entries removed during
+    the walk are skipped.
+    """
+    # The first levels of the tree are scanned until there are enough subtrees
+    # to balance the work, then subtrees are scanned by workers.
+    subtrees = [root]
+    while len(subtrees) < workers * SUBTREES_PER_WORKER:
+        expanded: List[str] = []
+        for path in subtrees:
+            subdirs, results = _scan_dir(path, visit)
+            yield from results
+            expanded.extend(subdirs)
+        subtrees = expanded
+        if not subtrees:
+            return
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for results in executor.map(lambda path: _scan_subtree(path, visit), subtrees):
+            yield from results
+
+
+def _scan_subtree(root: str, visit: Callable[[os.DirEntry], Optional[T]]) -> List[T]:
+    results: List[T] = []
+    stack = [root]
+    while stack:
+        subdirs, dir_results = _scan_dir(stack.pop(), visit)
+        results.extend(dir_results)
+        stack.extend(subdirs)
+    return results
+
+
+def _scan_dir(
+    path: str, visit: Callable[[os.DirEntry], Optional[T]]
+) -> Tuple[List[str], List[T]]:
+    subdirs: List[str] = []
+    results: List[T] = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    result = visit(entry)
+                except FileNotFoundError:
+                    continue
+                if result is not None:
+                    results.append(result)
+    except (FileNotFoundError, NotADirectoryError):
+        pass
+    return subdirs, results
+
+
+def get_disk_usage(path: str, workers: int = DEFAULT_SCAN_WORKERS) -> Dict[str, int]:
+    """
+    Return disk usage in bytes of each entry of the directory, as `du -s <path>/*` does.
+
+    Hard links are counted once.
+    """
+    usage: Dict[str, int] = {name: 0 for name in os.listdir(path)}
+    inodes: Set[Tuple[int, int]] = set()
+    root_len = len(os.path.join(path, ""))
+
+    def _visit(entry: os.DirEntry) -> Tuple[str, os.stat_result]:
+        return entry.path, entry.stat(follow_symlinks=False)
+
+    for entry_path, stat in scan_tree(path, _visit, workers):
+        if stat.st_nlink > 1 and not S_ISDIR(stat.st_mode):
+            inode = (stat.st_dev, stat.st_ino)
+            if inode in inodes:
+                continue
+            inodes.add(inode)
+        name = entry_path[root_len:].split(os.sep, 1)[0]
+        usage[name] = usage.get(name, 0) + stat.st_blocks * BLOCK_SIZE
+
+    return usage
+
+
+def format_disk_usage(size: int) -> str:
+    """
+    Format size in the same way as `du -h`, e.g. 8.0K, 15M.
+    """
+    unit = 0
+    while unit + 1 < len(SIZE_UNITS) and size >= 1024 ** (unit + 1):
+        unit += 1
+    if not unit:
+        return str(size)
+
+    value = size / 1024**unit
+    if value < 10:
+        value = math.ceil(value * 10) / 10
+        if value < 10:
+            return f"{value:.1f}{SIZE_UNITS[unit]}"
+    value = math.ceil(value)
+    if value >= 1024 and unit + 1 < len(SIZE_UNITS):
+        return f"1.0{SIZE_UNITS[unit + 1]}"
+    return f"{value}{SIZE_UNITS[unit]}"
+
+
+class MetadataUuidIndex:
+    """
+    Index of UUIDs referenced in .sql metadata files.
+
+    The index is built by a single walk of the ClickHouse directory, after that
+    lookups by UUID prefix (names of store directories) do not touch the disk.
+    """
+
+    def __init__(self, uuids: Dict[str, str]) -> None:
+        # Metadata file name by referenced UUID
+        self._uuids = uuids
+        self._sorted_uuids = sorted(uuids)
+
+    @classmethod
+    def build(
+        cls, root: str = CLICKHOUSE_PATH, workers: int = DEFAULT_SCAN_WORKERS
+    ) -> "MetadataUuidIndex":
+        uuids: Dict[str, str] = {}
+        for file_name, file_uuids in scan_tree(root, _read_metadata_uuids, workers):
+            for uuid in file_uuids:
+                uuids.setdefault(uuid, file_name)
+        return cls(uuids)
+
+    def __len__(self) -> int:
+        return len(self._uuids)
+
+    def find(self, prefix: str) -> Optional[str]:
+        """
+        Return name of a metadata file referencing a UUID starting with the prefix.
+        """
+        i = bisect.bisect_left(self._sorted_uuids, prefix)
+        if i < len(self._sorted_uuids) and self._sorted_uuids[i].startswith(prefix):
+            return self._uuids[self._sorted_uuids[i]]
+        return None
+
+
+def _read_metadata_uuids(entry: os.DirEntry) -> Optional[Tuple[str, List[str]]]:
+    if not entry.name.endswith(".sql") or not entry.is_file():
+        return None
+    with open(entry.path, encoding="utf-8") as f:
+        return entry.name, UUID_RE.findall(f.read())
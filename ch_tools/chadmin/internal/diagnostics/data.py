@@ -1,17 +1,42 @@
 import gzip
 import io
 import json
+import os
+import signal
 import subprocess
 import sys
-from typing import Any, Dict, List, Optional
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
 
 import yaml
 from requests.exceptions import RequestException
 
 from ch_tools.common import logging
+from ch_tools.common.cli.progress_bar import progress
 from ch_tools.common.clickhouse.client import ClickhouseClient, OutputFormat
 
-from .utils import delayed
+# Max number of concurrently executed diagnostics tasks
+DEFAULT_MAX_WORKERS = 8
+# Max time in seconds to execute a query or a command
+DEFAULT_TASK_TIMEOUT = 60
+# Extra time given to a task to return the result after its timeout expires
+TASK_TIMEOUT_GRACE_PERIOD = 10
+
+
+@dataclass
+class DiagnosticsTask:
+    """
+    Task collecting a single item of diagnostics data.
+
+    `collect` is called with the timeout in seconds and returns the item.
+    """
+
+    name: str
+    collect: Callable[[float], Dict[str, Any]]
+    section: Optional[str] = None
 
 
 class DiagnosticsData:
@@ -20,58 +45,52 @@ class DiagnosticsData:
         self.normalize_queries = normalize_queries
         self._sections: List[Dict[str, Any]] = [{"section": None, "data": {}}]
 
-    @delayed
-    def add_string(self, name: str, value: str, section: Optional[str] = None) -> None:
-        self._section(section)[name] = {
-            "type": "string",
-            "value": value,
-        }
+    def add_string(
+        self, name: str, value: str, section: Optional[str] = None
+    ) -> DiagnosticsTask:
+        return _value_task(name, {"type": "string", "value": value}, section)
 
-    @delayed
-    def add_url(self, name: str, value: str, section: Optional[str] = None) -> None:
-        self._section(section)[name] = {
-            "type": "url",
-            "value": value,
-        }
+    def add_url(
+        self, name: str, value: str, section: Optional[str] = None
+    ) -> DiagnosticsTask:
+        return _value_task(name, {"type": "url", "value": value}, section)
 
-    @delayed
     def add_xml_document(
         self, name: str, document: str, section: Optional[str] = None
+    ) -> DiagnosticsTask:
+        return _value_task(name, {"type": "xml", "value": document}, section)
+
+    def collect(
+        self,
+        tasks: List[DiagnosticsTask],
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        timeout: float = DEFAULT_TASK_TIMEOUT,
     ) -> None:
-        self._section(section)[name] = {
-            "type": "xml",
-            "value": document,
-        }
-
-    @delayed
-    def add_query(
-        self, name: str, query: str, result: str, section: Optional[str] = None
-    ) -> None:
-        self.add_query_sync(name, query, result, section)
-
-    def add_query_sync(
-        self, name: str, query: str, result: str, section: Optional[str] = None
-    ) -> None:
-        self._section(section)[name] = {
-            "type": "query",
-            "query": query,
-            "result": result,
-        }
-
-    @delayed
-    def add_command(
-        self, name: str, command: str, result: str, section: Optional[str] = None
-    ) -> None:
-        self.add_command_sync(name, command, result, section)
+        """
+        Execute tasks concurrently and add collected items in the order of tasks.
 
-    def add_command_sync(
-        self, name: str, command: str, result: str, section: Optional[str] = None
-    ) -> None:
-        self._section(section)[name] = {
-            "type": "command",
-            "command": command,
-            "result": result,
-        }
+        Queries and commands are interrupted on timeout and return partial results.
+        Tasks that fail to complete in time anyway are reported as timed out, so
+        a single stuck probe does not block the whole report.
+        """
+        executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+        futures = [executor.submit(_execute_task, task, timeout) for task in tasks]
+        deadline = time.monotonic() + (timeout + TASK_TIMEOUT_GRACE_PERIOD) * (
+            len(tasks) / max(1, max_workers) + 1
+        )
+        try:
+            for task, future in progress(
+                list(zip(tasks, futures)), description="Performing diagnostics"
+            ):
+                try:
+                    item = future.result(timeout=max(0, deadline - time.monotonic()))
+                except FuturesTimeoutError:
+                    logging.warning("Diagnostics task {!r} timed out", task.name)
+                    item = {"type": "string", "value": f"timed out after {timeout}s"}
+                self._section(task.section)[task.name] = item
+        finally:
+            # Do not wait for stuck tasks
+            executor.shutdown(wait=False, cancel_futures=True)
 
     def dump(self, format_: str) -> None:
         if format_.startswith("json"):
@@ -147,7 +166,7 @@ class DiagnosticsData:
             buffer_: io.StringIO,
             section_name_: Optional[str],
             name_: str,
-            item_: Dict[str, str],
+            item_: Dict[str, Any],
         ) -> None:
             if section_name_:
                 buffer_.write(f"=====+ {name_}\n")
@@ -155,13 +174,13 @@ class DiagnosticsData:
                 _write_subtitle(buffer_, name_)
 
             _write_query(buffer_, item_["query"])
-            _write_result(buffer_, item_["result"])
+            _write_result(buffer_, item_["result"], elapsed=item_.get("elapsed"))
 
         def _write_command_item(
             buffer_: io.StringIO,
             section_name_: Optional[str],
             name_: str,
-            item_: Dict[str, str],
+            item_: Dict[str, Any],
         ) -> None:
             if section_name_:
                 buffer_.write(f"=====+ {name_}\n")
@@ -169,7 +188,7 @@ class DiagnosticsData:
                 _write_subtitle(buffer_, name_)
 
             _write_command(buffer_, item_["command"])
-            _write_result(buffer_, item_["result"])
+            _write_result(buffer_, item_["result"], elapsed=item_.get("elapsed"))
 
         def _write_unknown_item(
             buffer_: io.StringIO,
@@ -199,14 +218,16 @@ class DiagnosticsData:
             buffer_.write("}>\n\n")
 
         def _write_result(
-            buffer_: io.StringIO, result: str, format_: Optional[str] = None
+            buffer_: io.StringIO,
+            result: str,
+            format_: Optional[str] = None,
+            elapsed: Optional[float] = None,
         ) -> None:
-            if format_:
-                buffer_.write(f"%%({format_})\n")
-            else:
-                buffer_.write("%%\n")
+            buffer_.write(f"%%({format_})\n" if format_ else "%%\n")
             buffer_.write(result)
             buffer_.write("\n%%\n")
+            if elapsed is not None:
+                buffer_.write(f"Elapsed: {elapsed}s\n")
 
         buffer = io.StringIO()
 
@@ -233,7 +254,6 @@ class DiagnosticsData:
         return buffer.getvalue()
 
 
-@delayed
 def add_query(
     diagnostics: DiagnosticsData,
     name: str,
@@ -241,17 +261,24 @@ def add_query(
     query: str,
     format_: OutputFormat,
     section: Optional[str] = None,
-) -> None:
-    query_args = {
-        "normalize_queries": diagnostics.normalize_queries,
-    }
-    query = client.render_query(query, **query_args)
-    diagnostics.add_query_sync(
-        name=name,
-        query=query,
-        result=execute_query(client, query, render_query=False, format_=format_),
-        section=section,
-    )
+) -> DiagnosticsTask:
+    def _collect(timeout: float) -> Dict[str, Any]:
+        rendered_query = client.render_query(
+            query, normalize_queries=diagnostics.normalize_queries
+        )
+        return {
+            "type": "query",
+            "query": rendered_query,
+            "result": execute_query(
+                client,
+                rendered_query,
+                render_query=False,
+                format_=format_,
+                timeout=timeout,
+            ),
+        }
+
+    return DiagnosticsTask(name, _collect, section)
 
 
 def execute_query(
@@ -259,35 +286,64 @@ def execute_query(
     query: str,
     render_query: bool = True,
     format_: OutputFormat = OutputFormat.Default,
+    timeout: Optional[float] = None,
 ) -> Any:
     if render_query:
         query = client.render_query(query)
 
+    settings: Dict[str, Any] = {"allow_introspection_functions": 1}
+    if timeout:
+        # Return rows read so far instead of failing when the time is over
+        settings["max_execution_time"] = int(timeout)
+        settings["timeout_overflow_mode"] = "break"
+
     try:
         return client.query(
             query,
-            settings={
-                "allow_introspection_functions": 1,
-            },
+            settings=settings,
             format_=format_,
+            timeout=int(timeout + TASK_TIMEOUT_GRACE_PERIOD) if timeout else None,
         )
     except RequestException as e:
         return repr(e) if e.response is None else e.response.text
 
 
-@delayed
 def add_command(
-    diagnostics: DiagnosticsData,
+    diagnostics: DiagnosticsData,  # pylint: disable=unused-argument
     name: str,
     command: str,
     section: Optional[str] = None,
-) -> None:
-    diagnostics.add_command_sync(
-        name=name, command=command, result=_execute_command(command), section=section
-    )
+) -> DiagnosticsTask:
+    def _collect(timeout: float) -> Dict[str, Any]:
+        return {
+            "type": "command",
+            "command": command,
+            "result": _execute_command(command, timeout=timeout),
+        }
+
+    return DiagnosticsTask(name, _collect, section)
+
 
+def _value_task(
+    name: str, item: Dict[str, Any], section: Optional[str]
+) -> DiagnosticsTask:
+    return DiagnosticsTask(name, lambda _: item, section)
 
-def _execute_command(command: str, input_: Optional[bytes] = None) -> str:
+
+def _execute_task(task: DiagnosticsTask, timeout: float) -> Dict[str, Any]:
+    start_time = time.monotonic()
+    try:
+        item = task.collect(timeout)
+    except Exception as e:
+        logging.warning("Diagnostics task {!r} failed: {!r}", task.name, e)
+        item = {"type": "string", "value": f"failed: {e!r}"}
+    item["elapsed"] = round(time.monotonic() - start_time, 3)
+    return item
+
+
+def _execute_command(
+    command: str, input_: Optional[bytes] = None, timeout: Optional[float] = None
+) -> str:
     # pylint: disable=consider-using-with
 
     proc = subprocess.Popen(
@@ -296,12 +352,19 @@ def _execute_command(command: str, input_: Optional[bytes] = None) -> str:
         stdin=subprocess.PIPE,
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
+        # Separate process group to kill the whole pipeline on timeout
+        start_new_session=True,
     )
 
     if isinstance(input_, str):
         input_ = input_.encode()
 
-    stdout, stderr = proc.communicate(input=input_)
+    try:
+        stdout, stderr = proc.communicate(input=input_, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        os.killpg(proc.pid, signal.SIGKILL)
+        stdout, _ = proc.communicate()
+        return f"timed out after {timeout}s, partial output:\n{stdout.decode()}"
 
     if proc.returncode:
         return f"failed with exit code {proc.returncode}\n{stderr.decode()}"
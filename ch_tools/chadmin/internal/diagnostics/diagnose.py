@@ -5,7 +5,6 @@ from click import Context
 
 from ch_tools.chadmin.internal.diagnostics import query
 from ch_tools.common.cli.formatting import format_duration
-from ch_tools.common.cli.progress_bar import progress
 from ch_tools.common.clickhouse.client import OutputFormat
 from ch_tools.common.clickhouse.config import (
     ClickhouseConfig,
@@ -14,10 +13,23 @@ from ch_tools.common.clickhouse.config import (
 )
 
 from ..utils import clickhouse_client
-from .data import DiagnosticsData, add_command, add_query, execute_query
+from .data import (
+    DEFAULT_MAX_WORKERS,
+    DEFAULT_TASK_TIMEOUT,
+    DiagnosticsData,
+    add_command,
+    add_query,
+    execute_query,
+)
 
 
-def diagnose(ctx: Context, output_format: str, normalize_queries: bool) -> None:
+def diagnose(
+    ctx: Context,
+    output_format: str,
+    normalize_queries: bool,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    timeout: float = DEFAULT_TASK_TIMEOUT,
+) -> None:
     timestamp = datetime.strftime(datetime.now(), "%Y-%m-%d %H:%M:%S")
     client = clickhouse_client(ctx)
     hostname = socket.getfqdn()
@@ -262,7 +274,6 @@ def diagnose(ctx: Context, output_format: str, normalize_queries: bool) -> None:
         )
     )
 
-    for task in progress(tasks, description="Performing diagnostics"):
-        task()
+    diagnostics.collect(tasks, max_workers, timeout)
 
     diagnostics.dump(output_format)
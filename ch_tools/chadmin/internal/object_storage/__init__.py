@@ -2,7 +2,9 @@ from ch_tools.chadmin.internal.object_storage.obj_list_item import ObjListItem
 from ch_tools.chadmin.internal.object_storage.s3_cleanup import (
     cleanup_s3_object_storage,
 )
+from ch_tools.chadmin.internal.object_storage.s3_existence import find_missing_keys
 from ch_tools.chadmin.internal.object_storage.s3_iterator import (
     ObjectSummary,
     s3_object_storage_iterator,
 )
+from ch_tools.chadmin.internal.object_storage.s3_listing import S3ParallelLister
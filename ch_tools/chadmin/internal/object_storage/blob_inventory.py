@@ -0,0 +1,235 @@
+"""
+Persistent inventory of object storage blobs referenced by local metadata files.
+
+Metadata files of object storage disks are parsed once and saved to a SQLite database
+together with modification times of their directories. On refresh only directories
+with changed modification time are parsed again, so commands look up blobs by key or
+by metadata file without rescanning the whole disk.
+"""
+
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from types import TracebackType
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, Type
+
+from click import Context
+
+from ch_tools.chadmin.internal.data_store import scan_tree
+from ch_tools.common import logging
+
+from .s3_object_metadata import S3ObjectLocalMetaData
+
+SCHEMA_VERSION = 1
+DEFAULT_REFRESH_WORKERS = 4
+# Number of directories with metadata files parsed by a process pool task
+PARSE_CHUNK_SIZE = 256
+# Directories modified within the interval before the refresh are parsed again
+# on the next refresh, as they can be modified within the same mtime tick.
+MTIME_GRANULARITY_NS = 2 * 10**9
+# Modification time of directories that must be parsed on the next refresh
+NOT_ACTUAL_MTIME = -1
+
+# Rows of blobs: metadata file name, position in the file, key, size, ref counter
+_BlobRow = Tuple[str, int, str, int, int]
+
+
+class InventoryBlob(NamedTuple):
+    key: str
+    # Directory and name of the metadata file referencing the blob
+    path: str
+    file: str
+    size: int
+    ref_counter: int
+
+
+class BlobInventory:
+    """
+    Index of blobs referenced by metadata files under directories of object storage disks.
+
+    Keys are relative to the prefix of the disk, as they are stored in metadata files.
+    """
+
+    def __init__(self, db_path: str) -> None:
+        self._db = sqlite3.connect(db_path, timeout=60)
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self._create_schema()
+
+    def __enter__(self) -> "BlobInventory":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._db.close()
+
+    def refresh(self, root: str, max_workers: int = DEFAULT_REFRESH_WORKERS) -> None:
+        """
+        Parse metadata files in directories under the root that are new or modified
+        since the last refresh and remove directories that do not exist anymore.
+        """
+        root = os.path.normpath(root)
+        start_time = time.monotonic()
+        actual_mtime = time.time_ns() - MTIME_GRANULARITY_NS
+
+        def _visit(entry: os.DirEntry) -> Optional[Tuple[str, int]]:
+            if not entry.is_dir(follow_symlinks=False):
+                return None
+            return entry.path, entry.stat(follow_symlinks=False).st_mtime_ns
+
+        dirs = dict(scan_tree(root, _visit, max_workers))
+        if os.path.isdir(root):
+            dirs[root] = os.stat(root).st_mtime_ns
+
+        saved = dict(
+            self._db.execute(
+                "SELECT path, mtime_ns FROM dirs WHERE path = ? OR (path >= ? AND path < ?)",
+                _subtree_range(root),
+            )
+        )
+        removed = [path for path in saved if path not in dirs]
+        changed = [path for path, mtime in dirs.items() if saved.get(path) != mtime]
+
+        with self._db:
+            for path in removed:
+                self._delete_dir(path)
+
+            with ProcessPoolExecutor(max_workers=max(1, max_workers)) as executor:
+                for path, rows, errors in executor.map(
+                    _parse_dir, changed, chunksize=PARSE_CHUNK_SIZE
+                ):
+                    for error in errors:
+                        logging.error("Failed to parse metadata in {}: {}", path, error)
+                    mtime = dirs[path]
+                    if errors or mtime > actual_mtime:
+                        mtime = NOT_ACTUAL_MTIME
+                    self._save_dir(path, mtime, rows)
+
+        logging.debug(
+            "Refreshed blob inventory of {} in {:.1f}s: {} directories, {} changed, {} removed",
+            root,
+            time.monotonic() - start_time,
+            len(dirs),
+            len(changed),
+            len(removed),
+        )
+
+    def get_blobs(self, key: str) -> List[InventoryBlob]:
+        """
+        Return references of the blob.
+        """
+        return [
+            InventoryBlob(*row)
+            for row in self._db.execute(
+                "SELECT key, path, file, size, ref_counter FROM blobs WHERE key = ?",
+                (key,),
+            )
+        ]
+
+    def get_file_blobs(self, file_path: str) -> List[InventoryBlob]:
+        """
+        Return blobs of the metadata file in the order they are stored in the file.
+        """
+        path, file = os.path.split(os.path.normpath(file_path))
+        return [
+            InventoryBlob(*row)
+            for row in self._db.execute(
+                "SELECT key, path, file, size, ref_counter FROM blobs"
+                " WHERE path = ? AND file = ? ORDER BY position",
+                (path, file),
+            )
+        ]
+
+    def iter_blobs(self, root: str) -> Iterator[InventoryBlob]:
+        """
+        Return blobs referenced by metadata files under the root ordered by directory.
+        """
+        root = os.path.normpath(root)
+        for row in self._db.execute(
+            "SELECT key, path, file, size, ref_counter FROM blobs"
+            " WHERE path = ? OR (path >= ? AND path < ?) ORDER BY path, file, position",
+            _subtree_range(root),
+        ):
+            yield InventoryBlob(*row)
+
+    def get_dir_keys(self, root: str, prefix: str = "") -> Dict[str, List[str]]:
+        """
+        Return keys of blobs referenced in each directory under the root joined with the prefix.
+        """
+        result: Dict[str, List[str]] = {}
+        for blob in self.iter_blobs(root):
+            result.setdefault(blob.path, []).append(os.path.join(prefix, blob.key))
+        return result
+
+    def _create_schema(self) -> None:
+        with self._db:
+            self._db.execute("DROP TABLE IF EXISTS dirs")
+            self._db.execute("DROP TABLE IF EXISTS blobs")
+            self._db.execute(
+                "CREATE TABLE dirs (path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE TABLE blobs (path TEXT NOT NULL, file TEXT NOT NULL,"
+                " position INTEGER NOT NULL, key TEXT NOT NULL, size INTEGER NOT NULL,"
+                " ref_counter INTEGER NOT NULL, PRIMARY KEY (path, file, position))"
+            )
+            self._db.execute("CREATE INDEX blobs_key ON blobs (key)")
+            self._db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _delete_dir(self, path: str) -> None:
+        self._db.execute("DELETE FROM dirs WHERE path = ?", (path,))
+        self._db.execute("DELETE FROM blobs WHERE path = ?", (path,))
+
+    def _save_dir(self, path: str, mtime: int, rows: List[_BlobRow]) -> None:
+        self._delete_dir(path)
+        self._db.execute("INSERT INTO dirs VALUES (?, ?)", (path, mtime))
+        self._db.executemany(
+            "INSERT INTO blobs VALUES (?, ?, ?, ?, ?, ?)",
+            ((path, *row) for row in rows),
+        )
+
+
+def open_blob_inventory(ctx: Context) -> Optional[BlobInventory]:
+    """
+    Open the inventory if its path is set in the config.
+    """
+    path = ctx.obj["config"]["object_storage"]["blob_inventory_path"]
+    return BlobInventory(path) if path else None
+
+
+def _subtree_range(root: str) -> Tuple[str, str, str]:
+    """
+    Return arguments of the condition matching the root and paths under it.
+    """
+    # "0" follows "/" in ASCII
+    return root, os.path.join(root, ""), root.rstrip("/") + "0"
+
+
+def _parse_dir(path: str) -> Tuple[str, List[_BlobRow], List[str]]:
+    rows: List[_BlobRow] = []
+    errors: List[str] = []
+    try:
+        with os.scandir(path) as entries:
+            files = sorted(e.name for e in entries if e.is_file(follow_symlinks=False))
+    except FileNotFoundError:
+        return path, rows, errors
+
+    for file in files:
+        try:
+            metadata = S3ObjectLocalMetaData.from_file(Path(os.path.join(path, file)))
+        except FileNotFoundError:
+            continue
+        except Exception as e:
+            errors.append(f"{file}: {e!r}")
+            continue
+        for position, obj in enumerate(metadata.objects):
+            rows.append((file, position, obj.key, obj.size, metadata.ref_counter))
+    return path, rows, errors
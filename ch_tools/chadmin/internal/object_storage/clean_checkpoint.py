@@ -0,0 +1,114 @@
+import json
+import os
+import threading
+from dataclasses import asdict, dataclass, field
+from typing import Any, List, Optional
+
+from ch_tools.common import logging
+
+
+@dataclass
+class CleanCheckpoint:
+    """
+    Progress of object storage clean saved to resume the interrupted run.
+
+    Position of the listing itself is saved to the listing checkpoint.
+    """
+
+    disk: str
+    prefix: str
+    clean_scope: str
+    antijoin_buckets: int = 1
+    listing_done: bool = False
+    done_buckets: List[int] = field(default_factory=list)
+    antijoin_done: bool = False
+    # Orphaned objects are deleted in the order of keys up to this key
+    last_deleted_key: Optional[str] = None
+    deleted: int = 0
+    deleted_size: int = 0
+
+    @classmethod
+    def from_json(cls, json_str: str) -> "CleanCheckpoint":
+        return cls(**json.loads(json_str))
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), indent=4)
+
+
+class CleanProgress:
+    """
+    Checkpoint of the clean saved to the local file after every completed step.
+    """
+
+    def __init__(
+        self, path: Optional[str], checkpoint: CleanCheckpoint, resumed: bool
+    ) -> None:
+        self.checkpoint = checkpoint
+        self.resumed = resumed
+        self._path = path
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(
+        cls,
+        path: Optional[str],
+        disk: str,
+        prefix: str,
+        clean_scope: str,
+        resume: bool,
+    ) -> "CleanProgress":
+        new_checkpoint = CleanCheckpoint(disk, prefix, clean_scope)
+        if not resume:
+            return cls(path, new_checkpoint, False)
+
+        if not path or not os.path.exists(path):
+            logging.warning("No clean checkpoint found, cleaning from the beginning")
+            return cls(path, new_checkpoint, False)
+
+        with open(path, encoding="utf-8") as file:
+            checkpoint = CleanCheckpoint.from_json(file.read())
+        if (checkpoint.disk, checkpoint.prefix, checkpoint.clean_scope) != (
+            new_checkpoint.disk,
+            new_checkpoint.prefix,
+            new_checkpoint.clean_scope,
+        ):
+            logging.warning(
+                "Clean checkpoint is saved for disk {}, prefix {} and scope {}, ignore it",
+                checkpoint.disk,
+                checkpoint.prefix,
+                checkpoint.clean_scope,
+            )
+            return cls(path, new_checkpoint, False)
+
+        logging.info("Resuming clean from the checkpoint: {}", checkpoint)
+        return cls(path, checkpoint, True)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._path)
+
+    def update(self, **changes: Any) -> None:
+        with self._lock:
+            for name, value in changes.items():
+                setattr(self.checkpoint, name, value)
+            self._save()
+
+    def bucket_done(self, bucket: int) -> None:
+        with self._lock:
+            self.checkpoint.done_buckets.append(bucket)
+            self._save()
+
+    def remove(self) -> None:
+        """
+        Remove the checkpoint after the clean is completed.
+        """
+        if self._path and os.path.exists(self._path):
+            os.remove(self._path)
+
+    def _save(self) -> None:
+        if not self._path:
+            return
+        tmp_path = f"{self._path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(self.checkpoint.to_json())
+        os.replace(tmp_path, self._path)
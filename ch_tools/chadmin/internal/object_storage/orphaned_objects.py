@@ -0,0 +1,73 @@
+"""
+Search of orphaned objects by merging sorted listing of object storage with sorted
+referenced paths.
+"""
+
+import json
+import re
+from typing import IO, Iterable, Iterator, NamedTuple, Optional
+
+from .obj_list_item import ObjListItem
+
+
+class OrphanedObjectsStats(NamedTuple):
+    """
+    Aggregates of orphaned objects checked before the deletion.
+    """
+
+    objects_count: int
+    total_size: int
+    # Number of objects not matching the regex of paths and an example of them
+    mismatched_count: int
+    mismatched_path: Optional[str]
+
+
+def spill_orphaned_objects(
+    orphaned_objects: Iterable[ObjListItem], file: IO[str], paths_regex: str
+) -> OrphanedObjectsStats:
+    """
+    Write orphaned objects to the file as JSON lines and return their stats.
+    """
+    regex = re.compile(paths_regex)
+    objects_count, total_size, mismatched_count = 0, 0, 0
+    mismatched_path = None
+    for obj in orphaned_objects:
+        file.write(json.dumps([obj.path, obj.size]) + "\n")
+        objects_count += 1
+        total_size += obj.size
+        if not regex.match(obj.path):
+            mismatched_count += 1
+            mismatched_path = mismatched_path or obj.path
+
+    return OrphanedObjectsStats(
+        objects_count, total_size, mismatched_count, mismatched_path
+    )
+
+
+def find_orphaned_objects(
+    objects: Iterable[ObjListItem], referenced_paths: Iterable[str]
+) -> Iterator[ObjListItem]:
+    """
+    Return objects which paths are not referenced. Both sequences must be sorted by path,
+    duplicates of referenced paths are allowed.
+    """
+    paths = iter(referenced_paths)
+    path = next(paths, None)
+    last_obj_path = None
+    for obj in objects:
+        if last_obj_path is not None and obj.path <= last_obj_path:
+            raise RuntimeError(
+                f"Listing of object storage is not sorted: {obj.path} after {last_obj_path}"
+            )
+        last_obj_path = obj.path
+
+        while path is not None and path < obj.path:
+            next_path = next(paths, None)
+            if next_path is not None and next_path < path:
+                raise RuntimeError(
+                    f"Remote data paths are not sorted: {next_path} after {path}"
+                )
+            path = next_path
+
+        if path != obj.path:
+            yield obj
@@ -1,43 +1,211 @@
-from typing import Any, Iterator, List, Tuple
+import random
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
 
-import boto3
-from botocore.client import Config
+from botocore.exceptions import ClientError
 
 from ch_tools.chadmin.internal.utils import chunked
+from ch_tools.common import logging
 from ch_tools.common.clickhouse.config.storage_configuration import S3DiskConfiguration
+from ch_tools.common.rate_limiter import TokenBucket
 
 from .obj_list_item import ObjListItem
+from .s3_client import create_s3_client
 
 BULK_DELETE_CHUNK_SIZE = 1000
+DEFAULT_DELETE_WORKERS = 4
+# Error codes of S3 requests and keys that are retried
+RETRYABLE_ERROR_CODES = {"SlowDown", "InternalError", "ServiceUnavailable"}
+MAX_DELETE_ATTEMPTS = 8
+RETRY_MIN_WAIT_SEC = 0.5
+RETRY_MAX_WAIT_SEC = 30
+# Max number of keys reported in the log for each error code
+LOGGED_FAILED_KEYS = 10
+
+
+@dataclass
+class DeleteResult:
+    deleted: int = 0
+    total_size: int = 0
+    # Number of failed keys by error code
+    errors: Counter = field(default_factory=Counter)
+
+
+# Callback receiving number and total size of deleted objects and the last key
+# of deleted chunks
+ProgressCallback = Callable[[int, int, str], None]
 
 
 def cleanup_s3_object_storage(
-    disk: S3DiskConfiguration, keys: Iterator[ObjListItem], dry_run: bool = False
+    disk: S3DiskConfiguration,
+    keys: Iterable[ObjListItem],
+    dry_run: bool = False,
+    *,
+    workers: int = DEFAULT_DELETE_WORKERS,
+    max_requests_per_second: float = 0,
+    max_bytes_per_second: float = 0,
+    on_progress: Optional[ProgressCallback] = None,
 ) -> Tuple[int, int]:
-    s3 = boto3.resource(
-        "s3",
-        endpoint_url=disk.endpoint_url,
-        aws_access_key_id=disk.access_key_id,
-        aws_secret_access_key=disk.secret_access_key,
-        config=Config(
-            s3={
-                "addressing_style": "auto",
-            },
-        ),
+    """
+    Delete objects with concurrent DeleteObjects requests of up to 1000 keys.
+
+    Requests are limited by number and by total size of deleted objects per second.
+    Requests and keys failed with SlowDown and other transient errors are retried
+    with exponential backoff, other per-key errors are counted and logged.
+    Return number and total size of deleted objects.
+
+    Keys are expected in ascending order. `on_progress` is called every time the
+    chunks of keys up to some key are processed, with the number and total size of
+    objects deleted so far and that key.
+    """
+    if dry_run:
+        result = DeleteResult()
+        for key in keys:
+            result.deleted += 1
+            result.total_size += key.size
+        return result.deleted, result.total_size
+
+    deleter = _S3Deleter(
+        disk,
+        workers,
+        TokenBucket(max_requests_per_second),
+        TokenBucket(max_bytes_per_second),
     )
-    bucket = s3.Bucket(disk.bucket_name)
-    deleted = 0
-    total_size = 0
+    result = deleter.delete(keys, on_progress)
+
+    for code, count in result.errors.items():
+        logging.warning("Failed to delete {} objects with error {}", count, code)
+    return result.deleted, result.total_size
+
+
+class _S3Deleter:
+    def __init__(
+        self,
+        disk: S3DiskConfiguration,
+        workers: int,
+        requests_limit: TokenBucket,
+        bytes_limit: TokenBucket,
+    ) -> None:
+        self._bucket = disk.bucket_name
+        self._workers = max(1, workers)
+        self._client = create_s3_client(disk, self._workers)
+        self._requests_limit = requests_limit
+        self._bytes_limit = bytes_limit
+
+    def delete(
+        self, keys: Iterable[ObjListItem], on_progress: Optional[ProgressCallback]
+    ) -> DeleteResult:
+        result = DeleteResult()
+        # Number and last key of submitted chunks
+        futures: Dict[Future, Tuple[int, str]] = {}
+        # Chunks are completed out of order, so the progress is reported
+        # for the longest sequence of completed chunks
+        completed: Dict[int, Tuple[DeleteResult, str]] = {}
+        reported = DeleteResult()
+        next_chunk = 0
+
+        def _collect(done: Set[Future]) -> None:
+            nonlocal next_chunk
+            error = None
+            for future in done:
+                number, last_key = futures.pop(future)
+                if future.exception():
+                    error = error or future.exception()
+                    continue
+                chunk_result = future.result()
+                result.deleted += chunk_result.deleted
+                result.total_size += chunk_result.total_size
+                result.errors.update(chunk_result.errors)
+                completed[number] = (chunk_result, last_key)
+
+            # Progress of chunks completed before a failed one is reported anyway
+            while next_chunk in completed:
+                chunk_result, last_key = completed.pop(next_chunk)
+                next_chunk += 1
+                reported.deleted += chunk_result.deleted
+                reported.total_size += chunk_result.total_size
+                if on_progress:
+                    on_progress(reported.deleted, reported.total_size, last_key)
+
+            if error:
+                raise error
+
+        with ThreadPoolExecutor(max_workers=self._workers) as executor:
+            for number, chunk in enumerate(chunked(keys, BULK_DELETE_CHUNK_SIZE)):
+                # Keep the number of chunks in memory bounded
+                if len(futures) >= self._workers * 2:
+                    _collect(wait(futures, return_when=FIRST_COMPLETED).done)
+                future = executor.submit(self._delete_chunk, chunk)
+                futures[future] = (number, chunk[-1].path)
+            _collect(wait(futures).done)
+
+        return result
+
+    def _delete_chunk(self, items: List[ObjListItem]) -> DeleteResult:
+        result = DeleteResult()
+        sizes = {item.path: item.size for item in items}
+        pending = list(sizes)
+        attempt = 0
+        while pending:
+            attempt += 1
+            self._requests_limit.acquire()
+            self._bytes_limit.acquire(sum(sizes[key] for key in pending))
+            try:
+                response = self._client.delete_objects(
+                    Bucket=self._bucket,
+                    Delete={
+                        "Objects": [{"Key": key} for key in pending],
+                        "Quiet": True,
+                    },
+                )
+            except ClientError as e:
+                code = e.response.get("Error", {}).get("Code")
+                if code not in RETRYABLE_ERROR_CODES or attempt >= MAX_DELETE_ATTEMPTS:
+                    raise
+                self._backoff(attempt, code)
+                continue
 
-    for chunk in chunked(keys, BULK_DELETE_CHUNK_SIZE):
-        if not dry_run:
-            _bulk_delete(bucket, chunk)
-        deleted += len(chunk)
-        total_size += sum(item.size for item in chunk)
+            errors = {error["Key"]: error for error in response.get("Errors", [])}
+            retried = []
+            for key in pending:
+                error = errors.get(key)
+                if error is None:
+                    result.deleted += 1
+                    result.total_size += sizes[key]
+                elif (
+                    error["Code"] in RETRYABLE_ERROR_CODES
+                    and attempt < MAX_DELETE_ATTEMPTS
+                ):
+                    retried.append(key)
+                else:
+                    self._report_failure(result, key, error)
+            pending = retried
+            if pending:
+                self._backoff(attempt, f"{len(pending)} failed keys")
 
-    return deleted, total_size
+        return result
 
+    @staticmethod
+    def _report_failure(result: DeleteResult, key: str, error: Dict[str, str]) -> None:
+        code = error["Code"]
+        result.errors[code] += 1
+        if result.errors[code] <= LOGGED_FAILED_KEYS:
+            logging.error(
+                "Failed to delete object {}: {} {}", key, code, error.get("Message", "")
+            )
 
-def _bulk_delete(bucket: Any, items: List[ObjListItem]) -> None:
-    objects = [{"Key": item.path} for item in items]
-    bucket.delete_objects(Delete={"Objects": objects, "Quiet": False})
+    @staticmethod
+    def _backoff(attempt: int, reason: str) -> None:
+        delay = random.uniform(
+            0, min(RETRY_MAX_WAIT_SEC, RETRY_MIN_WAIT_SEC * 2 ** (attempt - 1))
+        )
+        logging.warning(
+            "Retrying delete request due to {} in {:.1f}s (attempt {})",
+            reason,
+            delay,
+            attempt,
+        )
+        time.sleep(delay)
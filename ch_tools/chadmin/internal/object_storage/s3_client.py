@@ -0,0 +1,40 @@
+from datetime import datetime
+from typing import Any
+
+import boto3  # type: ignore[import]
+import botocore.session
+from botocore.client import Config
+from botocore.utils import parse_timestamp as default_timestamp_parser
+
+from ch_tools.common.clickhouse.config.storage_configuration import S3DiskConfiguration
+
+
+def create_s3_client(disk: S3DiskConfiguration, max_connections: int = 10) -> Any:
+    """
+    Create S3 client for the disk. The client is thread-safe and can be shared by workers.
+    """
+    botocore_session = botocore.session.get_session()
+    # Parsing of timestamps with dateutil takes most of the CPU time of listing
+    botocore_session.get_component("response_parser_factory").set_parser_defaults(
+        timestamp_parser=_parse_timestamp
+    )
+    return boto3.session.Session(botocore_session=botocore_session).client(
+        "s3",
+        endpoint_url=disk.endpoint_url,
+        aws_access_key_id=disk.access_key_id,
+        aws_secret_access_key=disk.secret_access_key,
+        config=Config(
+            s3={"addressing_style": "auto"},
+            max_pool_connections=max_connections,
+        ),
+    )
+
+
+def _parse_timestamp(value: str) -> datetime:
+    """
+    Fast path for ISO 8601 timestamps returned by S3, e.g. 2024-01-01T00:00:00.000Z.
+    """
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return default_timestamp_parser(value)
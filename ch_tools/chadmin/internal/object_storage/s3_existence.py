@@ -0,0 +1,106 @@
+"""
+Existence check of many objects in S3 bucket.
+
+Instead of a request per key, sorted keys are split into ranges and every range is
+checked by listing objects between its first and last key, so the number of requests
+depends on the number of objects in the ranges divided by the page size. Ranges of
+sparse keys are split further, down to HEAD requests for single keys.
+"""
+
+import os
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterable, Iterator, List, Set
+
+from botocore.exceptions import ClientError
+
+from ch_tools.chadmin.internal.utils import chunked
+from ch_tools.common.clickhouse.config.storage_configuration import S3DiskConfiguration
+
+from .s3_client import create_s3_client
+
+DEFAULT_CHECK_WORKERS = 8
+# Max number of keys checked with a single range listing
+KEYS_PER_RANGE = 1000
+# Listing of a range is stopped when it returns more objects than this number
+# per checked key, and the rest of the range is split in halves
+MAX_LISTED_OBJECTS_PER_KEY = 10
+
+
+def find_missing_keys(
+    disk: S3DiskConfiguration,
+    keys: Iterable[str],
+    workers: int = DEFAULT_CHECK_WORKERS,
+) -> Set[str]:
+    """
+    Return keys that do not exist in the bucket. Key ranges are listed concurrently.
+    """
+    workers = max(1, workers)
+    client = create_s3_client(disk, workers)
+    missing: Set[str] = set()
+
+    def _check(range_keys: List[str]) -> List[str]:
+        return _find_missing_in_range(client, disk.bucket_name, range_keys)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for range_missing in executor.map(
+            _check, chunked(sorted(set(keys)), KEYS_PER_RANGE)
+        ):
+            missing.update(range_missing)
+
+    return missing
+
+
+def _find_missing_in_range(client: Any, bucket: str, keys: List[str]) -> List[str]:
+    """
+    Return missing keys of the sorted list. The range of keys is listed while the number
+    of listed objects is proportional to the number of keys, the rest of keys is checked
+    by halves. A single key in a sparse range is checked with a HEAD request.
+    """
+    max_objects = len(keys) * MAX_LISTED_OBJECTS_PER_KEY
+    found: Set[str] = set()
+    for key in _list_range(client, bucket, keys[0], keys[-1]):
+        found.add(key)
+        if len(found) <= max_objects:
+            continue
+
+        # Keys up to the last listed one are checked
+        checked = bisect_right(keys, key)
+        missing = [k for k in keys[:checked] if k not in found]
+        rest = keys[checked:]
+        if len(rest) == 1:
+            return missing + [k for k in rest if not _exists(client, bucket, k)]
+        middle = len(rest) // 2
+        for part in (rest[:middle], rest[middle:]):
+            if part:
+                missing += _find_missing_in_range(client, bucket, part)
+        return missing
+
+    return [key for key in keys if key not in found]
+
+
+def _exists(client: Any, bucket: str, key: str) -> bool:
+    try:
+        client.head_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+            return False
+        raise
+    return True
+
+
+def _list_range(client: Any, bucket: str, first: str, last: str) -> Iterator[str]:
+    """
+    List keys from `first` to `last` inclusive under their common prefix.
+    """
+    kwargs = {"Bucket": bucket, "Prefix": os.path.commonprefix([first, last])}
+    if len(first) > 1:
+        # Any string preceding the first key is fine, the prefix of the key is the nearest
+        kwargs["StartAfter"] = first[:-1]
+
+    paginator = client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(**kwargs):
+        for item in page.get("Contents", []):
+            if item["Key"] > last:
+                return
+            yield item["Key"]
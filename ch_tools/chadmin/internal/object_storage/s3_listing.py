@@ -0,0 +1,324 @@
+"""
+Parallel listing of S3 bucket.
+
+The keyspace under the listed prefix is split into ranges of keys by common prefixes
+(directories) of the first levels, and the ranges are listed concurrently. Listing can be
+resumed from the checkpoint containing the last processed key of each range.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from ch_tools.chadmin.internal.object_storage.s3_client import create_s3_client
+from ch_tools.chadmin.internal.object_storage.s3_iterator import (
+    IGNORED_OBJECT_NAME_PREFIXES,
+)
+from ch_tools.common import logging
+from ch_tools.common.clickhouse.config.storage_configuration import S3DiskConfiguration
+
+DEFAULT_LISTING_WORKERS = 8
+# Number of key ranges per worker to balance uneven directories
+PARTITIONS_PER_WORKER = 8
+# Max depth of directories used to split the keyspace
+MAX_SPLIT_DEPTH = 2
+# Max number of listed pages waiting to be processed
+MAX_PENDING_PAGES = 64
+# Min interval in seconds between checkpoint saves
+CHECKPOINT_SAVE_INTERVAL = 5
+
+
+class S3ObjectSummary(NamedTuple):
+    """
+    Listed object, has the same attributes as boto3 ObjectSummary.
+    """
+
+    key: str
+    size: int
+    last_modified: datetime
+
+
+@dataclass
+class S3ListingPartition:
+    """
+    Range of keys (start_after, end]. Unbounded if `end` is None.
+    """
+
+    start_after: str = ""
+    end: Optional[str] = None
+    done: bool = False
+
+
+@dataclass
+class S3ListingCheckpoint:
+    bucket: str
+    prefix: str
+    partitions: List[S3ListingPartition] = field(default_factory=list)
+
+    @classmethod
+    def from_json(cls, json_str: str) -> "S3ListingCheckpoint":
+        data = json.loads(json_str)
+        return cls(
+            bucket=data["bucket"],
+            prefix=data["prefix"],
+            partitions=[S3ListingPartition(**p) for p in data["partitions"]],
+        )
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), indent=4)
+
+
+@dataclass
+class S3ListingPage:
+    partition: S3ListingPartition
+    objects: List[S3ObjectSummary]
+    last_key: Optional[str]
+    # The last page of the partition
+    last: bool
+
+
+class _Failure(NamedTuple):
+    error: Exception
+
+
+_PageQueue = queue.Queue[Union[S3ListingPage, _Failure]]
+
+
+class S3ParallelLister:
+    """
+    List objects under the prefix with several workers.
+
+    Pages are returned as soon as they are listed. Pages of the same partition are returned
+    in order. A page should be passed to `commit` after it is processed to make it a part of
+    the checkpoint.
+
+    If `ordered` is set, all pages are returned in the order of keys. Partitions are still
+    listed concurrently, but pages of partitions that are listed ahead are buffered until
+    the preceding partitions are returned.
+    """
+
+    def __init__(
+        self,
+        disk: S3DiskConfiguration,
+        prefix: str,
+        *,
+        workers: int = DEFAULT_LISTING_WORKERS,
+        checkpoint_path: Optional[str] = None,
+        resume: bool = False,
+        skip_ignoring: bool = False,
+        ordered: bool = False,
+    ) -> None:
+        self._bucket = disk.bucket_name
+        self._prefix = prefix
+        self._workers = max(1, workers)
+        self._checkpoint_path = checkpoint_path
+        self._skip_ignoring = skip_ignoring
+        self._ordered = ordered
+        self._client = create_s3_client(disk, self._workers)
+        self._stopped = threading.Event()
+        self._checkpoint = self._load_checkpoint() if resume else None
+        self._last_save_time = 0.0
+
+    def iter_pages(self) -> Iterator[S3ListingPage]:
+        if self._checkpoint is None:
+            self._checkpoint = S3ListingCheckpoint(
+                self._bucket, self._prefix, self._split_keyspace()
+            )
+            self._save_checkpoint(force=True)
+
+        partitions = [p for p in self._checkpoint.partitions if not p.done]
+        logging.info(
+            "Listing {} key ranges of {} with {} workers",
+            len(partitions),
+            self._prefix,
+            self._workers,
+        )
+
+        # In ordered mode every partition has its own queue of pages. As partitions are
+        # started in order, the partition being returned is always listed by a worker.
+        shared_queue = _PageQueue(MAX_PENDING_PAGES)
+        if self._ordered:
+            queues = [_PageQueue(MAX_PENDING_PAGES) for _ in partitions]
+        else:
+            queues = [shared_queue] * len(partitions)
+
+        self._stopped.clear()
+        with ThreadPoolExecutor(max_workers=self._workers) as executor:
+            for partition, pages in zip(partitions, queues):
+                executor.submit(self._list_partition, partition, pages)
+            try:
+                if self._ordered:
+                    for pages in queues:
+                        yield from _iter_queue(pages, 1)
+                else:
+                    yield from _iter_queue(shared_queue, len(partitions))
+            finally:
+                # Unblock and stop workers if the listing is interrupted
+                self._stopped.set()
+                for pages in queues:
+                    while not pages.empty():
+                        pages.get_nowait()
+                self._save_checkpoint(force=True)
+
+    def commit(self, page: S3ListingPage) -> None:
+        """
+        Mark objects of the page as processed.
+        """
+        if page.last_key is not None:
+            page.partition.start_after = page.last_key
+        if page.last:
+            page.partition.done = True
+        self._save_checkpoint()
+
+    def finish(self) -> None:
+        """
+        Remove the checkpoint after the listing is completed and processed.
+        """
+        if self._checkpoint_path and os.path.exists(self._checkpoint_path):
+            os.remove(self._checkpoint_path)
+
+    def _split_keyspace(self) -> List[S3ListingPartition]:
+        """
+        Split the keyspace into ranges by common prefixes of the first levels.
+        """
+        min_partitions = self._workers * PARTITIONS_PER_WORKER
+        boundaries = [self._prefix]
+        for _ in range(MAX_SPLIT_DEPTH):
+            if len(boundaries) >= min_partitions:
+                break
+            expanded = []
+            for prefix in boundaries:
+                expanded.extend(self._list_common_prefixes(prefix) or [prefix])
+            if expanded == boundaries:
+                break
+            boundaries = expanded
+
+        if len(boundaries) > min_partitions:
+            step = len(boundaries) / min_partitions
+            boundaries = [boundaries[int(i * step)] for i in range(min_partitions)]
+
+        # Each boundary is the end of the preceding range
+        ends = sorted(set(boundaries[1:]))
+        partitions = []
+        start_after = ""
+        for end in ends:
+            partitions.append(S3ListingPartition(start_after, end))
+            start_after = end
+        partitions.append(S3ListingPartition(start_after))
+        return partitions
+
+    def _list_common_prefixes(self, prefix: str) -> List[str]:
+        paginator = self._client.get_paginator("list_objects_v2")
+        result: List[str] = []
+        for page in paginator.paginate(
+            Bucket=self._bucket, Prefix=prefix, Delimiter="/"
+        ):
+            result.extend(item["Prefix"] for item in page.get("CommonPrefixes", []))
+        return result
+
+    def _list_partition(self, partition: S3ListingPartition, pages: _PageQueue) -> None:
+        if self._stopped.is_set():
+            return
+        try:
+            kwargs = {"Bucket": self._bucket, "Prefix": self._prefix}
+            if partition.start_after:
+                kwargs["StartAfter"] = partition.start_after
+
+            paginator = self._client.get_paginator("list_objects_v2")
+            for page in paginator.paginate(**kwargs):
+                if self._stopped.is_set():
+                    return
+                objects, last_key, finished = self._parse_page(page, partition.end)
+                self._put(pages, S3ListingPage(partition, objects, last_key, finished))
+                if finished:
+                    return
+
+            self._put(pages, S3ListingPage(partition, [], None, True))
+        except Exception as e:
+            self._put(pages, _Failure(e))
+
+    def _parse_page(
+        self, page: Any, end: Optional[str]
+    ) -> Tuple[List[S3ObjectSummary], Optional[str], bool]:
+        """
+        Return objects of the page up to the end of the partition, the last key
+        and whether the end of the partition is reached.
+        """
+        objects: List[S3ObjectSummary] = []
+        last_key = None
+        for item in page.get("Contents", []):
+            key = item["Key"]
+            if end is not None and key > end:
+                return objects, last_key, True
+            last_key = key
+            if not self._skip_ignoring and _is_ignored(key):
+                continue
+            objects.append(S3ObjectSummary(key, item["Size"], item["LastModified"]))
+        return objects, last_key, False
+
+    def _put(self, pages: _PageQueue, item: Union[S3ListingPage, _Failure]) -> None:
+        while not self._stopped.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _load_checkpoint(self) -> Optional[S3ListingCheckpoint]:
+        if not self._checkpoint_path or not os.path.exists(self._checkpoint_path):
+            logging.warning("No listing checkpoint found, listing from the beginning")
+            return None
+
+        with open(self._checkpoint_path, encoding="utf-8") as file:
+            checkpoint = S3ListingCheckpoint.from_json(file.read())
+        if (checkpoint.bucket, checkpoint.prefix) != (self._bucket, self._prefix):
+            logging.warning(
+                "Listing checkpoint is saved for bucket {} and prefix {}, ignore it",
+                checkpoint.bucket,
+                checkpoint.prefix,
+            )
+            return None
+
+        logging.info(
+            "Resuming listing, {} of {} key ranges are completed",
+            sum(p.done for p in checkpoint.partitions),
+            len(checkpoint.partitions),
+        )
+        return checkpoint
+
+    def _save_checkpoint(self, force: bool = False) -> None:
+        if not self._checkpoint_path or self._checkpoint is None:
+            return
+
+        now = time.monotonic()
+        if not force and now - self._last_save_time < CHECKPOINT_SAVE_INTERVAL:
+            return
+        self._last_save_time = now
+
+        tmp_path = f"{self._checkpoint_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(self._checkpoint.to_json())
+        os.replace(tmp_path, self._checkpoint_path)
+
+
+def _iter_queue(pages: _PageQueue, partitions: int) -> Iterator[S3ListingPage]:
+    """
+    Return pages from the queue until the last pages of the partitions are returned.
+    """
+    while partitions:
+        item = pages.get()
+        if isinstance(item, _Failure):
+            raise item.error
+        if item.last:
+            partitions -= 1
+        yield item
+
+
+def _is_ignored(name: str) -> bool:
+    return any(p in name for p in IGNORED_OBJECT_NAME_PREFIXES)
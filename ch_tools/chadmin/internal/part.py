@@ -1,15 +1,15 @@
 import json
 import re
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional
 
 from click import Context
 
 from ch_tools.chadmin.internal.clickhouse_disks import remove_from_ch_disk
 from ch_tools.chadmin.internal.system import get_version
-from ch_tools.chadmin.internal.utils import execute_query
+from ch_tools.chadmin.internal.utils import execute_query, iter_query_rows
 
 
-def list_parts(
+def iter_parts(
     ctx: Context,
     *,
     database: Optional[str] = None,
@@ -28,12 +28,12 @@ def list_parts(
     order_by: Optional[str] = None,
     limit: Optional[int] = None,
     use_part_list_from_json: Optional[str] = None,
-) -> List[Dict[str, Any]]:
+) -> Iterator[Dict[str, Any]]:
     """
-    List data parts.
+    Iterate over data parts. Parts are fetched from the server as they are consumed.
     """
     if use_part_list_from_json:
-        return read_and_validate_parts_from_json(use_part_list_from_json)["data"]
+        return iter(read_and_validate_parts_from_json(use_part_list_from_json)["data"])
 
     order_by = {
         "size": "bytes_on_disk DESC",
@@ -120,7 +120,7 @@ def list_parts(
         LIMIT {{ limit }}
         {% endif -%}
         """
-    return execute_query(
+    return iter_query_rows(
         ctx,
         query,
         database=database,
@@ -138,8 +138,18 @@ def list_parts(
         active=active,
         order_by=order_by,
         limit=limit,
-        format_="JSON",
-    )["data"]
+        quote_64bit_integers=True,
+    )
+
+
+def list_parts(
+    ctx: Context,
+    **kwargs: Any,
+) -> List[Dict[str, Any]]:
+    """
+    List data parts.
+    """
+    return list(iter_parts(ctx, **kwargs))
 
 
 def list_detached_parts(
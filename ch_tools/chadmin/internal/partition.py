@@ -1,6 +1,9 @@
+from typing import Any, Callable, Dict, List, Optional
+
 from click import Context
 
 from ch_tools.chadmin.internal.utils import execute_query
+from ch_tools.common.process_pool import WorkerTask, execute_tasks_in_parallel
 
 
 def attach_partition(
@@ -23,6 +26,16 @@ def detach_partition(
     _execute_query(ctx, query, dry_run)
 
 
+def reattach_partition(
+    ctx: Context, database: str, table: str, partition_id: str, dry_run: bool = False
+) -> None:
+    """
+    Detach and then attach back the specified table partition.
+    """
+    detach_partition(ctx, database, table, partition_id, dry_run=dry_run)
+    attach_partition(ctx, database, table, partition_id, dry_run=dry_run)
+
+
 def drop_partition(
     ctx: Context, database: str, table: str, partition_id: str, dry_run: bool = False
 ) -> None:
@@ -53,6 +66,51 @@ def materialize_ttl_in_partition(
     _execute_query(ctx, query, dry_run)
 
 
+def process_partitions(
+    partitions: List[Dict[str, Any]],
+    function: Callable,
+    *,
+    ctx: Context,
+    dry_run: bool,
+    workers: int,
+    keep_going: bool,
+    limit_errors: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Apply the function to partitions in parallel. Partitions of the same table are
+    processed one at a time to not run concurrent ALTER queries on a table.
+    Return the list of failed partitions.
+    """
+    tasks = [
+        WorkerTask(
+            f"`{p['database']}`.`{p['table']}` partition {p['partition_id']}",
+            function,
+            {
+                "ctx": ctx,
+                "database": p["database"],
+                "table": p["table"],
+                "partition_id": p["partition_id"],
+                "dry_run": dry_run,
+            },
+            group=f"`{p['database']}`.`{p['table']}`",
+        )
+        for p in partitions
+    ]
+    results = execute_tasks_in_parallel(
+        tasks,
+        max_workers=workers,
+        keep_going=keep_going,
+        limit_errors=limit_errors,
+        max_tasks_per_group=1,
+        report_progress=True,
+    )
+    return [
+        p
+        for p, task in zip(partitions, tasks)
+        if isinstance(results.get(task.indeifier), Exception)
+    ]
+
+
 def _execute_query(ctx: Context, query: str, dry_run: bool) -> None:
     timeout = ctx.obj["config"]["clickhouse"]["alter_table_timeout"]
     execute_query(ctx, query, timeout=timeout, format_=None, echo=True, dry_run=dry_run)
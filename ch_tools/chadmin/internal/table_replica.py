@@ -1,10 +1,10 @@
 import json
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional
 
 from click import ClickException, Context
 
 from ch_tools.chadmin.internal.part import attach_part
-from ch_tools.chadmin.internal.utils import execute_query
+from ch_tools.chadmin.internal.utils import execute_query, iter_query_rows
 from ch_tools.chadmin.internal.zookeeper import check_zk_node
 from ch_tools.common import logging
 from ch_tools.common.clickhouse.client.error import ClickhouseError
@@ -33,7 +33,7 @@ def get_table_replica(
     return replicas[0]
 
 
-def list_table_replicas(
+def iter_table_replicas(
     ctx: Context,
     *,
     database_name: Optional[str] = None,
@@ -46,9 +46,9 @@ def list_table_replicas(
     is_readonly: Optional[bool] = None,
     verbose: bool = False,
     limit: Optional[int] = None,
-) -> List[Dict[str, Any]]:
+) -> Iterator[Dict[str, Any]]:
     """
-    List replicas of replicated tables.
+    Iterate over replicas of replicated tables.
     """
     query = """
         SELECT
@@ -109,7 +109,7 @@ def list_table_replicas(
         LIMIT {{ limit }}
         {% endif -%}
         """
-    return execute_query(
+    return iter_query_rows(
         ctx,
         query,
         database_name=database_name,
@@ -122,8 +122,15 @@ def list_table_replicas(
         is_readonly=is_readonly,
         verbose=verbose,
         limit=limit,
-        format_="JSON",
-    )["data"]
+        quote_64bit_integers=True,
+    )
+
+
+def list_table_replicas(ctx: Context, **kwargs: Any) -> List[Dict[str, Any]]:
+    """
+    List replicas of replicated tables.
+    """
+    return list(iter_table_replicas(ctx, **kwargs))
 
 
 def restart_table_replica(
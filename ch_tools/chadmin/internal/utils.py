@@ -6,12 +6,16 @@ import os
 import re
 import shutil
 from itertools import islice
-from typing import Any, Iterable, Iterator, Optional
+from typing import Any, Dict, Iterable, Iterator, Optional
 
 from click import Context
 
 from ch_tools.common import logging
-from ch_tools.common.clickhouse.client.clickhouse_client import clickhouse_client
+from ch_tools.common.clickhouse.client.clickhouse_client import (
+    ClickhouseClient,
+    clickhouse_client,
+)
+from ch_tools.common.clickhouse.client.client_pool import clickhouse_client_pool
 from ch_tools.monrun_checks.clickhouse_info import ClickhouseInfo
 
 
@@ -33,11 +37,7 @@ def execute_query(
     if format_ == "default":
         format_ = "PrettyCompact"
 
-    ch_client = clickhouse_client(ctx)
-
-    if replica is not None:
-        ch_client.host = replica
-
+    ch_client = _get_client(ctx, replica)
     return ch_client.query(
         query=query,
         query_args=kwargs,
@@ -50,6 +50,32 @@ def execute_query(
     )
 
 
+def iter_query_rows(
+    ctx: Context,
+    query: Any,
+    timeout: Optional[int] = None,
+    echo: Optional[bool] = False,
+    dry_run: Optional[bool] = False,
+    settings: Optional[Any] = None,
+    replica: Optional[str] = None,
+    quote_64bit_integers: bool = False,
+    **kwargs: Any,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Execute ClickHouse query and iterate over result rows as they are received.
+    """
+    ch_client = _get_client(ctx, replica)
+    return ch_client.iter_rows(
+        query=query,
+        query_args=kwargs,
+        timeout=timeout,
+        echo=bool(echo),
+        dry_run=bool(dry_run),
+        settings=settings,
+        quote_64bit_integers=quote_64bit_integers,
+    )
+
+
 def execute_query_on_shard(
     ctx: Context,
     query: str,
@@ -61,20 +87,38 @@ def execute_query_on_shard(
     settings: Optional[Any] = None,
     **kwargs: Any,
 ) -> None:
+    """
+    Execute ClickHouse query on all replicas of the shard concurrently.
+    """
+    if format_ == "default":
+        format_ = "PrettyCompact"
+
     replicas = ClickhouseInfo.get_replicas(ctx)
-    for replica in replicas:
-        execute_query(
-            ctx,
-            query,
-            timeout=timeout,
-            echo=echo,
-            dry_run=dry_run,
-            format_=format_,
-            stream=stream,
-            settings=settings,
-            replica=replica,
-            **kwargs,
-        )
+    results = clickhouse_client_pool(ctx).fan_out(
+        query,
+        replicas,
+        query_args=kwargs,
+        timeout=timeout,
+        format_=format_,
+        echo=echo,
+        dry_run=dry_run,
+        stream=stream,
+        settings=settings,
+    )
+
+    error = None
+    for replica, result in results.items():
+        if result.error is not None:
+            logging.error("Query failed on replica {}: {!r}", replica, result.error)
+            error = error or result.error
+    if error is not None:
+        raise error
+
+
+def _get_client(ctx: Context, replica: Optional[str]) -> ClickhouseClient:
+    if replica is None:
+        return clickhouse_client(ctx)
+    return clickhouse_client_pool(ctx).get(replica)
 
 
 def format_query(query: str) -> str:
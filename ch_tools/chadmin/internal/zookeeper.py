@@ -1,30 +1,44 @@
 import os
 import re
+import threading
 from collections import deque
 from contextlib import contextmanager
-from math import sqrt
 from typing import (
     Any,
     Callable,
+    Deque,
     Dict,
     Generator,
-    Iterable,
+    Iterator,
     List,
     Optional,
     Set,
+    Tuple,
     Union,
 )
 
 from click import Context
 from kazoo.client import KazooClient
 from kazoo.exceptions import NoNodeError, NotEmptyError
-from kazoo.protocol.states import ZnodeStat
+from kazoo.interfaces import IAsyncResult
+from kazoo.protocol.states import KazooState, ZnodeStat
 
-from ch_tools.chadmin.internal.utils import chunked, replace_macros
+from ch_tools.chadmin.internal.utils import replace_macros
+from ch_tools.chadmin.internal.zookeeper_walker import (
+    DEFAULT_MAX_IN_FLIGHT,
+    ZookeeperTreeWalker,
+)
 from ch_tools.common import logging
 from ch_tools.common.clickhouse.config import get_clickhouse_config, get_macros
 from ch_tools.common.clickhouse.config.clickhouse import ClickhouseConfig
 
+# Max number of operations in a single delete transaction
+DELETE_TRANSACTION_SIZE = 500
+# Max number of delete transactions sent to ZooKeeper without waiting for the response
+DELETE_TRANSACTIONS_IN_FLIGHT = 10
+
+_zk_client_lock = threading.Lock()
+
 
 def has_zk() -> bool:
     return not ClickhouseConfig.load().zookeeper.is_empty()
@@ -59,25 +73,29 @@ def get_children(zk: KazooClient, path: str) -> List[str]:
 def list_zk_nodes(
     ctx: Context, path: str, verbose: bool = False
 ) -> Union[List[str], List[Dict[str, Any]]]:
-    def _stat_node(zk: KazooClient, node: str) -> Dict[str, Any]:
-        descendants_count = 0
-        queue = [node]
-        while queue:
-            item = queue.pop()
-            children = get_children(zk, item)
-            descendants_count += len(children)
-            queue.extend(os.path.join(item, node) for node in children)
-
-        return {
-            "path": node,
-            "nodes": descendants_count,
-        }
-
     with zk_client(ctx) as zk:
         path = format_path(ctx, path)
         result = zk.get_children(path)
         nodes = [os.path.join(path, node) for node in sorted(result)]
-        return [_stat_node(zk, node) for node in nodes] if verbose else nodes
+        if not verbose:
+            return nodes
+
+        # Count descendants of all listed nodes in a single pipelined traversal
+        descendants_count = dict.fromkeys(nodes, 0)
+        walker = ZookeeperTreeWalker(zk, get_zk_max_in_flight(ctx))
+        for node in walker.walk(nodes):
+            top_node = os.path.join(
+                path, os.path.relpath(node.path, path).split("/")[0]
+            )
+            descendants_count[top_node] += len(node.children)
+
+        return [
+            {
+                "path": node,
+                "nodes": descendants_count[node],
+            }
+            for node in nodes
+        ]
 
 
 def create_zk_nodes(
@@ -121,7 +139,16 @@ def delete_zk_node(ctx: Context, path: str) -> None:
 def delete_zk_nodes(ctx: Context, paths: List[str], dry_run: bool = False) -> None:
     paths_formated = [format_path(ctx, path) for path in paths]
     with zk_client(ctx) as zk:
-        delete_recursive(zk, paths_formated, dry_run)
+        delete_recursive(
+            zk, paths_formated, dry_run, max_in_flight=get_zk_max_in_flight(ctx)
+        )
+
+
+def get_zk_max_in_flight(ctx: Context) -> int:
+    """
+    Return max number of pipelined requests for traversals of ZooKeeper tree.
+    """
+    return ctx.obj["config"]["chadmin"]["zookeeper"]["max_in_flight_requests"]
 
 
 def format_path(ctx: Context, path: str) -> str:
@@ -148,96 +175,184 @@ def find_paths(
     root_path: str,
     included_paths_regexp: List[str],
     excluded_paths: Optional[List[str]] = None,
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
 ) -> List[str]:
     """
-    Traverse zookeeper tree from root_path with bfs approach.
+    Traverse zookeeper tree from root_path.
 
     Return paths of nodes that match the include regular expression and do not match the excluded one.
+    Subtrees of matched nodes are not traversed.
     """
-    paths: Set[str] = set()
-    queue: deque[str] = deque([root_path])
     included_regexp = re.compile("|".join(included_paths_regexp))
     excluded_regexp = re.compile("|".join(excluded_paths)) if excluded_paths else None
-    while len(queue):
-        path = queue.popleft()
-        if excluded_regexp and re.match(excluded_regexp, path):
-            continue
-        for child_node in get_children(zk, path):
-            subpath = os.path.join(path, child_node)
-            if re.match(included_regexp, subpath):
+
+    def _is_included(path: str) -> bool:
+        return re.match(included_regexp, path) is not None
+
+    def _is_excluded(path: str) -> bool:
+        return (
+            excluded_regexp is not None and re.match(excluded_regexp, path) is not None
+        )
+
+    if _is_excluded(root_path):
+        return []
+
+    paths: Set[str] = set()
+    walker = ZookeeperTreeWalker(zk, max_in_flight)
+    for node in walker.walk(
+        [root_path], exclude=lambda path: _is_included(path) or _is_excluded(path)
+    ):
+        for child_node in node.children:
+            subpath = os.path.join(node.path, child_node)
+            if _is_included(subpath):
                 paths.add(subpath)
-            else:
-                queue.append(os.path.join(path, subpath))
 
     return list(paths)
 
 
 def find_leafs_and_nodes(
-    zk: KazooClient, root_path: str, predicate: Callable
-) -> Iterable[str]:
+    zk: KazooClient,
+    root_path: str,
+    predicate: Callable,
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+) -> Iterator[str]:
     """
-    Recursively traverses zookeeper directory and returns all paths that satisfy the predicate.
+    Traverses zookeeper directory and returns all paths that satisfy the predicate.
 
     The predicate is applied on the leaf nodes only.
     If all nodes in a directory satisfy the predicate, then path of the node is also returned.
+    Paths are returned as soon as they are resolved, descendants before their directories.
     """
+    # Directories with not yet resolved children: [unresolved, matched, total] children
+    directories: Dict[str, List[int]] = {}
 
-    def _gen_matched_paths(path: str) -> Iterable[str]:
-        children = set(get_children(zk, path))
-        matched_children = 0
-
-        if not children:
-            if predicate(path):
+    def _resolve(path: str, matched: bool) -> Iterator[str]:
+        while True:
+            if matched:
                 yield path
-
-        for child in children:
-            child_path = os.path.join(path, child)
-            for matched_path in _gen_matched_paths(child_path):
-                # Check if returned path is a direct children
-                matched_path_dir = os.path.dirname(matched_path)
-                if path == matched_path_dir:
-                    matched_children += 1
-                yield matched_path
-
-        if children and matched_children == len(children):
-            yield path
-
-    yield from _gen_matched_paths(root_path)
+            if path == root_path:
+                return
+            parent = os.path.dirname(path)
+            counters = directories[parent]
+            counters[0] -= 1
+            counters[1] += int(matched)
+            if counters[0]:
+                return
+            # All children of the directory are resolved
+            del directories[parent]
+            path, matched = parent, counters[1] == counters[2]
+
+    walker = ZookeeperTreeWalker(zk, max_in_flight)
+    # Nodes deleted during the traversal are leafs, as if they have no children
+    for node in walker.walk([root_path], include_missing=True):
+        children = set(node.children)
+        if children:
+            directories[node.path] = [len(children), 0, len(children)]
+        else:
+            yield from _resolve(node.path, bool(predicate(node.path)))
 
 
-def delete_nodes_transaction(
-    zk: KazooClient, to_delete_in_trasaction: List[str]
-) -> None:
+class ZookeeperBulkDeleter:
     """
-    Perform deletion for the list of nodes in a single transaction.
-    If the transaction fails, go through the list and delete the nodes one by one.
-    """
-    delete_transaction = zk.transaction()
-    for node in to_delete_in_trasaction:
-        delete_transaction.delete(node)
-    result = delete_transaction.commit()
+    Delete nodes with multi-op transactions keeping several of them in flight.
 
-    if result.count(True) == len(result):
-        # Transaction completed successfully, exit.
-        return
+    Nodes must be passed to `delete` after their descendants. ZooKeeper processes requests
+    of a session in the order they were sent, so children are removed before their parents.
+    Failed transactions are split in halves and resent until failed operations are isolated,
+    nodes of failed operations are deleted one by one then.
+    """
 
-    logging.info(
-        "Delete transaction have failed. Fallthrough to single delete operations for zk_nodes : {}",
-        to_delete_in_trasaction,
-    )
-    for node in to_delete_in_trasaction:
-        successful_delete = False
-        while not successful_delete:
-            try:
-                zk.delete(node, recursive=True)
-                successful_delete = True
-            except NoNodeError:
+    def __init__(
+        self,
+        zk: KazooClient,
+        dry_run: bool = False,
+        transaction_size: int = DELETE_TRANSACTION_SIZE,
+        max_in_flight: int = DELETE_TRANSACTIONS_IN_FLIGHT,
+    ) -> None:
+        self._zk = zk
+        self._dry_run = dry_run
+        self._transaction_size = transaction_size
+        self._max_in_flight = max(1, max_in_flight)
+        self._batch: List[str] = []
+        self._in_flight: Deque[Tuple[List[str], IAsyncResult]] = deque()
+        self.deleted = 0
+        self.transactions = 0
+
+    def __enter__(self) -> "ZookeeperBulkDeleter":
+        return self
+
+    def __exit__(self, exc_type: Any, *_: Any) -> None:
+        if exc_type is None:
+            self.flush()
+
+    def delete(self, path: str) -> None:
+        """
+        Schedule deletion of the node.
+        """
+        if self._dry_run:
+            logging.info("Would delete node {}", path)
+            self.deleted += 1
+            return
+
+        self._batch.append(path)
+        if len(self._batch) >= self._transaction_size:
+            while len(self._in_flight) >= self._max_in_flight:
+                self._receive()
+            self._commit(self._batch)
+            self._batch = []
+
+    def flush(self) -> None:
+        """
+        Send the pending nodes and wait for all transactions to complete.
+        """
+        if self._batch:
+            self._commit(self._batch)
+            self._batch = []
+        while self._in_flight:
+            self._receive()
+
+    def _commit(self, paths: List[str]) -> None:
+        transaction = self._zk.transaction()
+        for path in paths:
+            transaction.delete(path)
+        self._in_flight.append((paths, transaction.commit_async()))
+        self.transactions += 1
+
+    def _receive(self) -> None:
+        paths, request = self._in_flight.popleft()
+        results = request.get()
+        if all(result is True for result in results):
+            self.deleted += len(paths)
+            return
+
+        if len(paths) > 1:
+            logging.debug(
+                "Delete transaction of {} nodes have failed, splitting it", len(paths)
+            )
+            # Halves are sent after the transactions in flight. If those contain parents
+            # of the nodes, they fail as well and are resent after the halves.
+            middle = len(paths) // 2
+            self._commit(paths[:middle])
+            self._commit(paths[middle:])
+            return
+
+        self._delete_node(paths[0], results[0])
+
+    def _delete_node(self, path: str, error: Exception) -> None:
+        while True:
+            if isinstance(error, NoNodeError):
                 #  Someone deleted node before us. Do nothing.
-                logging.error("Node {} is already absent, skipped", node)
-                successful_delete = True
-            except NotEmptyError:
-                # Someone created a node while we deleting. Restart the operation.
-                pass
+                logging.error("Node {} is already absent, skipped", path)
+                return
+            if not isinstance(error, NotEmptyError):
+                raise error
+            # Someone created a node while we deleting. Restart the operation.
+            try:
+                self._zk.delete(path, recursive=True)
+                self.deleted += 1
+                return
+            except (NoNodeError, NotEmptyError) as e:
+                error = e
 
 
 def remove_subpaths(paths: List[str]) -> List[str]:
@@ -262,13 +377,19 @@ def remove_subpaths(paths: List[str]) -> List[str]:
     return ["/".join(path) for path in normalized_paths]
 
 
-def delete_recursive(zk: KazooClient, paths: List[str], dry_run: bool = False) -> None:
+def delete_recursive(
+    zk: KazooClient,
+    paths: List[str],
+    dry_run: bool = False,
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+) -> None:
     """
     Kazoo already has the ability to recursively delete nodes, but the implementation is quite naive
     and has poor performance with a large number of nodes being deleted.
 
     In this implementation we unite the nodes to delete in transactions to do single operation for batch of nodes.
-    To delete in correct order first of all we perform topological sort using bfs approach.
+    Nodes are deleted while the tree is traversed, each node is scheduled for deletion
+    as soon as all its children are, so memory usage does not depend on the number of nodes.
     """
 
     if len(paths) == 0:
@@ -276,27 +397,21 @@ def delete_recursive(zk: KazooClient, paths: List[str], dry_run: bool = False) -
 
     logging.debug("Node to recursive delete {}", paths)
     paths = remove_subpaths(paths)
-    nodes_to_delete = []
-    queue = deque(paths)
-
-    while queue:
-        path = queue.popleft()
-        nodes_to_delete.append(path)
-        for child_node in get_children(zk, path):
-            queue.append(os.path.join(path, child_node))
+    with ZookeeperBulkDeleter(zk, dry_run) as deleter:
+        for path in paths:
+            for node in find_leafs_and_nodes(
+                zk, path, lambda _: True, max_in_flight=max_in_flight
+            ):
+                deleter.delete(node)
 
-    logging.info("Got {} nodes to remove.", len(nodes_to_delete))
     if dry_run:
-        logging.info("Would delete nodes: {}", nodes_to_delete)
-        return
-
-    # When number of nodes to delete is large preferable to use greater transaction size.
-    operations_in_transaction = max(100, int(sqrt(len(nodes_to_delete))))
-
-    for transaction_orerations in chunked(
-        reversed(nodes_to_delete), operations_in_transaction
-    ):
-        delete_nodes_transaction(zk, transaction_orerations)
+        logging.info("Would delete {} nodes.", deleter.deleted)
+    else:
+        logging.info(
+            "Deleted {} nodes in {} transactions.",
+            deleter.deleted,
+            deleter.transactions,
+        )
 
 
 def escape_for_zookeeper(s: str) -> str:
@@ -324,17 +439,93 @@ def get_table_shared_id(ctx: Context, zk_path: str) -> str:
         return ""
 
 
+class ZookeeperStats:
+    """
+    Counters of ZooKeeper sessions and requests made within a command invocation.
+    """
+
+    def __init__(self) -> None:
+        self.sessions = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def session_opened(self) -> None:
+        with self._lock:
+            self.sessions += 1
+
+    def request_sent(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+
+class _KazooClient(KazooClient):
+    """
+    KazooClient that counts requests sent to ZooKeeper. Every synchronous or
+    asynchronous operation, including multi-op transaction, is a single request.
+    """
+
+    def __init__(self, *args: Any, stats: ZookeeperStats, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.stats = stats
+        self._session_lost = False
+        self.add_listener(self._on_state_change)
+
+    def _on_state_change(self, state: KazooState) -> None:
+        # Kazoo transparently establishes a new session after the previous one is lost
+        if state == KazooState.LOST:
+            self._session_lost = True
+        elif state == KazooState.CONNECTED and self._session_lost:
+            self._session_lost = False
+            self.stats.session_opened()
+
+    def _call(self, request: Any, async_object: Any) -> Any:
+        self.stats.request_sent()
+        return super()._call(request, async_object)
+
+
+def get_zk_stats(ctx: Context) -> ZookeeperStats:
+    """
+    Return ZooKeeper counters of the current command invocation.
+    """
+    if "zk_stats" not in ctx.obj:
+        ctx.obj["zk_stats"] = ZookeeperStats()
+    return ctx.obj["zk_stats"]
+
+
 @contextmanager
 def zk_client(ctx: Context) -> Generator[KazooClient, None, None]:
-    zk = _get_zk_client(ctx)
-    try:
-        zk.start()
-        yield zk
-    finally:
-        zk.stop()
+    """
+    Return ZooKeeper client from the context if it exists. Otherwise, start a new one
+    and store it to the context. The client is shared by all operations of the command
+    and is stopped when the command ends.
+    """
+    with _zk_client_lock:
+        zk = ctx.obj.get("zk_client")
+        if zk is None:
+            zk = _get_zk_client(ctx)
+            zk.start()
+            zk.stats.session_opened()
+            ctx.obj["zk_client"] = zk
+            ctx.find_root().call_on_close(lambda: _close_zk_client(ctx))
+
+    yield zk
+
+
+def _close_zk_client(ctx: Context) -> None:
+    zk = ctx.obj.pop("zk_client", None)
+    if zk is None:
+        return
+
+    zk.stop()
+    zk.close()
+    logging.debug(
+        "ZooKeeper: {} session(s) opened, {} request(s) sent",
+        zk.stats.sessions,
+        zk.stats.requests,
+    )
 
 
-def _get_zk_client(ctx: Context) -> KazooClient:
+def _get_zk_client(ctx: Context) -> _KazooClient:
     """
     Create and return KazooClient.
     """
@@ -376,7 +567,7 @@ def _get_zk_client(ctx: Context) -> KazooClient:
     if zkcli_identity is not None:
         auth_data = [("digest", zkcli_identity)]
 
-    return KazooClient(
+    return _KazooClient(
         connect_str,
         auth_data=auth_data,
         timeout=timeout,
@@ -384,4 +575,5 @@ def _get_zk_client(ctx: Context) -> KazooClient:
         use_ssl=use_ssl,
         verify_certs=verify_ssl_certs,
         randomize_hosts=zk_randomize_hosts,
+        stats=get_zk_stats(ctx),
     )
@@ -2,15 +2,12 @@ import ast
 import os
 import re
 import time
-from collections import defaultdict, deque
-from dataclasses import dataclass
+from collections import defaultdict
 from functools import partial
 from typing import (
     Any,
     Callable,
-    Deque,
     Dict,
-    Generator,
     List,
     Optional,
     Tuple,
@@ -19,7 +16,6 @@ from typing import (
 from click import BadParameter, Context
 from kazoo.client import KazooClient
 from kazoo.exceptions import NoNodeError
-from kazoo.interfaces import IAsyncResult
 from tenacity import (
     retry,
     retry_if_exception_message,
@@ -38,6 +34,7 @@ from ch_tools.chadmin.internal.table_replica import (
 from ch_tools.chadmin.internal.utils import chunked
 from ch_tools.chadmin.internal.zero_copy import _get_zero_copy_zookeeper_path
 from ch_tools.chadmin.internal.zookeeper import (
+    ZookeeperBulkDeleter,
     delete_recursive,
     delete_zk_nodes,
     escape_for_zookeeper,
@@ -45,14 +42,18 @@ from ch_tools.chadmin.internal.zookeeper import (
     find_paths,
     format_path,
     get_children,
+    get_zk_max_in_flight,
     zk_client,
 )
+from ch_tools.chadmin.internal.zookeeper_walker import (
+    ZookeeperNode,
+    ZookeeperTreeWalker,
+)
 from ch_tools.common import logging
 from ch_tools.common.clickhouse.client import ClickhouseError
 from ch_tools.common.process_pool import WorkerTask, execute_tasks_in_parallel
 
 REPLICATED_DATABASE_MARKER = bytes("DatabaseReplicated", "utf-8")
-ZERO_COPY_LOCKS_TO_DELETE_BATCH = 10000
 
 
 def replace_macros_in_nodes(func: Callable) -> Callable:
@@ -63,146 +64,6 @@ def replace_macros_in_nodes(func: Callable) -> Callable:
     return wrapper
 
 
-@dataclass
-class ZookeeperNode:
-    path: str
-    children: List[str]
-
-
-@dataclass
-class GetChildrenTask:
-    path: str
-    get_children_request: IAsyncResult
-
-
-class ZookeeperTreeInspector:
-    """
-    Class for traversal zookeeper tree.
-    It is based on 3 queues (pending, active, finished). We are performing several (max_parrallel_tasks) async request,
-    so active queue has limited size.
-    Note: It doesn't inserts nodes, user should do it manually.
-
-    There are two main methods:
-        add() -> add list nodes to get children.
-        get() -> get the one node with list of children.
-    """
-
-    def __init__(self, zk: KazooClient, max_parrallel_tasks: int = 5) -> None:
-        self._zk_client = zk
-        self._max_active_tasks = max_parrallel_tasks
-
-        self._queue_pending: Deque[str] = deque()
-        self._queue_active: Deque[GetChildrenTask] = deque(
-            maxlen=self._max_active_tasks
-        )
-        self._queue_finished: Deque[ZookeeperNode] = deque()
-
-    def _update_pending_queue(self) -> None:
-        """
-        Moves tasks to active and creates async get_children requests.
-        """
-
-        number_tasks_to_move_to_active = min(
-            len(self._queue_pending), self._max_active_tasks - len(self._queue_active)
-        )
-
-        for _ in range(0, number_tasks_to_move_to_active):
-            path = self._queue_pending.popleft()
-            async_task = self._zk_client.get_children_async(path)
-            self._queue_active.append(GetChildrenTask(path, async_task))
-
-    def _update_active_queue(self) -> None:
-        """
-        Moves executed tasks from active to finished queues.
-        """
-
-        while (
-            len(self._queue_active)
-            and self._queue_active[0].get_children_request.ready()
-        ):
-            async_task = self._queue_active.popleft()
-            if async_task.get_children_request.successful():
-                self._queue_finished.append(
-                    ZookeeperNode(
-                        async_task.path, async_task.get_children_request.get()
-                    )
-                )
-            else:
-                if isinstance(async_task.get_children_request.exception, NoNodeError):
-                    logging.warning(
-                        "Ignoring node {}, because someone delete it", async_task.path
-                    )
-                    continue
-                raise async_task.get_children_request.exception
-
-    def _update_queues(self) -> None:
-        """
-        Perform queues updates.
-        """
-
-        self._update_active_queue()
-        self._update_pending_queue()
-
-    def _exists_tasks_to_do(self) -> bool:
-        """
-        Check that exists tasks in queues.
-        """
-
-        return (
-            len(self._queue_finished)
-            + len(self._queue_pending)
-            + len(self._queue_active)
-        ) > 0
-
-    def _wait_for_task_finished(self) -> None:
-        """
-        Wait until one of the tasks will be finished if it's possible.
-        """
-
-        while self._exists_tasks_to_do() and len(self._queue_finished) == 0:
-            self._update_pending_queue()
-            self._queue_active[0].get_children_request.wait()
-            self._update_active_queue()
-
-    def _get_impl(self) -> Optional[ZookeeperNode]:
-        """
-        Implementation of get functions.
-        """
-        self._update_queues()
-
-        if len(self._queue_finished):
-            return self._queue_finished.popleft()
-
-        self._wait_for_task_finished()
-
-        if not self._exists_tasks_to_do():
-            return None
-        return self._queue_finished.popleft()
-
-    def add(self, pathes_to_inspect: List[str]) -> None:
-        """
-        Add list of paths in pending queue.
-        """
-        self._queue_pending.extend(pathes_to_inspect)
-        self._update_queues()
-
-    def get(self) -> Optional[ZookeeperNode]:
-        """
-        Get one finished task, if exists.
-        """
-        return self._get_impl()
-
-    def tree_iterator(self) -> Generator[ZookeeperNode, None, None]:
-        """
-        Iterator for tree.
-        """
-        while True:
-            next_zk_node = self.get()
-            if not next_zk_node:
-                return
-            yield next_zk_node
-
-
 # pylint: disable=too-many-statements
 @replace_macros_in_nodes
 def clean_zk_metadata_for_hosts(
@@ -220,33 +81,24 @@ def clean_zk_metadata_for_hosts(
     """
 
     def _traverse_zk_tree_and_find_objects(
-        zk: KazooClient,
+        walker: ZookeeperTreeWalker,
         zk_root_path: str,
         excluded_paths: List[str],
-        max_workers: int = 4,
     ) -> List[ZookeeperNode]:
         """
         Traverse zk tree and find replicated objects.
         """
-
-        inspector = ZookeeperTreeInspector(zk, max_parrallel_tasks=max_workers)
-        inspector.add([zk_root_path])
-
-        objects_paths: List[ZookeeperNode] = []
-
         excluded_regexp = re.compile("|".join(excluded_paths))
 
-        for zk_node in inspector.tree_iterator():
-            if "replicas" in zk_node.children:
-                objects_paths.append(zk_node)
-                continue
-
-            children_to_traverse: List[str] = []
-            for children in zk_node.children:
-                children_full_path = os.path.join(zk_node.path, children)
-                if not re.match(excluded_regexp, children_full_path):
-                    children_to_traverse.append(children_full_path)
-            inspector.add(children_to_traverse)
+        objects_paths: List[ZookeeperNode] = [
+            zk_node
+            for zk_node in walker.walk(
+                [zk_root_path],
+                exclude=lambda path: re.match(excluded_regexp, path) is not None,
+                descend=lambda zk_node: "replicas" not in zk_node.children,
+            )
+            if "replicas" in zk_node.children
+        ]
 
         logging.info("Found {} replicated objects", len(objects_paths))
         return objects_paths
@@ -256,7 +108,6 @@ def clean_zk_metadata_for_hosts(
         zk_root_path: str,
         collect_tables: bool,
         collect_database: bool,
-        max_workers: int = 4,
     ) -> Tuple[Dict[str, List[Tuple[str, str]]], Dict[str, List[str]]]:
         """
         Gets list of all replicated objects in zk, determine tables and databases for cleanup.
@@ -269,12 +120,29 @@ def clean_zk_metadata_for_hosts(
             ".*/block_numbers/.*",
         ]
 
+        walker = ZookeeperTreeWalker(zk, get_zk_max_in_flight(ctx))
         replicated_objects: List[ZookeeperNode] = _traverse_zk_tree_and_find_objects(
-            zk,
+            walker,
             zk_root_path,
             excluded_paths=excluded_paths,
-            max_workers=max_workers,
         )
+        objects_paths = [
+            replicated_object.path for replicated_object in replicated_objects
+        ]
+        # Values and replicas of the found objects are requested in pipelines as well
+        objects_values = {
+            zk_node.path: zk_node.data
+            for zk_node in walker.walk(
+                objects_paths, fetch_children=False, fetch_data=True
+            )
+        }
+        objects_replicas = {
+            os.path.dirname(zk_node.path): zk_node.children
+            for zk_node in walker.walk(
+                [os.path.join(path, "replicas") for path in objects_paths],
+                descend=lambda _: False,
+            )
+        }
 
         nodes_set = set(nodes)
 
@@ -290,15 +158,14 @@ def clean_zk_metadata_for_hosts(
             #
             # Replicated Database
             # https://github.com/ClickHouse/ClickHouse/blob/eb984db51ea0309dd607eaf98280315b42347f65/src/Databases/DatabaseReplicated.cpp#L1529
-            try:
-                is_database = (
-                    zk.get(replicated_object.path)[0] == REPLICATED_DATABASE_MARKER
-                )
-            except NoNodeError:
+            if replicated_object.path not in objects_values:
                 logging.warning(
                     "Someone delete node {}, ignore it", replicated_object.path
                 )
                 continue
+            is_database = (
+                objects_values[replicated_object.path] == REPLICATED_DATABASE_MARKER
+            )
 
             is_table = not is_database
             if is_database and not collect_database:
@@ -306,9 +173,7 @@ def clean_zk_metadata_for_hosts(
             if is_table and not collect_tables:
                 continue
 
-            replicas_list: List[str] = get_children(
-                zk, os.path.join(replicated_object.path, "replicas")
-            )
+            replicas_list: List[str] = objects_replicas.get(replicated_object.path, [])
 
             for replica in replicas_list:
                 if is_database:
@@ -398,7 +263,6 @@ def clean_zk_metadata_for_hosts(
             zk_root_path,
             collect_database=cleanup_database,
             collect_tables=cleanup_tables,
-            max_workers=max_workers,
         )
 
         tasks: List[WorkerTask] = []
@@ -617,17 +481,20 @@ def _clean_zero_copy_locks_for_remote_path_and_replica(
     template = rf"{zero_copy_path}/{table_uuid}/{part_id}/{remote_path}/{replica_name}"
     predicate = partial(re.match, template)
 
-    paths_to_delete = []
-    for path_to_delete in find_leafs_and_nodes(zk, zero_copy_path, predicate):
-        # Do not delete root path
-        if zero_copy_path == path_to_delete:
-            continue
-        paths_to_delete.append(path_to_delete)
-        if len(paths_to_delete) >= ZERO_COPY_LOCKS_TO_DELETE_BATCH:
-            delete_recursive(zk, paths_to_delete, dry_run)
-            paths_to_delete = []
-
-    delete_recursive(zk, paths_to_delete, dry_run)
+    # Matched directories are returned after all their children, so nodes can be deleted
+    # while the tree is traversed
+    with ZookeeperBulkDeleter(zk, dry_run) as deleter:
+        for path_to_delete in find_leafs_and_nodes(zk, zero_copy_path, predicate):
+            # Do not delete root path
+            if zero_copy_path == path_to_delete:
+                continue
+            deleter.delete(path_to_delete)
+
+    logging.info(
+        "{} {} zero-copy lock nodes.",
+        "Would delete" if dry_run else "Deleted",
+        deleter.deleted,
+    )
 
 
 def _validate_args(
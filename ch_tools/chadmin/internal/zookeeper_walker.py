@@ -0,0 +1,136 @@
+"""
+Pipelined traversal of ZooKeeper tree.
+"""
+
+import os
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Iterable, Iterator, List, Optional
+
+from kazoo.client import KazooClient
+from kazoo.exceptions import NoNodeError
+from kazoo.interfaces import IAsyncResult
+from kazoo.protocol.states import ZnodeStat
+
+from ch_tools.common import logging
+
+# Default max number of requests sent to ZooKeeper without waiting for the response
+DEFAULT_MAX_IN_FLIGHT = 100
+
+
+@dataclass
+class ZookeeperNode:
+    path: str
+    children: List[str] = field(default_factory=list)
+    data: Optional[bytes] = None
+    stat: Optional[ZnodeStat] = None
+    # False if the node was deleted by someone else while the tree was traversed
+    exists: bool = True
+
+
+@dataclass
+class _Request:
+    path: str
+    children: Optional[IAsyncResult]
+    data: Optional[IAsyncResult]
+    stat: Optional[IAsyncResult]
+
+
+class ZookeeperTreeWalker:
+    """
+    Traverse ZooKeeper tree keeping up to `max_in_flight` asynchronous requests
+    in flight.
+
+    ZooKeeper answers requests of a session in the order they were sent, so
+    pipelining hides the round-trip latency without reordering the results. Nodes
+    are walked depth-first, so the number of paths waiting to be requested is bounded
+    by the depth and the fan-out of the tree rather than by its size. A node is always
+    yielded before its descendants.
+    """
+
+    def __init__(
+        self, zk: KazooClient, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT
+    ) -> None:
+        self._zk = zk
+        self._max_in_flight = max(1, max_in_flight)
+
+    def walk(
+        self,
+        roots: Iterable[str],
+        *,
+        exclude: Optional[Callable[[str], bool]] = None,
+        descend: Optional[Callable[[ZookeeperNode], bool]] = None,
+        fetch_children: bool = True,
+        fetch_data: bool = False,
+        fetch_stat: bool = False,
+        include_missing: bool = False,
+    ) -> Iterator[ZookeeperNode]:
+        """
+        Iterate over nodes of subtrees starting at `roots`.
+
+        `exclude` is called for descendant paths before requesting them, excluded
+        nodes and their subtrees are skipped. `descend` is called for every received
+        node to decide whether its children should be walked. With `fetch_children`
+        unset, only the root nodes are requested. `fetch_data` and `fetch_stat`
+        request node value and stat in the same pipeline. Nodes deleted during
+        the traversal are skipped unless `include_missing` is set.
+        """
+        pending: List[str] = list(reversed(list(roots)))
+        in_flight: Deque[_Request] = deque()
+
+        while pending or in_flight:
+            while pending and len(in_flight) < self._max_in_flight:
+                in_flight.append(
+                    self._send(pending.pop(), fetch_children, fetch_data, fetch_stat)
+                )
+
+            node = self._receive(in_flight.popleft())
+            if not node.exists:
+                logging.debug("Ignoring node {}, because someone deleted it", node.path)
+                if include_missing:
+                    yield node
+                continue
+
+            yield node
+
+            if not fetch_children or (descend and not descend(node)):
+                continue
+
+            for child in reversed(node.children):
+                child_path = os.path.join(node.path, child)
+                if exclude is None or not exclude(child_path):
+                    pending.append(child_path)
+
+    def _send(
+        self, path: str, fetch_children: bool, fetch_data: bool, fetch_stat: bool
+    ) -> _Request:
+        children = data = stat = None
+        if fetch_children:
+            # Stat is returned along with children, if requested
+            children = self._zk.get_children_async(
+                path, include_data=fetch_stat and not fetch_data
+            )
+        if fetch_data:
+            data = self._zk.get_async(path)
+        elif fetch_stat and not fetch_children:
+            stat = self._zk.exists_async(path)
+        return _Request(path, children, data, stat)
+
+    @staticmethod
+    def _receive(request: _Request) -> ZookeeperNode:
+        node = ZookeeperNode(request.path)
+        try:
+            if request.children is not None:
+                result = request.children.get()
+                if isinstance(result, tuple):
+                    node.children, node.stat = result
+                else:
+                    node.children = result
+            if request.data is not None:
+                node.data, node.stat = request.data.get()
+            if request.stat is not None:
+                node.stat = request.stat.get()
+                node.exists = node.stat is not None
+        except NoNodeError:
+            node.exists = False
+        return node
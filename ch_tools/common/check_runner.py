@@ -0,0 +1,185 @@
+"""
+Concurrent execution of monitoring checks for status commands.
+"""
+
+import queue
+import threading
+import time
+from typing import Any, List, NamedTuple, Optional
+
+import click
+import tabulate
+
+from ch_tools.common import logging
+from ch_tools.common.result import WARNING, Status
+
+# Max number of concurrently executed checks
+DEFAULT_MAX_WORKERS = 8
+# Max time in seconds to wait for a single check
+DEFAULT_CHECK_TIMEOUT = 30
+# Max time in seconds to wait for all checks
+DEFAULT_DEADLINE = 60
+
+DEFAULT_COLOR = "\033[0m"
+
+COLOR_MAP = {
+    0: "\033[92m",
+    1: "\033[93m",
+    2: "\033[91m",
+}
+
+
+class CheckResult(NamedTuple):
+    name: str
+    status: Status
+    # Time in seconds spent by the check, or waiting for it if it timed out
+    elapsed: float
+
+
+def run_checks(
+    ctx: click.Context,
+    commands: List[click.Command],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    timeout: float = DEFAULT_CHECK_TIMEOUT,
+    deadline: float = DEFAULT_DEADLINE,
+) -> List[CheckResult]:
+    """
+    Invoke check commands concurrently and return results in the order of commands.
+
+    Checks that are not completed within `timeout` seconds since their start or until
+    `deadline` seconds since the start of the run get warning status. Threads of such
+    checks are not waited for.
+    """
+    # Checks are executed in the logging configuration of the status command
+    logging.disable_stdout_logger()
+
+    start_time = time.monotonic()
+    results: List[Optional[CheckResult]] = [None] * len(commands)
+    start_times: List[Optional[float]] = [None] * len(commands)
+    tasks: "queue.Queue[int]" = queue.Queue()
+    for i in range(len(commands)):
+        tasks.put(i)
+    completed = threading.Condition()
+
+    def _worker() -> None:
+        while True:
+            try:
+                i = tasks.get_nowait()
+            except queue.Empty:
+                return
+            with completed:
+                start_times[i] = time.monotonic()
+                completed.notify_all()
+            result = invoke_check(ctx, commands[i])
+            with completed:
+                if results[i] is None:
+                    results[i] = result
+                completed.notify_all()
+
+    for _ in range(min(max(1, max_workers), len(commands))):
+        threading.Thread(target=_worker, daemon=True).start()
+
+    with completed:
+        while True:
+            now = time.monotonic()
+            wake_time = start_time + deadline
+            for i, command in enumerate(commands):
+                if results[i] is not None:
+                    continue
+                check_start_time = start_times[i]
+                check_deadline = min(
+                    start_time + deadline,
+                    (check_start_time or start_time + deadline) + timeout,
+                )
+                if now >= check_deadline:
+                    results[i] = _timed_out(
+                        command, now - (check_start_time or start_time)
+                    )
+                else:
+                    wake_time = min(wake_time, check_deadline)
+
+            if all(result is not None for result in results):
+                break
+            completed.wait(timeout=max(0.0, wake_time - now))
+
+    return [result for result in results if result is not None]
+
+
+def print_results(results: List[CheckResult], show_latency: bool = False) -> None:
+    """
+    Print check statuses as a table.
+    """
+    rows = []
+    for result in results:
+        row = [
+            result.name,
+            f"{COLOR_MAP[result.status.code]}{result.status.message}{DEFAULT_COLOR}",
+        ]
+        if show_latency:
+            row.append(f"{result.elapsed:.2f}s")
+        rows.append(row)
+
+    print(tabulate.tabulate(rows))
+
+
+def invoke_check(ctx: click.Context, command: click.Command) -> CheckResult:
+    """
+    Invoke check command in status mode and return its result.
+    """
+    start_time = time.monotonic()
+    try:
+        with logging.contextualize(cmd_name=command.name):
+            status = ctx.invoke(command)
+    except Exception as e:
+        logging.exception("Check {} failed:", command.name)
+        status = Status()
+        status.append(f"Unknown error: {e!r}")
+        status.set_code(WARNING)
+
+    return CheckResult(command.name or "", status, time.monotonic() - start_time)
+
+
+def _timed_out(command: click.Command, elapsed: float) -> CheckResult:
+    status = Status()
+    status.append(f"Check timed out after {elapsed:.1f}s")
+    status.set_code(WARNING)
+    logging.warning("Check {} timed out after {:.1f}s", command.name, elapsed)
+    return CheckResult(command.name or "", status, elapsed)
+
+
+def add_status_options(func: Any) -> Any:
+    """
+    Add options of the concurrent check runner to status command.
+    """
+    for option in reversed(
+        [
+            click.option(
+                "--max-workers",
+                type=int,
+                default=DEFAULT_MAX_WORKERS,
+                help="Max number of concurrently executed checks.",
+            ),
+            click.option(
+                "--timeout",
+                "check_timeout",
+                type=float,
+                default=DEFAULT_CHECK_TIMEOUT,
+                help="Max time in seconds to wait for a single check.",
+            ),
+            click.option(
+                "--deadline",
+                type=float,
+                default=DEFAULT_DEADLINE,
+                help="Max time in seconds to wait for all checks.",
+            ),
+            click.option(
+                "--latency",
+                "show_latency",
+                is_flag=True,
+                default=False,
+                help="Print time spent by each check.",
+            ),
+        ]
+    ):
+        func = option(func)
+    return func
@@ -5,34 +5,35 @@ Formatting module.
 import csv
 import json
 import sys
+import textwrap
 from collections import OrderedDict
 from datetime import date, datetime, timedelta
 from decimal import Decimal
-from itertools import chain
-from typing import Any, Callable, Dict, List, Mapping, Optional, Union
+from functools import lru_cache
+from itertools import chain, islice
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Union,
+)
 
 import humanfriendly
 from click import Context, style
 from cloup import Color
-from deepdiff.helper import notpresent
-from pygments import highlight
-from pygments.formatters.terminal256 import Terminal256Formatter
-from pygments.lexers.data import JsonLexer, YamlLexer
-from pygments.style import Style
-from pygments.token import Token
 from tabulate import tabulate
 from termcolor import colored
 
 from ..yaml import dump_yaml
 from .utils import get_timezone
 
-
-class FormatStyle(Style):
-    styles = {
-        Token.Name.Tag: "bold ansibrightblue",
-        Token.Punctuation: "bold ansiwhite",
-        Token.String: "ansigreen",
-    }
+# Number of rows aligned together when a table is printed from an iterator
+TABLE_PAGE_SIZE = 1000
 
 
 def print_header(header: str) -> None:
@@ -54,6 +55,8 @@ def print_response(
     separator: Optional[str] = None,
     limit: Optional[int] = None,
 ) -> None:
+    # pylint: disable=too-many-branches
+
     if format_ is None:
         # command-line parameter
         format_ = ctx.obj.get("format")
@@ -69,6 +72,28 @@ def print_response(
     else:
         separator = separator.replace(r"\n", "\n")
 
+    if isinstance(value, Iterator):
+        _print_stream(
+            ctx,
+            (
+                _purify_value(
+                    ctx,
+                    item,
+                    formatters=get_formatters(ctx),
+                    field_formatters=field_formatters,
+                    include_keys=fields,
+                    exclude_keys=ignored_fields,
+                )
+                for item in islice(value, limit or None)
+            ),
+            format_,
+            table_formatter=table_formatter,
+            quiet=quiet,
+            id_key=id_key,
+            separator=separator,
+        )
+        return
+
     value = _purify_value(
         ctx,
         value,
@@ -109,6 +134,43 @@ def print_response(
         print_json(ctx, value)
 
 
+def _print_stream(
+    ctx: Context,
+    items: Iterator[Any],
+    format_: str,
+    table_formatter: Optional[Callable],
+    quiet: Optional[bool],
+    id_key: Optional[str],
+    separator: str,
+) -> None:
+    """
+    Print items of a list as they are produced, without collecting them in memory.
+    """
+    if quiet:
+        if id_key is None:
+            id_key = "id"
+
+        for i, item in enumerate(items):
+            print(("" if i == 0 else separator) + str(item[id_key]), end="")
+        print()
+        return
+
+    if format_ in ("table", "csv"):
+        if table_formatter:
+            items = (table_formatter(item) for item in items)
+
+        if format_ == "table":
+            print_table_stream(items)
+        else:
+            print_csv_stream(items)
+
+    elif format_ == "yaml":
+        print_yaml_stream(ctx, items)
+
+    else:
+        print_json_stream(ctx, items)
+
+
 def _purify_value(
     ctx: Context,
     value: Any,
@@ -182,6 +244,10 @@ def print_diff(diff: Dict, key_separator: str = ".") -> None:
 
 
 def _print_diff_item(item: Any, key_separator: str) -> None:
+    # deepdiff is slow to import, it is loaded only when a diff is printed
+    # pylint: disable=import-outside-toplevel
+    from deepdiff.helper import notpresent
+
     item_path = item.path(output_format="list")
     if item_path:
         print("@ " + key_separator.join(str(value) for value in item_path))
@@ -207,10 +273,7 @@ def print_json(ctx: Context, value: Any) -> None:
     """
     json_dump = json.dumps(value, indent=2, ensure_ascii=False)
     if _color(ctx):
-        print(
-            highlight(json_dump, JsonLexer(), Terminal256Formatter(style=FormatStyle)),
-            end="",
-        )
+        print(_highlight(json_dump, "json"), end="")
     else:
         print(json_dump)
 
@@ -221,18 +284,130 @@ def print_yaml(ctx: Context, value: Any) -> None:
     """
     yaml_dump = dump_yaml(value)
     if _color(ctx):
-        print(
-            highlight(yaml_dump, YamlLexer(), Terminal256Formatter(style=FormatStyle)),
-            end="",
-        )
+        print(_highlight(yaml_dump, "yaml"), end="")
     else:
         print(yaml_dump)
 
 
+def _highlight(code: str, language: str) -> str:
+    """
+    Highlight JSON or YAML code for terminal. Pygments is slow to import, so it is
+    loaded only when the output is colored.
+    """
+    # pylint: disable=import-outside-toplevel
+    from pygments import highlight
+    from pygments.formatters.terminal256 import Terminal256Formatter
+    from pygments.lexers.data import JsonLexer, YamlLexer
+
+    lexer = JsonLexer() if language == "json" else YamlLexer()
+    return highlight(code, lexer, Terminal256Formatter(style=_format_style()))
+
+
+@lru_cache(maxsize=None)
+def _format_style() -> type:
+    # pylint: disable=import-outside-toplevel
+    from pygments.style import Style
+    from pygments.token import Token
+
+    class FormatStyle(Style):
+        styles = {
+            Token.Name.Tag: "bold ansibrightblue",
+            Token.Punctuation: "bold ansiwhite",
+            Token.String: "ansigreen",
+        }
+
+    return FormatStyle
+
+
+def print_json_stream(ctx: Context, items: Iterable[Any]) -> None:
+    """
+    Print items as JSON list. The output is the same as of print_json.
+    """
+    empty = True
+    for item in items:
+        json_dump = json.dumps(item, indent=2, ensure_ascii=False)
+        if _color(ctx):
+            json_dump = _highlight(json_dump, "json").rstrip("\n")
+        print("[" if empty else ",")
+        print(textwrap.indent(json_dump, "  "), end="")
+        empty = False
+    print("[]" if empty else "\n]")
+
+
+def print_yaml_stream(ctx: Context, items: Iterable[Any]) -> None:
+    """
+    Print items as YAML list. The output is the same as of print_yaml.
+    """
+    empty = True
+    for item in items:
+        yaml_dump = dump_yaml([item])
+        if _color(ctx):
+            yaml_dump = _highlight(yaml_dump, "yaml")
+        print(yaml_dump, end="")
+        empty = False
+    if empty:
+        print_yaml(ctx, [])
+    else:
+        print()
+
+
 def print_table(value: List[Dict]) -> None:
     print(tabulate(value, headers="keys"))
 
 
+def print_table_stream(items: Iterable[Dict]) -> None:
+    """
+    Print items as table. Column widths and alignment are determined by the first
+    TABLE_PAGE_SIZE rows, longer values in subsequent rows overflow their columns.
+    """
+    items = iter(items)
+    page = list(islice(items, TABLE_PAGE_SIZE))
+    table = tabulate(page, headers="keys")
+    print(table)
+    if not page:
+        return
+
+    keys = list(dict.fromkeys(key for item in page for key in item))
+    widths = [len(dashes) for dashes in table.splitlines()[1].split("  ")]
+    numeric = [all(_is_number(item.get(key)) for item in page) for key in keys]
+    for item in items:
+        cells = []
+        for key, width, right in zip(keys, widths, numeric):
+            text = _table_cell(item.get(key))
+            cells.append(text.rjust(width) if right else text.ljust(width))
+        print("  ".join(cells).rstrip())
+
+
+def _table_cell(value: Any) -> str:
+    """
+    Format value in the same way as tabulate does in single-line cells.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return format(value, "g")
+    return str(value).replace("\n", " ")
+
+
+def _is_number(value: Any) -> bool:
+    """
+    Return True if tabulate treats the value as number and aligns it to the right.
+    """
+    if value is None:
+        return True
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, (int, float, Decimal)):
+        return True
+    if isinstance(value, str):
+        try:
+            float(value)
+            return True
+        except ValueError:
+            return False
+    return False
+
+
 def print_csv(value: List[Dict]) -> None:
     if value:
         writer = csv.DictWriter(sys.stdout, fieldnames=value[0].keys())
@@ -240,6 +415,46 @@ def print_csv(value: List[Dict]) -> None:
         writer.writerows(value)
 
 
+def print_csv_stream(items: Iterable[Dict]) -> None:
+    writer = None
+    for item in items:
+        if writer is None:
+            writer = csv.DictWriter(sys.stdout, fieldnames=item.keys())
+            writer.writeheader()
+        writer.writerow(item)
+
+
+def format_vertical(row: Mapping[str, Any], number: int) -> str:
+    """
+    Format row of query result in the same way as ClickHouse Vertical format does.
+    """
+    header = f"Row {number}:"
+    width = max((len(name) for name in row), default=0) + 1
+    lines = [header, "─" * len(header)]
+    for name, value in row.items():
+        lines.append(f"{name + ':':<{width}} {_format_vertical_value(value)}")
+    return "\n".join(lines)
+
+
+def _format_vertical_value(value: Any, nested: bool = False) -> str:
+    if value is None:
+        return "NULL" if nested else "ᴺᵁᴸᴸ"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, str):
+        return "'" + value.replace("'", "\\'") + "'" if nested else value
+    if isinstance(value, (list, tuple)):
+        items = ",".join(_format_vertical_value(item, True) for item in value)
+        return f"[{items}]" if isinstance(value, list) else f"({items})"
+    if isinstance(value, Mapping):
+        items = ",".join(
+            f"{_format_vertical_value(k, True)}:{_format_vertical_value(v, True)}"
+            for k, v in value.items()
+        )
+        return "{" + items + "}"
+    return str(value)
+
+
 def format_list(value: List) -> str:
     return ",".join(value)
 
@@ -0,0 +1,68 @@
+"""
+Command group with commands imported on first use.
+"""
+
+import importlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import click
+import cloup
+
+# pylint: disable=too-many-ancestors
+
+
+class LazyGroup(cloup.Group):
+    """
+    Group with commands registered by name and import path in "module:attribute" format.
+
+    Modules of commands are imported only when commands are invoked or listed in help,
+    so heavy dependencies of one command do not slow down the start of others.
+    Loaded commands are added with add_command(), so subclasses wrap them in the same
+    way as commands added directly.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        # Import path and section by name of not loaded command
+        self._lazy_commands: Dict[str, Tuple[str, Optional[cloup.Section]]] = {}
+
+    def add_lazy_command(
+        self,
+        name: str,
+        import_path: str,
+        section: Optional[cloup.Section] = None,
+    ) -> None:
+        self._lazy_commands[name] = (import_path, section)
+
+    def list_commands(self, ctx: click.Context) -> List[str]:
+        return sorted({*super().list_commands(ctx), *self._lazy_commands})
+
+    def get_command(self, ctx: click.Context, cmd_name: str) -> Optional[click.Command]:
+        if cmd_name in self._lazy_commands:
+            self._load_command(cmd_name)
+        return super().get_command(ctx, cmd_name)
+
+    def list_sections(
+        self, ctx: click.Context, include_default_section: bool = True
+    ) -> List[cloup.Section]:
+        # Help of the group needs help of all commands
+        self.load_commands()
+        return super().list_sections(ctx, include_default_section)
+
+    def load_commands(self) -> None:
+        """
+        Import all not yet loaded commands in the order of registration.
+        """
+        for name in list(self._lazy_commands):
+            self._load_command(name)
+
+    def _load_command(self, name: str) -> None:
+        import_path, section = self._lazy_commands.pop(name)
+        module_name, attribute = import_path.split(":")
+        cmd = getattr(importlib.import_module(module_name), attribute)
+        self._add_loaded_command(cmd, name, section)
+
+    def _add_loaded_command(
+        self, cmd: click.Command, name: str, section: Optional[cloup.Section]
+    ) -> None:
+        self.add_command(cmd, name=name, section=section)
@@ -4,12 +4,14 @@ Utility functions.
 
 from collections import defaultdict
 from datetime import datetime, timedelta
-from typing import Any, Optional, Tuple, Union
+from typing import TYPE_CHECKING, Any, Optional, Tuple, Union
 
 import humanfriendly
 from click import Context
 from dateutil.tz import gettz, tzfile
-from deepdiff import DeepDiff
+
+if TYPE_CHECKING:
+    from deepdiff import DeepDiff
 
 
 def parse_timespan(value: str) -> timedelta:
@@ -34,10 +36,14 @@ def get_timezone(ctx: Context) -> tzfile:
     return ctx.obj["timezone"]
 
 
-def diff_objects(value1: Any, value2: Any) -> DeepDiff:
+def diff_objects(value1: Any, value2: Any) -> "DeepDiff":
     """
     Calculate structural diff between 2 values.
     """
+    # deepdiff is slow to import, it is loaded only when values are compared
+    # pylint: disable=import-outside-toplevel
+    from deepdiff import DeepDiff
+
     return DeepDiff(
         value1,
         value2,
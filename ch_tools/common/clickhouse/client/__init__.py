@@ -3,11 +3,14 @@ ClickHouse client.
 """
 
 from .clickhouse_client import ClickhouseClient
+from .client_pool import ClickhouseClientPool, HostResult
 from .error import ClickhouseError
 from .query_output_format import OutputFormat
 
 __all__ = [
     "ClickhouseClient",
+    "ClickhouseClientPool",
     "ClickhouseError",
+    "HostResult",
     "OutputFormat",
 ]
@@ -1,7 +1,21 @@
+import copy
 import json
+import re
 import subprocess
+import threading
 from datetime import timedelta
-from typing import Any, Dict, Optional, Tuple, Union
+from functools import lru_cache
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import requests
 from click import Context
@@ -15,7 +29,23 @@ from ch_tools.common.utils import version_ge
 from ..config import get_clickhouse_config
 from ..config.clickhouse import ClickhousePort
 from .error import ClickhouseError
+from .http_session_pool import HttpSessionPool
+from .native import (
+    NativeConnectionPool,
+    UnsupportedFeatureError,
+    is_supported_format,
+    render,
+)
 from .retry import retry
+from .rows import (
+    JSON_ROWS_FORMAT,
+    ROW_FORMATS,
+    TSV_FORMAT,
+    decode_json_result,
+    decode_rows,
+    encode_tsv_rows,
+    gzip_chunks,
+)
 from .utils import _format_str_imatch, _format_str_match
 
 PORTS_PRIORITY = [
@@ -25,12 +55,19 @@ PORTS_PRIORITY = [
     ClickhousePort.TCP,
 ]
 
+# Max number of compiled query templates cached per client
+TEMPLATE_CACHE_SIZE = 256
+
+FORMAT_CLAUSE_RE = re.compile(r"\bFORMAT\s+\w+\s*;?\s*$", re.IGNORECASE)
+
 
 class ClickhouseClient:
     """
     ClickHouse client wrapper.
     """
 
+    # pylint: disable=too-many-instance-attributes
+
     def __init__(
         self: Self,
         *,
@@ -42,6 +79,8 @@ class ClickhouseClient:
         cert_path: Optional[str] = None,
         timeout: int,
         settings: Optional[Dict[str, Any]] = None,
+        http_pool: Optional[HttpSessionPool] = None,
+        native_protocol: bool = True,
     ) -> None:
         self.host = host
         self.insecure = insecure
@@ -52,6 +91,22 @@ class ClickhouseClient:
         self._settings = settings or {}
         self._timeout = timeout
         self._ch_version: Optional[str] = None
+        self._http_pool = http_pool or HttpSessionPool()
+        self._native_protocol = native_protocol
+        self._native_pool = NativeConnectionPool()
+        self._compile_template = lru_cache(maxsize=TEMPLATE_CACHE_SIZE)(
+            self._create_jinja_env().from_string
+        )
+
+    def with_host(self, host: str) -> "ClickhouseClient":
+        """
+        Return client of another host with the same settings. Connection pools and caches
+        are shared with this client, so only this client needs to be closed.
+        """
+        client = copy.copy(self)
+        client.host = host
+        client._ch_version = None  # pylint: disable=protected-access
+        return client
 
     def get_clickhouse_version(self) -> str:
         """
@@ -81,15 +136,12 @@ class ClickhouseClient:
     ) -> Any:
         schema = "https" if port == ClickhousePort.HTTPS else "http"
         url = f"{schema}://{self.host}:{self.ports[port]}"
-        headers = {}
-        if self.user:
-            headers["X-ClickHouse-User"] = self.user
-        if self.password:
-            headers["X-ClickHouse-Key"] = self.password
+        headers = self._http_headers()
         verify = self.cert_path if port == ClickhousePort.HTTPS else None
+        session = self._http_pool.get_session(schema, self.host, self.ports[port])
         try:
             if query:
-                response = requests.post(
+                response = session.post(
                     url,
                     params={
                         **self._settings,
@@ -104,7 +156,7 @@ class ClickhouseClient:
                 )
             else:
                 # Used for ping
-                response = requests.get(
+                response = session.get(
                     url,
                     headers=headers,
                     timeout=timeout,
@@ -124,13 +176,84 @@ class ClickhouseClient:
         except requests.exceptions.HTTPError as e:
             raise ClickhouseError(str(query), e.response) from None
 
+    def _http_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.user:
+            headers["X-ClickHouse-User"] = self.user
+        if self.password:
+            headers["X-ClickHouse-Key"] = self.password
+        return headers
+
     def _execute_tcp(
         self,
         query: Optional[Query],
         format_: Optional[str],
+        timeout: Optional[int],
+        per_query_settings: Dict[str, Any],
         port: ClickhousePort,
     ) -> Any:
         # Private method, we are sure that port is tcps or tcp and presents in config
+        if self._native_protocol and self._native_supported(query, format_):
+            # Only failures before the query is sent fall back to clickhouse-client,
+            # unsupported results are raised as UnsupportedResultError
+            try:
+                return self._execute_native(
+                    query, format_, timeout, per_query_settings, port
+                )
+            except UnsupportedFeatureError as e:
+                logging.debug(
+                    "Falling back to clickhouse-client as native protocol failed: {!r}",
+                    e,
+                )
+
+        return self._execute_clickhouse_client(query, format_, port)
+
+    @staticmethod
+    def _native_supported(query: Optional[Query], format_: Optional[str]) -> bool:
+        if not is_supported_format(format_):
+            return False
+        # Output format defined in the query text is applied by clickhouse-client
+        if query and format_ is None and FORMAT_CLAUSE_RE.search(query.value):
+            return False
+        return True
+
+    def _execute_native(
+        self,
+        query: Optional[Query],
+        format_: Optional[str],
+        timeout: Optional[int],
+        per_query_settings: Dict[str, Any],
+        port: ClickhousePort,
+    ) -> Any:
+        with self._native_pool.connection(
+            host=self.host,
+            port=self.ports[port],
+            secure=port == ClickhousePort.TCP_SECURE,
+            user=self.user,
+            password=self.password,
+            cert_path=self.cert_path,
+            insecure=self.insecure,
+            timeout=timeout,
+        ) as conn:
+            if not query:
+                # Used for ping
+                conn.ping(timeout)
+                return "Ok."
+
+            result = conn.execute(
+                query.for_execute().strip().rstrip(";"),
+                settings={**self._settings, **per_query_settings},
+                timeout=timeout,
+            )
+
+        return render(format_, result.columns, result.rows)
+
+    def _clickhouse_client_cmd(
+        self, port: ClickhousePort
+    ) -> Tuple[List[str], List[str]]:
+        """
+        Return clickhouse-client command and its copy with masked password for logging.
+        """
         cmd = [
             "clickhouse-client",
             "--host",
@@ -146,6 +269,15 @@ class ClickhouseClient:
         if self.password is not None:
             cmd.extend(("--password", self.password))
             masked_cmd.extend(("--password", "*****"))
+        return cmd, masked_cmd
+
+    def _execute_clickhouse_client(
+        self,
+        query: Optional[Query],
+        format_: Optional[str],
+        port: ClickhousePort,
+    ) -> Any:
+        cmd, masked_cmd = self._clickhouse_client_cmd(port)
 
         if not query:
             raise RuntimeError(1, "Can't send empty query in tcp(s) port")
@@ -166,7 +298,7 @@ class ClickhouseClient:
 
         return response.strip()
 
-    @retry(requests.exceptions.ConnectionError)
+    @retry((requests.exceptions.ConnectionError, ConnectionError))
     def query(
         self: Self,
         query: Union[str, Query],
@@ -202,15 +334,7 @@ class ClickhouseClient:
             timeout = self._timeout
 
         per_query_settings = settings or {}
-
-        if port is None:
-            for i_port in PORTS_PRIORITY:
-                if self.check_port(i_port):
-                    port = i_port
-                    break
-
-            if port is None:
-                raise UserWarning(2, "Can't find any port in clickhouse-server config")
+        port = self._resolve_port(port)
 
         logging.debug("Executing query: {}", str(query))
         if port in [ClickhousePort.HTTPS, ClickhousePort.HTTP]:
@@ -223,7 +347,258 @@ class ClickhouseClient:
                 per_query_settings,
                 port,
             )
-        return self._execute_tcp(query, format_, port)
+        return self._execute_tcp(query, format_, timeout, per_query_settings, port)
+
+    def insert_rows(
+        self: Self,
+        table: str,
+        rows: Iterable[Sequence[Any]],
+        columns: Optional[Sequence[str]] = None,
+        *,
+        compress: bool = False,
+        timeout: Optional[int] = None,
+        settings: Optional[dict] = None,
+        port: Optional[ClickhousePort] = None,
+    ) -> int:
+        """
+        Insert rows in a single query streaming them in TabSeparated format.
+
+        Over HTTP the rows are sent as a chunked body of one request, optionally gzipped.
+        Over TCP they are piped to clickhouse-client. Rows are encoded as they are sent,
+        so a lazy iterable is consumed at the speed the server accepts the data.
+        Return the number of inserted rows.
+        """
+        inserted = 0
+
+        def _count(rows: Iterable[Sequence[Any]]) -> Iterator[Sequence[Any]]:
+            nonlocal inserted
+            for row in rows:
+                inserted += 1
+                yield row
+
+        query = Query(f"INSERT INTO {table}")
+        if columns:
+            query += f" ({', '.join(columns)})"
+        query += f" FORMAT {TSV_FORMAT}"
+        body = encode_tsv_rows(_count(rows))
+
+        port = self._resolve_port(port)
+        logging.debug("Executing query: {}", str(query))
+        if port in (ClickhousePort.HTTPS, ClickhousePort.HTTP):
+            self._insert_http(
+                query, body, compress, timeout or self._timeout, settings or {}, port
+            )
+        else:
+            self._insert_clickhouse_client(query, body, port)
+
+        return inserted
+
+    def _insert_http(
+        self,
+        query: Query,
+        body: Iterator[bytes],
+        compress: bool,
+        timeout: int,
+        per_query_settings: Dict[str, Any],
+        port: ClickhousePort,
+    ) -> None:
+        schema = "https" if port == ClickhousePort.HTTPS else "http"
+        headers = self._http_headers()
+        if compress:
+            headers["Content-Encoding"] = "gzip"
+            body = gzip_chunks(body)
+
+        session = self._http_pool.get_session(schema, self.host, self.ports[port])
+        response = session.post(
+            f"{schema}://{self.host}:{self.ports[port]}",
+            params={
+                **self._settings,
+                "query": query.for_execute(),
+                **per_query_settings,
+            },
+            headers=headers,
+            data=body,
+            timeout=timeout,
+            verify=self.cert_path if port == ClickhousePort.HTTPS else None,
+        )
+        try:
+            response.raise_for_status()
+        except requests.exceptions.HTTPError as e:
+            raise ClickhouseError(str(query), e.response) from None
+
+    def _insert_clickhouse_client(
+        self, query: Query, body: Iterator[bytes], port: ClickhousePort
+    ) -> None:
+        cmd, masked_cmd = self._clickhouse_client_cmd(port)
+        cmd.extend(("--query", query.for_execute()))
+
+        # pylint: disable=consider-using-with
+        proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        assert proc.stdin is not None and proc.stderr is not None
+        try:
+            for chunk in body:
+                proc.stdin.write(chunk)
+            proc.stdin.close()
+        except BrokenPipeError:
+            # clickhouse-client exited prematurely, the error is reported below
+            pass
+        stderr = proc.stderr.read()
+        proc.wait()
+
+        if proc.returncode:
+            raise RuntimeError(f'"{masked_cmd}" failed with: {stderr.decode()}')
+
+    def iter_rows(
+        self: Self,
+        query: Union[str, Query],
+        query_args: Optional[Dict[str, Any]] = None,
+        format_: str = JSON_ROWS_FORMAT,
+        timeout: Optional[int] = None,
+        echo: bool = False,
+        dry_run: bool = False,
+        settings: Optional[dict] = None,
+        port: Optional[ClickhousePort] = None,
+        quote_64bit_integers: bool = False,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Execute query and iterate over result rows as dicts keyed by column names.
+
+        Rows are decoded as they are received from the server, so memory consumption
+        doesn't depend on the size of result. The query is sent on the first
+        iteration, and the iterator must be exhausted or closed to release
+        the connection.
+
+        If `quote_64bit_integers` is set, values are returned as in JSON formats of
+        ClickHouse with 64-bit and wider integers as strings.
+        """
+        if format_ not in ROW_FORMATS:
+            raise ValueError(f"Unsupported row format: {format_}")
+
+        port = self._resolve_port(port)
+        if port in (ClickhousePort.TCP_SECURE, ClickhousePort.TCP):
+            yield from self._iter_rows_tcp(
+                query,
+                query_args,
+                timeout,
+                echo,
+                dry_run,
+                settings,
+                port,
+                quote_64bit_integers,
+            )
+            return
+
+        response = self.query(
+            query,
+            query_args=query_args,
+            format_=format_,
+            timeout=timeout,
+            echo=echo,
+            dry_run=dry_run,
+            stream=True,
+            settings=settings,
+            port=port,
+        )
+        if response is None:
+            return
+
+        with response:
+            yield from decode_rows(response.iter_lines(), format_, quote_64bit_integers)
+
+    def _iter_rows_tcp(
+        self,
+        query: Union[str, Query],
+        query_args: Optional[Dict[str, Any]],
+        timeout: Optional[int],
+        echo: bool,
+        dry_run: bool,
+        settings: Optional[dict],
+        port: ClickhousePort,
+        quote_64bit_integers: bool,
+    ) -> Iterator[Dict[str, Any]]:
+        if isinstance(query, str):
+            query = Query(query)
+        if query_args:
+            query = Query(
+                self.render_query(query.value, **query_args), query.sensitive_args
+            )
+
+        if self._native_protocol:
+            if echo:
+                print(str(query), "\n")
+            if dry_run:
+                return
+
+            try:
+                yield from self._iter_rows_native(
+                    query, timeout, settings, port, quote_64bit_integers
+                )
+                return
+            except UnsupportedFeatureError as e:
+                logging.debug(
+                    "Falling back to clickhouse-client as native protocol failed: {!r}",
+                    e,
+                )
+                echo = False
+
+        # Output of clickhouse-client is not streamed
+        result = self.query(
+            query,
+            format_="JSONCompact",
+            timeout=timeout,
+            echo=echo,
+            dry_run=dry_run,
+            settings=settings,
+            port=port,
+        )
+        if result is not None:
+            yield from decode_json_result(result, quote_64bit_integers)
+
+    def _iter_rows_native(
+        self,
+        query: Query,
+        timeout: Optional[int],
+        settings: Optional[dict],
+        port: ClickhousePort,
+        quote_64bit_integers: bool,
+    ) -> Iterator[Dict[str, Any]]:
+        if timeout is None:
+            timeout = self._timeout
+
+        logging.debug("Executing query: {}", str(query))
+        # Closing of the generator exits the context and closes the connection
+        # pylint: disable=contextmanager-generator-missing-cleanup
+        with self._native_pool.connection(
+            host=self.host,
+            port=self.ports[port],
+            secure=port == ClickhousePort.TCP_SECURE,
+            user=self.user,
+            password=self.password,
+            cert_path=self.cert_path,
+            insecure=self.insecure,
+            timeout=timeout,
+        ) as conn:
+            for block in conn.iter_blocks(
+                query.for_execute().strip().rstrip(";"),
+                settings={**self._settings, **(settings or {})},
+                timeout=timeout,
+            ):
+                if quote_64bit_integers:
+                    result = render(
+                        "JSONCompact",
+                        block.columns,
+                        [list(row) for row in zip(*block.data)],
+                    )
+                    yield from decode_json_result(result, quote_64bit_integers)
+                    continue
+                names = [column["name"] for column in block.columns]
+                for row in zip(*block.data):
+                    yield dict(zip(names, row))
 
     def query_json_data(
         self: Self,
@@ -262,6 +637,16 @@ class ClickhouseClient:
         return self.query_json_data(**kwargs)[0]
 
     def render_query(self, query: str, **kwargs: Any) -> str:
+        template = self._compile_template(query)
+        cache_info = self._compile_template.cache_info()
+        logging.debug(
+            "Query template cache: {} hits, {} misses",
+            cache_info.hits,
+            cache_info.misses,
+        )
+        return template.render(kwargs)
+
+    def _create_jinja_env(self) -> Environment:
         env = Environment()
 
         env.globals["version_ge"] = lambda version: version_ge(
@@ -270,8 +655,17 @@ class ClickhouseClient:
         env.globals["format_str_match"] = _format_str_match
         env.globals["format_str_imatch"] = _format_str_imatch
 
-        template = env.from_string(query)
-        return template.render(kwargs)
+        return env
+
+    def _resolve_port(self, port: Optional[ClickhousePort]) -> ClickhousePort:
+        if port is not None:
+            return port
+
+        for i_port in PORTS_PRIORITY:
+            if self.check_port(i_port):
+                return i_port
+
+        raise UserWarning(2, "Can't find any port in clickhouse-server config")
 
     def check_port(self, port: ClickhousePort) -> bool:
         return port in self.ports
@@ -282,6 +676,17 @@ class ClickhouseClient:
     def ping(self, port: ClickhousePort) -> str:
         return self.query(query=None, port=port)
 
+    def close(self) -> None:
+        """
+        Close persistent connections to ClickHouse server.
+        """
+        self._http_pool.close()
+        self._native_pool.close()
+
+
+# Guards lazy initialization of the client shared by concurrently executed commands
+_client_lock = threading.Lock()
+
 
 def clickhouse_client(ctx: Context) -> ClickhouseClient:
     """
@@ -289,19 +694,29 @@ def clickhouse_client(ctx: Context) -> ClickhouseClient:
     Init ClickHouse client and store to the context if it doesn't exist.
     """
     if not ctx.obj.get("chcli"):
-        ch_server_config = get_clickhouse_config(ctx)
-        tools_config = ctx.obj["config"]["clickhouse"]
-        user, password = clickhouse_credentials(ctx)
-        ctx.obj["chcli"] = ClickhouseClient(
-            host=tools_config["host"],
-            ports=ch_server_config.ports,
-            user=user,
-            password=password,
-            cert_path=ch_server_config.cert_path,
-            insecure=tools_config["insecure"],
-            timeout=tools_config["timeout"],
-            settings=tools_config["settings"],
-        )
+        with _client_lock:
+            if not ctx.obj.get("chcli"):
+                ch_server_config = get_clickhouse_config(ctx)
+                tools_config = ctx.obj["config"]["clickhouse"]
+                user, password = clickhouse_credentials(ctx)
+                http_pool_config = tools_config["http_pool"]
+                ctx.obj["chcli"] = ClickhouseClient(
+                    host=tools_config["host"],
+                    ports=ch_server_config.ports,
+                    user=user,
+                    password=password,
+                    cert_path=ch_server_config.cert_path,
+                    insecure=tools_config["insecure"],
+                    timeout=tools_config["timeout"],
+                    settings=tools_config["settings"],
+                    http_pool=HttpSessionPool(
+                        pool_size=http_pool_config["pool_size"],
+                        keep_alive=http_pool_config["keep_alive"],
+                        idle_timeout=http_pool_config["idle_timeout"],
+                    ),
+                    native_protocol=tools_config["native_protocol"],
+                )
+                ctx.find_root().call_on_close(ctx.obj["chcli"].close)
 
     return ctx.obj["chcli"]
 
@@ -0,0 +1,85 @@
+"""
+ClickHouse clients of cluster hosts.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, NamedTuple, Optional
+
+from click import Context
+
+from .clickhouse_client import ClickhouseClient, clickhouse_client
+
+# Max number of hosts queried concurrently
+DEFAULT_FAN_OUT_WORKERS = 8
+
+
+class HostResult(NamedTuple):
+    result: Any
+    error: Optional[Exception]
+
+
+class ClickhouseClientPool:
+    """
+    Thread-safe pool of clients keyed by host.
+
+    Clients are derived from the client of the local server, so they use its ports,
+    credentials and settings, and share its connection pools.
+    """
+
+    def __init__(
+        self, client: ClickhouseClient, max_workers: int = DEFAULT_FAN_OUT_WORKERS
+    ) -> None:
+        self._client = client
+        self._max_workers = max(1, max_workers)
+        self._clients: Dict[str, ClickhouseClient] = {}
+        self._lock = threading.Lock()
+
+    def get(self, host: str) -> ClickhouseClient:
+        with self._lock:
+            client = self._clients.get(host)
+            if client is None:
+                client = self._client.with_host(host)
+                self._clients[host] = client
+        return client
+
+    def fan_out(
+        self, query: Any, hosts: Iterable[str], **kwargs: Any
+    ) -> Dict[str, HostResult]:
+        """
+        Execute the query on hosts concurrently and return results in the order of hosts.
+
+        Keyword arguments are passed to ClickhouseClient.query(). Errors are returned
+        in results instead of being raised.
+        """
+        hosts = list(hosts)
+        if not hosts:
+            return {}
+
+        def _execute(host: str) -> HostResult:
+            try:
+                return HostResult(self.get(host).query(query, **kwargs), None)
+            except Exception as e:
+                return HostResult(None, e)
+
+        with ThreadPoolExecutor(
+            max_workers=min(self._max_workers, len(hosts))
+        ) as executor:
+            return dict(zip(hosts, executor.map(_execute, hosts)))
+
+
+# Guards lazy initialization of the pool shared by concurrently executed commands
+_pool_lock = threading.Lock()
+
+
+def clickhouse_client_pool(ctx: Context) -> ClickhouseClientPool:
+    """
+    Return the pool of clients of cluster hosts from the context, create it if needed.
+    """
+    if not ctx.obj.get("chcli_pool"):
+        client = clickhouse_client(ctx)
+        with _pool_lock:
+            if not ctx.obj.get("chcli_pool"):
+                ctx.obj["chcli_pool"] = ClickhouseClientPool(client)
+
+    return ctx.obj["chcli_pool"]
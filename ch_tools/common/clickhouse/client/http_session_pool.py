@@ -0,0 +1,86 @@
+"""
+Pool of persistent HTTP sessions for ClickHouse client.
+"""
+
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from typing_extensions import Self
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_IDLE_TIMEOUT = 60
+
+SessionKey = Tuple[str, str, int]
+
+
+class HttpSessionPool:
+    """
+    Thread-safe pool of persistent HTTP sessions keyed by (schema, host, port).
+
+    Each session keeps up to `pool_size` keep-alive connections, so concurrent
+    workers sharing the same client reuse TCP connections and TLS sessions
+    instead of establishing new ones for every query. Sessions that have not been
+    used for more than `idle_timeout` seconds are closed on the next access.
+    """
+
+    def __init__(
+        self: Self,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        keep_alive: bool = True,
+        idle_timeout: Optional[float] = DEFAULT_IDLE_TIMEOUT,
+    ) -> None:
+        self._pool_size = pool_size
+        self._keep_alive = keep_alive
+        self._idle_timeout = idle_timeout
+        self._sessions: Dict[SessionKey, requests.Session] = {}
+        self._last_used: Dict[SessionKey, float] = {}
+        self._lock = threading.Lock()
+
+    def get_session(self: Self, schema: str, host: str, port: int) -> requests.Session:
+        """
+        Return session for the specified endpoint. Create it if it doesn't exist.
+        """
+        key = (schema, host, port)
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._create_session(schema)
+                self._sessions[key] = session
+            self._last_used[key] = now
+            return session
+
+    def close(self: Self) -> None:
+        """
+        Close all sessions of the pool.
+        """
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            self._last_used.clear()
+
+    def __len__(self: Self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def _create_session(self: Self, schema: str) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self._pool_size)
+        session.mount(f"{schema}://", adapter)
+        if not self._keep_alive:
+            session.headers["Connection"] = "close"
+        return session
+
+    def _evict_idle(self: Self, now: float) -> None:
+        if not self._idle_timeout:
+            return
+
+        for key, last_used in list(self._last_used.items()):
+            if now - last_used > self._idle_timeout:
+                self._sessions.pop(key).close()
+                del self._last_used[key]
@@ -0,0 +1,27 @@
+"""
+ClickHouse native (TCP) protocol client.
+"""
+
+from .columns import UnsupportedTypeError
+from .connection import (
+    Block,
+    ClickhouseNativeError,
+    NativeConnection,
+    NativeConnectionPool,
+    QueryResult,
+)
+from .formats import is_supported_format, render
+from .protocol import UnsupportedFeatureError, UnsupportedResultError
+
+__all__ = [
+    "Block",
+    "ClickhouseNativeError",
+    "NativeConnection",
+    "NativeConnectionPool",
+    "QueryResult",
+    "UnsupportedFeatureError",
+    "UnsupportedResultError",
+    "UnsupportedTypeError",
+    "is_supported_format",
+    "render",
+]
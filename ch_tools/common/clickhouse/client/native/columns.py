@@ -0,0 +1,305 @@
+"""
+Decoding of column data in ClickHouse Native format.
+https://clickhouse.com/docs/en/native-protocol/columns
+"""
+
+import ipaddress
+import re
+import uuid
+from datetime import date, datetime, timedelta, timezone, tzinfo
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from .protocol import BinaryReader, UnsupportedFeatureError
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # pragma: no cover
+    ZoneInfo = None  # type: ignore
+
+EPOCH_DATE = date(1970, 1, 1)
+
+_FIXED_FORMATS = {
+    "Int8": "b",
+    "UInt8": "B",
+    "Int16": "h",
+    "UInt16": "H",
+    "Int32": "i",
+    "UInt32": "I",
+    "Int64": "q",
+    "UInt64": "Q",
+    "Float32": "f",
+    "Float64": "d",
+}
+
+_BIG_INTEGER_SIZES = {
+    "Int128": (16, True),
+    "UInt128": (16, False),
+    "Int256": (32, True),
+    "UInt256": (32, False),
+}
+
+_NAMED_ELEMENT_RE = re.compile(r"^`?([A-Za-z_][A-Za-z0-9_]*)`?\s+(.+)$", re.DOTALL)
+
+
+class UnsupportedTypeError(UnsupportedFeatureError):
+    """
+    Column type that the native client is not able to decode.
+    """
+
+
+class ColumnType(NamedTuple):
+    """
+    Parsed ClickHouse data type, e.g. ColumnType("Array", ("Nullable(String)",)).
+    """
+
+    name: str
+    params: Tuple[str, ...] = ()
+
+    def param_type(self, index: int) -> "ColumnType":
+        return parse_type(self.params[index])
+
+    def element_types(self) -> List["ColumnType"]:
+        """
+        Return types of Tuple elements stripping element names.
+        """
+        result = []
+        for param in self.params:
+            match = _NAMED_ELEMENT_RE.match(param)
+            if match and "(" not in param.split(None, 1)[0]:
+                param = match.group(2)
+            result.append(parse_type(param))
+        return result
+
+
+@lru_cache(maxsize=None)
+def parse_type(type_name: str) -> ColumnType:
+    """
+    Parse ClickHouse data type name into name and list of raw parameters.
+    """
+    type_name = type_name.strip()
+    pos = type_name.find("(")
+    if pos < 0:
+        return ColumnType(type_name)
+    if not type_name.endswith(")"):
+        raise UnsupportedTypeError(f"Malformed type: {type_name}")
+    return ColumnType(
+        type_name[:pos].strip(), tuple(_split_params(type_name[pos + 1 : -1]))
+    )
+
+
+def _split_params(params: str) -> List[str]:
+    result = []
+    depth = 0
+    quote: Optional[str] = None
+    escaped = False
+    start = 0
+    for i, char in enumerate(params):
+        if quote:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == quote:
+                quote = None
+        elif char in ("'", "`"):
+            quote = char
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            result.append(params[start:i].strip())
+            start = i + 1
+    result.append(params[start:].strip())
+    return result
+
+
+def _unquote(value: str) -> str:
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] == "'":
+        value = value[1:-1].replace("\\'", "'").replace("\\\\", "\\")
+    return value
+
+
+def get_timezone(name: Optional[str], default: tzinfo) -> tzinfo:
+    if not name:
+        return default
+    if ZoneInfo is not None:
+        try:
+            return ZoneInfo(name)
+        except Exception:
+            pass
+    return timezone.utc
+
+
+def _format_datetime(seconds: int, tz: tzinfo) -> str:
+    value = datetime.fromtimestamp(0, timezone.utc) + timedelta(seconds=seconds)
+    return value.astimezone(tz).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _format_uuid(high: int, low: int) -> str:
+    return str(uuid.UUID(int=(high << 64) | low))
+
+
+def _enum_values(column_type: ColumnType) -> Dict[int, str]:
+    values = {}
+    for param in column_type.params:
+        name, _, value = param.rpartition("=")
+        values[int(value)] = _unquote(name)
+    return values
+
+
+def _decimal_layout(column_type: ColumnType) -> Tuple[int, int]:
+    """
+    Return size in bytes and scale of Decimal type.
+    """
+    sizes = {"Decimal32": 4, "Decimal64": 8, "Decimal128": 16, "Decimal256": 32}
+    if column_type.name in sizes:
+        return sizes[column_type.name], int(column_type.params[0])
+
+    precision, scale = int(column_type.params[0]), int(column_type.params[1])
+    for max_precision, size in ((9, 4), (18, 8), (38, 16)):
+        if precision <= max_precision:
+            return size, scale
+    return 32, scale
+
+
+def _read_big_integers(
+    reader: BinaryReader, n_rows: int, size: int, signed: bool
+) -> List[int]:
+    data = reader.read(size * n_rows)
+    return [
+        int.from_bytes(data[i * size : (i + 1) * size], "little", signed=signed)
+        for i in range(n_rows)
+    ]
+
+
+def read_column(
+    reader: BinaryReader, column_type: ColumnType, n_rows: int, server_tz: tzinfo
+) -> List[Any]:
+    """
+    Read values of a column with the specified type.
+    """
+    # pylint: disable=too-many-return-statements,too-many-branches,too-many-locals
+
+    name = column_type.name
+
+    if name in _FIXED_FORMATS:
+        return list(reader.read_fixed(_FIXED_FORMATS[name], n_rows))
+
+    if name in _BIG_INTEGER_SIZES:
+        return _read_big_integers(reader, n_rows, *_BIG_INTEGER_SIZES[name])
+
+    if name == "String":
+        return [reader.read_str() for _ in range(n_rows)]
+
+    if name == "FixedString":
+        size = int(column_type.params[0])
+        data = reader.read(size * n_rows)
+        return [
+            data[i * size : (i + 1) * size].decode(errors="replace")
+            for i in range(n_rows)
+        ]
+
+    if name == "Bool":
+        return [bool(value) for value in reader.read_fixed("B", n_rows)]
+
+    if name == "Nothing":
+        reader.read(n_rows)
+        return [None] * n_rows
+
+    if name in ("Date", "Date32"):
+        days = reader.read_fixed("H" if name == "Date" else "i", n_rows)
+        return [(EPOCH_DATE + timedelta(days=value)).isoformat() for value in days]
+
+    if name == "DateTime":
+        tz = get_timezone(
+            _unquote(column_type.params[0]) if column_type.params else None, server_tz
+        )
+        return [_format_datetime(value, tz) for value in reader.read_fixed("I", n_rows)]
+
+    if name == "DateTime64":
+        precision = int(column_type.params[0])
+        tz = get_timezone(
+            _unquote(column_type.params[1]) if len(column_type.params) > 1 else None,
+            server_tz,
+        )
+        result = []
+        for ticks in reader.read_fixed("q", n_rows):
+            seconds, fraction = divmod(ticks, 10**precision)
+            value = _format_datetime(seconds, tz)
+            if precision:
+                value += f".{fraction:0{precision}d}"
+            result.append(value)
+        return result
+
+    if name == "UUID":
+        halves = reader.read_fixed("Q", 2 * n_rows)
+        return [_format_uuid(halves[2 * i], halves[2 * i + 1]) for i in range(n_rows)]
+
+    if name == "IPv4":
+        return [
+            str(ipaddress.IPv4Address(value))
+            for value in reader.read_fixed("I", n_rows)
+        ]
+
+    if name == "IPv6":
+        data = reader.read(16 * n_rows)
+        return [
+            str(ipaddress.IPv6Address(data[i * 16 : (i + 1) * 16]))
+            for i in range(n_rows)
+        ]
+
+    if name in ("Enum8", "Enum16"):
+        names = _enum_values(column_type)
+        codes = reader.read_fixed("b" if name == "Enum8" else "h", n_rows)
+        return [names.get(code, str(code)) for code in codes]
+
+    if name.startswith("Decimal"):
+        size, scale = _decimal_layout(column_type)
+        return [
+            Decimal(value).scaleb(-scale)
+            for value in _read_big_integers(reader, n_rows, size, True)
+        ]
+
+    if name == "Nullable":
+        null_map = reader.read(n_rows)
+        nested = read_column(reader, column_type.param_type(0), n_rows, server_tz)
+        return [None if null_map[i] else nested[i] for i in range(n_rows)]
+
+    if name == "Array":
+        offsets = reader.read_fixed("Q", n_rows)
+        total = offsets[-1] if offsets else 0
+        items = read_column(reader, column_type.param_type(0), total, server_tz)
+        return _split_by_offsets(items, offsets)
+
+    if name == "Map":
+        offsets = reader.read_fixed("Q", n_rows)
+        total = offsets[-1] if offsets else 0
+        keys = read_column(reader, column_type.param_type(0), total, server_tz)
+        map_values = read_column(reader, column_type.param_type(1), total, server_tz)
+        pairs = list(zip(keys, map_values))
+        return [dict(chunk) for chunk in _split_by_offsets(pairs, offsets)]
+
+    if name == "Tuple":
+        elements = [
+            read_column(reader, element_type, n_rows, server_tz)
+            for element_type in column_type.element_types()
+        ]
+        return [tuple(element[i] for element in elements) for i in range(n_rows)]
+
+    if name == "SimpleAggregateFunction":
+        return read_column(reader, column_type.param_type(1), n_rows, server_tz)
+
+    raise UnsupportedTypeError(f"Unsupported column type: {column_type.name}")
+
+
+def _split_by_offsets(items: List[Any], offsets: Tuple[int, ...]) -> List[List[Any]]:
+    result = []
+    start = 0
+    for end in offsets:
+        result.append(items[start:end])
+        start = end
+    return result
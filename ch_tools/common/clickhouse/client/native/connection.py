@@ -0,0 +1,436 @@
+"""
+Connection to ClickHouse server over native (TCP) protocol.
+"""
+
+import getpass
+import os
+import socket
+import ssl
+import threading
+from contextlib import contextmanager
+from datetime import timezone, tzinfo
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from typing_extensions import Self
+
+from .columns import get_timezone, parse_type, read_column
+from .protocol import (
+    CLIENT_REVISION,
+    COMPRESSION_DISABLED,
+    INTERFACE_TCP,
+    QUERY_KIND_INITIAL,
+    QUERY_STAGE_COMPLETE,
+    REVISION_WITH_CLIENT_WRITE_INFO,
+    REVISION_WITH_QUOTA_KEY_IN_CLIENT_INFO,
+    REVISION_WITH_SERVER_DISPLAY_NAME,
+    REVISION_WITH_SERVER_TIMEZONE,
+    REVISION_WITH_VERSION_PATCH,
+    BinaryReader,
+    BinaryWriter,
+    ClientPacket,
+    ServerPacket,
+    UnsupportedFeatureError,
+    UnsupportedResultError,
+)
+
+CLIENT_NAME = "ch-tools"
+CLIENT_VERSION = (1, 0, 0)
+
+DEFAULT_MAX_IDLE_CONNECTIONS = 10
+
+# The setting makes server convert LowCardinality columns to ordinary ones.
+QUERY_SETTINGS = {"low_cardinality_allow_in_native_format": 0}
+
+
+class ClickhouseNativeError(RuntimeError):
+    """
+    Exception received from ClickHouse server over native protocol.
+    """
+
+    def __init__(self, code: int, name: str, message: str, query: str) -> None:
+        self.code = code
+        self.name = name
+        self.message = message
+        self.query = query
+        super().__init__(f"Code: {code}. {name}: {message}\n\nQuery: {query}")
+
+
+class QueryResult(NamedTuple):
+    columns: List[Dict[str, str]]
+    rows: List[List[Any]]
+
+
+class Block(NamedTuple):
+    columns: List[Dict[str, str]]
+    data: List[List[Any]]
+
+
+class NativeConnection:
+    """
+    Single connection to ClickHouse server. Not thread-safe.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(
+        self: Self,
+        *,
+        host: str,
+        port: int,
+        user: Optional[str] = None,
+        password: Optional[str] = None,
+        secure: bool = False,
+        cert_path: Optional[str] = None,
+        insecure: bool = False,
+        timeout: Optional[float] = None,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self._user = user or "default"
+        self._password = password or ""
+        self._secure = secure
+        self._cert_path = cert_path
+        self._insecure = insecure
+        self._timeout = timeout
+        self._socket: Optional[socket.socket] = None
+        self._reader: Optional[BinaryReader] = None
+        self._revision = CLIENT_REVISION
+        self.server_name = ""
+        self.server_version: Tuple[int, int, int] = (0, 0, 0)
+        self.server_timezone: tzinfo = timezone.utc
+
+    def connect(self: Self) -> None:
+        """
+        Establish connection and perform handshake.
+        """
+        sock = socket.create_connection((self.host, self.port), timeout=self._timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self._secure:
+            sock = self._ssl_context().wrap_socket(sock, server_hostname=self.host)
+        self._socket = sock
+        self._reader = BinaryReader(sock.makefile("rb"))
+        try:
+            self._send_hello()
+            self._receive_hello()
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self: Self) -> None:
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+            self._reader = None
+
+    @property
+    def connected(self: Self) -> bool:
+        return self._socket is not None
+
+    def ping(self: Self, timeout: Optional[float] = None) -> None:
+        writer = BinaryWriter()
+        writer.write_varint(ClientPacket.PING)
+        self._send(writer, timeout)
+        while True:
+            packet = self._read().read_varint()
+            if packet == ServerPacket.PONG:
+                return
+            if packet != ServerPacket.PROGRESS:
+                raise UnsupportedFeatureError(f"Unexpected packet {packet} on ping")
+            self._read_progress()
+
+    def execute(
+        self: Self,
+        query: str,
+        settings: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+    ) -> QueryResult:
+        """
+        Execute query and return received columns and rows.
+        """
+        columns: List[Dict[str, str]] = []
+        rows: List[List[Any]] = []
+        for block in self.iter_blocks(query, settings, timeout):
+            if not columns:
+                columns = block.columns
+            rows.extend(list(row) for row in zip(*block.data))
+        return QueryResult(columns, rows)
+
+    def iter_blocks(
+        self: Self,
+        query: str,
+        settings: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+    ) -> Iterator[Block]:
+        """
+        Execute query and iterate over received data blocks. The connection can't be
+        used for other queries until the iterator is exhausted.
+
+        Features that the client doesn't support in the result are reported with
+        UnsupportedResultError, as the query has already been sent.
+        """
+        writer = BinaryWriter()
+        self._write_query(writer, query, {**(settings or {}), **QUERY_SETTINGS})
+        self._write_empty_block(writer)
+        self._send(writer, timeout)
+
+        try:
+            yield from self._receive_blocks(query)
+        except UnsupportedFeatureError as e:
+            raise UnsupportedResultError(str(e)) from e
+
+    def _receive_blocks(self: Self, query: str) -> Iterator[Block]:
+        reader = self._read()
+        while True:
+            packet = reader.read_varint()
+            if packet == ServerPacket.DATA:
+                yield self._read_block()
+            elif packet == ServerPacket.EXCEPTION:
+                raise self._read_exception(query)
+            elif packet == ServerPacket.PROGRESS:
+                self._read_progress()
+            elif packet == ServerPacket.PROFILE_INFO:
+                self._read_profile_info()
+            elif packet in (
+                ServerPacket.TOTALS,
+                ServerPacket.EXTREMES,
+                ServerPacket.LOG,
+            ):
+                self._read_block()
+            elif packet == ServerPacket.TABLE_COLUMNS:
+                reader.read_str()
+                reader.read_str()
+            elif packet == ServerPacket.END_OF_STREAM:
+                return
+            else:
+                raise UnsupportedFeatureError(f"Unexpected packet {packet}")
+
+    def _ssl_context(self: Self) -> ssl.SSLContext:
+        cafile = (
+            self._cert_path
+            if self._cert_path and os.path.exists(self._cert_path)
+            else None
+        )
+        context = ssl.create_default_context(cafile=cafile)
+        if self._insecure:
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+        return context
+
+    def _send(self: Self, writer: BinaryWriter, timeout: Optional[float]) -> None:
+        if self._socket is None:
+            raise ConnectionError("Connection to ClickHouse server is closed")
+        self._socket.settimeout(timeout or self._timeout)
+        self._socket.sendall(writer.getvalue())
+
+    def _read(self: Self) -> BinaryReader:
+        if self._reader is None:
+            raise ConnectionError("Connection to ClickHouse server is closed")
+        return self._reader
+
+    def _send_hello(self: Self) -> None:
+        writer = BinaryWriter()
+        writer.write_varint(ClientPacket.HELLO)
+        writer.write_str(CLIENT_NAME)
+        writer.write_varint(CLIENT_VERSION[0])
+        writer.write_varint(CLIENT_VERSION[1])
+        writer.write_varint(CLIENT_REVISION)
+        writer.write_str("")  # default database
+        writer.write_str(self._user)
+        writer.write_str(self._password)
+        self._send(writer, None)
+
+    def _receive_hello(self: Self) -> None:
+        reader = self._read()
+        packet = reader.read_varint()
+        if packet == ServerPacket.EXCEPTION:
+            raise self._read_exception("")
+        if packet != ServerPacket.HELLO:
+            raise UnsupportedFeatureError(f"Unexpected packet {packet} on handshake")
+
+        self.server_name = reader.read_str()
+        major = reader.read_varint()
+        minor = reader.read_varint()
+        server_revision = reader.read_varint()
+        self._revision = min(CLIENT_REVISION, server_revision)
+        patch = server_revision
+        if self._revision >= REVISION_WITH_SERVER_TIMEZONE:
+            self.server_timezone = get_timezone(reader.read_str(), timezone.utc)
+        if self._revision >= REVISION_WITH_SERVER_DISPLAY_NAME:
+            reader.read_str()
+        if self._revision >= REVISION_WITH_VERSION_PATCH:
+            patch = reader.read_varint()
+        self.server_version = (major, minor, patch)
+
+        if self._revision < CLIENT_REVISION:
+            raise UnsupportedFeatureError(
+                f"Server protocol revision {server_revision} is too old"
+            )
+
+    def _write_query(
+        self: Self, writer: BinaryWriter, query: str, settings: Dict[str, Any]
+    ) -> None:
+        writer.write_varint(ClientPacket.QUERY)
+        writer.write_str("")  # query id
+
+        # Client info
+        writer.write_uint8(QUERY_KIND_INITIAL)
+        writer.write_str("")  # initial user
+        writer.write_str("")  # initial query id
+        writer.write_str("0.0.0.0:0")  # initial address
+        writer.write_uint8(INTERFACE_TCP)
+        writer.write_str(_os_user())
+        writer.write_str(socket.gethostname())
+        writer.write_str(CLIENT_NAME)
+        writer.write_varint(CLIENT_VERSION[0])
+        writer.write_varint(CLIENT_VERSION[1])
+        writer.write_varint(CLIENT_REVISION)
+        if self._revision >= REVISION_WITH_QUOTA_KEY_IN_CLIENT_INFO:
+            writer.write_str("")  # quota key
+        if self._revision >= REVISION_WITH_VERSION_PATCH:
+            writer.write_varint(CLIENT_VERSION[2])
+
+        # Settings serialized as strings, terminated by empty name
+        for name, value in settings.items():
+            writer.write_str(name)
+            writer.write_varint(0)  # flags
+            writer.write_str(str(int(value)) if isinstance(value, bool) else str(value))
+        writer.write_str("")
+
+        writer.write_varint(QUERY_STAGE_COMPLETE)
+        writer.write_varint(COMPRESSION_DISABLED)
+        writer.write_str(query)
+
+    @staticmethod
+    def _write_empty_block(writer: BinaryWriter) -> None:
+        writer.write_varint(ClientPacket.DATA)
+        writer.write_str("")  # table name
+        # Block info
+        writer.write_varint(1)
+        writer.write_uint8(0)  # is_overflows
+        writer.write_varint(2)
+        writer.write_int32(-1)  # bucket_num
+        writer.write_varint(0)
+        # Number of columns and rows
+        writer.write_varint(0)
+        writer.write_varint(0)
+
+    def _read_block(self: Self) -> Block:
+        reader = self._read()
+        reader.read_str()  # table name
+        while True:
+            field_num = reader.read_varint()
+            if field_num == 0:
+                break
+            if field_num == 1:
+                reader.read_uint8()
+            elif field_num == 2:
+                reader.read_int32()
+            else:
+                raise UnsupportedFeatureError(f"Unknown block info field {field_num}")
+
+        n_columns = reader.read_varint()
+        n_rows = reader.read_varint()
+        columns = []
+        data = []
+        for _ in range(n_columns):
+            name = reader.read_str()
+            type_name = reader.read_str()
+            columns.append({"name": name, "type": type_name})
+            data.append(
+                read_column(reader, parse_type(type_name), n_rows, self.server_timezone)
+                if n_rows
+                else []
+            )
+        return Block(columns, data)
+
+    def _read_exception(self: Self, query: str) -> ClickhouseNativeError:
+        reader = self._read()
+        code = reader.read_int32()
+        name = reader.read_str()
+        message = reader.read_str()
+        reader.read_str()  # stack trace
+        if reader.read_uint8():  # has nested
+            self._read_exception(query)
+        return ClickhouseNativeError(code, name, message, query)
+
+    def _read_progress(self: Self) -> None:
+        reader = self._read()
+        for _ in range(3):  # rows, bytes, total rows
+            reader.read_varint()
+        if self._revision >= REVISION_WITH_CLIENT_WRITE_INFO:
+            reader.read_varint()  # written rows
+            reader.read_varint()  # written bytes
+
+    def _read_profile_info(self: Self) -> None:
+        reader = self._read()
+        reader.read_varint()  # rows
+        reader.read_varint()  # blocks
+        reader.read_varint()  # bytes
+        reader.read_uint8()  # applied limit
+        reader.read_varint()  # rows before limit
+        reader.read_uint8()  # calculated rows before limit
+
+
+def _os_user() -> str:
+    try:
+        return getpass.getuser()
+    except Exception:
+        return ""
+
+
+class NativeConnectionPool:
+    """
+    Thread-safe pool of idle native connections keyed by (host, port, secure).
+    """
+
+    def __init__(
+        self: Self, max_idle_connections: int = DEFAULT_MAX_IDLE_CONNECTIONS
+    ) -> None:
+        self._max_idle_connections = max_idle_connections
+        self._idle: Dict[Tuple[str, int, bool], List[NativeConnection]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(
+        self: Self, *, host: str, port: int, secure: bool, **kwargs: Any
+    ) -> Iterator[NativeConnection]:
+        """
+        Acquire connection from the pool or open a new one. The connection is returned
+        back to the pool if the caller doesn't fail with an error other than server
+        exception, otherwise it is closed.
+        """
+        key = (host, port, secure)
+        with self._lock:
+            idle = self._idle.get(key)
+            conn = idle.pop() if idle else None
+
+        if conn is None:
+            conn = NativeConnection(host=host, port=port, secure=secure, **kwargs)
+            conn.connect()
+
+        try:
+            yield conn
+        except ClickhouseNativeError:
+            self._release(key, conn)
+            raise
+        except BaseException:
+            conn.close()
+            raise
+        self._release(key, conn)
+
+    def close(self: Self) -> None:
+        with self._lock:
+            for connections in self._idle.values():
+                for conn in connections:
+                    conn.close()
+            self._idle.clear()
+
+    def _release(
+        self: Self, key: Tuple[str, int, bool], conn: NativeConnection
+    ) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if conn.connected and len(idle) < self._max_idle_connections:
+                idle.append(conn)
+                return
+        conn.close()
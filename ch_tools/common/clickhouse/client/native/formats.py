@@ -0,0 +1,176 @@
+"""
+Client-side rendering of query results received over native protocol.
+
+Only formats used by ch-tools are supported. Rendering mimics output of ClickHouse
+server with default format settings.
+"""
+
+import math
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+from .columns import ColumnType, parse_type
+
+_QUOTED_JSON_INTEGERS = ("Int64", "UInt64", "Int128", "UInt128", "Int256", "UInt256")
+
+_TSV_ESCAPES = str.maketrans(
+    {
+        "\\": "\\\\",
+        "\t": "\\t",
+        "\n": "\\n",
+        "\r": "\\r",
+        "\0": "\\0",
+        "\b": "\\b",
+        "\f": "\\f",
+    }
+)
+
+JSON_FORMATS = ("JSON", "JSONCompact")
+TEXT_FORMATS = (
+    "TabSeparated",
+    "TSV",
+    "TabSeparatedWithNames",
+    "TSVWithNames",
+    "TabSeparatedWithNamesAndTypes",
+    "TSVWithNamesAndTypes",
+    "TabSeparatedRaw",
+    "TSVRaw",
+)
+
+
+def is_supported_format(format_: Optional[str]) -> bool:
+    return format_ is None or format_ in JSON_FORMATS or format_ in TEXT_FORMATS
+
+
+def render(
+    format_: Optional[str],
+    columns: List[Dict[str, str]],
+    rows: List[List[Any]],
+) -> Any:
+    """
+    Render result set in the specified format. Absent format means TabSeparated that
+    is the default output format of clickhouse-client in non-interactive mode.
+    """
+    types = [parse_type(column["type"]) for column in columns]
+
+    if format_ in JSON_FORMATS:
+        data: List[Any] = [
+            [_json_value(value, types[i]) for i, value in enumerate(row)]
+            for row in rows
+        ]
+        if format_ == "JSON":
+            names = [column["name"] for column in columns]
+            data = [dict(zip(names, row)) for row in data]
+        return {"meta": columns, "data": data, "rows": len(data)}
+
+    format_ = format_ or "TabSeparated"
+    raw = format_ in ("TabSeparatedRaw", "TSVRaw")
+    lines = []
+    if format_.endswith(("WithNames", "WithNamesAndTypes")):
+        lines.append("\t".join(_escape(column["name"]) for column in columns))
+    if format_.endswith("WithNamesAndTypes"):
+        lines.append("\t".join(_escape(column["type"]) for column in columns))
+    for row in rows:
+        lines.append(
+            "\t".join(_tsv_field(value, types[i], raw) for i, value in enumerate(row))
+        )
+    return "\n".join(lines)
+
+
+def _tsv_field(value: Any, column_type: ColumnType, raw: bool) -> str:
+    if value is None:
+        return "\\N"
+    text = _text_value(value, column_type)
+    return text if raw else _escape(text)
+
+
+def _base_type(column_type: ColumnType) -> ColumnType:
+    while column_type.name in ("Nullable", "LowCardinality"):
+        column_type = column_type.param_type(0)
+    return column_type
+
+
+def _json_value(value: Any, column_type: ColumnType) -> Any:
+    # pylint: disable=too-many-return-statements
+
+    if value is None:
+        return None
+
+    column_type = _base_type(column_type)
+
+    if column_type.name in _QUOTED_JSON_INTEGERS:
+        return str(value)
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if column_type.name == "Array":
+        item_type = column_type.param_type(0)
+        return [_json_value(item, item_type) for item in value]
+    if column_type.name == "Tuple":
+        element_types = column_type.element_types()
+        return [_json_value(item, element_types[i]) for i, item in enumerate(value)]
+    if column_type.name == "Map":
+        key_type, value_type = column_type.param_type(0), column_type.param_type(1)
+        return {
+            _text_value(k, key_type): _json_value(v, value_type)
+            for k, v in value.items()
+        }
+    return value
+
+
+def _text_value(value: Any, column_type: ColumnType, nested: bool = False) -> str:
+    # pylint: disable=too-many-return-statements
+
+    if value is None:
+        return "NULL"
+
+    column_type = _base_type(column_type)
+
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, str):
+        return _quote(value) if nested else value
+    if isinstance(value, float):
+        return _format_float(value)
+    if column_type.name == "Array":
+        item_type = column_type.param_type(0)
+        return "[" + ",".join(_text_value(v, item_type, True) for v in value) + "]"
+    if column_type.name == "Tuple":
+        element_types = column_type.element_types()
+        return (
+            "("
+            + ",".join(
+                _text_value(v, element_types[i], True) for i, v in enumerate(value)
+            )
+            + ")"
+        )
+    if column_type.name == "Map":
+        key_type, value_type = column_type.param_type(0), column_type.param_type(1)
+        return (
+            "{"
+            + ",".join(
+                f"{_text_value(k, key_type, True)}:{_text_value(v, value_type, True)}"
+                for k, v in value.items()
+            )
+            + "}"
+        )
+    return str(value)
+
+
+def _format_float(value: float) -> str:
+    if math.isnan(value):
+        return "nan"
+    if math.isinf(value):
+        return "inf" if value > 0 else "-inf"
+    if value.is_integer() and abs(value) < 1e16:
+        return str(int(value))
+    return repr(value)
+
+
+def _quote(value: str) -> str:
+    return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+def _escape(value: str) -> str:
+    return value.translate(_TSV_ESCAPES)
@@ -0,0 +1,142 @@
+"""
+Primitives of ClickHouse native (TCP) protocol.
+https://clickhouse.com/docs/en/native-protocol/basics
+"""
+
+import struct
+from typing import Any, BinaryIO, Tuple
+
+from typing_extensions import Self
+
+# Protocol revision the client speaks. It is the first revision where settings are
+# serialized as strings, so settings can be sent without knowing their types.
+CLIENT_REVISION = 54429
+
+# Minimal revisions of protocol features supported by the client.
+REVISION_WITH_SERVER_TIMEZONE = 54058
+REVISION_WITH_QUOTA_KEY_IN_CLIENT_INFO = 54060
+REVISION_WITH_SERVER_DISPLAY_NAME = 54372
+REVISION_WITH_VERSION_PATCH = 54401
+REVISION_WITH_CLIENT_WRITE_INFO = 54420
+
+QUERY_KIND_INITIAL = 1
+INTERFACE_TCP = 1
+QUERY_STAGE_COMPLETE = 2
+COMPRESSION_DISABLED = 0
+
+
+class UnsupportedFeatureError(Exception):
+    """
+    Protocol feature that the native client doesn't implement. Callers are expected
+    to fall back to clickhouse-client.
+    """
+
+
+class UnsupportedResultError(Exception):
+    """
+    Result of the query that the native client can't read. The query has already been
+    sent to the server, so it must not be executed again with clickhouse-client.
+    """
+
+
+class ClientPacket:
+    HELLO = 0
+    QUERY = 1
+    DATA = 2
+    CANCEL = 3
+    PING = 4
+
+
+class ServerPacket:
+    HELLO = 0
+    DATA = 1
+    EXCEPTION = 2
+    PROGRESS = 3
+    PONG = 4
+    END_OF_STREAM = 5
+    PROFILE_INFO = 6
+    TOTALS = 7
+    EXTREMES = 8
+    TABLES_STATUS_RESPONSE = 9
+    LOG = 10
+    TABLE_COLUMNS = 11
+
+
+class BinaryWriter:
+    """
+    Buffer for serializing client packets.
+    """
+
+    def __init__(self: Self) -> None:
+        self._buffer = bytearray()
+
+    def write_varint(self: Self, value: int) -> None:
+        while True:
+            byte = value & 0x7F
+            value >>= 7
+            if value:
+                self._buffer.append(byte | 0x80)
+            else:
+                self._buffer.append(byte)
+                return
+
+    def write_bytes(self: Self, value: bytes) -> None:
+        self.write_varint(len(value))
+        self._buffer += value
+
+    def write_str(self: Self, value: str) -> None:
+        self.write_bytes(value.encode())
+
+    def write_uint8(self: Self, value: int) -> None:
+        self._buffer += struct.pack("<B", value)
+
+    def write_int32(self: Self, value: int) -> None:
+        self._buffer += struct.pack("<i", value)
+
+    def getvalue(self: Self) -> bytes:
+        return bytes(self._buffer)
+
+
+class BinaryReader:
+    """
+    Reader of server packets from a buffered stream.
+    """
+
+    def __init__(self: Self, stream: BinaryIO) -> None:
+        self._stream = stream
+
+    def read(self: Self, size: int) -> bytes:
+        data = self._stream.read(size)
+        if len(data) != size:
+            raise ConnectionError("Unexpected end of stream from ClickHouse server")
+        return data
+
+    def read_varint(self: Self) -> int:
+        result = 0
+        shift = 0
+        while True:
+            byte = self.read(1)[0]
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return result
+            shift += 7
+
+    def read_bytes(self: Self) -> bytes:
+        return self.read(self.read_varint())
+
+    def read_str(self: Self) -> str:
+        return self.read_bytes().decode(errors="replace")
+
+    def read_uint8(self: Self) -> int:
+        return self.read(1)[0]
+
+    def read_int32(self: Self) -> int:
+        return struct.unpack("<i", self.read(4))[0]
+
+    def read_fixed(self: Self, fmt: str, count: int) -> Tuple[Any, ...]:
+        """
+        Read `count` little-endian values of the specified struct format.
+        """
+        if not count:
+            return ()
+        return struct.unpack(f"<{count}{fmt}", self.read(struct.calcsize(fmt) * count))
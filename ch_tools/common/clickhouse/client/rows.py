@@ -0,0 +1,267 @@
+"""
+Encoding and decoding of rows streamed to and from ClickHouse.
+
+Supported result formats carry column names and types in the first two lines, so values
+are converted to Python types without buffering the whole response.
+"""
+
+import json
+import zlib
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, Union
+
+from .native.columns import ColumnType, parse_type
+
+JSON_ROWS_FORMAT = "JSONCompactEachRowWithNamesAndTypes"
+TSV_ROWS_FORMAT = "TabSeparatedWithNamesAndTypes"
+ROW_FORMATS = (JSON_ROWS_FORMAT, TSV_ROWS_FORMAT)
+# Format of inserted rows
+TSV_FORMAT = "TabSeparated"
+
+# Min size of chunks of encoded data
+ENCODE_CHUNK_SIZE = 64 * 1024
+
+_INTEGER_TYPES = frozenset(
+    f"{prefix}Int{bits}" for prefix in ("", "U") for bits in (8, 16, 32, 64, 128, 256)
+)
+# Integer types quoted by ClickHouse in JSON formats
+_QUOTED_INTEGER_TYPES = frozenset(
+    f"{prefix}Int{bits}" for prefix in ("", "U") for bits in (64, 128, 256)
+)
+_FLOAT_TYPES = frozenset(("Float32", "Float64"))
+_WRAPPER_TYPES = ("Nullable", "LowCardinality")
+
+_TSV_UNESCAPES = {
+    "t": "\t",
+    "n": "\n",
+    "r": "\r",
+    "0": "\0",
+    "b": "\b",
+    "f": "\f",
+    "a": "\a",
+    "v": "\v",
+}
+
+_TSV_ESCAPES = str.maketrans(
+    {
+        "\\": "\\\\",
+        "\t": "\\t",
+        "\n": "\\n",
+        "\r": "\\r",
+        "\0": "\\0",
+    }
+)
+
+Decoder = Callable[[Any], Any]
+Line = Union[str, bytes]
+
+
+def decode_rows(
+    lines: Iterable[Line], format_: str, quote_64bit_integers: bool = False
+) -> Iterator[Dict[str, Any]]:
+    """
+    Decode lines of query result in one of ROW_FORMATS into dicts keyed by column names.
+
+    If `quote_64bit_integers` is set, 64-bit and wider integers are returned as strings
+    as in JSON formats of ClickHouse.
+    """
+    if format_ not in ROW_FORMATS:
+        raise ValueError(f"Unsupported row format: {format_}")
+
+    if format_ == JSON_ROWS_FORMAT:
+        split, make_decoder, header = _split_json, _json_decoder, _identity
+    else:
+        split, make_decoder, header = _split_tsv, _tsv_decoder, _tsv_unescape
+
+    lines = iter(lines)
+    try:
+        names = [header(name) for name in split(next(lines))]
+        types = [header(type_) for type_ in split(next(lines))]
+    except StopIteration:
+        return
+
+    decoders = [
+        make_decoder(parse_type(type_), quote_64bit_integers) for type_ in types
+    ]
+    for line in lines:
+        if not line:
+            continue
+        values = split(line)
+        if len(values) != len(decoders):
+            raise RuntimeError(
+                f"Unexpected data in query result stream: {_to_str(line)}"
+            )
+        yield {
+            name: decode(value) for name, decode, value in zip(names, decoders, values)
+        }
+
+
+def decode_json_result(
+    result: Dict[str, Any], quote_64bit_integers: bool = False
+) -> Iterator[Dict[str, Any]]:
+    """
+    Decode rows of query result in JSONCompact format into dicts keyed by column names.
+    """
+    names = [column["name"] for column in result["meta"]]
+    decoders = [
+        _json_decoder(parse_type(column["type"]), quote_64bit_integers)
+        for column in result["meta"]
+    ]
+    for values in result["data"]:
+        yield {
+            name: decode(value) for name, decode, value in zip(names, decoders, values)
+        }
+
+
+def encode_tsv_rows(
+    rows: Iterable[Sequence[Any]], chunk_size: int = ENCODE_CHUNK_SIZE
+) -> Iterator[bytes]:
+    """
+    Encode rows in TabSeparated format yielding chunks of at least `chunk_size` bytes.
+    """
+    lines: List[str] = []
+    size = 0
+    for row in rows:
+        line = "\t".join(_tsv_escape(value) for value in row) + "\n"
+        lines.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield "".join(lines).encode()
+            lines.clear()
+            size = 0
+    if lines:
+        yield "".join(lines).encode()
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 1) -> Iterator[bytes]:
+    """
+    Compress stream of chunks in gzip format. Fast compression level is used by default
+    to keep up with the producer of the stream.
+    """
+    compressor = zlib.compressobj(level, wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def _tsv_escape(value: Any) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, bytes):
+        value = value.decode()
+    return str(value).translate(_TSV_ESCAPES)
+
+
+def _to_str(line: Line) -> str:
+    return line.decode(errors="replace") if isinstance(line, bytes) else line
+
+
+def _split_json(line: Line) -> List[Any]:
+    try:
+        values = json.loads(line)
+    except ValueError:
+        # ClickHouse appends exception text to the response if query fails
+        # after sending of the result has been started
+        raise RuntimeError(
+            f"Unexpected data in query result stream: {_to_str(line)}"
+        ) from None
+    if not isinstance(values, list):
+        raise RuntimeError(f"Unexpected data in query result stream: {_to_str(line)}")
+    return values
+
+
+def _split_tsv(line: Line) -> List[str]:
+    return _to_str(line).rstrip("\r\n").split("\t")
+
+
+def _unwrap(column_type: ColumnType) -> ColumnType:
+    while column_type.name in _WRAPPER_TYPES:
+        column_type = column_type.param_type(0)
+    return column_type
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def _json_decoder(column_type: ColumnType, quote_64bit_integers: bool) -> Decoder:
+    """
+    Return function converting JSON value of the specified type. 64-bit and wider
+    integers are quoted by ClickHouse in JSON formats and need to be converted back
+    unless `quote_64bit_integers` is set.
+    """
+    column_type = _unwrap(column_type)
+    name = column_type.name
+
+    if name in _INTEGER_TYPES and not quote_64bit_integers:
+        return lambda value: None if value is None else int(value)
+
+    if name == "Array":
+        item = _json_decoder(column_type.param_type(0), quote_64bit_integers)
+        if item is _identity:
+            return _identity
+        return lambda value: None if value is None else [item(v) for v in value]
+
+    if name == "Map":
+        item = _json_decoder(column_type.param_type(1), quote_64bit_integers)
+        if item is _identity:
+            return _identity
+        return lambda value: {k: item(v) for k, v in value.items()}
+
+    if name == "Tuple":
+        elements = [
+            _json_decoder(t, quote_64bit_integers) for t in column_type.element_types()
+        ]
+        return lambda value: tuple(decode(v) for decode, v in zip(elements, value))
+
+    if name == "SimpleAggregateFunction":
+        return _json_decoder(column_type.param_type(1), quote_64bit_integers)
+
+    return _identity
+
+
+def _tsv_decoder(column_type: ColumnType, quote_64bit_integers: bool) -> Decoder:
+    """
+    Return function converting TSV field of the specified type. Only scalar types are
+    converted, values of composite types are returned as text.
+    """
+    column_type = _unwrap(column_type)
+    name = column_type.name
+
+    if name == "SimpleAggregateFunction":
+        return _tsv_decoder(column_type.param_type(1), quote_64bit_integers)
+
+    convert: Decoder = _tsv_unescape
+    if quote_64bit_integers and name in _QUOTED_INTEGER_TYPES:
+        convert = _identity
+    elif name in _INTEGER_TYPES:
+        convert = int
+    elif name in _FLOAT_TYPES:
+        convert = float
+    elif name == "Bool":
+        convert = _tsv_bool
+
+    return lambda value: None if value == "\\N" else convert(value)
+
+
+def _tsv_bool(value: str) -> bool:
+    return value == "true"
+
+
+def _tsv_unescape(value: str) -> str:
+    if "\\" not in value:
+        return value
+
+    result = []
+    i = 0
+    while i < len(value):
+        char = value[i]
+        if char == "\\" and i + 1 < len(value):
+            i += 1
+            char = _TSV_UNESCAPES.get(value[i], value[i])
+        result.append(char)
+        i += 1
+    return "".join(result)
@@ -1,3 +1,4 @@
+import threading
 from typing import Any
 
 from click import Context
@@ -15,9 +16,15 @@ __all__ = [
 ]
 
 
+# Guards lazy initialization of the config shared by concurrently executed commands
+_config_lock = threading.Lock()
+
+
 def get_clickhouse_config(ctx: Context) -> ClickhouseConfig:
     if "clickhouse_config" not in ctx.obj:
-        ctx.obj["clickhouse_config"] = ClickhouseConfig.load()
+        with _config_lock:
+            if "clickhouse_config" not in ctx.obj:
+                ctx.obj["clickhouse_config"] = ClickhouseConfig.load()
 
     return ctx.obj["clickhouse_config"]
 
@@ -1,34 +1,157 @@
+import hashlib
+import json
 import os.path
+import threading
 from copy import deepcopy
-from typing import Any, MutableMapping
+from typing import Any, Dict, List, MutableMapping, NamedTuple, Optional, Tuple
 
 import xmltodict
 
 from ch_tools.common.utils import first_value
 
+# Identity of a file the config was read from: mtime in ns, size and inode, or None
+# if the file does not exist
+FileStat = Optional[List[int]]
+
+
+class _ParsedConfig(NamedTuple):
+    # Paths and stats of files in the order of reading, the include file is the last
+    files: List[Tuple[str, FileStat]]
+    config: Any
+
+
+# Parsed configs by path of the main config file and name of the overrides directory
+_cache: Dict[Tuple[str, str], _ParsedConfig] = {}
+_cache_lock = threading.Lock()
+_disk_cache_dir: Optional[str] = None
+
+
+def set_disk_cache_dir(path: Optional[str]) -> None:
+    """
+    Enable persistent cache of parsed configs in the directory, or disable it if None.
+
+    The cache lets short-lived processes skip parsing of XML files. As configs contain
+    secrets, the directory and cache files are accessible only to the current user.
+    """
+    global _disk_cache_dir  # pylint: disable=global-statement
+    _disk_cache_dir = path
+
 
 def load_config(config_path: str, configd_dir: str = "config.d") -> Any:
     """
     Load ClickHouse config file.
+
+    Parsed configs are cached until any of the files they are read from changes.
+    The returned config is shared between callers and must not be modified.
     """
-    # Load main config file.
-    config = _load_config(config_path)
+    key = (config_path, configd_dir)
+    paths = _list_config_files(config_path, configd_dir)
+    with _cache_lock:
+        parsed = _cache.get(key)
 
-    # Load config files from config.d/ directory.
+    if parsed is None or not _is_actual(parsed, paths):
+        parsed = _load_disk_cache(key)
+        if parsed is None or not _is_actual(parsed, paths):
+            parsed = _parse_config(paths)
+            _save_disk_cache(key, parsed)
+        with _cache_lock:
+            _cache[key] = parsed
+
+    return parsed.config
+
+
+def _list_config_files(config_path: str, configd_dir: str) -> List[str]:
+    paths = [config_path]
     configd_path = os.path.join(os.path.dirname(config_path), configd_dir)
     if os.path.exists(configd_path):
         for file in os.listdir(configd_path):
-            file_path = os.path.join(configd_path, file)
-            _merge_configs(config, _load_config(file_path))
+            paths.append(os.path.join(configd_path, file))
+    return paths
+
+
+def _parse_config(paths: List[str]) -> _ParsedConfig:
+    files: List[Tuple[str, FileStat]] = []
+
+    def _read(path: str) -> Any:
+        # Stat goes first, so a change during reading invalidates the result
+        files.append((path, _stat(path)))
+        return _load_config(path)
+
+    # Load main config file.
+    config = _read(paths[0])
+
+    # Load config files from config.d/ directory.
+    for file_path in paths[1:]:
+        _merge_configs(config, _read(file_path))
 
     # Process includes.
     root_section = first_value(config)
     include_file = root_section.get("include_from")
     if include_file:
-        include_config = first_value(_load_config(include_file))
+        include_config = first_value(_read(include_file))
         _apply_config_directives(root_section, include_config)
 
-    return config
+    return _ParsedConfig(files, config)
+
+
+def _is_actual(parsed: _ParsedConfig, paths: List[str]) -> bool:
+    if [path for path, _ in parsed.files[: len(paths)]] != paths:
+        return False
+    if len(parsed.files) > len(paths) + 1:
+        return False
+    return all(_stat(path) == stat for path, stat in parsed.files)
+
+
+def _stat(path: str) -> FileStat:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size, stat.st_ino]
+
+
+def _get_disk_cache_path(key: Tuple[str, str]) -> Optional[str]:
+    if not _disk_cache_dir:
+        return None
+    name = hashlib.sha256("\0".join(key).encode()).hexdigest()[:32]
+    return os.path.join(_disk_cache_dir, f"{name}.json")
+
+
+def _load_disk_cache(key: Tuple[str, str]) -> Optional[_ParsedConfig]:
+    path = _get_disk_cache_path(key)
+    if path is None:
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            # Do not trust the cache written by another user
+            if os.fstat(file.fileno()).st_uid != os.geteuid():
+                return None
+            data = json.load(file)
+        return _ParsedConfig(
+            [(str(file_path), stat) for file_path, stat in data["files"]],
+            data["config"],
+        )
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _save_disk_cache(key: Tuple[str, str], parsed: _ParsedConfig) -> None:
+    path = _get_disk_cache_path(key)
+    if path is None:
+        return
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            json.dump({"files": parsed.files, "config": parsed.config}, file)
+        os.replace(tmp_path, path)
+    except (OSError, TypeError, ValueError):
+        # The cache is an optimization, failure to write it is not an error
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
 
 
 def dump_config(
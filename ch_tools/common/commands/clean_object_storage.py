@@ -1,17 +1,38 @@
+import json
 import os
 import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from enum import Enum
-from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
 
 import click
 from click import Context
 from humanfriendly import format_size
 
 from ch_tools.chadmin.internal.object_storage import cleanup_s3_object_storage
+from ch_tools.chadmin.internal.object_storage.clean_checkpoint import CleanProgress
 from ch_tools.chadmin.internal.object_storage.obj_list_item import ObjListItem
-from ch_tools.chadmin.internal.object_storage.s3_iterator import (
-    s3_object_storage_iterator,
+from ch_tools.chadmin.internal.object_storage.orphaned_objects import (
+    OrphanedObjectsStats,
+    find_orphaned_objects,
+    spill_orphaned_objects,
+)
+from ch_tools.chadmin.internal.object_storage.s3_cleanup import ProgressCallback
+from ch_tools.chadmin.internal.object_storage.s3_listing import (
+    S3ListingPage,
+    S3ObjectSummary,
+    S3ParallelLister,
 )
 from ch_tools.chadmin.internal.system import match_ch_version
 from ch_tools.chadmin.internal.utils import (
@@ -26,14 +47,14 @@ from ch_tools.common.clickhouse.client.clickhouse_client import (
     clickhouse_client,
 )
 from ch_tools.common.clickhouse.client.query import Query
+from ch_tools.common.clickhouse.client.rows import JSON_ROWS_FORMAT, TSV_ROWS_FORMAT
 from ch_tools.common.clickhouse.config.clickhouse import ClickhousePort
 from ch_tools.common.clickhouse.config.storage_configuration import S3DiskConfiguration
 from ch_tools.monrun_checks.clickhouse_info import ClickhouseInfo
 
-# Batch size for inserts in a listing table
-# Set not very big value due to default ClickHouse 'http_max_field_value_size' settings value 128Kb
-# TODO: streaming upload in POST body while INSERT
-INSERT_BATCH_SIZE = 500
+# Max number of rows streamed to a listing table in a single INSERT query.
+# Listing checkpoint advances only when the query is completed.
+INSERT_BATCH_SIZE = 1000000
 # The guard interval is used for S3 objects for which metadata is not found.
 # And for metadata for which object is not found in S3.
 # These objects are not counted if their last modified time fall in the interval from the moment of starting analyzing.
@@ -53,17 +74,31 @@ class CleanScope(str, Enum):
     CLUSTER = "cluster"
 
 
+class AntijoinMode(str, Enum):
+    """
+    Define how orphaned objects are found.
+    """
+
+    # Listing is inserted into a table and joined with system.remote_data_paths
+    TABLE = "table"
+    # Sorted listing and remote data paths are merged on the client without tables
+    MERGE = "merge"
+
+
 def _create_object_listing_table(
     ctx: Context,
     table_name: str,
     replica_zk_prefix: str,
     storage_policy: str,
     recreate_table: bool,
+    partition_by: Optional[str] = None,
 ) -> None:
     if not recreate_table:
         _drop_table_on_shard(ctx, table_name)
 
-    _create_table_on_shard(ctx, table_name, replica_zk_prefix, storage_policy)
+    _create_table_on_shard(
+        ctx, table_name, replica_zk_prefix, storage_policy, partition_by
+    )
 
 
 def clean(
@@ -79,16 +114,40 @@ def clean(
     verify_paths_regex: Optional[str] = None,
     max_size_to_delete_bytes: int = 0,
     max_size_to_delete_fraction: float = 1.0,
+    resume_listing: bool = False,
+    antijoin_mode: AntijoinMode = AntijoinMode.TABLE,
+    antijoin_buckets: int = 1,
+    resume: bool = False,
 ) -> Tuple[int, int]:
     """
     Clean orphaned S3 objects.
     """
+    # pylint: disable=too-many-locals
     if from_time is not None and to_time < from_time:
         raise click.BadParameter(
             "'from_time' parameter must be greater than 'to_time'",
             param_hint="--from-time",
         )
 
+    if antijoin_mode == AntijoinMode.MERGE:
+        if use_saved_list or resume_listing or resume:
+            raise click.BadParameter(
+                "Saved lists and resuming are not supported without tables",
+                param_hint="--antijoin-mode",
+            )
+        return _clean_object_storage_merge(
+            ctx,
+            object_name_prefix,
+            from_time,
+            to_time,
+            clean_scope,
+            cluster_name,
+            dry_run,
+            verify_paths_regex,
+            max_size_to_delete_bytes,
+            max_size_to_delete_fraction,
+        )
+
     disk_conf: S3DiskConfiguration = ctx.obj["disk_configuration"]
     config = ctx.obj["config"]["object_storage"]["clean"]
 
@@ -100,22 +159,45 @@ def clean(
     ]
     storage_policy = config["storage_policy"]
 
+    prefix = _get_object_name_prefix(object_name_prefix, clean_scope, disk_conf)
+    progress = CleanProgress.load(
+        config["clean_checkpoint_path"],
+        disk_conf.name,
+        prefix,
+        clean_scope.value,
+        resume,
+    )
+    if progress.resumed:
+        use_saved_list = progress.checkpoint.listing_done
+        resume_listing = not use_saved_list
+        # Partitioning of the orphaned objects table depends on the number of buckets
+        antijoin_buckets = progress.checkpoint.antijoin_buckets
+    else:
+        progress.update(antijoin_buckets=antijoin_buckets)
+
     # Create listing table for storing paths from object storage.
     # Create orphaned objects for accumulating the result.
+    completed = False
     try:
         _create_object_listing_table(
             ctx,
             listing_table,
             listing_table_zk_path_prefix,
             storage_policy,
-            use_saved_list,
+            use_saved_list or resume_listing,
         )
         _create_object_listing_table(
             ctx,
             orphaned_objects_table,
             orphaned_objects_table_zk_path_prefix,
             storage_policy,
-            False,
+            progress.resumed,
+            # Partitions allow to drop rows of the failed bucket
+            (
+                _get_bucket_expression("obj_path", antijoin_buckets)
+                if antijoin_buckets > 1
+                else None
+            ),
         )
 
         deleted, total_size = _clean_object_storage(
@@ -132,11 +214,24 @@ def clean(
             verify_paths_regex,
             max_size_to_delete_bytes,
             max_size_to_delete_fraction,
+            resume_listing,
+            antijoin_buckets,
+            progress,
         )
+        progress.remove()
+        completed = True
     finally:
-        if not keep_paths:
+        if keep_paths:
+            pass
+        elif completed or not (resume and progress.enabled):
             _drop_table_on_shard(ctx, listing_table)
             _drop_table_on_shard(ctx, orphaned_objects_table)
+            # The checkpoint is not valid without the tables
+            progress.remove()
+        else:
+            logging.warning(
+                "Listing and orphaned objects tables are kept to resume the clean with --resume"
+            )
 
     return deleted, total_size
 
@@ -146,41 +241,72 @@ def _object_list_generator(
     table_name: str,
     query_settings: Dict[str, Any],
     timeout: Optional[int] = None,
+    start_after: Optional[str] = None,
 ) -> Callable:
+    # Objects are read in the order of paths to resume the deletion after the last deleted path
+    condition = f"WHERE obj_path > {_quote(start_after)}" if start_after else ""
 
     def obj_list_iterator() -> Iterator[ObjListItem]:
-        with ch_client.query(
-            f"SELECT obj_path, obj_size FROM {table_name}",
-            format_="TabSeparated",
+        for row in ch_client.iter_rows(
+            f"SELECT obj_path, obj_size FROM {table_name} {condition} ORDER BY obj_path",
+            format_=TSV_ROWS_FORMAT,
             timeout=timeout,
             settings=query_settings,
-            stream=True,
-        ) as resp:
-            for line in resp.iter_lines():
-                yield ObjListItem.from_tab_separated(line.decode().strip())
+        ):
+            yield ObjListItem(row["obj_path"], row["obj_size"])
 
     return obj_list_iterator
 
 
+def _get_orphaned_objects_stats_from_table(
+    ch_client: ClickhouseClient,
+    orphaned_objects_table: str,
+    listing_table: str,
+    paths_regex: str,
+    timeout: int,
+) -> Tuple[OrphanedObjectsStats, int]:
+    """
+    Return stats of orphaned objects and the size of listed objects computed by the server
+    in one query.
+    """
+    # Python re.match() matches only at the beginning of the path
+    not_matched = f"NOT match(obj_path, {_quote(f'^(?:{paths_regex})')})"
+    row = ch_client.query_json_data_first_row(
+        query=f"""
+            SELECT count(), sum(obj_size), countIf({not_matched}), anyIf(obj_path, {not_matched}),
+                (SELECT sum(obj_size) FROM {listing_table})
+            FROM {orphaned_objects_table}
+        """,
+        timeout=timeout,
+        settings={"receive_timeout": timeout, "max_execution_time": 0},
+        compact=True,
+    )
+    stats = OrphanedObjectsStats(int(row[0]), int(row[1]), int(row[2]), row[3] or None)
+    return stats, int(row[4])
+
+
+def _get_verify_paths_regex(
+    ctx: Context, verify_paths_regex: Optional[str], clean_scope: CleanScope
+) -> str:
+    if verify_paths_regex:
+        return verify_paths_regex
+    return ctx.obj["config"]["object_storage"]["clean"]["verify_paths_regex"][
+        clean_scope
+    ]
+
+
 def _sanity_check_before_cleanup(
     ctx: Context,
-    orphaned_objects_iterator: Callable,
+    stats: OrphanedObjectsStats,
     ch_client: ClickhouseClient,
     listing_size_in_bucket: int,
     remote_data_paths_table: str,
-    verify_paths_regex: Optional[str],
-    clean_scope: CleanScope,
+    paths_regex: str,
 ) -> None:
 
     size_error_rate_threshold_fraction = ctx.obj["config"]["object_storage"]["clean"][
         "verify_size_error_rate_threshold_fraction"
     ]
-    if verify_paths_regex:
-        paths_regex = verify_paths_regex
-    else:
-        paths_regex = ctx.obj["config"]["object_storage"]["clean"][
-            "verify_paths_regex"
-        ][clean_scope]
 
     remote_data_paths_query_settings = (
         {"traverse_shadow_remote_data_paths": 1}
@@ -191,27 +317,18 @@ def _sanity_check_before_cleanup(
     def perform_check_paths() -> None:
         ### Compare path from system.remote_data_path and from list to delete. They must match the regex.
         ### Perform such check to prevent silly mistakes if the paths are completely different.
-        ch_objects_cnt = int(
-            ch_client.query_json_data_first_row(
-                query=Query(
-                    f"SELECT count() FROM {remote_data_paths_table}",
-                    sensitive_args={"user_password": ch_client.password or ""},
-                ),
-                settings=remote_data_paths_query_settings,
-                compact=True,
-            )[0]
-        )
-        ## Nothing to check
-        if ch_objects_cnt == 0:
-            return
-        path_form_ch = ch_client.query_json_data_first_row(
+        rows = ch_client.query_json_data(
             query=Query(
                 f"SELECT remote_path FROM {remote_data_paths_table} LIMIT 1",
                 sensitive_args={"user_password": ch_client.password or ""},
             ),
             settings=remote_data_paths_query_settings,
             compact=True,
-        )[0]
+        )
+        ## Nothing to check
+        if not rows:
+            return
+        path_form_ch = rows[0][0]
 
         if not re.match(paths_regex, path_form_ch):
             raise RuntimeError(
@@ -220,19 +337,16 @@ def _sanity_check_before_cleanup(
                 )
             )
 
-        for orphaned_object in orphaned_objects_iterator():
-            if not re.match(paths_regex, orphaned_object.path):
-                raise RuntimeError(
-                    "Sanity check not passed, because orphaned object({}) doesn't matches the regex({}).".format(
-                        orphaned_object.path, paths_regex
-                    )
+        if stats.mismatched_count:
+            raise RuntimeError(
+                "Sanity check not passed, because orphaned object({}) doesn't matches the regex({}).".format(
+                    stats.mismatched_path, paths_regex
                 )
+            )
 
     def perform_check_size() -> None:
         ### Total size of objects after cleanup must be very close to sum(bytes) FROM system.remote_data_paths
-        size_to_delete = 0
-        for orphaned_object in orphaned_objects_iterator():
-            size_to_delete += orphaned_object.size
+        size_to_delete = stats.total_size
         if (
             listing_size_in_bucket * size_error_rate_threshold_fraction
             <= size_to_delete
@@ -266,62 +380,33 @@ def _clean_object_storage(
     verify_paths_regex: Optional[str] = None,
     max_size_to_delete_bytes: int = 0,
     max_size_to_delete_fraction: float = 1.0,
+    resume_listing: bool = False,
+    antijoin_buckets: int = 1,
+    progress: Optional[CleanProgress] = None,
 ) -> Tuple[int, int]:
     """
     Delete orphaned objects from object storage.
+
+    Completed steps are saved to the checkpoint, so the interrupted clean continues
+    from the step it was interrupted at.
     """
     disk_conf: S3DiskConfiguration = ctx.obj["disk_configuration"]
-    prefix = object_name_prefix or _get_default_object_name_prefix(
-        clean_scope, disk_conf
-    )
-    prefix = os.path.join(prefix, "")
+    prefix = _get_object_name_prefix(object_name_prefix, clean_scope, disk_conf)
 
     if not use_saved_list:
         logging.info(
             f"Collecting objects... (Disk: '{disk_conf.name}', Endpoint '{disk_conf.endpoint_url}', Bucket: '{disk_conf.bucket_name}', Prefix: '{prefix}')",
         )
-        _traverse_object_storage(ctx, listing_table, from_time, to_time, prefix)
-
-    ch_client = clickhouse_client(ctx)
-    user_name = ch_client.user or ""
-    user_password = ch_client.password or ""
-
-    remote_data_paths_table = "system.remote_data_paths"
-
-    if clean_scope == CleanScope.CLUSTER:
-        remote_data_paths_table = (
-            f"clusterAllReplicas('{cluster_name}', {remote_data_paths_table})"
+        _traverse_object_storage(
+            ctx, listing_table, from_time, to_time, prefix, resume_listing
         )
-    elif clean_scope == CleanScope.SHARD:
-        #  It is believed that all hosts in shard have the same port set, so check current for tcp port
-        if ch_client.check_port(ClickhousePort.TCP_SECURE):
-            remote_clause = "remoteSecure"
-        elif ch_client.check_port(ClickhousePort.TCP):
-            remote_clause = "remote"
-        else:
-            raise RuntimeError(
-                "For using remote() table function tcp port must be defined"
-            )
-
-        replicas = ",".join(ClickhouseInfo.get_replicas(ctx))
-        remote_data_paths_table = f"{remote_clause}('{replicas}', {remote_data_paths_table}, '{user_name}', '{{user_password}}')"
+    if progress:
+        progress.update(listing_done=True)
 
-    settings = ""
-    if match_ch_version(ctx, min_version="24.3"):
-        settings = "SETTINGS traverse_shadow_remote_data_paths=1"
-
-    antijoin_query = Query(
-        f"""
-        INSERT INTO {orphaned_objects_table}
-            SELECT obj_path, obj_size FROM {listing_table} AS object_storage
-            LEFT ANTI JOIN {remote_data_paths_table} AS object_table
-            ON object_table.remote_path = object_storage.obj_path
-                    AND object_table.disk_name = '{disk_conf.name}'
-        {settings}
-    """,
-        sensitive_args={"user_password": user_password},
+    ch_client = clickhouse_client(ctx)
+    remote_data_paths_table = _get_remote_data_paths_table(
+        ctx, ch_client, clean_scope, cluster_name
     )
-    logging.info("Antijoin query: {}", str(antijoin_query))
 
     if dry_run:
         logging.info("Counting orphaned objects...")
@@ -330,60 +415,343 @@ def _clean_object_storage(
 
     timeout = ctx.obj["config"]["object_storage"]["clean"]["antijoin_timeout"]
     query_settings = {"receive_timeout": timeout, "max_execution_time": 0}
-    execute_query(
+    if progress and progress.checkpoint.antijoin_done:
+        logging.info("Antijoin is completed by the previous run")
+    else:
+        _find_orphaned_objects_in_table(
+            ctx,
+            ch_client,
+            listing_table,
+            orphaned_objects_table,
+            remote_data_paths_table,
+            antijoin_buckets,
+            query_settings,
+            progress,
+        )
+        if progress:
+            progress.update(antijoin_done=True)
+    orphaned_objects_iterator = _object_list_generator(
+        ch_client,
+        orphaned_objects_table,
+        query_settings,
+        timeout,
+        progress.checkpoint.last_deleted_key if progress else None,
+    )
+    stats, listing_size_in_bucket = _get_orphaned_objects_stats_from_table(
+        ch_client,
+        orphaned_objects_table,
+        listing_table,
+        _get_verify_paths_regex(ctx, verify_paths_regex, clean_scope),
+        timeout,
+    )
+
+    return _delete_orphaned_objects(
         ctx,
-        antijoin_query,
-        timeout=timeout,
-        settings=query_settings,
+        orphaned_objects_iterator,
+        stats,
+        ch_client,
+        listing_size_in_bucket,
+        remote_data_paths_table,
+        clean_scope,
+        prefix,
+        dry_run,
+        verify_paths_regex,
+        max_size_to_delete_bytes,
+        max_size_to_delete_fraction,
+        progress,
     )
-    orphaned_objects_iterator = _object_list_generator(
-        ch_client, orphaned_objects_table, query_settings, timeout
+
+
+def _find_orphaned_objects_in_table(
+    ctx: Context,
+    ch_client: ClickhouseClient,
+    listing_table: str,
+    orphaned_objects_table: str,
+    remote_data_paths_table: str,
+    buckets: int,
+    query_settings: Dict[str, Any],
+    progress: Optional[CleanProgress] = None,
+) -> None:
+    """
+    Insert objects of the listing table that are not referenced by remote data paths
+    into the orphaned objects table.
+
+    If more than one bucket is requested, objects are split into buckets by the hash
+    of the path, and the anti-join is executed for every bucket separately, so
+    the hash table of referenced paths contains only paths of one bucket at a time.
+    Every bucket is inserted into its own partition of the orphaned objects table,
+    so the failed bucket is retried after dropping its partially inserted rows.
+    Buckets completed by the interrupted run are skipped.
+    """
+    disk_conf: S3DiskConfiguration = ctx.obj["disk_configuration"]
+    config = ctx.obj["config"]["object_storage"]["clean"]
+    settings = _get_remote_data_paths_settings_clause(ctx)
+    resumed = progress is not None and progress.resumed
+
+    if buckets == 1:
+        if resumed:
+            # Drop objects inserted by the interrupted antijoin
+            execute_query(ctx, f"TRUNCATE TABLE {orphaned_objects_table}", format_=None)
+        antijoin_query = Query(
+            f"""
+            INSERT INTO {orphaned_objects_table}
+                SELECT obj_path, obj_size FROM {listing_table} AS object_storage
+                LEFT ANTI JOIN {remote_data_paths_table} AS object_table
+                ON object_table.remote_path = object_storage.obj_path
+                        AND object_table.disk_name = '{disk_conf.name}'
+            {settings}
+        """,
+            sensitive_args={"user_password": ch_client.password or ""},
+        )
+        logging.info("Antijoin query: {}", str(antijoin_query))
+        execute_query(
+            ctx,
+            antijoin_query,
+            timeout=query_settings["receive_timeout"],
+            settings=query_settings,
+        )
+        return
+
+    remote_path_bucket = _get_bucket_expression("remote_path", buckets)
+    obj_path_bucket = _get_bucket_expression("obj_path", buckets)
+
+    def _antijoin_bucket(bucket: int) -> None:
+        antijoin_query = Query(
+            f"""
+            INSERT INTO {orphaned_objects_table}
+                SELECT obj_path, obj_size FROM {listing_table} AS object_storage
+                LEFT ANTI JOIN (
+                    SELECT remote_path FROM {remote_data_paths_table}
+                    WHERE disk_name = '{disk_conf.name}'
+                        AND {remote_path_bucket} = {bucket}
+                ) AS object_table
+                ON object_table.remote_path = object_storage.obj_path
+                WHERE {obj_path_bucket} = {bucket}
+            {settings}
+        """,
+            sensitive_args={"user_password": ch_client.password or ""},
+        )
+        for attempt in range(config["antijoin_bucket_retries"] + 1):
+            if attempt:
+                logging.warning(
+                    "Retrying antijoin of bucket {}/{}, attempt {}",
+                    bucket + 1,
+                    buckets,
+                    attempt + 1,
+                )
+            if attempt or resumed:
+                execute_query(
+                    ctx,
+                    f"ALTER TABLE {orphaned_objects_table} DROP PARTITION {bucket}",
+                    format_=None,
+                )
+            try:
+                logging.debug("Antijoin query: {}", str(antijoin_query))
+                execute_query(
+                    ctx,
+                    antijoin_query,
+                    timeout=query_settings["receive_timeout"],
+                    settings=query_settings,
+                )
+                logging.info("Antijoin of bucket {}/{} is done", bucket + 1, buckets)
+                if progress:
+                    progress.bucket_done(bucket)
+                return
+            except Exception as e:
+                if attempt == config["antijoin_bucket_retries"]:
+                    raise
+                logging.warning(
+                    "Antijoin of bucket {}/{} failed: {!r}", bucket + 1, buckets, e
+                )
+
+    done_buckets = set(progress.checkpoint.done_buckets) if progress else set()
+    pending_buckets = [b for b in range(buckets) if b not in done_buckets]
+    logging.info("Running antijoin in {} of {} buckets", len(pending_buckets), buckets)
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(config["antijoin_parallelism"], buckets))
+    ) as executor:
+        # Consume results to raise the first error
+        list(executor.map(_antijoin_bucket, pending_buckets))
+
+
+def _quote(value: str) -> str:
+    return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+def _get_bucket_expression(column: str, buckets: int) -> str:
+    return f"cityHash64({column}) % {buckets}"
+
+
+def _clean_object_storage_merge(
+    ctx: Context,
+    object_name_prefix: str,
+    from_time: Optional[timedelta],
+    to_time: timedelta,
+    clean_scope: CleanScope,
+    cluster_name: str,
+    dry_run: bool,
+    verify_paths_regex: Optional[str] = None,
+    max_size_to_delete_bytes: int = 0,
+    max_size_to_delete_fraction: float = 1.0,
+) -> Tuple[int, int]:
+    """
+    Delete orphaned objects from object storage without creating tables.
+
+    Listing of the bucket and remote data paths sorted by ClickHouse are merged
+    side by side, so memory consumption doesn't depend on the number of objects.
+    Orphaned objects are spilled to a local temporary file to be checked before
+    the deletion.
+    """
+    disk_conf: S3DiskConfiguration = ctx.obj["disk_configuration"]
+    config = ctx.obj["config"]["object_storage"]["clean"]
+    prefix = _get_object_name_prefix(object_name_prefix, clean_scope, disk_conf)
+    ch_client = clickhouse_client(ctx)
+    remote_data_paths_table = _get_remote_data_paths_table(
+        ctx, ch_client, clean_scope, cluster_name
     )
-    listing_size_in_bucket = int(
-        ch_client.query_json_data_first_row(
-            query=f"SELECT sum(obj_size) FROM {listing_table}",
-            compact=True,
-        )[0]
+
+    remote_paths_query = Query(
+        f"""
+        SELECT remote_path FROM {remote_data_paths_table}
+        WHERE disk_name = '{disk_conf.name}' AND startsWith(remote_path, '{prefix}')
+        ORDER BY remote_path
+        {_get_remote_data_paths_settings_clause(ctx)}
+    """,
+        sensitive_args={"user_password": ch_client.password or ""},
+    )
+    logging.info("Remote data paths query: {}", str(remote_paths_query))
+
+    timeout = config["antijoin_timeout"]
+    # Text of exception appended to the response by a failed query would be a valid
+    # row of single column TSV and end referenced paths early. It is rejected in JSON.
+    remote_paths = (
+        row["remote_path"]
+        for row in ch_client.iter_rows(
+            remote_paths_query,
+            format_=JSON_ROWS_FORMAT,
+            timeout=timeout,
+            settings={
+                "receive_timeout": timeout,
+                "send_timeout": timeout,
+                "max_execution_time": 0,
+            },
+        )
     )
 
-    if ctx.obj["config"]["object_storage"]["clean"]["verify"]:
-        _sanity_check_before_cleanup(
+    logging.info(
+        f"Collecting objects... (Disk: '{disk_conf.name}', Endpoint '{disk_conf.endpoint_url}', Bucket: '{disk_conf.bucket_name}', Prefix: '{prefix}')",
+    )
+    lister = S3ParallelLister(
+        disk_conf, prefix, workers=config["listing_workers"], ordered=True
+    )
+    is_in_interval = _get_interval_filter(from_time, to_time)
+    listing_size_in_bucket = 0
+
+    def _listed_objects() -> Iterator[ObjListItem]:
+        nonlocal listing_size_in_bucket
+        for page in lister.iter_pages():
+            for obj in page.objects:
+                if is_in_interval(obj):
+                    listing_size_in_bucket += obj.size
+                    yield ObjListItem(obj.key, obj.size)
+
+    with tempfile.TemporaryFile("w+", encoding="utf-8") as orphaned_objects_file:
+        stats = spill_orphaned_objects(
+            find_orphaned_objects(_listed_objects(), remote_paths),
+            orphaned_objects_file,
+            _get_verify_paths_regex(ctx, verify_paths_regex, clean_scope),
+        )
+
+        def _orphaned_objects_iterator() -> Iterator[ObjListItem]:
+            orphaned_objects_file.seek(0)
+            for line in orphaned_objects_file:
+                path, size = json.loads(line)
+                yield ObjListItem(path, size)
+
+        if dry_run:
+            logging.info("Counting orphaned objects...")
+        else:
+            logging.info("Deleting orphaned objects...")
+
+        return _delete_orphaned_objects(
             ctx,
-            orphaned_objects_iterator,
+            _orphaned_objects_iterator,
+            stats,
             ch_client,
             listing_size_in_bucket,
             remote_data_paths_table,
-            verify_paths_regex,
             clean_scope,
+            prefix,
+            dry_run,
+            verify_paths_regex,
+            max_size_to_delete_bytes,
+            max_size_to_delete_fraction,
         )
 
-    deleted, total_size = 0, 0
+
+def _delete_orphaned_objects(
+    ctx: Context,
+    orphaned_objects_iterator: Callable,
+    stats: OrphanedObjectsStats,
+    ch_client: ClickhouseClient,
+    listing_size_in_bucket: int,
+    remote_data_paths_table: str,
+    clean_scope: CleanScope,
+    prefix: str,
+    dry_run: bool,
+    verify_paths_regex: Optional[str],
+    max_size_to_delete_bytes: int,
+    max_size_to_delete_fraction: float,
+    progress: Optional[CleanProgress] = None,
+) -> Tuple[int, int]:
+    """
+    Check stats of orphaned objects and delete them within the size limits.
+
+    Orphaned objects are read only once by the deletion, after the check is passed.
+    If the progress is passed, objects deleted by the interrupted run are counted
+    in the limits and the result.
+    """
+    disk_conf: S3DiskConfiguration = ctx.obj["disk_configuration"]
+    config = ctx.obj["config"]["object_storage"]["clean"]
+    if config["verify"]:
+        _sanity_check_before_cleanup(
+            ctx,
+            stats,
+            ch_client,
+            listing_size_in_bucket,
+            remote_data_paths_table,
+            _get_verify_paths_regex(ctx, verify_paths_regex, clean_scope),
+        )
 
     max_size_to_delete = listing_size_in_bucket * max_size_to_delete_fraction
     if max_size_to_delete_bytes:
         max_size_to_delete = min(max_size_to_delete, max_size_to_delete_bytes)
 
-    for objects in chunked(orphaned_objects_iterator(), KEYS_BATCH_SIZE):
-        batch_size = sum(obj.size for obj in objects)
-        is_last_batch = False
-
-        if total_size + batch_size > max_size_to_delete:
-            # To fit into the size restriction: sort all objects by size
-            # And remove elements from the end;
-            is_last_batch = True
-            objects = sorted(objects, key=lambda obj: obj.size)
-            while total_size + batch_size > max_size_to_delete:
-                batch_size -= objects[-1].size
-                objects.pop()
-
-        chunk_deleted, chunk_size = cleanup_s3_object_storage(
-            disk_conf, iter(objects), dry_run
+    deleted, total_size = 0, 0
+    if progress:
+        deleted, total_size = (
+            progress.checkpoint.deleted,
+            progress.checkpoint.deleted_size,
         )
-        deleted += chunk_deleted
-        total_size += chunk_size
+    objects = _limit_total_size(
+        orphaned_objects_iterator(), max_size_to_delete - total_size
+    )
 
-        if is_last_batch:
-            break
+    on_progress = None
+    if progress and not dry_run:
+        on_progress = _checkpoint_deletion(progress)
+
+    run_deleted, run_total_size = cleanup_s3_object_storage(
+        disk_conf,
+        objects,
+        dry_run,
+        workers=config["delete_workers"],
+        max_requests_per_second=config["delete_max_requests_per_second"],
+        max_bytes_per_second=config["delete_max_bytes_per_second"],
+        on_progress=on_progress,
+    )
+    deleted += run_deleted
+    total_size += run_total_size
 
     logging.info(
         f"{'Would delete' if dry_run else 'Deleted'} {deleted} objects with total size {format_size(total_size, binary=True)} from bucket [{disk_conf.bucket_name}] with prefix {prefix}",
@@ -392,52 +760,177 @@ def _clean_object_storage(
     return deleted, total_size
 
 
+def _checkpoint_deletion(progress: CleanProgress) -> ProgressCallback:
+    """
+    Return callback advancing the checkpoint after every deleted chunk of objects.
+    Objects are deleted in order of keys, so the chunk and preceding ones are done.
+    """
+    deleted, deleted_size = (
+        progress.checkpoint.deleted,
+        progress.checkpoint.deleted_size,
+    )
+
+    def _update(chunks_deleted: int, chunks_size: int, last_key: str) -> None:
+        progress.update(
+            last_deleted_key=last_key,
+            deleted=deleted + chunks_deleted,
+            deleted_size=deleted_size + chunks_size,
+        )
+
+    return _update
+
+
+def _get_object_name_prefix(
+    object_name_prefix: str, clean_scope: CleanScope, disk_conf: S3DiskConfiguration
+) -> str:
+    prefix = object_name_prefix or _get_default_object_name_prefix(
+        clean_scope, disk_conf
+    )
+    return os.path.join(prefix, "")
+
+
+def _get_remote_data_paths_table(
+    ctx: Context,
+    ch_client: ClickhouseClient,
+    clean_scope: CleanScope,
+    cluster_name: str,
+) -> str:
+    """
+    Return table expression of remote data paths in the clean scope.
+    """
+    remote_data_paths_table = "system.remote_data_paths"
+
+    if clean_scope == CleanScope.CLUSTER:
+        remote_data_paths_table = (
+            f"clusterAllReplicas('{cluster_name}', {remote_data_paths_table})"
+        )
+    elif clean_scope == CleanScope.SHARD:
+        #  It is believed that all hosts in shard have the same port set, so check current for tcp port
+        if ch_client.check_port(ClickhousePort.TCP_SECURE):
+            remote_clause = "remoteSecure"
+        elif ch_client.check_port(ClickhousePort.TCP):
+            remote_clause = "remote"
+        else:
+            raise RuntimeError(
+                "For using remote() table function tcp port must be defined"
+            )
+
+        user_name = ch_client.user or ""
+        replicas = ",".join(ClickhouseInfo.get_replicas(ctx))
+        remote_data_paths_table = f"{remote_clause}('{replicas}', {remote_data_paths_table}, '{user_name}', '{{user_password}}')"
+
+    return remote_data_paths_table
+
+
+def _get_remote_data_paths_settings_clause(ctx: Context) -> str:
+    if match_ch_version(ctx, min_version="24.3"):
+        return "SETTINGS traverse_shadow_remote_data_paths=1"
+    return ""
+
+
+def _limit_total_size(
+    objects: Iterator[ObjListItem], max_size: float
+) -> Iterator[ObjListItem]:
+    """
+    Pass objects through while their total size fits into the limit.
+    """
+    total_size = 0
+    for batch in chunked(objects, KEYS_BATCH_SIZE):
+        batch_size = sum(obj.size for obj in batch)
+        if total_size + batch_size <= max_size:
+            total_size += batch_size
+            yield from batch
+            continue
+
+        # To fit into the size restriction: sort all objects by size
+        # And remove elements from the end;
+        batch = sorted(batch, key=lambda obj: obj.size)
+        while batch and total_size + batch_size > max_size:
+            batch_size -= batch[-1].size
+            batch.pop()
+        yield from batch
+        return
+
+
 def _traverse_object_storage(
     ctx: Context,
     listing_table: str,
     from_time: Optional[timedelta],
     to_time: timedelta,
     prefix: str,
+    resume: bool = False,
 ) -> None:
     """
     Traverse S3 disk's bucket and put object names to the ClickHouse table.
-    """
-    obj_paths_batch: List[ObjListItem] = []
-    counter = 0
-    now = datetime.now(timezone.utc)
-    for obj in s3_object_storage_iterator(
-        ctx.obj["disk_configuration"], object_name_prefix=prefix
-    ):
-        if obj.last_modified > now - to_time:
-            continue
-        if from_time is not None and obj.last_modified < now - from_time:
-            continue
 
-        obj_paths_batch.append(ObjListItem(obj.key, obj.size))
-        counter += 1
-        if len(obj_paths_batch) >= INSERT_BATCH_SIZE:
-            _insert_listing_batch(ctx, obj_paths_batch, listing_table)
-            obj_paths_batch.clear()
+    Key ranges of the bucket are listed concurrently. Processed pages are saved to
+    the checkpoint, so the interrupted listing can be resumed if the listing table is kept.
+    """
+    config = ctx.obj["config"]["object_storage"]["clean"]
+    lister = S3ParallelLister(
+        ctx.obj["disk_configuration"],
+        prefix,
+        workers=config["listing_workers"],
+        checkpoint_path=config["listing_checkpoint_path"],
+        resume=resume,
+    )
+    ch_client = clickhouse_client(ctx)
+    _is_in_interval = _get_interval_filter(from_time, to_time)
 
-    # Insert the last batch (might be shorter)
-    if obj_paths_batch:
-        _insert_listing_batch(ctx, obj_paths_batch, listing_table)
+    counter = 0
+    start_time = time.monotonic()
+    pages = lister.iter_pages()
+    exhausted = False
+    while not exhausted:
+        inserted_pages: List[S3ListingPage] = []
+
+        def _rows() -> Iterator[Tuple[str, int]]:
+            nonlocal exhausted
+            rows = 0
+            for page in pages:
+                inserted_pages.append(page)
+                for obj in page.objects:
+                    if _is_in_interval(obj):
+                        rows += 1
+                        yield obj.key, obj.size
+                if rows >= INSERT_BATCH_SIZE:
+                    return
+            exhausted = True
+
+        counter += ch_client.insert_rows(
+            listing_table,
+            _rows(),
+            ["obj_path", "obj_size"],
+            compress=config["listing_insert_compression"],
+        )
+        # Pages are saved to the checkpoint only after the query is completed
+        for page in inserted_pages:
+            lister.commit(page)
 
-    logging.info("Collected {} objects", counter)
+    lister.finish()
+    elapsed = time.monotonic() - start_time
+    logging.info(
+        "Collected {} objects in {:.1f}s ({:.0f} objects/s)",
+        counter,
+        elapsed,
+        counter / elapsed if elapsed else 0,
+    )
 
 
-def _insert_listing_batch(
-    ctx: Context, obj_paths_batch: List[ObjListItem], listing_table: str
-) -> None:
+def _get_interval_filter(
+    from_time: Optional[timedelta], to_time: timedelta
+) -> Callable[[S3ObjectSummary], bool]:
     """
-    Insert batch of object names to the listing table.
+    Return filter of objects modified within [now - from_time, now - to_time].
     """
-    batch_values = ",".join(f"('{item.path}',{item.size})" for item in obj_paths_batch)
-    execute_query(
-        ctx,
-        f"INSERT INTO {listing_table} (obj_path, obj_size) VALUES {batch_values}",
-        format_=None,
-    )
+    now = datetime.now(timezone.utc)
+
+    def _is_in_interval(obj: S3ObjectSummary) -> bool:
+        if obj.last_modified > now - to_time:
+            return False
+        return from_time is None or obj.last_modified >= now - from_time
+
+    return _is_in_interval
 
 
 def _drop_table_on_shard(ctx: Context, table_name: str) -> None:
@@ -445,17 +938,22 @@ def _drop_table_on_shard(ctx: Context, table_name: str) -> None:
 
 
 def _create_table_on_shard(
-    ctx: Context, table_name: str, table_zk_path_prefix: str, storage_policy: str
+    ctx: Context,
+    table_name: str,
+    table_zk_path_prefix: str,
+    storage_policy: str,
+    partition_by: Optional[str] = None,
 ) -> None:
     engine = (
         f"ReplicatedMergeTree('{table_zk_path_prefix}/{{shard}}/{table_name}', '{{replica}}')"
         if has_zk()
         else "MergeTree"
     )
+    partition_by_clause = f"PARTITION BY {partition_by}" if partition_by else ""
 
     execute_query_on_shard(
         ctx,
-        f"CREATE TABLE IF NOT EXISTS {table_name} (obj_path String, obj_size UInt64) ENGINE {engine} ORDER BY obj_path SETTINGS storage_policy = '{storage_policy}'",
+        f"CREATE TABLE IF NOT EXISTS {table_name} (obj_path String, obj_size UInt64) ENGINE {engine} {partition_by_clause} ORDER BY obj_path SETTINGS storage_policy = '{storage_policy}'",
         format_=None,
     )
 
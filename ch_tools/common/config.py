@@ -28,6 +28,14 @@ DEFAULT_CONFIG = {
         "user": None,
         "password": None,
         "settings": {},
+        # Persistent HTTP sessions reused across queries.
+        "http_pool": {
+            "pool_size": 10,
+            "keep_alive": True,
+            "idle_timeout": 60,
+        },
+        # Use in-process native protocol client for TCP ports instead of clickhouse-client.
+        "native_protocol": True,
         "monitoring_user": None,
         "monitoring_password": None,
         "distributed_ddl_path": "/clickhouse/task_queue/ddl",
@@ -43,6 +51,9 @@ DEFAULT_CONFIG = {
     },
     "object_storage": {
         "bucket_name_prefix": "cloud-storage-",
+        # SQLite database with blobs referenced by local metadata files of disks.
+        # If set, commands look up blobs in it instead of parsing all metadata files.
+        "blob_inventory_path": None,
         "clean": {
             "listing_table_prefix": "listing_objects_from_",
             "orphaned_objects_table_prefix": "orphaned_objects_",
@@ -52,6 +63,14 @@ DEFAULT_CONFIG = {
             "orphaned_objects_table_zk_path_prefix": "/_system/tables",
             "storage_policy": "default",
             "antijoin_timeout": 10 * 60,
+            # "table" or "merge", see --antijoin-mode of object-storage clean.
+            "antijoin_mode": "table",
+            # Number of buckets by hash of the path the antijoin is split into to bound
+            # memory consumption, see --antijoin-buckets of object-storage clean.
+            "antijoin_buckets": 1,
+            # Number of concurrently joined buckets and retries of the failed bucket.
+            "antijoin_parallelism": 1,
+            "antijoin_bucket_retries": 2,
             "verify": True,
             "verify_paths_regex": {
                 "host": r"^(\w+)/(\w+)/(\w+)/",
@@ -59,6 +78,20 @@ DEFAULT_CONFIG = {
                 "cluster": r"^(\w+)/(\w+)/",
             },
             "verify_size_error_rate_threshold_fraction": 0.9,
+            # Number of concurrently listed key ranges of the bucket.
+            "listing_workers": 8,
+            # Last listed keys are saved to resume interrupted listing with --resume-listing.
+            "listing_checkpoint_path": "/tmp/object_storage_listing_checkpoint.json",
+            # Completed steps of clean are saved to resume interrupted clean with --resume.
+            "clean_checkpoint_path": "/tmp/object_storage_clean_checkpoint.json",
+            # Compress object listing streamed to ClickHouse with gzip.
+            "listing_insert_compression": True,
+            # Number of concurrent DeleteObjects requests.
+            "delete_workers": 4,
+            # Limits of DeleteObjects requests and total size of deleted objects per second
+            # to protect the shared bucket. Zero means no limit.
+            "delete_max_requests_per_second": 0,
+            "delete_max_bytes_per_second": 0,
         },
     },
     "zookeeper": {
@@ -90,6 +123,8 @@ DEFAULT_CONFIG = {
                 "max_retries": 25,
             },
             "verify_zookeeper_zero_copy_path_regex": r"zero_copy",
+            # Max number of pipelined requests while traversing ZooKeeper tree.
+            "max_in_flight_requests": 100,
         },
     },
     "flamegraph": {
@@ -108,6 +143,9 @@ DEFAULT_CONFIG = {
     },
     # Monitoring settings. It applies to the both ch-monitoring and keeper-monitoring tools.
     "monitoring": {
+        # Directory to cache parsed ClickHouse configs between runs of checks, or None
+        # to disable the cache. Cached configs contain secrets.
+        "config_cache_dir": None,
         "output": {
             "escaping_rules": [
                 {
@@ -130,6 +168,7 @@ DEFAULT_CONFIG = {
             "watch_seconds": 600,
             "exclude": r"e\.displayText\(\) = No message received",
             "logfile": "/var/log/clickhouse-server/clickhouse-server.err.log",
+            "state_file": "/tmp/ch_log_errors_state.json",
         },
         "core-dumps": {
             "@disabled": False,
@@ -15,7 +15,7 @@ from logging import (  # noqa # pylint:disable=unused-import
     WARN,
     WARNING,
 )
-from typing import Any, Dict, Optional
+from typing import Any, ContextManager, Dict, Optional
 
 from loguru import logger
 
@@ -215,6 +215,13 @@ def getNativeLogger(name: str) -> logging.Logger:
     return logging.getLogger(name)
 
 
+def contextualize(**kwargs: Any) -> ContextManager:
+    """
+    Add extra values to records logged within the context by the current thread.
+    """
+    return logger.contextualize(**kwargs)
+
+
 def add(sink: Any, level: Any, format_: Any) -> None:
     """
     Add new log handler.
@@ -1,43 +1,165 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from dataclasses import dataclass
-from typing import Any, Callable, Dict, List
+from typing import Any, Callable, Deque, Dict, List, Optional
 
 from ch_tools.common import logging
 
+# Min interval in seconds between progress reports
+PROGRESS_REPORT_INTERVAL = 5
+
 
 @dataclass
 class WorkerTask:
     indeifier: str
     function: Callable
     kwargs: Dict[str, Any]
+    # Tasks of the same group are subject to the limit of concurrently executed tasks
+    group: Optional[str] = None
 
 
 def execute_tasks_in_parallel(
-    tasks: List[WorkerTask], max_workers: int = 4, keep_going: bool = False
+    tasks: List[WorkerTask],
+    max_workers: int = 4,
+    keep_going: bool = False,
+    limit_errors: Optional[int] = None,
+    max_tasks_per_group: Optional[int] = None,
+    report_progress: bool = False,
 ) -> Dict[str, Any]:
+    """
+    Execute tasks in a pool of threads and return results keyed by task identifiers.
+
+    Tasks are submitted to the pool only when there is a free worker and, if
+    `max_tasks_per_group` is set, the group of the task has less running tasks than
+    the limit. Groups are served in round-robin order.
+
+    On the first failed task without `keep_going`, or when the number of failed tasks
+    reaches `limit_errors`, no new tasks are started and the running ones are waited
+    for. Without `keep_going` the error is re-raised, otherwise exceptions of failed
+    tasks are returned as their results.
+    """
+    scheduler = _Scheduler(tasks, max_tasks_per_group)
+    futures: Dict[Future, WorkerTask] = {}
+    result: Dict[str, Any] = {}
+    progress = _Progress(len(tasks), report_progress)
+    error: Optional[Exception] = None
+    stopped = False
+
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Can't use map function here. The map method returns a generator
-        # and it is not possible to resume a generator after an exception occurs.
-        # https://peps.python.org/pep-0255/#specification-generators-and-exception-propagation
-        futures_to_indedifier = {
-            executor.submit(
-                task.function,
-                **task.kwargs,
-            ): task.indeifier
-            for task in tasks
-        }
-        result: Dict[str, Any] = {}
-        for future in as_completed(futures_to_indedifier):
-            idf = futures_to_indedifier[future]
-            try:
-                result[idf] = future.result()
-            except Exception as e:
-                if keep_going:
+        while True:
+            while not stopped and len(futures) < max_workers:
+                task = scheduler.next_task()
+                if task is None:
+                    break
+                futures[executor.submit(task.function, **task.kwargs)] = task
+
+            if not futures:
+                break
+
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                task = futures.pop(future)
+                scheduler.complete(task)
+                try:
+                    result[task.indeifier] = future.result()
+                    progress.task_completed()
+                except Exception as e:
+                    progress.task_failed()
+                    if not keep_going:
+                        error = error or e
+                        stopped = True
+                        continue
+
                     logging.warning(
-                        "Ignoring the exception due to while executing {} due to keep-going flag : {!r}",
-                        id,
+                        "Ignoring the exception while executing {} due to keep-going flag: {!r}",
+                        task.indeifier,
                         e,
                     )
-                else:
-                    raise
-        return result
+                    result[task.indeifier] = e
+                    if limit_errors and progress.failed >= limit_errors and not stopped:
+                        logging.info("Max number of errors reached.")
+                        stopped = True
+
+            progress.report()
+
+    progress.report(force=True)
+    if error:
+        raise error
+    return result
+
+
+class _Scheduler:
+    """
+    Queue of tasks that limits the number of running tasks per group.
+    """
+
+    def __init__(
+        self, tasks: List[WorkerTask], max_tasks_per_group: Optional[int]
+    ) -> None:
+        self._max_tasks_per_group = max_tasks_per_group
+        self._queues: Dict[Optional[str], Deque[WorkerTask]] = OrderedDict()
+        self._running: Dict[Optional[str], int] = {}
+        for task in tasks:
+            self._queues.setdefault(task.group, deque()).append(task)
+
+    def next_task(self) -> Optional[WorkerTask]:
+        """
+        Return the next task that can be started, or None if there is no such task.
+        """
+        for group in list(self._queues):
+            if not self._has_capacity(group):
+                continue
+            queue = self._queues.pop(group)
+            task = queue.popleft()
+            if queue:
+                # Move the group to the end of the queue to serve groups in turn
+                self._queues[group] = queue
+            self._running[group] = self._running.get(group, 0) + 1
+            return task
+        return None
+
+    def complete(self, task: WorkerTask) -> None:
+        self._running[task.group] -= 1
+
+    def _has_capacity(self, group: Optional[str]) -> bool:
+        if group is None or not self._max_tasks_per_group:
+            return True
+        return self._running.get(group, 0) < self._max_tasks_per_group
+
+
+class _Progress:
+    """
+    Counter of processed tasks that periodically logs the progress.
+    """
+
+    def __init__(self, total: int, enabled: bool) -> None:
+        self.total = total
+        self.completed = 0
+        self.failed = 0
+        self._enabled = enabled
+        self._start_time = time.monotonic()
+        self._last_report_time = self._start_time
+
+    def task_completed(self) -> None:
+        self.completed += 1
+
+    def task_failed(self) -> None:
+        self.failed += 1
+
+    def report(self, force: bool = False) -> None:
+        if not self._enabled:
+            return
+
+        now = time.monotonic()
+        if not force and now - self._last_report_time < PROGRESS_REPORT_INTERVAL:
+            return
+
+        self._last_report_time = now
+        logging.info(
+            "Progress: {}/{} tasks processed ({} failed) in {:.1f}s",
+            self.completed + self.failed,
+            self.total,
+            self.failed,
+            now - self._start_time,
+        )
@@ -0,0 +1,41 @@
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket limiting the rate of some resource consumption.
+
+    Tokens are refilled at `rate` per second up to `capacity` (one second of the rate
+    by default). Acquiring more tokens than available puts the bucket into debt, and
+    the caller sleeps until the debt is repaid, so large requests are allowed but
+    the average rate is kept. Zero rate means no limit.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None) -> None:
+        self._rate = rate
+        self._capacity = capacity or rate
+        self._tokens = self._capacity
+        self._last_time = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1) -> float:
+        """
+        Acquire tokens, blocking if needed. Return time spent waiting in seconds.
+        """
+        if not self._rate:
+            return 0
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self._capacity, self._tokens + (now - self._last_time) * self._rate
+            )
+            self._last_time = now
+            self._tokens -= amount
+            delay = -self._tokens / self._rate if self._tokens < 0 else 0
+
+        if delay:
+            time.sleep(delay)
+        return delay
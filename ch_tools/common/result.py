@@ -1,4 +1,5 @@
 import re
+from typing import Dict, List
 
 from click import Context
 
@@ -47,13 +48,21 @@ class Status:
 
     def report(self, ctx: Context) -> None:
         """Output formatted status message."""
+        print(
+            self.format_report(
+                ctx.obj["config"]["monitoring"]["output"]["escaping_rules"]
+            ),
+            end="",
+        )
+
+    def format_report(self, escaping_rules: List[Dict[str, str]]) -> str:
+        """Return status message in the output format of monitoring checks."""
         message = self.message
-        for rule in ctx.obj["config"]["monitoring"]["output"]["escaping_rules"]:
+        for rule in escaping_rules:
             message = re.sub(rule["pattern"], rule["replacement"], message)
 
-        print(f"{self.code};{message}")
-        if self.verbose:
-            for v in self.verbose:
-                if v:
-                    print("\n")
-                    print(v)
+        report = f"{self.code};{message}\n"
+        for v in self.verbose:
+            if v:
+                report += f"\n\n{v}\n"
+        return report
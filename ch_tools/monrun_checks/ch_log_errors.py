@@ -1,16 +1,30 @@
+"""
+Check errors in ClickHouse server logs.
+
+Errors are counted incrementally. A run saves the read offset and inode of the log file
+together with per-second error counts over the watch window into a state file, so the
+next run reads only lines appended since then. The log is scanned backwards within
+the watch window only if there is no usable state, e.g. on the first run.
+"""
+
+import glob
+import json
+import os
 import re
-from datetime import datetime, timedelta
-from typing import Any
+import time
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional
 
 import click
-from file_read_backwards import FileReadBackwards
 
+from ch_tools.common import logging
 from ch_tools.common.cli.parameters import RegexpParamType
 from ch_tools.common.result import CRIT, OK, WARNING, Result
 
 REGEXP = re.compile(
     r"^([0-9]{4}\.[0-9]{2}\.[0-9]{2}\ [0-9]{2}\:[0-9]{2}\:[0-9]{2}).*?<(Error|Fatal)>"
 )
+STATE_VERSION = 1
+READ_BLOCK_SIZE = 64 * 1024
 
 
 @click.command("log-errors")
@@ -36,26 +50,23 @@ REGEXP = re.compile(
     "logfile",
     help="Log file path.",
 )
+@click.option(
+    "--state-file",
+    "state_file",
+    help="Path to the file with the state of incremental counting.",
+)
 def log_errors_command(
-    crit: int, warn: int, watch_seconds: int, exclude: Any, logfile: str
+    crit: int,
+    warn: int,
+    watch_seconds: int,
+    exclude: Any,
+    logfile: str,
+    state_file: Optional[str],
 ) -> Result:
     """
     Check errors in ClickHouse server logs.
     """
-    datetime_start = datetime.now() - timedelta(seconds=watch_seconds)
-    errors = 0
-
-    with FileReadBackwards(logfile, encoding="utf-8") as f:
-        for line in f:
-            if exclude.search(line):
-                continue
-            match = REGEXP.match(line)
-            if match is None:
-                continue
-            date = match.group(1)
-            if datetime.strptime(date, "%Y.%m.%d %H:%M:%S") < datetime_start:
-                break
-            errors += 1
+    errors = count_errors(logfile, watch_seconds, exclude, state_file)
 
     msg = f"{errors} errors for last {watch_seconds} seconds"
     if errors >= crit:
@@ -63,3 +74,251 @@ def log_errors_command(
     if errors >= warn:
         return Result(WARNING, msg)
     return Result(OK, f"OK, {msg}")
+
+
+class ErrorCounter:
+    """
+    Ring buffer of per-second error counts for the last `size` seconds up to `last_time`.
+    """
+
+    def __init__(
+        self, size: int, last_time: int, counts: Optional[List[int]] = None
+    ) -> None:
+        self.size = size
+        self.last_time = last_time
+        self.counts = counts or [0] * size
+        self.total = sum(self.counts)
+
+    def add(self, timestamp: int) -> None:
+        if timestamp <= self.last_time - self.size:
+            return
+        self.advance(timestamp)
+        self.counts[timestamp % self.size] += 1
+        self.total += 1
+
+    def advance(self, timestamp: int) -> None:
+        """
+        Move the end of the window forward, dropping counts that leave the window.
+        """
+        if timestamp <= self.last_time:
+            return
+        for t in range(
+            self.last_time + 1, min(timestamp, self.last_time + self.size) + 1
+        ):
+            self.total -= self.counts[t % self.size]
+            self.counts[t % self.size] = 0
+        self.last_time = timestamp
+
+
+class _ErrorLineParser:
+    """
+    Return timestamps of not excluded error lines.
+
+    Timestamps are in local time. Instead of parsing the whole timestamp, the start of
+    every hour is converted once and minutes and seconds are added to it.
+    """
+
+    def __init__(self, exclude: Any) -> None:
+        self._exclude = exclude
+        self._hours: Dict[str, int] = {}
+
+    def parse(self, line: bytes) -> Optional[int]:
+        if b"<Error>" not in line and b"<Fatal>" not in line:
+            return None
+        text = line.decode("utf-8", errors="replace")
+        if self._exclude and self._exclude.search(text):
+            return None
+        match = REGEXP.match(text)
+        if match is None:
+            return None
+
+        date = match.group(1)
+        hour = self._hours.get(date[:13])
+        if hour is None:
+            hour = _get_hour_start(date)
+            self._hours[date[:13]] = hour
+        return hour + int(date[14:16]) * 60 + int(date[17:19])
+
+
+def _get_hour_start(date: str) -> int:
+    """
+    Return Unix time of the start of the hour of local time in "%Y.%m.%d %H" format.
+    """
+    year, month, day, hour = date[0:4], date[5:7], date[8:10], date[11:13]
+    return int(
+        time.mktime((int(year), int(month), int(day), int(hour), 0, 0, 0, 0, -1))
+    )
+
+
+def count_errors(
+    logfile: str,
+    watch_seconds: int,
+    exclude: Any,
+    state_file: Optional[str],
+    now: Optional[int] = None,
+) -> int:
+    """
+    Return the number of errors in the log for the last `watch_seconds` seconds.
+    """
+    now = int(time.time()) if now is None else now
+    parser = _ErrorLineParser(exclude)
+    exclude_pattern = exclude.pattern if exclude else None
+    state = _load_state(state_file) if state_file else None
+    if state is not None and not (
+        state["logfile"] == logfile
+        and state["exclude"] == exclude_pattern
+        and len(state["counts"]) == watch_seconds
+        # Reading the whole backlog is slower than the scan of the watch window
+        and now - watch_seconds < state["time"] <= now
+    ):
+        state = None
+
+    with open(logfile, "rb") as f:
+        stat = os.fstat(f.fileno())
+        if state is None:
+            counter = ErrorCounter(watch_seconds, now)
+            offset = _find_line_end(f, stat.st_size)
+            _count_backwards(f, offset, counter, parser)
+        else:
+            counter = ErrorCounter(watch_seconds, state["time"], state["counts"])
+            offset = state["offset"]
+            if state["inode"] != stat.st_ino:
+                _count_rotated(logfile, state["inode"], offset, counter, parser)
+                offset = 0
+            elif offset > stat.st_size:
+                # The log was truncated
+                offset = 0
+            offset = _count_appended(f, offset, counter, parser)
+
+    counter.advance(now)
+    if state_file:
+        _save_state(
+            state_file,
+            {
+                "version": STATE_VERSION,
+                "logfile": logfile,
+                "exclude": exclude_pattern,
+                "inode": stat.st_ino,
+                "offset": offset,
+                "time": counter.last_time,
+                "counts": counter.counts,
+            },
+        )
+    return counter.total
+
+
+def _count_appended(
+    f: BinaryIO, offset: int, counter: ErrorCounter, parser: _ErrorLineParser
+) -> int:
+    """
+    Count errors in complete lines after the offset and return the offset of their end.
+    """
+    f.seek(offset)
+    for line in f:
+        if not line.endswith(b"\n"):
+            break
+        offset += len(line)
+        timestamp = parser.parse(line)
+        if timestamp is not None:
+            counter.add(timestamp)
+    return offset
+
+
+def _count_backwards(
+    f: BinaryIO, end: int, counter: ErrorCounter, parser: _ErrorLineParser
+) -> None:
+    """
+    Count errors in lines before the end until the first error out of the window.
+    """
+    for line in _read_lines_backwards(f, end):
+        timestamp = parser.parse(line)
+        if timestamp is None:
+            continue
+        if timestamp <= counter.last_time - counter.size:
+            break
+        counter.add(timestamp)
+
+
+def _count_rotated(
+    logfile: str,
+    inode: int,
+    offset: int,
+    counter: ErrorCounter,
+    parser: _ErrorLineParser,
+) -> None:
+    """
+    Count errors appended to the previous log file after the last run if it was renamed
+    on rotation. Compressed logs are not read.
+    """
+    for path in glob.glob(f"{glob.escape(logfile)}.*"):
+        try:
+            if os.stat(path).st_ino != inode:
+                continue
+            with open(path, "rb") as f:
+                _count_appended(f, offset, counter, parser)
+            return
+        except OSError:
+            continue
+    logging.debug("Rotated log file of {} is not found", logfile)
+
+
+def _find_line_end(f: BinaryIO, size: int) -> int:
+    """
+    Return the offset after the last complete line.
+    """
+    position = size
+    while position > 0:
+        block_start = max(0, position - READ_BLOCK_SIZE)
+        f.seek(block_start)
+        block = f.read(position - block_start)
+        index = block.rfind(b"\n")
+        if index >= 0:
+            return block_start + index + 1
+        position = block_start
+    return 0
+
+
+def _read_lines_backwards(f: BinaryIO, end: int) -> Iterator[bytes]:
+    buffer = b""
+    position = end
+    while position > 0:
+        block_start = max(0, position - READ_BLOCK_SIZE)
+        f.seek(block_start)
+        buffer = f.read(position - block_start) + buffer
+        position = block_start
+        lines = buffer.split(b"\n")
+        buffer = lines[0]
+        yield from reversed(lines[1:])
+    yield buffer
+
+
+def _load_state(state_file: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(state_file, encoding="utf-8") as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logging.warning("Failed to load state of log-errors check: {!r}", e)
+        return None
+
+    if not isinstance(state, dict) or state.get("version") != STATE_VERSION:
+        return None
+    return state
+
+
+def _save_state(state_file: str, state: Dict[str, Any]) -> None:
+    """
+    Save the state atomically, so concurrent runs never read a partially written state.
+    """
+    tmp_file = f"{state_file}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(state, f, separators=(",", ":"))
+        os.replace(tmp_file, state_file)
+    except OSError as e:
+        logging.warning("Failed to save state of log-errors check: {!r}", e)
+        try:
+            os.remove(tmp_file)
+        except OSError:
+            pass
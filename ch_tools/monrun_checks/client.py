@@ -0,0 +1,75 @@
+"""
+Thin client of ch-monitoring daemon.
+
+Prints the cached result of a check served by `ch-monitoring daemon`. If the daemon is
+not running, has no fresh result or the check is invoked with options, the check is
+executed by ch-monitoring itself. The module uses only the standard library to keep
+the start of the client cheap.
+"""
+
+import importlib
+import json
+import os
+import socket
+import sys
+from typing import Optional
+
+DEFAULT_SOCKET_PATH = "/tmp/ch-monitoring.sock"
+SOCKET_PATH_ENV = "CH_MONITORING_SOCKET"
+# Max time in seconds to wait for the daemon response
+CLIENT_TIMEOUT = 2
+MAX_RESPONSE_SIZE = 1024 * 1024
+
+
+def get_socket_path() -> str:
+    return os.environ.get(SOCKET_PATH_ENV, DEFAULT_SOCKET_PATH)
+
+
+def query_daemon(check: str, socket_path: Optional[str] = None) -> Optional[str]:
+    """
+    Return output of the check cached by the daemon, or None if it is not available.
+    """
+    socket_path = socket_path or get_socket_path()
+    try:
+        # Do not trust the socket created by another user
+        if os.stat(socket_path).st_uid != os.geteuid():
+            return None
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(CLIENT_TIMEOUT)
+            sock.connect(socket_path)
+            sock.sendall(f"{check}\n".encode())
+            data = b""
+            while not data.endswith(b"\n") and len(data) < MAX_RESPONSE_SIZE:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                data += chunk
+
+        response = json.loads(data)
+    except (OSError, ValueError):
+        return None
+
+    output = response.get("output")
+    return output if isinstance(output, str) else None
+
+
+def main() -> None:
+    """
+    Program entry point.
+    """
+    args = sys.argv[1:]
+    output = None
+    if len(args) == 1 and not args[0].startswith("-"):
+        output = query_daemon(args[0])
+
+    if output is None:
+        # ch-monitoring is imported only when needed, it takes most of the start time
+        importlib.import_module("ch_tools.monrun_checks.main").main()
+        return
+
+    sys.stdout.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Resident mode of ch-monitoring.
+
+The daemon keeps ClickHouse client and parsed configs between runs of checks, runs each
+check on its own schedule and serves cached results over Unix socket to the thin client
+(see client.py). Protocol: the client sends a check name terminated by a new line,
+the daemon responds with a JSON object terminated by a new line, that contains either
+`output` of the check in the format of ch-monitoring or `error`.
+"""
+
+import heapq
+import json
+import os
+import signal
+import socketserver
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+
+import click
+
+from ch_tools.common import logging
+from ch_tools.common.check_runner import invoke_check
+from ch_tools.monrun_checks.client import get_socket_path
+from ch_tools.monrun_checks.status import get_commands
+
+DEFAULT_INTERVAL = 60
+DEFAULT_TTL = 180
+DEFAULT_MAX_WORKERS = 4
+MAX_REQUEST_SIZE = 1024
+
+
+class CachedResult(NamedTuple):
+    output: str
+    timestamp: float
+
+
+class MonitoringDaemon:
+    """
+    Scheduler of checks with the cache of their results.
+    """
+
+    def __init__(
+        self,
+        ctx: click.Context,
+        commands: List[click.Command],
+        intervals: Dict[str, float],
+        ttl: float,
+        max_workers: int,
+    ) -> None:
+        self._ctx = ctx
+        self._commands = {cmd.name or "": cmd for cmd in commands}
+        self._intervals = intervals
+        self._ttl = ttl
+        self._max_workers = max(1, max_workers)
+        self._escaping_rules = ctx.obj["config"]["monitoring"]["output"][
+            "escaping_rules"
+        ]
+        self._results: Dict[str, CachedResult] = {}
+        self._running: Set[str] = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def get(self, name: str) -> Optional[CachedResult]:
+        """
+        Return the result of the check if it is not older than TTL.
+        """
+        with self._lock:
+            result = self._results.get(name)
+        if result is None or time.time() - result.timestamp > self._ttl:
+            return None
+        return result
+
+    def run_scheduler(self) -> None:
+        """
+        Run checks on their schedules until stopped. Runs of the same check do not overlap.
+        """
+        schedule: List[Tuple[float, str]] = [
+            (time.monotonic(), name) for name in self._commands
+        ]
+        heapq.heapify(schedule)
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            while schedule and not self._stopped.is_set():
+                next_time, name = schedule[0]
+                delay = next_time - time.monotonic()
+                if delay > 0:
+                    self._stopped.wait(delay)
+                    continue
+
+                heapq.heapreplace(schedule, (next_time + self._intervals[name], name))
+                with self._lock:
+                    if name in self._running:
+                        logging.warning("Check {} is still running, skip", name)
+                        continue
+                    self._running.add(name)
+                executor.submit(self._run_check, name)
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def _run_check(self, name: str) -> None:
+        try:
+            result = invoke_check(self._ctx, self._commands[name])
+            output = result.status.format_report(self._escaping_rules)
+            with self._lock:
+                self._results[name] = CachedResult(output, time.time())
+            logging.debug("Check {} completed in {:.2f}s", name, result.elapsed)
+        finally:
+            with self._lock:
+                self._running.discard(name)
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    server: "_UnixServer"
+
+    def handle(self) -> None:
+        name = self.rfile.readline(MAX_REQUEST_SIZE).decode().strip()
+        result = self.server.daemon.get(name)
+        if result is not None:
+            response: Dict[str, Any] = {
+                "output": result.output,
+                "age": round(time.time() - result.timestamp, 3),
+            }
+        else:
+            response = {"error": f"no fresh result of check {name!r}"}
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, daemon: MonitoringDaemon) -> None:
+        self.daemon = daemon
+        super().__init__(socket_path, _RequestHandler)
+
+
+def serve(daemon: MonitoringDaemon, socket_path: str) -> None:
+    """
+    Run the scheduler and serve results over Unix socket until SIGTERM or SIGINT.
+    """
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+
+    old_umask = os.umask(0o177)
+    try:
+        server = _UnixServer(socket_path, daemon)
+    finally:
+        os.umask(old_umask)
+
+    def _stop(*_: Any) -> None:
+        daemon.stop()
+        # shutdown() waits for serve_forever() and can't be called from its thread
+        threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    scheduler = threading.Thread(target=daemon.run_scheduler, daemon=True)
+    scheduler.start()
+    logging.info("Serving check results on {}", socket_path)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.remove(socket_path)
+
+
+def daemon_command(command_names: List[str]) -> click.Command:
+    @click.command("daemon")
+    @click.option(
+        "--socket",
+        "socket_path",
+        default=get_socket_path,
+        help="Path to Unix socket to serve results on.",
+    )
+    @click.option(
+        "--interval",
+        type=float,
+        default=DEFAULT_INTERVAL,
+        help="Interval in seconds between runs of a check. "
+        "Can be overridden for a check with '@interval' setting.",
+    )
+    @click.option(
+        "--ttl",
+        type=float,
+        default=DEFAULT_TTL,
+        help="Max age in seconds of results served to clients.",
+    )
+    @click.option(
+        "--max-workers",
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        help="Max number of concurrently executed checks.",
+    )
+    @click.pass_context
+    def daemon_impl(
+        ctx: click.Context,
+        socket_path: str,
+        interval: float,
+        ttl: float,
+        max_workers: int,
+    ) -> None:
+        """
+        Run checks periodically and serve their results to ch-monitoring-client.
+        """
+        logging.configure(
+            ctx.obj["config"]["loguru"], "ch-monitoring", {"cmd_name": "daemon"}
+        )
+        # Checks are executed concurrently and log to the file only
+        logging.disable_stdout_logger()
+        config = ctx.obj["config"]["ch-monitoring"]
+        ctx.obj["status_mode"] = True
+        ctx.default_map = config
+
+        enabled_commands = get_commands(ctx, command_names)
+        intervals = {
+            cmd.name or "": config.get(cmd.name, {}).get("@interval", interval)
+            for cmd in enabled_commands
+        }
+        serve(
+            MonitoringDaemon(ctx, enabled_commands, intervals, ttl, max_workers),
+            socket_path,
+        )
+
+    return daemon_impl
@@ -1,4 +1,4 @@
-from requests import RequestException
+import sys
 
 from ch_tools.common.result import Status
 
@@ -16,7 +16,7 @@ def unknown_exception(exc: Exception, status: Status) -> Status:
     return status
 
 
-def requests_error(exc: RequestException, status: Status) -> Status:
+def requests_error(exc: Exception, status: Status) -> Status:
     status.append(f"ClickHouse connection error: {exc.__class__.__name__}")
     status.set_code(1)
     return status
@@ -24,7 +24,6 @@ def requests_error(exc: RequestException, status: Status) -> Status:
 
 EXC_MAP = {
     UserWarning: user_warning,
-    RequestException: requests_error,
 }
 
 
@@ -32,6 +31,11 @@ def translate_to_status(exc: Exception, status: Status) -> Status:
     handler = unknown_exception
     if exc.__class__ in EXC_MAP:
         handler = EXC_MAP[exc.__class__]  # type: ignore
+    # requests is not imported here to keep the start of checks cheap,
+    # it is already loaded if its exception is raised
+    requests = sys.modules.get("requests")
+    if requests is not None and exc.__class__ is requests.RequestException:
+        handler = requests_error
     return handler(exc, status)
 
 
@@ -3,7 +3,7 @@ import pwd
 import sys
 import warnings
 from functools import wraps
-from typing import Any, Optional
+from typing import Any, Dict, Optional
 
 import click
 import cloup
@@ -11,6 +11,7 @@ from cloup import group, option, pass_context, version_option
 
 from ch_tools.common import logging
 from ch_tools.common.cli.parameters import YamlParamType
+from ch_tools.common.clickhouse.config.utils import set_disk_cache_dir
 from ch_tools.common.config import CH_MONITORING_LOG_FILE, load_config
 from ch_tools.common.utils import get_full_command_name, update_by_key_path
 
@@ -20,26 +21,10 @@ warnings.filterwarnings(action="ignore", message="Python 3.6 is no longer suppor
 
 from ch_tools import __version__
 from ch_tools.common.cli.context_settings import CONTEXT_SETTINGS
+from ch_tools.common.cli.lazy_group import LazyGroup
 from ch_tools.common.cli.locale_resolver import LocaleResolver
 from ch_tools.common.result import Status
-from ch_tools.monrun_checks.ch_backup import backup_command
-from ch_tools.monrun_checks.ch_core_dumps import core_dumps_command
-from ch_tools.monrun_checks.ch_dist_tables import dist_tables_command
-from ch_tools.monrun_checks.ch_geobase import geobase_command
-from ch_tools.monrun_checks.ch_keeper import keeper_command
-from ch_tools.monrun_checks.ch_log_errors import log_errors_command
-from ch_tools.monrun_checks.ch_orphaned_objects import orphaned_objects_command
-from ch_tools.monrun_checks.ch_ping import ping_command
-from ch_tools.monrun_checks.ch_replication_lag import replication_lag_command
-from ch_tools.monrun_checks.ch_resetup_state import resetup_state_command
-from ch_tools.monrun_checks.ch_ro_replica import ro_replica_command
-from ch_tools.monrun_checks.ch_s3_backup_orphaned import orphaned_backups_command
-from ch_tools.monrun_checks.ch_s3_credentials_config import (
-    s3_credentials_configs_command,
-)
-from ch_tools.monrun_checks.ch_system_queues import system_queues_command
-from ch_tools.monrun_checks.ch_tls import tls_command
-from ch_tools.monrun_checks.dns import dns_command
+from ch_tools.monrun_checks.daemon import daemon_command
 from ch_tools.monrun_checks.exceptions import translate_to_status
 from ch_tools.monrun_checks.status import status_command
 
@@ -48,7 +33,7 @@ DEFAULT_USER = "monitor"
 # pylint: disable=too-many-ancestors
 
 
-class MonrunChecks(cloup.Group):
+class MonrunChecks(LazyGroup):
     def add_command(
         self,
         cmd: click.Command,
@@ -70,11 +55,13 @@ class MonrunChecks(cloup.Group):
         @wraps(cmd_callback)
         @pass_context
         def callback_wrapper(ctx: Any, *args: Any, **kwargs: Any) -> Any:
-            logging.configure(
-                ctx.obj["config"]["loguru"],
-                "ch-monitoring",
-                {"cmd_name": get_full_command_name(ctx)},
-            )
+            # Checks invoked by status command share its logging configuration
+            if not ctx.obj.get("status_mode", False):
+                logging.configure(
+                    ctx.obj["config"]["loguru"],
+                    "ch-monitoring",
+                    {"cmd_name": get_full_command_name(ctx)},
+                )
 
             logging.debug(
                 "Command starts executing, params: {}, args: {}, version: {}",
@@ -147,6 +134,8 @@ def cli(ctx: click.Context, settings: dict, ensure_monitoring_user: bool) -> Non
     if ensure_monitoring_user:
         _ensure_monitoring_user()
 
+    set_disk_cache_dir(config["monitoring"]["config_cache_dir"])
+
     ctx.obj = {
         "config": config,
         "monitoring": True,
@@ -154,29 +143,32 @@ def cli(ctx: click.Context, settings: dict, ensure_monitoring_user: bool) -> Non
     ctx.default_map = config["ch-monitoring"]
 
 
-CLI_COMMANDS = [
-    ping_command,
-    log_errors_command,
-    replication_lag_command,
-    system_queues_command,
-    core_dumps_command,
-    dist_tables_command,
-    resetup_state_command,
-    ro_replica_command,
-    geobase_command,
-    backup_command,
-    orphaned_backups_command,
-    s3_credentials_configs_command,
-    tls_command,
-    keeper_command,
-    dns_command,
-    orphaned_objects_command,
-]
-
-cli.add_command(status_command(CLI_COMMANDS))
-
-for command in CLI_COMMANDS:
-    cli.add_command(command)
+# Checks are imported on first use from modules of ch_tools.monrun_checks package
+CLI_COMMANDS: Dict[str, str] = {
+    "ping": "ch_ping:ping_command",
+    "log-errors": "ch_log_errors:log_errors_command",
+    "replication-lag": "ch_replication_lag:replication_lag_command",
+    "system-queues": "ch_system_queues:system_queues_command",
+    "core-dumps": "ch_core_dumps:core_dumps_command",
+    "dist-tables": "ch_dist_tables:dist_tables_command",
+    "resetup-state": "ch_resetup_state:resetup_state_command",
+    "ro-replica": "ch_ro_replica:ro_replica_command",
+    "geobase": "ch_geobase:geobase_command",
+    "backup": "ch_backup:backup_command",
+    "orphaned-backups": "ch_s3_backup_orphaned:orphaned_backups_command",
+    "s3-credentials-config": "ch_s3_credentials_config:s3_credentials_configs_command",
+    "tls": "ch_tls:tls_command",
+    "keeper": "ch_keeper:keeper_command",
+    "dns": "dns:dns_command",
+    "orphaned-objects": "ch_orphaned_objects:orphaned_objects_command",
+}
+
+cli.add_command(status_command(list(CLI_COMMANDS)))
+# The daemon is a long-running command, so it is not wrapped as a check
+cloup.Group.add_command(cli, daemon_command(list(CLI_COMMANDS)))
+
+for command_name, import_path in CLI_COMMANDS.items():
+    cli.add_lazy_command(command_name, f"ch_tools.monrun_checks.{import_path}")
 
 
 def main() -> None:
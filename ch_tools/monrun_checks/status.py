@@ -1,21 +1,21 @@
-from typing import Any
+from typing import Any, List, cast
 
 import click
-import tabulate
 
-DEFAULT_COLOR = "\033[0m"
+from ch_tools.common.check_runner import add_status_options, print_results, run_checks
 
-COLOR_MAP = {
-    0: "\033[92m",
-    1: "\033[93m",
-    2: "\033[91m",
-}
 
-
-def status_command(commands: Any) -> Any:
+def status_command(command_names: List[str]) -> Any:
     @click.command("status")
+    @add_status_options
     @click.pass_context
-    def status_impl(ctx: Any) -> None:
+    def status_impl(
+        ctx: Any,
+        max_workers: int,
+        check_timeout: float,
+        deadline: float,
+        show_latency: bool,
+    ) -> None:
         """
         Perform all checks.
         """
@@ -23,17 +23,27 @@ def status_command(commands: Any) -> Any:
         ctx.obj["status_mode"] = True
         ctx.default_map = config
 
-        checks_status = []
-        for cmd in commands:
-            if not config.get(cmd.name, {}).get("@disabled"):
-                status = ctx.invoke(cmd)
-                checks_status.append(
-                    (
-                        cmd.name,
-                        f"{COLOR_MAP[status.code]}{status.message}{DEFAULT_COLOR}",
-                    )
-                )
-
-        print(tabulate.tabulate(checks_status))
+        enabled_commands = get_commands(ctx, command_names)
+        results = run_checks(
+            ctx, enabled_commands, max_workers, check_timeout, deadline
+        )
+        print_results(results, show_latency)
 
     return status_impl
+
+
+def get_commands(ctx: click.Context, command_names: List[str]) -> List[click.Command]:
+    """
+    Return enabled check commands loaded from the root group.
+    """
+    config = ctx.obj["config"]["ch-monitoring"]
+    root = ctx.find_root()
+    group = cast(click.Group, root.command)
+    commands = []
+    for name in command_names:
+        if config.get(name, {}).get("@disabled"):
+            continue
+        command = group.get_command(root, name)
+        if command is not None:
+            commands.append(command)
+    return commands
@@ -16,6 +16,7 @@ from ch_tools import __version__
 from ch_tools.common import logging
 from ch_tools.common.cli.context_settings import CONTEXT_SETTINGS
 from ch_tools.common.cli.locale_resolver import LocaleResolver
+from ch_tools.common.clickhouse.config.utils import set_disk_cache_dir
 from ch_tools.common.config import load_config
 from ch_tools.common.result import Status
 from ch_tools.monrun_checks_keeper.keeper_commands import (
@@ -57,11 +58,13 @@ class KeeperChecks(cloup.Group):
         @wraps(cmd_callback)
         @cloup.pass_context
         def wrapper(ctx: Any, *a: Any, **kw: Any) -> Any:
-            logging.configure(
-                ctx.obj["config"]["loguru"],
-                "keeper-monitoring",
-                {"cmd_name": get_full_command_name(ctx)},
-            )
+            # Checks invoked by status command share its logging configuration
+            if not ctx.obj.get("status_mode", False):
+                logging.configure(
+                    ctx.obj["config"]["loguru"],
+                    "keeper-monitoring",
+                    {"cmd_name": get_full_command_name(ctx)},
+                )
 
             logging.debug(
                 "Command starts executing, params: {}, args: {}, version: {}",
@@ -148,6 +151,8 @@ def cli(
     for setting_path, value in settings:
         update_by_key_path(config, setting_path, value)
 
+    set_disk_cache_dir(config["monitoring"]["config_cache_dir"])
+
     ctx.obj = {
         "config": config,
         "retries": retries,
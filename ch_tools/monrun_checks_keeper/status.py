@@ -1,21 +1,21 @@
 from typing import Any
 
 import click
-import tabulate
 
-DEFAULT_COLOR = "\033[0m"
-
-COLOR_MAP = {
-    0: "\033[92m",
-    1: "\033[93m",
-    2: "\033[91m",
-}
+from ch_tools.common.check_runner import add_status_options, print_results, run_checks
 
 
 def status_command(commands: Any) -> Any:
     @click.command("status")
+    @add_status_options
     @click.pass_context
-    def status_impl(ctx: Any) -> None:
+    def status_impl(
+        ctx: Any,
+        max_workers: int,
+        check_timeout: float,
+        deadline: float,
+        show_latency: bool,
+    ) -> None:
         """
         Perform all checks.
         """
@@ -23,17 +23,12 @@ def status_command(commands: Any) -> Any:
         ctx.obj.update({"status_mode": True})
         ctx.default_map = config
 
-        checks_status = []
-        for cmd in commands:
-            if not config.get(cmd.name, {}).get("@disabled"):
-                status = ctx.invoke(cmd)
-                checks_status.append(
-                    (
-                        cmd.name,
-                        f"{COLOR_MAP[status.code]}{status.message}{DEFAULT_COLOR}",
-                    )
-                )
-
-        print(tabulate.tabulate(checks_status))
+        enabled_commands = [
+            cmd for cmd in commands if not config.get(cmd.name, {}).get("@disabled")
+        ]
+        results = run_checks(
+            ctx, enabled_commands, max_workers, check_timeout, deadline
+        )
+        print_results(results, show_latency)
 
     return status_impl
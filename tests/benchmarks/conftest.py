@@ -0,0 +1,8 @@
+import pytest
+
+from ch_tools.common import logging
+
+
+@pytest.fixture(autouse=True, scope="session")
+def _configure_logging() -> None:
+    logging.configure({"formatters": {}, "handlers": {}}, "benchmark")
@@ -0,0 +1,91 @@
+"""
+Benchmark of clean-orphaned-tables lookups on a synthetic ClickHouse directory of 50k tables.
+"""
+
+import os
+import subprocess
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
+
+import pytest
+
+from ch_tools.chadmin.internal.data_store import MetadataUuidIndex, get_disk_usage
+
+TABLES = 50000
+DATABASES = 50
+PARTS_PER_TABLE = 2
+# Number of store directories checked with the previous implementation,
+# the total time is extrapolated
+SAMPLE = 20
+
+
+def _prefix_exists_in_metadata(root: str, prefix: str) -> Optional[str]:
+    """
+    Previous implementation: walk the whole tree and read all .sql files per lookup.
+    """
+    for dir_name, _, filenames in os.walk(root):
+        for file in filenames:
+            if not file.endswith(".sql"):
+                continue
+            with open(dir_name + "/" + file, encoding="utf-8") as f:
+                if f"'{prefix}" in f.read():
+                    return file
+    return None
+
+
+@pytest.fixture(name="clickhouse_path", scope="module")
+def _clickhouse_path(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    root = tmp_path_factory.mktemp("clickhouse")
+    metadata = root / "metadata"
+    metadata.mkdir()
+    for db in range(DATABASES):
+        db_uuid = str(uuid.uuid4())
+        db_path = root / "store" / db_uuid[:3] / db_uuid
+        db_path.mkdir(parents=True)
+        (metadata / f"db{db}.sql").write_text(
+            f"ATTACH DATABASE _ UUID '{db_uuid}'\nENGINE = Atomic\n"
+        )
+        os.symlink(db_path, metadata / f"db{db}")
+        for table in range(TABLES // DATABASES):
+            table_uuid = str(uuid.uuid4())
+            # Every 100th table is orphaned
+            if table % 100:
+                (db_path / f"t{table}.sql").write_text(
+                    f"ATTACH TABLE _ UUID '{table_uuid}'\n"
+                    "(`id` UInt64, `s` String DEFAULT 'x')\n"
+                    "ENGINE = MergeTree ORDER BY id\n"
+                )
+            table_path = root / "store" / table_uuid[:3] / table_uuid
+            for part in range(PARTS_PER_TABLE):
+                part_path = table_path / f"all_{part}_{part}_0"
+                part_path.mkdir(parents=True)
+                (part_path / "data.bin").write_bytes(b"x" * 100)
+    return root
+
+
+def test_clean_orphaned_tables_lookup(clickhouse_path: Path) -> None:
+    root = str(clickhouse_path)
+    store_path = str(clickhouse_path / "store")
+    prefixes = sorted(os.listdir(store_path))
+
+    start = time.perf_counter()
+    for prefix in prefixes[:SAMPLE]:
+        _prefix_exists_in_metadata(root, prefix)
+        subprocess.check_output(["du", "-sh", os.path.join(store_path, prefix)])
+    previous = (time.perf_counter() - start) / SAMPLE * len(prefixes)
+
+    start = time.perf_counter()
+    index = MetadataUuidIndex.build(root)
+    disk_usage = get_disk_usage(store_path)
+    used = sum(bool(index.find(prefix)) for prefix in disk_usage)
+    current = time.perf_counter() - start
+
+    print(
+        f"\n{TABLES} tables, {len(prefixes)} store directories"
+        f"\nwalk per directory + du (extrapolated): {previous:.1f}s"
+        f"\nmetadata index + scandir walker:        {current:.2f}s"
+    )
+    assert len(index) == TABLES + DATABASES - TABLES // 100
+    assert used == len(prefixes)
@@ -0,0 +1,80 @@
+"""
+Benchmark of HTTP transport of ClickHouse client against a local HTTP stand-in.
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Iterator, List
+
+import pytest
+import requests
+
+from ch_tools.common.clickhouse.client import ClickhouseClient
+from ch_tools.common.clickhouse.config.clickhouse import ClickhousePort
+
+QUERIES = 300
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    connections: List[Any] = []
+
+    def setup(self) -> None:
+        super().setup()
+        self.connections.append(self.client_address)
+
+    def do_POST(self) -> None:  # pylint: disable=invalid-name
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        body = b"1\n"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+@pytest.fixture(name="server")
+def _server() -> Iterator[ThreadingHTTPServer]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _qps(func: Any) -> float:
+    _Handler.connections.clear()
+    start = time.perf_counter()
+    for _ in range(QUERIES):
+        func()
+    return QUERIES / (time.perf_counter() - start)
+
+
+def test_http_pool_qps(server: ThreadingHTTPServer) -> None:
+    port = server.server_address[1]
+    url = f"http://127.0.0.1:{port}"
+
+    qps_before = _qps(
+        lambda: requests.post(url, params={"query": "SELECT 1"}, timeout=10).text
+    )
+    connections_before = len(_Handler.connections)
+
+    client = ClickhouseClient(
+        host="127.0.0.1", ports={ClickhousePort.HTTP: port}, timeout=10
+    )
+    qps_after = _qps(lambda: client.query("SELECT 1"))
+    connections_after = len(_Handler.connections)
+    client.close()
+
+    print(
+        f"\nnew connection per query: {qps_before:.0f} qps ({connections_before} connections)"
+        f"\npooled sessions:          {qps_after:.0f} qps ({connections_after} connections)"
+    )
+    assert connections_before == QUERIES
+    assert connections_after == 1
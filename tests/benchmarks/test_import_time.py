@@ -0,0 +1,31 @@
+"""
+Benchmark of import time of command line entry points.
+"""
+
+import re
+import subprocess
+import sys
+
+import pytest
+
+# Budget of cumulative import time of the entry point module, in microseconds
+IMPORT_TIME_BUDGET_US = 500_000
+
+
+@pytest.mark.parametrize(
+    "module", ["ch_tools.chadmin.chadmin_cli", "ch_tools.monrun_checks.main"]
+)
+def test_import_time(module: str) -> None:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+
+    match = re.search(rf"\|\s*(\d+) \| {re.escape(module)}$", result.stderr, re.M)
+    assert match is not None
+    import_time_us = int(match.group(1))
+
+    print(f"\n{module}: imported in {import_time_us / 1000:.0f} ms")
+    assert import_time_us < IMPORT_TIME_BUDGET_US
@@ -0,0 +1,117 @@
+"""
+Benchmark of inserting object listing against a local ClickHouse HTTP stand-in.
+"""
+
+import gzip
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Iterator, List, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from ch_tools.chadmin.internal.utils import chunked
+from ch_tools.common.clickhouse.client import ClickhouseClient
+from ch_tools.common.clickhouse.config.clickhouse import ClickhousePort
+
+ROWS = 200000
+# Time spent by the server on each INSERT query, e.g. to write a part
+INSERT_LATENCY = 0.01
+BATCH_SIZE = 500
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    rows = 0
+    body_bytes = 0
+
+    def do_POST(self) -> None:  # pylint: disable=invalid-name
+        if self.headers.get("Transfer-Encoding") == "chunked":
+            body = self._read_chunked()
+        else:
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        query = parse_qs(urlparse(self.path).query)["query"][0]
+        _Handler.body_bytes += len(body) + len(query)
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        if "VALUES" in query:
+            _Handler.rows += query.count("),(") + 1
+        else:
+            _Handler.rows += body.count(b"\n")
+        time.sleep(INSERT_LATENCY)
+
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _read_chunked(self) -> bytes:
+        chunks = []
+        while True:
+            size = int(self.rfile.readline().strip(), 16)
+            chunks.append(self.rfile.read(size))
+            self.rfile.readline()
+            if not size:
+                return b"".join(chunks)
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+@pytest.fixture(name="client")
+def _client() -> Iterator[ClickhouseClient]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    client = ClickhouseClient(
+        host="127.0.0.1",
+        ports={ClickhousePort.HTTP: server.server_address[1]},
+        timeout=60,
+    )
+    yield client
+    client.close()
+    server.shutdown()
+    server.server_close()
+
+
+def _listing() -> Iterator[Tuple[str, int]]:
+    for i in range(ROWS):
+        yield f"cloud_storage/cluster/shard1/{i % 4096:03x}/{i:029x}", i
+
+
+def _measure(func: Any) -> str:
+    _Handler.rows = _Handler.body_bytes = 0
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    assert _Handler.rows == ROWS
+    return (
+        f"{ROWS / elapsed:.0f} rows/s ({elapsed:.2f}s, "
+        f"{_Handler.body_bytes / 2**20:.1f} MiB sent)"
+    )
+
+
+def test_insert_rows_throughput(client: ClickhouseClient) -> None:
+    def _insert_values() -> None:
+        batch: List[Tuple[str, int]]
+        for batch in chunked(_listing(), BATCH_SIZE):
+            values = ",".join(f"('{path}',{size})" for path, size in batch)
+            client.query(f"INSERT INTO listing (obj_path, obj_size) VALUES {values}")
+
+    values = _measure(_insert_values)
+    stream = _measure(
+        lambda: client.insert_rows("listing", _listing(), ["obj_path", "obj_size"])
+    )
+    stream_gzip = _measure(
+        lambda: client.insert_rows(
+            "listing", _listing(), ["obj_path", "obj_size"], compress=True
+        )
+    )
+
+    print(
+        f"\n{ROWS} rows, {INSERT_LATENCY * 1000:.0f}ms per INSERT"
+        f"\nVALUES batches of {BATCH_SIZE}: {values}"
+        f"\nstreamed TabSeparated:   {stream}"
+        f"\nstreamed with gzip:      {stream_gzip}"
+    )
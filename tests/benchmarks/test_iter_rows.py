@@ -0,0 +1,118 @@
+"""
+Benchmark of memory consumption of buffered and streamed reading of query results.
+"""
+
+import json
+import threading
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Iterator
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from ch_tools.common.clickhouse.client import ClickhouseClient
+from ch_tools.common.clickhouse.config.clickhouse import ClickhousePort
+
+ROWS_PER_CHUNK = 1000
+COLUMNS = [
+    {"name": "database", "type": "String"},
+    {"name": "table", "type": "String"},
+    {"name": "name", "type": "String"},
+    {"name": "rows", "type": "UInt64"},
+    {"name": "bytes_on_disk", "type": "UInt64"},
+]
+
+
+def _row(i: int) -> list:
+    return ["db", f"table_{i % 100}", f"all_{i}_{i}_0", str(i * 10), str(i * 1000)]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self) -> None:  # pylint: disable=invalid-name
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        query = parse_qs(urlparse(self.path).query)["query"][0]
+        n_rows = int(query.split("LIMIT")[1].split()[0])
+
+        self.send_response(200)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for chunk in self._chunks(query, n_rows):
+            data = chunk.encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    @staticmethod
+    def _chunks(query: str, n_rows: int) -> Iterator[str]:
+        if query.endswith("FORMAT JSONCompact"):
+            yield '{"meta": ' + json.dumps(COLUMNS) + ', "data": ['
+            for start in range(0, n_rows, ROWS_PER_CHUNK):
+                rows = range(start, min(start + ROWS_PER_CHUNK, n_rows))
+                yield ("," if start else "") + ",".join(
+                    json.dumps(_row(i)) for i in rows
+                )
+            yield f'], "rows": {n_rows}}}'
+            return
+
+        yield json.dumps([c["name"] for c in COLUMNS]) + "\n"
+        yield json.dumps([c["type"] for c in COLUMNS]) + "\n"
+        for start in range(0, n_rows, ROWS_PER_CHUNK):
+            rows = range(start, min(start + ROWS_PER_CHUNK, n_rows))
+            yield "".join(json.dumps(_row(i)) + "\n" for i in rows)
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+@pytest.fixture(name="client")
+def _client() -> Iterator[ClickhouseClient]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    client = ClickhouseClient(
+        host="127.0.0.1",
+        ports={ClickhousePort.HTTP: server.server_address[1]},
+        timeout=60,
+    )
+    yield client
+    client.close()
+    server.shutdown()
+    server.server_close()
+
+
+def _peak_memory(func: Callable[[], int], n_rows: int) -> int:
+    tracemalloc.start()
+    try:
+        assert func() == n_rows
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_iter_rows_memory(client: ClickhouseClient) -> None:
+    def _buffered(n_rows: int) -> int:
+        data = client.query_json_data(f"SELECT * FROM system.parts LIMIT {n_rows}")
+        return sum(1 for _ in data)
+
+    def _streamed(n_rows: int) -> int:
+        rows = client.iter_rows(f"SELECT * FROM system.parts LIMIT {n_rows}")
+        return sum(1 for _ in rows)
+
+    print()
+    peaks = {}
+    for n_rows in (10_000, 100_000):
+        buffered = _peak_memory(lambda: _buffered(n_rows), n_rows)
+        streamed = _peak_memory(lambda: _streamed(n_rows), n_rows)
+        peaks[n_rows] = (buffered, streamed)
+        print(
+            f"{n_rows:>7} rows: query_json_data peak {buffered / 2**20:7.1f} MiB,"
+            f" iter_rows peak {streamed / 2**20:5.1f} MiB"
+        )
+
+    # Buffered reading grows with the result, streamed one stays flat
+    assert peaks[100_000][0] > 5 * peaks[10_000][0]
+    assert peaks[100_000][1] < 2 * peaks[10_000][1]
@@ -0,0 +1,156 @@
+"""
+Latency benchmark of native protocol transport against a local fake server.
+"""
+
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Iterator, List
+
+import pytest
+
+from ch_tools.common.clickhouse.client import ClickhouseClient
+from ch_tools.common.clickhouse.client.native.protocol import (
+    CLIENT_REVISION,
+    BinaryReader,
+    BinaryWriter,
+    ClientPacket,
+    ServerPacket,
+)
+from ch_tools.common.clickhouse.config.clickhouse import ClickhousePort
+
+QUERIES = 300
+SUBPROCESSES = 20
+
+
+class _FakeServerHandler(socketserver.StreamRequestHandler):
+    """
+    Speaks enough of the native protocol to answer any query with `SELECT 1` result.
+    """
+
+    disable_nagle_algorithm = True
+    connections: List[Any] = []
+
+    def handle(self) -> None:
+        self.connections.append(self.client_address)
+        reader = BinaryReader(self.rfile)  # type: ignore[arg-type]
+        try:
+            self._handshake(reader)
+            while True:
+                packet = reader.read_varint()
+                if packet == ClientPacket.PING:
+                    self._send(lambda w: w.write_varint(ServerPacket.PONG))
+                elif packet == ClientPacket.QUERY:
+                    self._read_query(reader)
+                    self._send(self._write_result)
+                else:
+                    return
+        except ConnectionError:
+            return
+
+    def _handshake(self, reader: BinaryReader) -> None:
+        assert reader.read_varint() == ClientPacket.HELLO
+        reader.read_str()  # client name
+        for _ in range(3):  # version major, minor, revision
+            reader.read_varint()
+        for _ in range(3):  # database, user, password
+            reader.read_str()
+
+        def write_hello(writer: BinaryWriter) -> None:
+            writer.write_varint(ServerPacket.HELLO)
+            writer.write_str("ClickHouse")
+            writer.write_varint(24)
+            writer.write_varint(8)
+            writer.write_varint(CLIENT_REVISION)
+            writer.write_str("UTC")
+            writer.write_str("fake")
+            writer.write_varint(1)
+
+        self._send(write_hello)
+
+    @staticmethod
+    def _read_query(reader: BinaryReader) -> None:
+        reader.read_str()  # query id
+        reader.read_uint8()  # query kind
+        for _ in range(3):  # initial user, query id, address
+            reader.read_str()
+        reader.read_uint8()  # interface
+        for _ in range(3):  # os user, hostname, client name
+            reader.read_str()
+        for _ in range(3):  # version major, minor, revision
+            reader.read_varint()
+        reader.read_str()  # quota key
+        reader.read_varint()  # version patch
+        while reader.read_str():  # settings
+            reader.read_varint()
+            reader.read_str()
+        reader.read_varint()  # stage
+        reader.read_varint()  # compression
+        reader.read_str()  # query
+
+        assert reader.read_varint() == ClientPacket.DATA
+        reader.read_str()
+        while True:  # block info
+            field_num = reader.read_varint()
+            if not field_num:
+                break
+            reader.read(1 if field_num == 1 else 4)
+        reader.read_varint()  # columns
+        reader.read_varint()  # rows
+
+    @staticmethod
+    def _write_result(writer: BinaryWriter) -> None:
+        writer.write_varint(ServerPacket.DATA)
+        writer.write_str("")
+        writer.write_varint(0)
+        writer.write_varint(1)  # columns
+        writer.write_varint(1)  # rows
+        writer.write_str("1")
+        writer.write_str("UInt8")
+        writer.write_uint8(1)
+        writer.write_varint(ServerPacket.END_OF_STREAM)
+
+    def _send(self, write: Any) -> None:
+        writer = BinaryWriter()
+        write(writer)
+        self.wfile.write(writer.getvalue())
+
+
+@pytest.fixture(name="server")
+def _server() -> Iterator[socketserver.ThreadingTCPServer]:
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _FakeServerHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_native_protocol_latency(server: socketserver.ThreadingTCPServer) -> None:
+    port = server.server_address[1]
+    client = ClickhouseClient(
+        host="127.0.0.1", ports={ClickhousePort.TCP: port}, timeout=10
+    )
+
+    start = time.perf_counter()
+    for _ in range(QUERIES):
+        assert client.query_json_data("SELECT 1", port=ClickhousePort.TCP) == [[1]]
+    native_latency = (time.perf_counter() - start) / QUERIES
+    client.close()
+
+    # Lower bound of the subprocess transport: bare interpreter startup without
+    # loading clickhouse-client binary and connecting to the server.
+    start = time.perf_counter()
+    for _ in range(SUBPROCESSES):
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+    subprocess_latency = (time.perf_counter() - start) / SUBPROCESSES
+
+    print(
+        f"\nnative protocol:               {native_latency * 1000:.3f} ms/query"
+        f" ({len(_FakeServerHandler.connections)} connections)"
+        f"\nprocess startup (lower bound): {subprocess_latency * 1000:.3f} ms/query"
+    )
+    assert len(_FakeServerHandler.connections) == 1
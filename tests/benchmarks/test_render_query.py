@@ -0,0 +1,73 @@
+"""
+Micro-benchmark of query template rendering for the largest chadmin templates.
+"""
+
+import time
+from datetime import timedelta
+from typing import Any, Callable, Dict, Iterator, Tuple
+
+import pytest
+from click import Command, Context
+
+from ch_tools.chadmin.cli.partition_group import get_partitions
+from ch_tools.chadmin.cli.replication_queue_group import get_replication_queue_tasks
+from ch_tools.chadmin.internal.part import list_part_log, list_parts
+from ch_tools.common.clickhouse.client import ClickhouseClient
+
+ITERATIONS = 100
+
+
+class _RenderOnlyClient(ClickhouseClient):
+    """
+    Client that renders queries without sending them to the server.
+    """
+
+    def query(self, query: Any, query_args: Any = None, **kwargs: Any) -> Any:
+        self.render_query(query, **(query_args or {}))
+        return {"data": []}
+
+    def iter_rows(
+        self, query: Any, query_args: Any = None, *args: Any, **kwargs: Any
+    ) -> Iterator[Dict[str, Any]]:
+        self.render_query(query, **(query_args or {}))
+        return iter([])
+
+
+TEMPLATES: Dict[str, Tuple[Callable, Dict[str, Any]]] = {
+    "list_parts": (list_parts, {"database": "db1", "table": "t1", "limit": 10}),
+    "list_part_log": (list_part_log, {"database": "db1", "failed": True}),
+    "get_partitions": (
+        get_partitions,
+        {"database": "db1", "table": "t1", "min_size": 1},
+    ),
+    "get_replication_queue_tasks": (
+        get_replication_queue_tasks,
+        {"database": "db1", "failed": True, "min_age": timedelta(hours=1)},
+    ),
+}
+
+
+@pytest.mark.parametrize("name", TEMPLATES)
+def test_render_query(name: str) -> None:
+    function, kwargs = TEMPLATES[name]
+    client = _RenderOnlyClient(host="localhost", ports={}, timeout=10)
+    ctx = Context(Command("benchmark"), obj={"chcli": client})
+
+    def _run(clear_cache: bool) -> float:
+        start = time.perf_counter()
+        for _ in range(ITERATIONS):
+            if clear_cache:
+                client._compile_template.cache_clear()  # pylint: disable=protected-access
+            function(ctx, **kwargs)
+        return (time.perf_counter() - start) / ITERATIONS
+
+    uncached = _run(clear_cache=True)
+    cached = _run(clear_cache=False)
+
+    print(
+        f"\n{name}: compile on every call {uncached * 1e6:.0f} us,"
+        f" cached template {cached * 1e6:.0f} us"
+    )
+    assert (
+        client._compile_template.cache_info().hits >= ITERATIONS - 1
+    )  # pylint: disable=protected-access
@@ -0,0 +1,133 @@
+"""
+Benchmark of object storage listing against a local S3 stand-in with network latency.
+"""
+
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Iterator, List
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+
+import pytest
+
+from ch_tools.chadmin.internal.object_storage.s3_iterator import (
+    s3_object_storage_iterator,
+)
+from ch_tools.chadmin.internal.object_storage.s3_listing import S3ParallelLister
+from ch_tools.common.clickhouse.config.storage_configuration import S3DiskConfiguration
+
+BUCKET = "bucket"
+PREFIX = "data/shard1/"
+# Round-trip time of a request to S3
+LATENCY = 0.03
+MAX_KEYS = 1000
+KEYS = sorted(
+    f"{PREFIX}{d:03x}/{o:029x}" for d in range(200) for o in range(100 + d % 4 * 100)
+)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    ListObjects and ListObjectsV2 of a single static bucket.
+    """
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        time.sleep(LATENCY)
+        params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        prefix = params.get("prefix", "")
+        delimiter = params.get("delimiter")
+        start_after = (
+            params.get("continuation-token")
+            or params.get("start-after")
+            or params.get("marker", "")
+        )
+        start = bisect.bisect_right(KEYS, start_after)
+        end = bisect.bisect_left(KEYS, prefix + "\U0010ffff")
+        keys = KEYS[max(start, bisect.bisect_left(KEYS, prefix)) : end]
+
+        body = [
+            '<?xml version="1.0" encoding="UTF-8"?>',
+            '<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">',
+            f"<Name>{BUCKET}</Name><Prefix>{escape(prefix)}</Prefix>",
+        ]
+        if delimiter:
+            prefixes = sorted({k[: k.index(delimiter, len(prefix)) + 1] for k in keys})
+            body += [
+                f"<CommonPrefixes><Prefix>{escape(p)}</Prefix></CommonPrefixes>"
+                for p in prefixes
+            ]
+            keys = []
+        truncated = len(keys) > MAX_KEYS
+        keys = keys[:MAX_KEYS]
+        body += [
+            "<Contents>"
+            f"<Key>{escape(key)}</Key><LastModified>2020-01-01T00:00:00.000Z</LastModified>"
+            f'<ETag>"0"</ETag><Size>{len(key)}</Size><StorageClass>STANDARD</StorageClass>'
+            "</Contents>"
+            for key in keys
+        ]
+        body.append(f"<KeyCount>{len(keys)}</KeyCount><MaxKeys>{MAX_KEYS}</MaxKeys>")
+        body.append(f"<IsTruncated>{str(truncated).lower()}</IsTruncated>")
+        if truncated:
+            tag = "NextContinuationToken" if "list-type" in params else "NextMarker"
+            body.append(f"<{tag}>{escape(keys[-1])}</{tag}>")
+        body.append("</ListBucketResult>")
+
+        data = "".join(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/xml")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+@pytest.fixture(name="disk")
+def _disk(monkeypatch: pytest.MonkeyPatch) -> Iterator[S3DiskConfiguration]:
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield S3DiskConfiguration(
+        name="object_storage",
+        endpoint_url=f"http://127.0.0.1:{server.server_address[1]}",
+        access_key_id="key",
+        secret_access_key="secret",
+        bucket_name=BUCKET,
+        prefix=PREFIX,
+    )
+    server.shutdown()
+    server.server_close()
+
+
+def _throughput(keys: List[str], start: float) -> str:
+    elapsed = time.perf_counter() - start
+    return f"{len(keys) / elapsed:.0f} objects/s ({elapsed:.2f}s)"
+
+
+def test_s3_listing_throughput(disk: S3DiskConfiguration) -> None:
+    start = time.perf_counter()
+    sequential_keys = [
+        obj.key for obj in s3_object_storage_iterator(disk, object_name_prefix=PREFIX)
+    ]
+    sequential = _throughput(sequential_keys, start)
+
+    start = time.perf_counter()
+    lister = S3ParallelLister(disk, PREFIX, workers=8)
+    parallel_keys = [obj.key for page in lister.iter_pages() for obj in page.objects]
+    parallel = _throughput(parallel_keys, start)
+
+    print(
+        f"\n{len(KEYS)} objects, {LATENCY * 1000:.0f}ms latency"
+        f"\nsequential paginator: {sequential}"
+        f"\nparallel key ranges:  {parallel}"
+    )
+    assert sequential_keys == KEYS
+    assert sorted(parallel_keys) == KEYS
@@ -0,0 +1,54 @@
+import os
+import shutil
+from pathlib import Path
+
+from pytest import MonkeyPatch
+
+from ch_tools.chadmin.cli.data_store_group import read_parts_metadata
+from ch_tools.chadmin.internal.object_storage import blob_inventory
+from ch_tools.chadmin.internal.object_storage.blob_inventory import (
+    BlobInventory,
+    InventoryBlob,
+)
+
+
+def test_blob_inventory(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(blob_inventory, "MTIME_GRANULARITY_NS", 0)
+    root = tmp_path / "store"
+    part1 = root / "123" / "uuid" / "all_1_1_0"
+    part2 = root / "123" / "uuid" / "all_2_2_0"
+    part1.mkdir(parents=True)
+    part2.mkdir(parents=True)
+    (part1 / "checksums.txt").write_text("3\n2 20\n10 abc/ghi\n10 abc/def\n1\n0\n")
+    (part2 / "data.bin").write_text("3\n1 10\n10 abc/ghi\n0\n0\n")
+
+    with BlobInventory(str(tmp_path / "inventory.db")) as inventory:
+        inventory.refresh(str(root), max_workers=2)
+        assert inventory.get_dir_keys(str(root), "data/") == read_parts_metadata(
+            str(root), "data/", max_workers=2
+        )
+        assert [
+            b.key for b in inventory.get_file_blobs(str(part1 / "checksums.txt"))
+        ] == [
+            "abc/ghi",
+            "abc/def",
+        ]
+        assert inventory.get_blobs("abc/def") == [
+            InventoryBlob("abc/def", str(part1), "checksums.txt", 10, 1)
+        ]
+
+    with BlobInventory(str(tmp_path / "inventory.db")) as inventory:
+        os.utime(part2, ns=(0, 10**9))
+        inventory.refresh(str(root), max_workers=2)
+
+        # Directories with not changed modification time are not parsed again
+        (part2 / "data.bin").write_text("3\n1 10\n10 abc/xyz\n0\n0\n")
+        os.utime(part2, ns=(0, 10**9))
+        shutil.rmtree(part1)
+        inventory.refresh(str(root), max_workers=2)
+        assert inventory.get_dir_keys(str(root)) == {str(part2): ["abc/ghi"]}
+
+        os.utime(part2, ns=(0, 2 * 10**9))
+        inventory.refresh(str(root), max_workers=2)
+        assert inventory.get_dir_keys(str(root)) == {str(part2): ["abc/xyz"]}
+        assert not inventory.get_blobs("abc/def")
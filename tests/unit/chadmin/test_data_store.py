@@ -0,0 +1,74 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from ch_tools.chadmin.internal.data_store import (
+    MetadataUuidIndex,
+    format_disk_usage,
+    get_disk_usage,
+)
+
+
+@pytest.mark.parametrize(
+    "size,expected",
+    [
+        (0, "0"),
+        (512, "512"),
+        (8192, "8.0K"),
+        (8193, "8.1K"),
+        (10 * 1024 - 1, "10K"),
+        (15 * 2**20 + 1, "16M"),
+        (1024 * 2**20 - 1, "1.0G"),
+    ],
+)
+def test_format_disk_usage(size: int, expected: str) -> None:
+    assert format_disk_usage(size) == expected
+
+
+def test_metadata_uuid_index(tmp_path: Path) -> None:
+    table_uuid = "123e4567-e89b-12d3-a456-426614174000"
+    db_uuid = "fd3e4567-e89b-12d3-a456-426614174000"
+    (tmp_path / "metadata" / "db").mkdir(parents=True)
+    (tmp_path / "metadata" / "db.sql").write_text(
+        f"ATTACH DATABASE _ UUID '{db_uuid}'\nENGINE = Atomic\n"
+    )
+    (tmp_path / "metadata" / "db" / "t.sql").write_text(
+        f"ATTACH TABLE _ UUID '{table_uuid}'\n(`s` String DEFAULT 'abc')\n"
+    )
+    (tmp_path / "metadata" / "db" / "t.txt").write_text(
+        "'ab3e4567-e89b-12d3-a456-426614174000'"
+    )
+
+    index = MetadataUuidIndex.build(str(tmp_path), workers=2)
+    assert len(index) == 2
+    assert index.find("123") == "t.sql"
+    assert index.find(db_uuid) == "db.sql"
+    # Only UUIDs are indexed, other quoted strings and non .sql files are ignored
+    assert index.find("abc") is None
+    assert index.find("ab3") is None
+
+
+def test_get_disk_usage(tmp_path: Path) -> None:
+    (tmp_path / "abc" / "part").mkdir(parents=True)
+    (tmp_path / "abc" / "part" / "data.bin").write_bytes(b"x" * 10000)
+    os.link(tmp_path / "abc" / "part" / "data.bin", tmp_path / "abc" / "link.bin")
+    (tmp_path / "def").mkdir()
+    (tmp_path / "file").write_bytes(b"x")
+
+    usage = get_disk_usage(str(tmp_path), workers=2)
+    assert set(usage) == {"abc", "def", "file"}
+
+    def _du(path: Path) -> int:
+        return os.stat(path).st_blocks * 512
+
+    assert usage["abc"] == sum(
+        _du(p)
+        for p in (
+            tmp_path / "abc",
+            tmp_path / "abc" / "part",
+            tmp_path / "abc" / "part" / "data.bin",
+        )
+    )
+    assert usage["def"] == _du(tmp_path / "def")
+    assert usage["file"] == _du(tmp_path / "file")
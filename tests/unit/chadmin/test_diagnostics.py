@@ -0,0 +1,96 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import pytest
+
+from ch_tools.chadmin.internal.diagnostics import data
+from ch_tools.chadmin.internal.diagnostics.data import (
+    DiagnosticsData,
+    DiagnosticsTask,
+    add_command,
+)
+
+
+def _task(
+    name: str, section: str = "", wait: Optional[Callable[[], Any]] = None
+) -> DiagnosticsTask:
+    def _collect(_: float) -> Dict[str, Any]:
+        if wait:
+            wait()
+        return {"type": "string", "value": name}
+
+    return DiagnosticsTask(name, _collect, section or None)
+
+
+def _items(diagnostics: DiagnosticsData) -> Dict[str, Dict[str, Any]]:
+    # pylint: disable=protected-access
+    return {
+        name: item
+        for section in diagnostics._sections
+        for name, item in section["data"].items()
+    }
+
+
+def test_collect_preserves_order() -> None:
+    # Tasks pass the barrier only if they are executed concurrently
+    barrier = threading.Barrier(3, timeout=5)
+    diagnostics = DiagnosticsData("host", False)
+    tasks = [
+        diagnostics.add_string("Version", "1.0"),
+        _task("slow", "Queries", barrier.wait),
+        _task("fast", "Queries", barrier.wait),
+        _task("other", wait=barrier.wait),
+    ]
+
+    diagnostics.collect(tasks, max_workers=4, timeout=10)
+
+    # pylint: disable=protected-access
+    assert [(s["section"], list(s["data"])) for s in diagnostics._sections] == [
+        (None, ["Version"]),
+        ("Queries", ["slow", "fast"]),
+        (None, ["other"]),
+    ]
+    items = _items(diagnostics)
+    assert [items[name]["value"] for name in ("slow", "fast", "other")] == [
+        "slow",
+        "fast",
+        "other",
+    ]
+
+
+def test_collect_stuck_task(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(data, "TASK_TIMEOUT_GRACE_PERIOD", 0.1)
+    release = threading.Event()
+    diagnostics = DiagnosticsData("host", False)
+    try:
+        diagnostics.collect(
+            [_task("stuck", wait=lambda: release.wait(5)), _task("fast")],
+            max_workers=2,
+            timeout=0.1,
+        )
+    finally:
+        release.set()
+
+    items = _items(diagnostics)
+    assert items["stuck"]["value"] == "timed out after 0.1s"
+    assert items["fast"]["value"] == "fast"
+
+
+def test_command_timeout() -> None:
+    diagnostics = DiagnosticsData("host", False)
+    start = time.monotonic()
+    diagnostics.collect(
+        [
+            add_command(diagnostics, "partial", "echo started; sleep 10 | cat"),
+            add_command(diagnostics, "failed", "echo error >&2; exit 3"),
+        ],
+        timeout=0.5,
+    )
+    assert time.monotonic() - start < 5
+
+    items = _items(diagnostics)
+    assert items["partial"]["result"] == (
+        "timed out after 0.5s, partial output:\nstarted\n"
+    )
+    assert items["failed"]["result"] == "failed with exit code 3\nerror\n"
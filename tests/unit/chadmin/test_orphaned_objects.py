@@ -0,0 +1,42 @@
+import io
+from typing import List
+
+from pytest import raises
+
+from ch_tools.chadmin.internal.object_storage.obj_list_item import ObjListItem
+from ch_tools.chadmin.internal.object_storage.orphaned_objects import (
+    find_orphaned_objects,
+    spill_orphaned_objects,
+)
+
+
+def _objects(*paths: str) -> List[ObjListItem]:
+    return [ObjListItem(path, 1) for path in paths]
+
+
+def test_find_orphaned_objects() -> None:
+    objects = _objects("a/1", "a/2", "b/1", "b/3", "c/1")
+    referenced_paths = ["a/0", "a/2", "a/2", "b/2", "b/3", "b/3", "d/1"]
+
+    orphaned = find_orphaned_objects(objects, referenced_paths)
+    assert [obj.path for obj in orphaned] == ["a/1", "b/1", "c/1"]
+
+    assert list(find_orphaned_objects(objects, [])) == objects
+    assert not list(find_orphaned_objects([], referenced_paths))
+
+
+def test_find_orphaned_objects_unsorted() -> None:
+    with raises(RuntimeError, match="Listing"):
+        list(find_orphaned_objects(_objects("b", "a"), []))
+    with raises(RuntimeError, match="Remote data paths"):
+        list(find_orphaned_objects(_objects("c"), ["b", "a"]))
+
+
+def test_spill_orphaned_objects() -> None:
+    file = io.StringIO()
+    objects = [ObjListItem("a/b/1", 10), ObjListItem("c/2", 5), ObjListItem("d/3", 1)]
+
+    stats = spill_orphaned_objects(objects, file, r"^(\w+)/(\w+)/")
+
+    assert stats == (3, 16, 2, "c/2")
+    assert file.getvalue().splitlines()[1] == '["c/2", 5]'
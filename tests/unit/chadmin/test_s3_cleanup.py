@@ -0,0 +1,114 @@
+from typing import Any, Dict, List
+
+import pytest
+from botocore.exceptions import ClientError
+
+from ch_tools.chadmin.internal.object_storage import s3_cleanup
+from ch_tools.chadmin.internal.object_storage.obj_list_item import ObjListItem
+from ch_tools.chadmin.internal.object_storage.s3_cleanup import (
+    cleanup_s3_object_storage,
+)
+from ch_tools.common.clickhouse.config.storage_configuration import S3DiskConfiguration
+
+DISK = S3DiskConfiguration(
+    name="object_storage",
+    endpoint_url="http://localhost:9000",
+    access_key_id="key",
+    secret_access_key="secret",
+    bucket_name="bucket",
+    prefix="data/shard1/",
+)
+
+
+class _FakeS3Client:
+    """
+    Stand-in of boto3 S3 client failing DeleteObjects requests and keys as configured.
+    """
+
+    def __init__(self) -> None:
+        self.requests: List[List[str]] = []
+        # Number of requests failed with SlowDown before succeeding
+        self.throttled_requests = 0
+        # Keys failed with the error code once or permanently
+        self.transient_errors: Dict[str, str] = {}
+        self.permanent_errors: Dict[str, str] = {}
+
+    def delete_objects(
+        self, Bucket: str, Delete: Dict[str, Any]  # pylint: disable=invalid-name
+    ) -> Dict[str, Any]:
+        assert Bucket == DISK.bucket_name
+        keys = [obj["Key"] for obj in Delete["Objects"]]
+        assert len(keys) <= 1000
+        self.requests.append(keys)
+        if self.throttled_requests:
+            self.throttled_requests -= 1
+            raise ClientError(
+                {"Error": {"Code": "SlowDown", "Message": "Reduce your request rate"}},
+                "DeleteObjects",
+            )
+
+        errors = []
+        for key in keys:
+            code = self.transient_errors.pop(key, None) or self.permanent_errors.get(
+                key
+            )
+            if code:
+                errors.append({"Key": key, "Code": code, "Message": code})
+        return {"Errors": errors} if errors else {}
+
+
+@pytest.fixture(name="client")
+def _client(monkeypatch: pytest.MonkeyPatch) -> _FakeS3Client:
+    client = _FakeS3Client()
+    monkeypatch.setattr(s3_cleanup, "create_s3_client", lambda *_: client)
+    monkeypatch.setattr(s3_cleanup, "RETRY_MIN_WAIT_SEC", 0.001)
+    return client
+
+
+def _objects(count: int) -> List[ObjListItem]:
+    return [ObjListItem(f"data/shard1/{i:05}", i) for i in range(count)]
+
+
+def test_delete(client: _FakeS3Client) -> None:
+    objects = _objects(3500)
+    deleted, total_size = cleanup_s3_object_storage(DISK, iter(objects), workers=3)
+
+    assert (deleted, total_size) == (3500, sum(obj.size for obj in objects))
+    assert sorted(len(keys) for keys in client.requests) == [500, 1000, 1000, 1000]
+    assert sorted(k for keys in client.requests for k in keys) == [
+        obj.path for obj in objects
+    ]
+
+
+def test_dry_run(client: _FakeS3Client) -> None:
+    assert cleanup_s3_object_storage(DISK, iter(_objects(10)), dry_run=True) == (
+        10,
+        45,
+    )
+    assert not client.requests
+
+
+def test_retry_slow_down(client: _FakeS3Client) -> None:
+    client.throttled_requests = 2
+    assert cleanup_s3_object_storage(DISK, iter(_objects(10)), workers=1) == (10, 45)
+    assert len(client.requests) == 3
+
+
+def test_per_key_errors(client: _FakeS3Client) -> None:
+    client.transient_errors = {"data/shard1/00001": "SlowDown"}
+    client.permanent_errors = {
+        "data/shard1/00002": "AccessDenied",
+        "data/shard1/00003": "AccessDenied",
+    }
+    assert cleanup_s3_object_storage(DISK, iter(_objects(10)), workers=1) == (8, 40)
+    # Only the key failed with retryable error is retried
+    assert client.requests[1] == ["data/shard1/00001"]
+
+
+def test_non_retryable_request_error(client: _FakeS3Client) -> None:
+    def _fail(**_: Any) -> None:
+        raise ClientError({"Error": {"Code": "AccessDenied"}}, "DeleteObjects")
+
+    client.delete_objects = _fail  # type: ignore[assignment]
+    with pytest.raises(ClientError):
+        cleanup_s3_object_storage(DISK, iter(_objects(10)))
@@ -0,0 +1,112 @@
+import bisect
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+import pytest
+from botocore.exceptions import ClientError
+
+from ch_tools.chadmin.cli.data_store_group import read_parts_metadata
+from ch_tools.chadmin.internal.object_storage import s3_existence
+from ch_tools.chadmin.internal.object_storage.s3_existence import find_missing_keys
+from ch_tools.common.clickhouse.config.storage_configuration import S3DiskConfiguration
+
+PAGE_SIZE = 10
+
+DISK = S3DiskConfiguration(
+    name="object_storage",
+    endpoint_url="http://localhost:9000",
+    access_key_id="key",
+    secret_access_key="secret",
+    bucket_name="bucket",
+    prefix="data/shard1/",
+)
+
+
+class _FakeS3Client:
+    """
+    In-memory stand-in of boto3 S3 client supporting ListObjectsV2 pagination.
+    """
+
+    def __init__(self, keys: List[str]) -> None:
+        self.keys = sorted(keys)
+        self.requests = 0
+
+    def head_object(
+        self, Bucket: str, Key: str  # pylint: disable=invalid-name
+    ) -> Dict[str, Any]:
+        assert Bucket == DISK.bucket_name
+        self.requests += 1
+        i = bisect.bisect_left(self.keys, Key)
+        if i == len(self.keys) or self.keys[i] != Key:
+            raise ClientError({"Error": {"Code": "404"}}, "HeadObject")
+        return {}
+
+    def get_paginator(self, _: str) -> "_FakeS3Client":
+        return self
+
+    def paginate(
+        self,
+        Bucket: str,  # pylint: disable=invalid-name
+        Prefix: str,  # pylint: disable=invalid-name
+        StartAfter: str = "",  # pylint: disable=invalid-name
+    ) -> Iterator[Dict[str, Any]]:
+        assert Bucket == DISK.bucket_name
+        start = max(
+            bisect.bisect_right(self.keys, StartAfter),
+            bisect.bisect_left(self.keys, Prefix),
+        )
+        while start < len(self.keys) and self.keys[start].startswith(Prefix):
+            page = [k for k in self.keys[start : start + PAGE_SIZE] if k >= Prefix]
+            page = [k for k in page if k.startswith(Prefix)]
+            self.requests += 1
+            yield {"Contents": [{"Key": key} for key in page]}
+            start += PAGE_SIZE
+
+
+@pytest.fixture(name="client")
+def _client(monkeypatch: pytest.MonkeyPatch) -> _FakeS3Client:
+    keys = [
+        f"data/shard{s}/{d:03}/{o:05}"
+        for s in (1, 2)
+        for d in range(10)
+        for o in range(500)
+    ]
+    client = _FakeS3Client(keys)
+    monkeypatch.setattr(s3_existence, "create_s3_client", lambda *_: client)
+    return client
+
+
+def test_find_missing_keys(client: _FakeS3Client) -> None:
+    existing = [k for k in client.keys if k.startswith(DISK.prefix)][::3]
+    missing = ["data/shard1/003/99999", "data/shard1/004/00000x", "data/shard1/zzz"]
+
+    assert find_missing_keys(DISK, existing + missing, workers=3) == set(missing)
+    # Objects are listed by ranges instead of a request per key
+    assert client.requests < len(existing) / 2
+
+
+def test_find_missing_sparse_keys(monkeypatch: pytest.MonkeyPatch) -> None:
+    client = _FakeS3Client([f"data/shard1/{i:06}" for i in range(100000)])
+    monkeypatch.setattr(s3_existence, "create_s3_client", lambda *_: client)
+    existing = ["data/shard1/000000", "data/shard1/050000", "data/shard1/099999"]
+    missing = ["data/shard1/050000x"]
+
+    assert find_missing_keys(DISK, existing + missing, workers=1) == set(missing)
+    # Objects between sparse keys are not listed
+    assert client.requests <= 20
+
+
+def test_read_parts_metadata(tmp_path: Path) -> None:
+    part = tmp_path / "store" / "123" / "uuid" / "all_1_1_0"
+    part.mkdir(parents=True)
+    (part / "data.bin").write_text("3\n1 10\n10 abc/def\n0\n0\n")
+    (part / "columns.txt").write_text("3\n2 20\n10 abc/ghi\n10 abc/jkl\n0\n0\n")
+    (part / "broken.txt").write_text("broken")
+
+    result = read_parts_metadata(str(tmp_path), "data/shard1/", max_workers=2)
+    assert list(result) == [str(part)]
+    assert sorted(result[str(part)]) == [
+        "data/shard1/abc/def",
+        "data/shard1/abc/ghi",
+        "data/shard1/abc/jkl",
+    ]
@@ -0,0 +1,136 @@
+import bisect
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List
+
+import pytest
+
+from ch_tools.chadmin.internal.object_storage import s3_listing
+from ch_tools.chadmin.internal.object_storage.s3_listing import S3ParallelLister
+from ch_tools.common.clickhouse.config.storage_configuration import S3DiskConfiguration
+
+PAGE_SIZE = 7
+
+DISK = S3DiskConfiguration(
+    name="object_storage",
+    endpoint_url="http://localhost:9000",
+    access_key_id="key",
+    secret_access_key="secret",
+    bucket_name="bucket",
+    prefix="data/shard1/",
+)
+
+
+class _FakeS3Client:
+    """
+    In-memory stand-in of boto3 S3 client supporting ListObjectsV2 pagination.
+    """
+
+    def __init__(self, keys: List[str]) -> None:
+        self.keys = sorted(keys)
+        self.requests = 0
+
+    def get_paginator(self, _: str) -> "_FakeS3Client":
+        return self
+
+    def paginate(
+        self,
+        Bucket: str,  # pylint: disable=invalid-name
+        Prefix: str,  # pylint: disable=invalid-name
+        Delimiter: str = "",  # pylint: disable=invalid-name
+        StartAfter: str = "",  # pylint: disable=invalid-name
+    ) -> Iterator[Dict[str, Any]]:
+        assert Bucket == DISK.bucket_name
+        keys = self.keys[bisect.bisect_right(self.keys, StartAfter) :]
+        keys = [k for k in keys if k.startswith(Prefix)]
+        if Delimiter:
+            prefixes = sorted(
+                {
+                    Prefix + k[len(Prefix) :].split(Delimiter)[0] + Delimiter
+                    for k in keys
+                    if Delimiter in k[len(Prefix) :]
+                }
+            )
+            self.requests += 1
+            yield {"CommonPrefixes": [{"Prefix": p} for p in prefixes]}
+            return
+
+        for i in range(0, len(keys), PAGE_SIZE):
+            self.requests += 1
+            yield {
+                "Contents": [
+                    {
+                        "Key": key,
+                        "Size": len(key),
+                        "LastModified": datetime.now(timezone.utc),
+                    }
+                    for key in keys[i : i + PAGE_SIZE]
+                ]
+            }
+
+
+@pytest.fixture(name="client")
+def _client(monkeypatch: pytest.MonkeyPatch) -> _FakeS3Client:
+    keys = [
+        f"data/shard{shard}/{d:03}/{o:03}"
+        for shard in (1, 2)
+        for d in range(40)
+        for o in range(d % 5 * 4)
+    ]
+    keys += ["data/shard1/marker", "data/shard1/operations/log"]
+    client = _FakeS3Client(keys)
+    monkeypatch.setattr(s3_listing, "create_s3_client", lambda *_: client)
+    return client
+
+
+def test_parallel_listing(client: _FakeS3Client) -> None:
+    lister = S3ParallelLister(DISK, DISK.prefix, workers=3)
+    keys: List[str] = []
+    for page in lister.iter_pages():
+        keys.extend(obj.key for obj in page.objects)
+        lister.commit(page)
+
+    expected = [
+        k
+        for k in client.keys
+        if k.startswith(DISK.prefix) and not k.endswith("operations/log")
+    ]
+    assert sorted(keys) == expected
+
+
+def test_resume_listing(client: _FakeS3Client, tmp_path: Any) -> None:
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+    lister = S3ParallelLister(
+        DISK, DISK.prefix, workers=2, checkpoint_path=checkpoint_path
+    )
+    keys: List[str] = []
+    for i, page in enumerate(lister.iter_pages()):
+        if i == 10:
+            # Interrupt the listing, the page is not processed
+            break
+        keys.extend(obj.key for obj in page.objects)
+        lister.commit(page)
+
+    lister = S3ParallelLister(
+        DISK, DISK.prefix, workers=2, checkpoint_path=checkpoint_path, resume=True
+    )
+    for page in lister.iter_pages():
+        keys.extend(obj.key for obj in page.objects)
+        lister.commit(page)
+    lister.finish()
+
+    assert len(keys) == len(set(keys))
+    assert len(keys) == len(
+        [k for k in client.keys if k.startswith(DISK.prefix) and "operations" not in k]
+    )
+    assert not (tmp_path / "checkpoint.json").exists()
+
+
+def test_ordered_listing(client: _FakeS3Client) -> None:
+    lister = S3ParallelLister(DISK, DISK.prefix, workers=4, ordered=True)
+    keys = [obj.key for page in lister.iter_pages() for obj in page.objects]
+
+    assert keys == [
+        k
+        for k in client.keys
+        if k.startswith(DISK.prefix) and not k.endswith("operations/log")
+    ]
@@ -0,0 +1,43 @@
+from typing import Any, List
+
+import pytest
+from click import Command, Context
+
+from ch_tools.chadmin.internal import zookeeper
+from ch_tools.chadmin.internal.zookeeper import get_zk_stats, zk_client
+
+
+@pytest.fixture(name="ctx")
+def _ctx(monkeypatch: pytest.MonkeyPatch) -> Any:
+    calls: List[str] = []
+
+    def _get_zk_client(ctx: Context) -> Any:
+        client = zookeeper._KazooClient(  # pylint: disable=protected-access
+            "localhost:2181", stats=get_zk_stats(ctx)
+        )
+        monkeypatch.setattr(client, "start", lambda: calls.append("start"))
+        monkeypatch.setattr(client, "stop", lambda: calls.append("stop"))
+        monkeypatch.setattr(client, "close", lambda: calls.append("close"))
+        return client
+
+    monkeypatch.setattr(zookeeper, "_get_zk_client", _get_zk_client)
+    ctx = Context(Command("test"), obj={"config": {}})
+    ctx.obj["calls"] = calls
+    return ctx
+
+
+def test_zk_client_is_shared(ctx: Context) -> None:
+    with ctx:
+        with zk_client(ctx) as zk1:
+            pass
+        with zk_client(ctx) as zk2:
+            zk2.get_async("/node")
+            zk2.exists_async("/node")
+
+        assert zk1 is zk2
+        assert ctx.obj["calls"] == ["start"]
+
+    assert ctx.obj["calls"] == ["start", "stop", "close"]
+    assert get_zk_stats(ctx).sessions == 1
+    assert get_zk_stats(ctx).requests == 2
+    assert "zk_client" not in ctx.obj
@@ -0,0 +1,234 @@
+import os
+import re
+from functools import partial
+from typing import Any, Dict, List, Optional
+
+import pytest
+from kazoo.exceptions import NoNodeError, NotEmptyError, RolledBackError
+
+from ch_tools.chadmin.internal.zookeeper import (
+    ZookeeperBulkDeleter,
+    delete_recursive,
+    find_leafs_and_nodes,
+    find_paths,
+)
+from ch_tools.chadmin.internal.zookeeper_walker import ZookeeperTreeWalker
+
+
+class _Result:
+    def __init__(self, zk: "_FakeZk", value: Any) -> None:
+        self._zk = zk
+        self._value = value
+
+    def get(self) -> Any:
+        self._zk.in_flight -= 1
+        if isinstance(self._value, Exception):
+            raise self._value
+        return self._value
+
+
+class _FakeZk:
+    """
+    ZooKeeper stand-in that keeps the tree in a dict and tracks pipelined requests.
+    """
+
+    def __init__(self, paths: List[str]) -> None:
+        self.tree: Dict[str, List[str]] = {"/": []}
+        for path in paths:
+            parent = "/"
+            for name in path.strip("/").split("/"):
+                node = os.path.join(parent, name)
+                if node not in self.tree:
+                    self.tree[node] = []
+                    self.tree[parent].append(name)
+                parent = node
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.deleted: List[str] = []
+        self.transactions: List[List[str]] = []
+
+    def get_children_async(self, path: str, include_data: bool = False) -> _Result:
+        children = self._lookup(path)
+        if include_data and not isinstance(children, Exception):
+            return self._send((children, "stat"))
+        return self._send(children)
+
+    def get_async(self, path: str) -> _Result:
+        node = self._lookup(path)
+        return self._send(node if isinstance(node, Exception) else (b"data", "stat"))
+
+    def transaction(self) -> "_FakeTransaction":
+        return _FakeTransaction(self)
+
+    def delete(self, path: str, recursive: bool = False) -> None:
+        assert recursive
+        for node in [p for p in self.tree if p == path or p.startswith(path + "/")]:
+            del self.tree[node]
+        self.tree[os.path.dirname(path)].remove(os.path.basename(path))
+
+    def commit(self, paths: List[str]) -> _Result:
+        self.transactions.append(paths)
+        removed: List[str] = []
+        for i, path in enumerate(paths):
+            if path not in self.tree or path in removed:
+                return self._send(self._failed(len(paths), i, NoNodeError()))
+            if set(self.tree[path]) - {os.path.basename(p) for p in removed}:
+                return self._send(self._failed(len(paths), i, NotEmptyError()))
+            removed.append(path)
+        for path in paths:
+            self.delete(path, recursive=True)
+        return self._send([True] * len(paths))
+
+    @staticmethod
+    def _failed(size: int, index: int, error: Exception) -> List[Exception]:
+        results: List[Exception] = [RolledBackError() for _ in range(size)]
+        results[index] = error
+        return results
+
+    def _lookup(self, path: str) -> Any:
+        if path in self.deleted or path not in self.tree:
+            return NoNodeError()
+        return list(self.tree[path])
+
+    def _send(self, value: Any) -> _Result:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        return _Result(self, value)
+
+
+class _FakeTransaction:
+    def __init__(self, zk: _FakeZk) -> None:
+        self._zk = zk
+        self._paths: List[str] = []
+
+    def delete(self, path: str) -> None:
+        self._paths.append(path)
+
+    def commit_async(self) -> _Result:
+        return self._zk.commit(self._paths)
+
+
+@pytest.fixture(name="zk")
+def _zk() -> _FakeZk:
+    return _FakeZk(
+        [
+            f"/zero_copy/{table}/{part}/{replica}"
+            for table in ("t1", "t2")
+            for part in ("p1", "p2", "p3")
+            for replica in ("r1", "r2")
+        ]
+    )
+
+
+def test_walk_pipelines_requests(zk: _FakeZk) -> None:
+    nodes = list(ZookeeperTreeWalker(zk, max_in_flight=4).walk(["/zero_copy"]))  # type: ignore
+
+    paths = [node.path for node in nodes]
+    assert sorted(paths) == sorted(p for p in zk.tree if p.startswith("/zero_copy"))
+    assert all(paths.index(os.path.dirname(p)) < paths.index(p) for p in paths[1:])
+    assert zk.max_in_flight == 4
+    assert zk.in_flight == 0
+
+
+@pytest.mark.parametrize(
+    "fetch_data,fetch_stat,expected_data,expected_stat",
+    [
+        (False, False, None, None),
+        (False, True, None, "stat"),
+        (True, False, b"data", "stat"),
+    ],
+)
+def test_walk_fetches(
+    zk: _FakeZk,
+    fetch_data: bool,
+    fetch_stat: bool,
+    expected_data: Optional[bytes],
+    expected_stat: Optional[str],
+) -> None:
+    walker = ZookeeperTreeWalker(zk)  # type: ignore
+    for node in walker.walk(
+        ["/zero_copy/t1"], fetch_data=fetch_data, fetch_stat=fetch_stat
+    ):
+        assert (node.data, node.stat) == (expected_data, expected_stat)
+
+
+def test_walk_pruning(zk: _FakeZk) -> None:
+    zk.deleted.append("/zero_copy/t1/p2")
+    walker = ZookeeperTreeWalker(zk)  # type: ignore
+    paths = sorted(
+        node.path
+        for node in walker.walk(
+            ["/zero_copy"],
+            exclude=lambda path: path.endswith("p3"),
+            descend=lambda node: "r1" not in node.children,
+        )
+    )
+    assert paths == [
+        "/zero_copy",
+        "/zero_copy/t1",
+        "/zero_copy/t1/p1",
+        "/zero_copy/t2",
+        "/zero_copy/t2/p1",
+        "/zero_copy/t2/p2",
+    ]
+
+
+def test_find_paths(zk: _FakeZk) -> None:
+    paths = find_paths(zk, "/zero_copy", [r"/zero_copy/t\d/p1"], [".*/t2$"])  # type: ignore
+    assert paths == ["/zero_copy/t1/p1"]
+
+
+def test_find_leafs_and_nodes(zk: _FakeZk) -> None:
+    predicate = partial(re.match, r"/zero_copy/(t1/.*|t2/p1)/r1|/zero_copy/t1/p2/r2")
+    paths = list(find_leafs_and_nodes(zk, "/zero_copy", predicate, max_in_flight=3))  # type: ignore
+    assert sorted(paths) == [
+        "/zero_copy/t1/p1/r1",
+        "/zero_copy/t1/p2",
+        "/zero_copy/t1/p2/r1",
+        "/zero_copy/t1/p2/r2",
+        "/zero_copy/t1/p3/r1",
+        "/zero_copy/t2/p1/r1",
+    ]
+    assert paths.index("/zero_copy/t1/p2/r2") < paths.index("/zero_copy/t1/p2")
+
+
+def test_delete_recursive(zk: _FakeZk) -> None:
+    delete_recursive(zk, ["/zero_copy/t1", "/zero_copy/t2/p1", "/zero_copy/t1/p1"])  # type: ignore
+    assert sorted(zk.tree) == [
+        "/",
+        "/zero_copy",
+        "/zero_copy/t2",
+        "/zero_copy/t2/p2",
+        "/zero_copy/t2/p2/r1",
+        "/zero_copy/t2/p2/r2",
+        "/zero_copy/t2/p3",
+        "/zero_copy/t2/p3/r1",
+        "/zero_copy/t2/p3/r2",
+    ]
+    assert zk.in_flight == 0
+
+
+def test_bulk_deleter_splits_failed_transactions(zk: _FakeZk) -> None:
+    paths = [
+        "/zero_copy/t1/p1/r1",
+        "/zero_copy/t1/p1/r2",
+        "/zero_copy/t1/p1/r3",
+        "/zero_copy/t1/p1",
+        "/zero_copy/t1/p2/r1",
+        "/zero_copy/t1/p2",
+        "/zero_copy/t1/p3/r1",
+        "/zero_copy/t1/p3/r2",
+    ]
+    with ZookeeperBulkDeleter(zk, transaction_size=4, max_in_flight=2) as deleter:  # type: ignore
+        for path in paths:
+            deleter.delete(path)
+
+    assert deleter.deleted == 7
+    assert zk.tree["/zero_copy/t1"] == ["p3"]
+    assert zk.tree["/zero_copy/t1/p3"] == []
+    # /zero_copy/t1/p2 is not empty and is deleted with its remaining child
+    assert "/zero_copy/t1/p2/r2" not in zk.tree
+    # Both transactions fail and are split until failed operations are isolated
+    assert [len(transaction) for transaction in zk.transactions] == [4, 4] + [2] * 4 + [
+        1
+    ] * 4
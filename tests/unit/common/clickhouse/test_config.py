@@ -2,11 +2,12 @@ from typing import Any
 
 import pytest
 
-from ch_tools.common.clickhouse.config import ClickhouseConfig
+from ch_tools.common.clickhouse.config import ClickhouseConfig, utils
 from ch_tools.common.clickhouse.config.path import (
     CLICKHOUSE_SERVER_CONFIG_PATH,
     CLICKHOUSE_SERVER_PREPROCESSED_CONFIG_PATH,
 )
+from ch_tools.common.clickhouse.config.utils import set_disk_cache_dir
 
 # type: ignore
 
@@ -178,3 +179,34 @@ def test_config_zookeeper(fs: Any, files: Any, result: Any) -> None:
         fs.create_file(file_path, contents=contents)
 
     assert ClickhouseConfig.load().zookeeper.is_empty() == result
+
+
+def test_config_cache(fs: Any, monkeypatch: Any) -> None:
+    fs.create_file(
+        CLICKHOUSE_SERVER_CONFIG_PATH,
+        contents="<clickhouse><macros><cluster>one</cluster></macros></clickhouse>",
+    )
+    assert ClickhouseConfig.load().cluster_name == "one"
+    with monkeypatch.context() as patch:
+        patch.setattr(utils.xmltodict, "parse", None)
+        assert ClickhouseConfig.load().cluster_name == "one"
+
+    # New override file invalidates the cache
+    fs.create_file(
+        "/etc/clickhouse-server/config.d/macros.xml",
+        contents="<clickhouse><macros><cluster>two</cluster></macros></clickhouse>",
+    )
+    assert ClickhouseConfig.load().cluster_name == "two"
+
+    # Configs are not parsed if they are cached on disk
+    set_disk_cache_dir("/tmp/config-cache")
+    try:
+        assert ClickhouseConfig.load().cluster_name == "two"
+        with open(CLICKHOUSE_SERVER_CONFIG_PATH, "a", encoding="utf-8") as file:
+            file.write("\n")
+        ClickhouseConfig.load()
+        utils._cache.clear()  # pylint: disable=protected-access
+        monkeypatch.setattr(utils.xmltodict, "parse", None)
+        assert ClickhouseConfig.load().cluster_name == "two"
+    finally:
+        set_disk_cache_dir(None)
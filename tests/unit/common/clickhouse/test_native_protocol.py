@@ -0,0 +1,179 @@
+import io
+import struct
+from contextlib import contextmanager
+from datetime import timezone
+from typing import Any, Iterator, List
+
+import pytest
+
+from ch_tools.common.clickhouse.client import ClickhouseClient
+from ch_tools.common.clickhouse.client.native import (
+    NativeConnection,
+    UnsupportedResultError,
+    UnsupportedTypeError,
+    render,
+)
+from ch_tools.common.clickhouse.client.native.columns import (
+    ColumnType,
+    parse_type,
+    read_column,
+)
+from ch_tools.common.clickhouse.client.native.protocol import (
+    BinaryReader,
+    BinaryWriter,
+    ServerPacket,
+)
+from ch_tools.common.clickhouse.config.clickhouse import ClickhousePort
+
+
+def _read(data: bytes, type_name: str, n_rows: int) -> List[Any]:
+    reader = BinaryReader(io.BytesIO(data))
+    return read_column(reader, parse_type(type_name), n_rows, timezone.utc)
+
+
+@pytest.mark.parametrize(
+    "type_name,result",
+    [
+        ("UInt64", ColumnType("UInt64")),
+        ("Nullable(String)", ColumnType("Nullable", ("String",))),
+        (
+            "Map(String, Array(UInt8))",
+            ColumnType("Map", ("String", "Array(UInt8)")),
+        ),
+        (
+            "Enum8('a, b' = 1, 'c' = 2)",
+            ColumnType("Enum8", ("'a, b' = 1", "'c' = 2")),
+        ),
+    ],
+)
+def test_parse_type(type_name: str, result: ColumnType) -> None:
+    assert parse_type(type_name) == result
+
+
+@pytest.mark.parametrize(
+    "data,type_name,n_rows,result",
+    [
+        pytest.param(struct.pack("<2Q", 1, 2**64 - 1), "UInt64", 2, [1, 2**64 - 1]),
+        pytest.param(b"\x03abc\x00", "String", 2, ["abc", ""]),
+        pytest.param(b"\x00\x01\x05hello\x00", "Nullable(String)", 2, ["hello", None]),
+        pytest.param(
+            struct.pack("<2Q", 2, 3) + b"\x01\x02\x03",
+            "Array(UInt8)",
+            2,
+            [[1, 2], [3]],
+        ),
+        pytest.param(
+            struct.pack("<I", 86400 + 3661), "DateTime", 1, ["1970-01-02 01:01:01"]
+        ),
+        pytest.param(
+            struct.pack("<q", 1500),
+            "DateTime64(3, 'UTC')",
+            1,
+            ["1970-01-01 00:00:01.500"],
+        ),
+        pytest.param(struct.pack("<H", 1), "Date", 1, ["1970-01-02"]),
+        pytest.param(
+            struct.pack("<2Q", 0x0123456789ABCDEF, 0xFEDCBA9876543210),
+            "UUID",
+            1,
+            ["01234567-89ab-cdef-fedc-ba9876543210"],
+        ),
+        pytest.param(b"\x02", "Enum8('a' = 1, 'b' = 2)", 1, ["b"]),
+        pytest.param(
+            struct.pack("<Q", 1) + b"\x01k" + b"\x07",
+            "Map(String, UInt8)",
+            1,
+            [{"k": 7}],
+        ),
+        pytest.param(b"\x01\x01x", "Tuple(a UInt8, b String)", 1, [(1, "x")]),
+    ],
+)
+def test_read_column(data: bytes, type_name: str, n_rows: int, result: Any) -> None:
+    assert _read(data, type_name, n_rows) == result
+
+
+def test_read_column_unsupported_type() -> None:
+    with pytest.raises(UnsupportedTypeError):
+        _read(b"", "AggregateFunction(uniq, UInt64)", 1)
+
+
+def test_render() -> None:
+    columns = [
+        {"name": "id", "type": "UInt64"},
+        {"name": "name", "type": "Nullable(String)"},
+        {"name": "tags", "type": "Array(String)"},
+    ]
+    rows: List[List[Any]] = [[1, "a\tb", ["x", "y"]], [2, None, []]]
+
+    assert render("JSONCompact", columns, rows) == {
+        "meta": columns,
+        "data": [["1", "a\tb", ["x", "y"]], ["2", None, []]],
+        "rows": 2,
+    }
+    assert render("JSON", columns, rows)["data"][1] == {
+        "id": "2",
+        "name": None,
+        "tags": [],
+    }
+    assert render(None, columns, rows) == "1\ta\\tb\t['x','y']\n2\t\\N\t[]"
+    assert (
+        render("TabSeparatedWithNames", columns, rows[1:])
+        == "id\tname\ttags\n2\t\\N\t[]"
+    )
+
+
+class _FakeSocket:
+    def __init__(self) -> None:
+        self.sent: List[bytes] = []
+
+    def settimeout(self, _: Any) -> None:
+        pass
+
+    def sendall(self, data: bytes) -> None:
+        self.sent.append(data)
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_unsupported_result_is_not_executed_again(
+    monkeypatch: pytest.MonkeyPatch, stream: bool
+) -> None:
+    # Server response with a column of type that the client can't read
+    response = BinaryWriter()
+    response.write_varint(ServerPacket.DATA)
+    response.write_str("")  # table name
+    response.write_varint(0)  # end of block info
+    response.write_varint(1)  # columns
+    response.write_varint(1)  # rows
+    response.write_str("state")
+    response.write_str("AggregateFunction(uniq, UInt64)")
+
+    sock = _FakeSocket()
+    conn = NativeConnection(host="localhost", port=9000)
+    conn._socket = sock  # type: ignore[assignment]  # pylint: disable=protected-access
+    conn._reader = BinaryReader(  # pylint: disable=protected-access
+        io.BytesIO(response.getvalue())
+    )
+
+    @contextmanager
+    def _connection(**_kwargs: Any) -> Iterator[NativeConnection]:
+        yield conn
+
+    def _execute_clickhouse_client(*_args: Any) -> None:
+        raise AssertionError("Query is executed again with clickhouse-client")
+
+    client = ClickhouseClient(
+        host="localhost", ports={ClickhousePort.TCP: 9000}, timeout=10
+    )
+    # pylint: disable=protected-access
+    monkeypatch.setattr(client._native_pool, "connection", _connection)
+    monkeypatch.setattr(
+        client, "_execute_clickhouse_client", _execute_clickhouse_client
+    )
+
+    query = "SELECT uniqState(number) AS state FROM numbers(10)"
+    with pytest.raises(UnsupportedResultError, match="AggregateFunction"):
+        if stream:
+            list(client.iter_rows(query))
+        else:
+            client.query(query, format_="JSON")
+    assert len(sock.sent) == 1
@@ -0,0 +1,131 @@
+import gzip
+from typing import Any, Dict, List
+
+import pytest
+
+from ch_tools.common.clickhouse.client.rows import (
+    JSON_ROWS_FORMAT,
+    TSV_ROWS_FORMAT,
+    decode_json_result,
+    decode_rows,
+    encode_tsv_rows,
+    gzip_chunks,
+)
+
+
+@pytest.mark.parametrize(
+    "format_,lines,result",
+    [
+        pytest.param(
+            JSON_ROWS_FORMAT,
+            [
+                b'["name","rows","size","tags","flag"]',
+                b'["String","UInt64","Nullable(Int64)","Array(UInt64)","Bool"]',
+                b'["all_1_1_0","100",null,["1","2"],true]',
+                b'["all_2_2_0","5","-7",[],false]',
+            ],
+            [
+                {
+                    "name": "all_1_1_0",
+                    "rows": 100,
+                    "size": None,
+                    "tags": [1, 2],
+                    "flag": True,
+                },
+                {"name": "all_2_2_0", "rows": 5, "size": -7, "tags": [], "flag": False},
+            ],
+            id="JSONCompactEachRowWithNamesAndTypes",
+        ),
+        pytest.param(
+            TSV_ROWS_FORMAT,
+            [
+                b"path\tsize\tratio\tnote",
+                b"String\tUInt64\tFloat64\tNullable(String)",
+                b"a\\tb/c\t42\t0.5\t\\N",
+                b"d\\\\e\t0\tinf\tx\\ny",
+            ],
+            [
+                {"path": "a\tb/c", "size": 42, "ratio": 0.5, "note": None},
+                {"path": "d\\e", "size": 0, "ratio": float("inf"), "note": "x\ny"},
+            ],
+            id="TabSeparatedWithNamesAndTypes",
+        ),
+        pytest.param(JSON_ROWS_FORMAT, [], [], id="empty stream"),
+    ],
+)
+def test_decode_rows(
+    format_: str, lines: List[bytes], result: List[Dict[str, Any]]
+) -> None:
+    assert list(decode_rows(lines, format_)) == result
+
+
+def test_decode_rows_exception_in_stream() -> None:
+    lines = [
+        b'["name"]',
+        b'["String"]',
+        b'["a"]',
+        b"Code: 241. DB::Exception: Memory limit exceeded. (MEMORY_LIMIT_EXCEEDED)",
+    ]
+    rows = decode_rows(lines, JSON_ROWS_FORMAT)
+    assert next(rows) == {"name": "a"}
+    with pytest.raises(RuntimeError, match="MEMORY_LIMIT_EXCEEDED"):
+        next(rows)
+
+
+def test_decode_json_result() -> None:
+    result = {
+        "meta": [
+            {"name": "database", "type": "String"},
+            {"name": "bytes", "type": "UInt64"},
+        ],
+        "data": [["db1", "1024"]],
+    }
+    assert list(decode_json_result(result)) == [{"database": "db1", "bytes": 1024}]
+
+
+@pytest.mark.parametrize(
+    "format_, lines, sizes",
+    [
+        pytest.param(
+            JSON_ROWS_FORMAT,
+            [
+                b'["level","rows","sizes"]',
+                b'["UInt32","UInt64","Array(Int64)"]',
+                b'[1,"100",["-7","8"]]',
+            ],
+            ["-7", "8"],
+            id="JSONCompactEachRowWithNamesAndTypes",
+        ),
+        pytest.param(
+            TSV_ROWS_FORMAT,
+            [
+                b"level\trows\tsizes",
+                b"UInt32\tUInt64\tArray(Int64)",
+                b"1\t100\t[-7,8]",
+            ],
+            "[-7,8]",
+            id="TabSeparatedWithNamesAndTypes",
+        ),
+    ],
+)
+def test_decode_rows_quote_64bit_integers(
+    format_: str, lines: List[bytes], sizes: Any
+) -> None:
+    rows = decode_rows(lines, format_, quote_64bit_integers=True)
+    assert list(rows) == [{"level": 1, "rows": "100", "sizes": sizes}]
+
+
+def test_encode_tsv_rows() -> None:
+    rows = [("a\tb\\c\nd'", 1, None, True), ("path/to/object", 2**64 - 1, "x", False)]
+    chunks = list(encode_tsv_rows(rows * 100, chunk_size=1024))
+    assert len(chunks) > 1
+    assert all(chunk.endswith(b"\n") for chunk in chunks)
+
+    lines = [
+        b"path\tsize\tvalue\tflag",
+        b"String\tUInt64\tNullable(String)\tBool",
+        *gzip.decompress(b"".join(gzip_chunks(chunks))).splitlines(),
+    ]
+    assert [tuple(row.values()) for row in decode_rows(lines, TSV_ROWS_FORMAT)] == (
+        rows * 100
+    )
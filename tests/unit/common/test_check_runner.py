@@ -0,0 +1,67 @@
+import threading
+from typing import Any, Callable, Optional
+
+import click
+
+from ch_tools.common.check_runner import run_checks
+from ch_tools.common.result import CRIT, OK, WARNING, Status
+
+
+def _check(
+    name: str, code: int = OK, wait: Optional[Callable[[], Any]] = None
+) -> click.Command:
+    @click.command(name)
+    def _cmd() -> Status:
+        if wait:
+            wait()
+        status = Status()
+        status.append(f"{name} message")
+        status.set_code(code)
+        return status
+
+    return _cmd
+
+
+def test_run_checks_concurrently() -> None:
+    # Checks pass the barrier only if they are executed concurrently
+    barrier = threading.Barrier(3, timeout=5)
+    commands = [
+        _check("first", CRIT, barrier.wait),
+        _check("second", OK, barrier.wait),
+        _check("third", OK, barrier.wait),
+    ]
+    with click.Context(click.Command("status"), obj={}) as ctx:
+        results = run_checks(ctx, commands, max_workers=3)
+
+    assert [(r.name, r.status.code, r.status.message) for r in results] == [
+        ("first", CRIT, "first message"),
+        ("second", OK, "second message"),
+        ("third", OK, "third message"),
+    ]
+
+
+def test_run_checks_timeouts() -> None:
+    # Blocked checks are released only after the run, so they are reported
+    # as timed out if the run does not wait for them
+    release = threading.Event()
+    commands = [
+        _check("stuck", wait=lambda: release.wait(5)),
+        _check("fast"),
+        _check("queued"),
+        _check("late", wait=lambda: release.wait(5)),
+    ]
+    with click.Context(click.Command("status"), obj={}) as ctx:
+        try:
+            results = run_checks(
+                ctx, commands, max_workers=2, timeout=0.5, deadline=0.7
+            )
+        finally:
+            release.set()
+
+    assert [(r.name, r.status.code) for r in results] == [
+        ("stuck", WARNING),
+        ("fast", OK),
+        ("queued", OK),
+        ("late", WARNING),
+    ]
+    assert results[0].status.message.startswith("Check timed out after 0.5s")
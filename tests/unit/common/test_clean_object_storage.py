@@ -0,0 +1,301 @@
+import copy
+import os
+import re
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import pytest
+from pytest import MonkeyPatch
+
+from ch_tools.chadmin.internal.object_storage import s3_cleanup
+from ch_tools.chadmin.internal.object_storage.clean_checkpoint import CleanProgress
+from ch_tools.chadmin.internal.object_storage.orphaned_objects import (
+    OrphanedObjectsStats,
+)
+from ch_tools.common.clickhouse.client.rows import decode_rows
+from ch_tools.common.commands import clean_object_storage
+from ch_tools.common.commands.clean_object_storage import (
+    CleanScope,
+    _clean_object_storage_merge,
+    _delete_orphaned_objects,
+    _find_orphaned_objects_in_table,
+    _object_list_generator,
+    clean,
+)
+from ch_tools.common.config import DEFAULT_CONFIG
+
+
+def _antijoin(
+    monkeypatch: MonkeyPatch, failed_query: int, progress: Optional[CleanProgress]
+) -> List[str]:
+    queries: List[str] = []
+
+    def _execute_query(_ctx: Any, query: Any, **_kwargs: Any) -> None:
+        queries.append(str(query))
+        if len(queries) == failed_query:
+            raise RuntimeError("MEMORY_LIMIT_EXCEEDED")
+
+    monkeypatch.setattr(clean_object_storage, "execute_query", _execute_query)
+    monkeypatch.setattr(clean_object_storage, "match_ch_version", lambda *_, **__: True)
+    ctx = SimpleNamespace(
+        obj={"config": DEFAULT_CONFIG, "disk_configuration": SimpleNamespace(name="s3")}
+    )
+
+    _find_orphaned_objects_in_table(
+        ctx,  # type: ignore[arg-type]
+        SimpleNamespace(password=None),  # type: ignore[arg-type]
+        "listing",
+        "orphaned",
+        "system.remote_data_paths",
+        3,
+        {"receive_timeout": 10},
+        progress,
+    )
+    return queries
+
+
+def test_antijoin_buckets_retry(monkeypatch: MonkeyPatch) -> None:
+    queries = _antijoin(monkeypatch, 2, None)
+
+    assert len(queries) == 5
+    assert "cityHash64(obj_path) % 3 = 0" in queries[0]
+    assert queries[2] == "ALTER TABLE orphaned DROP PARTITION 1"
+    assert "cityHash64(remote_path) % 3 = 1" in queries[3]
+
+
+def test_antijoin_buckets_resume(monkeypatch: MonkeyPatch, tmp_path: str) -> None:
+    path = os.path.join(tmp_path, "checkpoint.json")
+    progress = CleanProgress.load(path, "s3", "data/", "shard", resume=True)
+    assert not progress.resumed
+    progress.update(antijoin_buckets=3, listing_done=True, done_buckets=[1])
+
+    progress = CleanProgress.load(path, "s3", "data/", "shard", resume=True)
+    assert progress.resumed
+    assert not CleanProgress.load(path, "s3", "other/", "shard", resume=True).resumed
+
+    queries = _antijoin(monkeypatch, 0, progress)
+
+    # Rows of not completed buckets inserted by the interrupted run are dropped
+    assert queries[0] == "ALTER TABLE orphaned DROP PARTITION 0"
+    assert queries[2] == "ALTER TABLE orphaned DROP PARTITION 2"
+    assert len(queries) == 4
+    progress = CleanProgress.load(path, "s3", "data/", "shard", resume=True)
+    assert progress.checkpoint.done_buckets == [1, 0, 2]
+
+    progress.remove()
+    assert not os.path.exists(path)
+
+
+class _FakeDeletion:
+    """
+    Orphaned objects table and S3 client failing the specified bulk delete request.
+    """
+
+    def __init__(self, objects: List[str], failed_request: int) -> None:
+        self.objects = objects
+        self.failed_request = failed_request
+        self.requests = 0
+        self.deleted: List[str] = []
+        self.queries: List[str] = []
+
+    def iter_rows(self, query: str, **_kwargs: Any) -> Iterator[Dict[str, Any]]:
+        self.queries.append(query)
+        match = re.search(r"obj_path > '([^']*)'", query)
+        for path in self.objects:
+            if not match or path > match.group(1):
+                yield {"obj_path": path, "obj_size": 1}
+
+    def delete_objects(self, **kwargs: Any) -> Dict:
+        self.requests += 1
+        if self.requests == self.failed_request:
+            raise RuntimeError("Connection reset")
+        self.deleted.extend(obj["Key"] for obj in kwargs["Delete"]["Objects"])
+        return {}
+
+
+def _delete(
+    monkeypatch: MonkeyPatch, fake: _FakeDeletion, progress: CleanProgress
+) -> Tuple[int, int]:
+    config: Dict[str, Any] = copy.deepcopy(DEFAULT_CONFIG)
+    config["object_storage"]["clean"]["verify"] = False
+    config["object_storage"]["clean"]["delete_workers"] = 1
+    monkeypatch.setattr(s3_cleanup, "create_s3_client", lambda *_: fake)
+    ctx = SimpleNamespace(
+        obj={
+            "config": config,
+            "disk_configuration": SimpleNamespace(name="s3", bucket_name="bucket"),
+        }
+    )
+
+    return _delete_orphaned_objects(
+        ctx,  # type: ignore[arg-type]
+        _object_list_generator(
+            fake,  # type: ignore[arg-type]
+            "orphaned",
+            {},
+            start_after=progress.checkpoint.last_deleted_key,
+        ),
+        OrphanedObjectsStats(len(fake.objects), len(fake.objects), 0, None),
+        fake,  # type: ignore[arg-type]
+        10000,
+        "system.remote_data_paths",
+        CleanScope.SHARD,
+        "data/",
+        False,
+        None,
+        3000,
+        1.0,
+        progress,
+    )
+
+
+def test_delete_resume(monkeypatch: MonkeyPatch, tmp_path: str) -> None:
+    path = os.path.join(tmp_path, "checkpoint.json")
+    objects = [f"data/{i:05}" for i in range(3500)]
+
+    progress = CleanProgress.load(path, "s3", "data/", "shard", resume=True)
+    interrupted = _FakeDeletion(objects, failed_request=3)
+    with pytest.raises(RuntimeError, match="Connection reset"):
+        _delete(monkeypatch, interrupted, progress)
+    assert interrupted.deleted == objects[:2000]
+
+    # Checkpoint is advanced after every chunk of 1000 keys
+    progress = CleanProgress.load(path, "s3", "data/", "shard", resume=True)
+    assert progress.checkpoint.last_deleted_key == "data/01999"
+    assert progress.checkpoint.deleted == 2000
+    assert progress.checkpoint.deleted_size == 2000
+
+    resumed = _FakeDeletion(objects, failed_request=0)
+    # Objects deleted by the interrupted run are counted in the limit of 3000 bytes
+    assert _delete(monkeypatch, resumed, progress) == (3000, 3000)
+    assert "WHERE obj_path > 'data/01999'" in resumed.queries[0]
+    assert resumed.deleted == objects[2000:3000]
+
+    progress = CleanProgress.load(path, "s3", "data/", "shard", resume=True)
+    assert progress.checkpoint.last_deleted_key == "data/02999"
+    assert progress.checkpoint.deleted == 3000
+
+
+@pytest.mark.parametrize(
+    "resume, keep_paths, tables_kept",
+    [
+        pytest.param(False, False, False, id="default"),
+        pytest.param(True, False, True, id="resume"),
+        pytest.param(False, True, True, id="keep-paths"),
+    ],
+)
+def test_clean_failure_keeps_tables_on_opt_in(
+    monkeypatch: MonkeyPatch,
+    tmp_path: str,
+    resume: bool,
+    keep_paths: bool,
+    tables_kept: bool,
+) -> None:
+    dropped: List[str] = []
+
+    def _fail(*_args: Any) -> None:
+        raise RuntimeError("Connection reset")
+
+    path = os.path.join(tmp_path, "checkpoint.json")
+    config: Dict[str, Any] = copy.deepcopy(DEFAULT_CONFIG)
+    config["object_storage"]["clean"]["clean_checkpoint_path"] = path
+    monkeypatch.setattr(
+        clean_object_storage, "_create_object_listing_table", lambda *_: None
+    )
+    monkeypatch.setattr(clean_object_storage, "_clean_object_storage", _fail)
+    monkeypatch.setattr(
+        clean_object_storage,
+        "_drop_table_on_shard",
+        lambda _ctx, table: dropped.append(table),
+    )
+    ctx = SimpleNamespace(
+        obj={
+            "config": config,
+            "disk_configuration": SimpleNamespace(name="s3", prefix="data/"),
+        }
+    )
+
+    with pytest.raises(RuntimeError, match="Connection reset"):
+        clean(
+            ctx,  # type: ignore[arg-type]
+            "data/",
+            None,
+            timedelta(hours=1),
+            CleanScope.SHARD,
+            "cluster",
+            False,
+            keep_paths,
+            False,
+            resume=resume,
+        )
+
+    assert (not dropped) == tables_kept
+    assert os.path.exists(path) == tables_kept
+
+
+def test_merge_antijoin_exception_in_referenced_paths(
+    monkeypatch: MonkeyPatch,
+) -> None:
+    # Paths that sort before the exception text, so it can't be detected by the order
+    listed = [f"1/data/{i}" for i in range(4)]
+    lines = {
+        "TabSeparatedWithNamesAndTypes": [b"remote_path", b"String", b"1/data/0"],
+        "JSONCompactEachRowWithNamesAndTypes": [
+            b'["remote_path"]',
+            b'["String"]',
+            b'["1/data/0"]',
+        ],
+    }
+    exception = (
+        b"Code: 241. DB::Exception: Memory limit exceeded. (MEMORY_LIMIT_EXCEEDED)"
+    )
+    deleted: List[Any] = []
+
+    def _iter_rows(_query: Any, format_: str, **_kwargs: Any) -> Iterator[Dict]:
+        return decode_rows([*lines[format_], exception], format_)
+
+    def _cleanup(_disk: Any, keys: Any, *_args: Any, **_kwargs: Any) -> Tuple:
+        deleted.extend(keys)
+        return len(deleted), len(deleted)
+
+    class _Lister:
+        def __init__(self, *_args: Any, **_kwargs: Any) -> None:
+            pass
+
+        def iter_pages(self) -> Iterator[Any]:
+            last_modified = datetime.now(timezone.utc) - timedelta(days=2)
+            yield SimpleNamespace(
+                objects=[
+                    SimpleNamespace(key=key, size=1, last_modified=last_modified)
+                    for key in listed
+                ]
+            )
+
+    config: Dict[str, Any] = copy.deepcopy(DEFAULT_CONFIG)
+    config["object_storage"]["clean"]["verify"] = False
+    ch_client = SimpleNamespace(password=None, iter_rows=_iter_rows)
+    monkeypatch.setattr(clean_object_storage, "clickhouse_client", lambda _: ch_client)
+    monkeypatch.setattr(clean_object_storage, "match_ch_version", lambda *_, **__: True)
+    monkeypatch.setattr(clean_object_storage, "S3ParallelLister", _Lister)
+    monkeypatch.setattr(clean_object_storage, "cleanup_s3_object_storage", _cleanup)
+    ctx = SimpleNamespace(
+        obj={
+            "config": config,
+            "disk_configuration": SimpleNamespace(
+                name="s3", endpoint_url="", bucket_name="bucket"
+            ),
+        }
+    )
+
+    with pytest.raises(RuntimeError, match="MEMORY_LIMIT_EXCEEDED"):
+        _clean_object_storage_merge(
+            ctx,  # type: ignore[arg-type]
+            "1/data/",
+            None,
+            timedelta(hours=1),
+            CleanScope.HOST,
+            "cluster",
+            False,
+        )
+    assert not deleted
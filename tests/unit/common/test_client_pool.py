@@ -0,0 +1,45 @@
+import threading
+from typing import Any, List
+
+from ch_tools.common.clickhouse.client import ClickhouseClient, ClickhouseClientPool
+
+
+def _client() -> ClickhouseClient:
+    return ClickhouseClient(host="localhost", ports={}, timeout=10)
+
+
+def test_clients_are_keyed_by_host() -> None:
+    client = _client()
+    pool = ClickhouseClientPool(client)
+
+    replica = pool.get("replica1")
+    assert replica.host == "replica1"
+    assert pool.get("replica1") is replica
+    assert pool.get("replica2").host == "replica2"
+    assert client.host == "localhost"
+
+
+def test_fan_out(monkeypatch: Any) -> None:
+    hosts: List[str] = []
+    lock = threading.Lock()
+    # Queries pass the barrier only if they are executed concurrently
+    barrier = threading.Barrier(3, timeout=5)
+
+    def _query(self: ClickhouseClient, query: str, **kwargs: Any) -> str:
+        barrier.wait()
+        if self.host == "replica2":
+            raise RuntimeError("unavailable")
+        with lock:
+            hosts.append(self.host)
+        return f"{query} on {self.host} with {kwargs}"
+
+    monkeypatch.setattr(ClickhouseClient, "query", _query)
+    pool = ClickhouseClientPool(_client())
+
+    results = pool.fan_out("SELECT 1", ["replica1", "replica2", "replica3"], timeout=5)
+
+    assert list(results) == ["replica1", "replica2", "replica3"]
+    assert results["replica1"].result == "SELECT 1 on replica1 with {'timeout': 5}"
+    assert results["replica1"].error is None
+    assert repr(results["replica2"].error) == "RuntimeError('unavailable')"
+    assert sorted(hosts) == ["replica1", "replica3"]
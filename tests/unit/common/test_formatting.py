@@ -0,0 +1,32 @@
+import pytest
+
+from ch_tools.common.cli import formatting
+from ch_tools.common.cli.formatting import print_table, print_table_stream
+
+
+def test_print_table_stream(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture
+) -> None:
+    monkeypatch.setattr(formatting, "TABLE_PAGE_SIZE", 2)
+    rows = [
+        {"name": "all_1_1_0", "rows": 1, "ratio": 0.5},
+        {"name": "all_2_2_0", "rows": 10, "ratio": None},
+        {"name": "all_3_3_0", "rows": 123, "ratio": 1.25},
+        {"name": "all_4_4_0_5", "rows": 123456789, "ratio": 2.0},
+    ]
+
+    print_table(rows[:2])
+    first_page = capsys.readouterr().out.splitlines()
+    print_table_stream(iter(rows))
+    lines = capsys.readouterr().out.splitlines()
+
+    assert lines[:4] == first_page
+    assert lines[4] == "all_3_3_0     123     1.25"
+    assert len(lines[4]) == len(lines[1])
+    # Values are never truncated
+    assert lines[5] == "all_4_4_0_5  123456789        2"
+
+
+def test_print_table_stream_empty(capsys: pytest.CaptureFixture) -> None:
+    print_table_stream(iter([]))
+    assert capsys.readouterr().out == "\n"
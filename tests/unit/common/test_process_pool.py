@@ -0,0 +1,73 @@
+import threading
+import time
+from typing import Dict
+
+import pytest
+
+from ch_tools.common.process_pool import WorkerTask, execute_tasks_in_parallel
+
+
+class _Tracker:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.running: Dict[str, int] = {}
+        self.max_running: Dict[str, int] = {}
+        self.executed = 0
+
+    def task(self, table: str, fail: bool = False) -> str:
+        with self.lock:
+            self.running[table] = self.running.get(table, 0) + 1
+            self.max_running[table] = max(
+                self.max_running.get(table, 0), self.running[table]
+            )
+            self.executed += 1
+        time.sleep(0.01)
+        with self.lock:
+            self.running[table] -= 1
+        if fail:
+            raise RuntimeError(f"failed {table}")
+        return table
+
+
+def _tasks(tracker: _Tracker, tables: int, per_table: int, fail: bool = False) -> list:
+    return [
+        WorkerTask(
+            f"t{t}-p{p}",
+            tracker.task,
+            {"table": f"t{t}", "fail": fail},
+            group=f"t{t}",
+        )
+        for t in range(tables)
+        for p in range(per_table)
+    ]
+
+
+def test_max_tasks_per_group() -> None:
+    tracker = _Tracker()
+    result = execute_tasks_in_parallel(
+        _tasks(tracker, tables=3, per_table=5), max_workers=8, max_tasks_per_group=1
+    )
+    assert len(result) == 15
+    assert tracker.max_running == {"t0": 1, "t1": 1, "t2": 1}
+
+
+def test_keep_going_with_limit_errors() -> None:
+    tracker = _Tracker()
+    result = execute_tasks_in_parallel(
+        _tasks(tracker, tables=10, per_table=2, fail=True),
+        max_workers=2,
+        keep_going=True,
+        limit_errors=3,
+    )
+    assert 3 <= len(result) < 20
+    assert tracker.executed == len(result)
+    assert all(isinstance(value, RuntimeError) for value in result.values())
+
+
+def test_stop_on_first_error() -> None:
+    tracker = _Tracker()
+    with pytest.raises(RuntimeError):
+        execute_tasks_in_parallel(
+            _tasks(tracker, tables=10, per_table=2, fail=True), max_workers=2
+        )
+    assert tracker.executed <= 2
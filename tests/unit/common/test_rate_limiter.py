@@ -0,0 +1,25 @@
+import time
+
+from ch_tools.common.rate_limiter import TokenBucket
+
+
+def test_unlimited() -> None:
+    bucket = TokenBucket(0)
+    assert all(bucket.acquire(10**9) == 0 for _ in range(100))
+
+
+def test_rate_limit() -> None:
+    bucket = TokenBucket(100)
+    start = time.monotonic()
+    # The first second of tokens is available immediately
+    assert bucket.acquire(100) == 0
+    for _ in range(10):
+        bucket.acquire(5)
+    assert time.monotonic() - start >= 0.45
+
+
+def test_large_request_goes_into_debt() -> None:
+    bucket = TokenBucket(1000)
+    # The request exceeding the capacity waits only for the missing tokens
+    assert 0.05 < bucket.acquire(1100) < 0.2
+    assert bucket.acquire(100) > 0.05
@@ -0,0 +1,80 @@
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import click
+
+from ch_tools.common.result import CRIT, Status
+from ch_tools.monrun_checks.client import query_daemon
+from ch_tools.monrun_checks.daemon import MonitoringDaemon, _UnixServer
+
+CONFIG: Dict[str, Any] = {"monitoring": {"output": {"escaping_rules": []}}}
+TIMEOUT = 10
+
+
+def _check(
+    name: str,
+    calls: list,
+    ran: Optional[threading.Event] = None,
+    runs: int = 1,
+) -> click.Command:
+    """
+    Check that records its runs and sets the event after the specified number of them.
+    """
+
+    @click.command(name)
+    def _cmd() -> Status:
+        calls.append(name)
+        if ran is not None and calls.count(name) >= runs:
+            ran.set()
+        status = Status()
+        status.append(f"{name} failed")
+        status.set_code(CRIT)
+        return status
+
+    return _cmd
+
+
+def _wait_result(name: str, socket_path: str) -> Optional[str]:
+    """
+    Poll the daemon until the result of the check is cached or the deadline passes.
+    """
+    deadline = time.monotonic() + TIMEOUT
+    while True:
+        result = query_daemon(name, socket_path)
+        if result is not None or time.monotonic() > deadline:
+            return result
+        time.sleep(0.01)
+
+
+def test_daemon_serves_cached_results(tmp_path: str) -> None:
+    socket_path = os.path.join(tmp_path, "ch-monitoring.sock")
+    calls: list = []
+    ping_ran = threading.Event()
+    commands = [_check("ping", calls, ping_ran, runs=3), _check("slow", calls)]
+    with click.Context(click.Command("daemon"), obj={"config": CONFIG}) as ctx:
+        daemon = MonitoringDaemon(
+            ctx, commands, {"ping": 0.1, "slow": 60}, ttl=TIMEOUT, max_workers=2
+        )
+        server = _UnixServer(socket_path, daemon)
+        scheduler = threading.Thread(target=daemon.run_scheduler)
+        scheduler.start()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            assert ping_ran.wait(TIMEOUT)
+            assert _wait_result("ping", socket_path) == "2;ping failed\n"
+            assert _wait_result("slow", socket_path) == "2;slow failed\n"
+            assert query_daemon("unknown", socket_path) is None
+        finally:
+            daemon.stop()
+            server.shutdown()
+            server.server_close()
+            scheduler.join()
+
+    assert calls.count("ping") >= 3
+    assert calls.count("slow") == 1
+
+
+def test_query_daemon_without_daemon(tmp_path: str) -> None:
+    assert query_daemon("ping", os.path.join(tmp_path, "missing.sock")) is None
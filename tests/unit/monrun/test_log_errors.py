@@ -0,0 +1,75 @@
+import os
+import re
+import time
+from typing import List
+
+from ch_tools.monrun_checks.ch_log_errors import ErrorCounter, count_errors
+
+NOW = int(time.mktime((2024, 3, 1, 12, 0, 0, 0, 0, -1)))
+
+
+def _lines(*entries: int, level: str = "Error", text: str = "failed") -> str:
+    return "".join(
+        f"{time.strftime('%Y.%m.%d %H:%M:%S', time.localtime(NOW - ago))}.123456 "
+        f"[ 1 ] {{}} <{level}> executeQuery: {text}\n"
+        for ago in entries
+    )
+
+
+def _append(path: str, data: str) -> None:
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(data)
+
+
+def test_error_counter() -> None:
+    counter = ErrorCounter(10, 100)
+    for timestamp in [80, 90, 91, 95, 100]:
+        counter.add(timestamp)
+    assert counter.total == 3
+
+    counter.advance(104)
+    assert counter.total == 2
+    counter.add(110)
+    assert counter.total == 1
+    counter.advance(200)
+    assert counter.total == 0
+
+
+def test_count_errors_incrementally(tmp_path: str) -> None:
+    logfile = os.path.join(tmp_path, "clickhouse-server.err.log")
+    state_file = os.path.join(tmp_path, "state.json")
+    exclude = re.compile("excluded")
+    _append(logfile, _lines(700, 30, 20) + _lines(10, level="Warning"))
+    _append(logfile, _lines(5, text="excluded") + _lines(1) + "2024.03.01 12:00:00")
+
+    def _count(now: int) -> int:
+        return count_errors(logfile, 60, exclude, state_file, now)
+
+    assert _count(NOW) == 3
+
+    # Lines counted by the previous run are not read again
+    with open(logfile, "r+b") as f:
+        f.write(b"X" * 100)
+    _append(logfile, " <Error> partial line\n" + _lines(-3, -4))
+    assert _count(NOW + 5) == 6
+    assert _count(NOW + 45) == 4
+
+    # The tail of the rotated log is read
+    _append(logfile, _lines(-50))
+    os.rename(logfile, f"{logfile}.1")
+    _append(logfile, _lines(-55))
+    assert _count(NOW + 60) == 4
+
+
+def test_count_errors_resets_state(tmp_path: str) -> None:
+    logfile = os.path.join(tmp_path, "clickhouse-server.err.log")
+    state_file = os.path.join(tmp_path, "state.json")
+    _append(logfile, _lines(100, 50, 1))
+
+    results: List[int] = [
+        count_errors(logfile, 60, None, state_file, NOW),
+        count_errors(logfile, 120, None, state_file, NOW),
+        count_errors(logfile, 120, re.compile("failed"), state_file, NOW),
+        count_errors(logfile, 120, None, state_file, NOW + 1000),
+    ]
+    assert results == [2, 3, 0, 0]
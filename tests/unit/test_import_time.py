@@ -0,0 +1,53 @@
+"""
+Lazy loading of command line entry points.
+
+Modules of commands are imported lazily, so heavy dependencies must not be loaded
+on the start of tools. Import time itself is measured in tests/benchmarks.
+"""
+
+import re
+import subprocess
+import sys
+
+from click.testing import CliRunner
+from pytest import mark
+
+from ch_tools.chadmin.chadmin_cli import cli as chadmin_cli
+
+HEAVY_MODULES = [
+    "boto3",
+    "botocore",
+    "deepdiff",
+    "jinja2",
+    "kazoo",
+    "lxml",
+    "OpenSSL",
+    "pygments",
+    "requests",
+]
+
+
+@mark.parametrize(
+    "module", ["ch_tools.chadmin.chadmin_cli", "ch_tools.monrun_checks.main"]
+)
+def test_heavy_modules_not_imported(module: str) -> None:
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            f"import sys, {module}; print(' '.join(sys.modules))",
+        ],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+
+    loaded = set(result.stdout.split())
+    assert [m for m in HEAVY_MODULES if m in loaded] == []
+
+
+def test_help_lists_lazy_commands() -> None:
+    result = CliRunner().invoke(chadmin_cli, ["--help"])
+    assert result.exit_code == 0
+    assert re.search(r"^  macros +Show macros\.$", result.output, re.M)
+    assert re.search(r"^  zookeeper +", result.output, re.M)